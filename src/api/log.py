@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# All project loggers live under this namespace (logging.getLogger(__name__) inside src/)
+ROOT_LOGGER = "src"
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and becomes a JSON field
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+_sampler: Optional["InfoSampler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event + any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class InfoSampler(logging.Filter):
+    """Keep a random `rate` share of INFO-and-below records; warnings and errors always pass."""
+
+    def __init__(self, rate: float = 1.0) -> None:
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueue the raw record; message interpolation and JSON encoding happen on the
+    listener thread, not on the request thread. Log immutable values only.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: str = "INFO", info_sample_rate: float = 1.0, stream=None) -> None:
+    """
+    Route every `src.*` logger through a queue to a background JSON-lines writer.
+    Idempotent: calling again only updates level and sampling.
+    """
+    global _listener, _sampler
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(str(level).upper())
+
+    if _listener is not None:
+        _sampler.rate = float(info_sample_rate)
+        return
+
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _sampler = InfoSampler(info_sample_rate)
+    qh = _DeferredQueueHandler(q)
+    qh.addFilter(_sampler)
+
+    out = logging.StreamHandler(stream or sys.stdout)
+    out.setFormatter(JsonFormatter())
+
+    logger.handlers = [qh]
+    logger.propagate = False
+
+    _listener = QueueListener(q, out, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    if _listener is None:
+        setup_logging()
+    return logging.getLogger(name)
@@ -1,5 +1,7 @@
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+import time
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import RedirectResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import json
 from datetime import datetime
@@ -9,13 +11,20 @@ import pandas as pd
 from src.api.schemas import (
     RecommendRequest, RecommendResponse, MovieRecommendation,
     FeedbackRequest, FeedbackResponse,
-    GenresResponse
+    GenresResponse, SimilarResponse
 )
 from src.llm.intent_parser import parse_mood_to_filters
 from src.llm.reasoning import generate_reason
 from src.api.deps import get_recommender
 from src.api.settings import settings
 from src.api.filters import apply_filters
+from src.api import metrics
+from src.api.metrics import stage, trace_stages, summarize_trace
+from src.api.profiling import SortKey, profiler
+from src.api.log import get_logger, setup_logging
+
+setup_logging(level=settings.LOG_LEVEL, info_sample_rate=settings.LOG_INFO_SAMPLE_RATE)
+logger = get_logger(__name__)
 
 app = FastAPI(
     title="OFF Hours — Hybrid Movie Recommendation API",
@@ -53,13 +62,34 @@ def reload_model():
     get_recommender.cache_clear()
     # Warm up
     r = get_recommender()
+    metrics.set_model_gauges(r)
     return {
         "status": "reloaded", 
-        "run_dir": str(r.run_dir),
+        "run_dir": str(getattr(r, "run_dir", None)),
         "cf_enabled": r.cf_enabled
     }
 
 
+@app.post("/admin/profile")
+def arm_profiler(n_requests: int = Query(default=20, ge=0, le=10000)):
+    """Profile the next N /recommend requests with cProfile (0 disarms)."""
+    profiler.arm(n_requests)
+    return {"status": "armed" if n_requests else "disarmed", "remaining": profiler.remaining}
+
+
+@app.get("/admin/profile")
+def profile_report(sort: SortKey = "cumulative", limit: int = Query(default=40, ge=1, le=500)):
+    """Aggregated cProfile stats of the requests sampled since the last arm."""
+    return profiler.report(sort=sort, limit=limit)
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition (per-stage latency histograms, mode/fallback counters, model gauges)."""
+    metrics.set_model_gauges(get_recommender())
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/genres", response_model=GenresResponse)
 def genres():
     r = get_recommender()
@@ -77,9 +107,15 @@ def genres():
     return {"genres": sorted(all_genres)}
 
 
+# score column of the returned frame -> mode that actually produced it
+SCORE_COLUMNS = {"trend_score": "trending", "cf_score": "cf", "bayes_score": "baseline"}
+
+
 def _default_reason(mode: str) -> str:
     if mode == "baseline":
         return "Popular picks based on global ratings and popularity."
+    if mode == "trending":
+        return "Trending now, based on recent ratings and swipes."
     if mode == "cf":
         return "Personalized picks based on similar users' ratings."
     return "Personalized if possible, otherwise popular picks."
@@ -106,7 +142,15 @@ from src.llm.intent_parser import parse_mood_to_filters
 from src.llm.reasoning import generate_reason
 
 @app.post("/recommend", response_model=RecommendResponse)
-def recommend(req: RecommendRequest):
+def recommend(req: RecommendRequest, x_debug_timing: Optional[str] = Header(default=None)):
+    # Opt-in per-request stage breakdown (body flag or X-Debug-Timing: 1); sampled cProfile when armed
+    debug = req.debug or (x_debug_timing or "").lower() in ("1", "true", "yes")
+    with profiler.maybe_profile(), trace_stages(debug) as trace:
+        return _recommend(req, trace)
+
+
+def _recommend(req: RecommendRequest, trace) -> Response:
+    t_request = time.perf_counter()
     r = get_recommender()
     constraints = req.constraints or {}
 
@@ -114,34 +158,35 @@ def recommend(req: RecommendRequest):
     user_id = req.user_id
     mode = (req.mode or "auto").lower()
     
-    can_use_cf = (r.cf_enabled and user_id is not None)
-
-    if mode == "auto":
-        seen_count = 0
-        if can_use_cf:
-            try:
-                r._load_user_seen()
-                seen_count = len(r._user_seen.get(int(user_id), set()))
-            except: pass
-        
-        # Add real-time swiped movies to the count if provided in constraints
-        swiped_ids = constraints.get("exclude_movieIds", [])
-        total_history_signal = seen_count + len(swiped_ids)
-
-        # Decision: Use CF only if user has 5+ interactions total (Historical + Current Session)
-        if can_use_cf and total_history_signal >= 5:
-            mode = "cf"
-        else:
-            mode = "baseline"
-        print(f"[INFO] Orchestrator selected mode: {mode} (history={seen_count}, swiped={len(swiped_ids)})")
+    with stage("mode_selection"):
+        can_use_cf = (r.cf_enabled and user_id is not None)
+
+        if mode == "auto":
+            seen_count = 0
+            if can_use_cf:
+                try:
+                    seen_count = r.seen_count(int(user_id))
+                except: pass
+            
+            # Add real-time swiped movies to the count if provided in constraints
+            swiped_ids = constraints.get("exclude_movieIds", [])
+            total_history_signal = seen_count + len(swiped_ids)
+
+            # Decision: Use CF only if user has 5+ interactions total (Historical + Current Session)
+            if can_use_cf and total_history_signal >= 5:
+                mode = "cf"
+            else:
+                mode = "baseline"
+            logger.info("orchestrator_mode_selected", extra={"mode": mode, "history": seen_count, "swiped": len(swiped_ids)})
 
     # 2. LLM Intent Parsing
     intent_obj = None
     
     if req.query and len(req.query.strip()) > 2:
-        print(f"[INFO] Triggering LLM Intent Parser for query: '{req.query}'")
-        intent_obj = parse_mood_to_filters(req.query)
-        print(f"[INFO] LLM Intent: {intent_obj}")
+        logger.info("llm_intent_parse", extra={"query": req.query})
+        with stage("intent_parse"):
+            intent_obj = parse_mood_to_filters(req.query)
+        logger.info("llm_intent_parsed", extra={"intent": intent_obj})
 
     # Map LLM Intent Object (New Schema) to Recommendation Constraints
     llm_expl = None
@@ -162,7 +207,7 @@ def recommend(req: RecommendRequest):
             if "max_year" not in constraints: constraints["max_year"] = yr[1]
 
     # 3. Recommendation Generation
-    print(f"[INFO] Generating recommendations: mode={mode}, k={req.k}, constraints={list(constraints.keys())}")
+    logger.info("generate_recommendations", extra={"mode": mode, "k": req.k, "constraints": list(constraints.keys())})
     df = r.recommend(
         user_id=user_id,
         k=int(req.k),
@@ -174,7 +219,8 @@ def recommend(req: RecommendRequest):
     # 4. Enforce Baseline Fallback if results are empty
     # If the first attempt (with all constraints) is empty, it's often because of a too-strict year or genre filter.
     if df.empty:
-        print("[WARN] No results found with full constraints. Relaxing restrictions...")
+        logger.warning("empty_results_relaxing_constraints")
+        metrics.RELAXATION_FALLBACKS.labels("relaxed").inc()
         
         # Try 1: Keep genres/mood but drop year/rating constraints
         relaxed_constraints = {
@@ -185,61 +231,132 @@ def recommend(req: RecommendRequest):
         
         # If still empty, Final safety net (global favorites)
         if df.empty:
-            print("[WARN] Final safety net: Serving global top picked directly.")
+            logger.warning("empty_results_serving_global_top")
+            metrics.RELAXATION_FALLBACKS.labels("global").inc()
             df = r.recommend_baseline(user_id=user_id, k=int(req.k))
 
+    # fallbacks (relaxation, no trending.npz / CF model) serve baseline rows whatever the mode
+    score_col = next((c for c in SCORE_COLUMNS if c in df.columns), None)
+    if df.empty:
+        metrics.EMPTY_RESULTS.inc()
+    elif score_col:
+        metrics.MODE_SELECTED.labels(SCORE_COLUMNS[score_col]).inc()
+
     # 5. Enrich with Explanations & Metadata
-    recs = []
-    
-    # Fetch user liked titles for the reasoning engine
-    user_liked_titles = []
-    if user_id:
-        try:
-            ix = pd.read_parquet("data/interactions.parquet")
-            u_likes = ix[(ix["userId"] == user_id) & (ix["rating"] >= 4.0)].sort_values("timestamp", ascending=False).head(5)
-            if not u_likes.empty and r.movies_df is not None:
-                liked_ids = u_likes["movieId"].tolist()
-                user_liked_titles = r.movies_df[r.movies_df["movieId"].isin(liked_ids)]["title"].tolist()
-        except: pass
-
-    for i, (_, row) in enumerate(df.iterrows()):
-        # Reasoning Priority:
-        # 1. LLM "explanation" from intent (for top 1)
-        # 2. Reasoning Engine (for top 3)
-        # 3. Fallback logic
-        reason = "Recommended for you."
-        if i == 0 and llm_expl:
-            reason = llm_expl
-        elif user_liked_titles and i < 3:
-            reason = generate_reason(user_liked_titles, row["title"], row.get("genres", ""))
-        elif "genres" in row:
-            top_g = row["genres"].split("|")[0]
-            reason = f"A top choice for {top_g} lovers."
+    reasons = []
+    with stage("reason_generation"):
+        # Fetch user liked titles for the reasoning engine
+        user_liked_titles = []
+        if user_id:
+            try:
+                ix = pd.read_parquet("data/interactions.parquet")
+                u_likes = ix[(ix["userId"] == user_id) & (ix["rating"] >= 4.0)].sort_values("timestamp", ascending=False).head(5)
+                if not u_likes.empty and r.movies_df is not None:
+                    liked_ids = u_likes["movieId"].tolist()
+                    user_liked_titles = r.movies_df[r.movies_df["movieId"].isin(liked_ids)]["title"].tolist()
+            except: pass
+
+        for i, (_, row) in enumerate(df.iterrows()):
+            # Reasoning Priority:
+            # 1. LLM "explanation" from intent (for top 1)
+            # 2. Reasoning Engine (for top 3)
+            # 3. Fallback logic
+            reason = "Recommended for you."
+            if i == 0 and llm_expl:
+                reason = llm_expl
+            elif user_liked_titles and i < 3:
+                reason = generate_reason(user_liked_titles, row["title"], row.get("genres", ""))
+            elif "genres" in row:
+                top_g = row["genres"].split("|")[0]
+                reason = f"A top choice for {top_g} lovers."
+            reasons.append(reason)
+
+    with stage("serialization"):
+        recs = []
+        for reason, (_, row) in zip(reasons, df.iterrows()):
+            recs.append(MovieRecommendation(
+                movieId=int(row["movieId"]),
+                title=row["title"],
+                genres=row.get("genres"),
+                score=float(row[score_col]) if score_col and pd.notnull(row[score_col]) else 0.0,
+                reason=reason,
+                year=int(row["year"]) if pd.notnull(row.get("year")) else None,
+                rating=float(row["rating"]) if "rating" in row else None,
+                description=_safe(row, "description"),
+                poster=_safe(row, "poster") or f"https://via.placeholder.com/300x450?text={row['title']}",
+                backdrop=_safe(row, "backdrop"),
+                duration=int(row["duration"]) if pd.notnull(row.get("duration")) else None
+            ))
+
+        intent_debug = {
+            "mode": mode,
+            "llm_parsed": intent_obj,
+            "final_constraints": {k: v for k, v in constraints.items() if v}
+        }
+        if trace is not None:
+            # serialization itself cannot be part of the payload it produces
+            intent_debug["timings"] = {
+                **summarize_trace(trace),
+                "elapsed_ms": round((time.perf_counter() - t_request) * 1000.0, 3),
+            }
+
+        body = RecommendResponse(
+            intent=intent_debug,
+            recommendations=recs
+        ).model_dump_json()
+
+    metrics.REQUEST_LATENCY.observe(time.perf_counter() - t_request)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/similar/{movie_id}", response_model=SimilarResponse)
+def similar(
+    movie_id: int,
+    k: int = Query(default=10, ge=1, le=50),
+    user_id: Optional[int] = None,
+    genres_in: Optional[List[str]] = Query(default=None),
+    genres_out: Optional[List[str]] = Query(default=None),
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    min_avg_rating: Optional[float] = None,
+    min_n_ratings: Optional[int] = None,
+    exclude_movieIds: Optional[List[int]] = Query(default=None),
+):
+    """More like this: the movie's precomputed item-item neighbors, filtered like /recommend constraints."""
+    r = get_recommender()
+    if r.neighbors is None:
+        raise HTTPException(status_code=503, detail="No neighbors artifact in the current run; retrain with --neighbors_k")
+
+    constraints = {key: v for key, v in {
+        "genres_in": genres_in, "genres_out": genres_out, "min_year": min_year, "max_year": max_year,
+        "min_avg_rating": min_avg_rating, "min_n_ratings": min_n_ratings, "exclude_movieIds": exclude_movieIds,
+    }.items() if v is not None}
+    df = r.recommend_similar(movie_id, k=k, user_id=user_id, constraints=constraints)
+    if df is None:
+        raise HTTPException(status_code=404, detail=f"No neighbors for movieId {movie_id}")
 
+    movies = r.movies_by_id()
+    title = movies["title"].get(movie_id) if movies is not None and "title" in movies.columns else None
+    reason = f"Similar to {title}." if isinstance(title, str) and title else "Similar to the movie you picked."
+
+    recs = []
+    for _, row in df.iterrows():
+        if pd.isna(row.get("title")):
+            continue
         recs.append(MovieRecommendation(
             movieId=int(row["movieId"]),
             title=row["title"],
             genres=row.get("genres"),
-            score=float(row.get("cf_score") if mode=="cf" else row.get("bayes_score", 0.0)),
+            score=float(row["similarity"]),
             reason=reason,
             year=int(row["year"]) if pd.notnull(row.get("year")) else None,
-            rating=float(row["rating"]) if "rating" in row else None,
-            description=row.get("description"),
-            poster=row.get("poster") or f"https://via.placeholder.com/300x450?text={row['title']}",
-            backdrop=row.get("backdrop"),
+            rating=float(row["rating"]) if "rating" in row and pd.notnull(row.get("rating")) else None,
+            description=_safe(row, "description"),
+            poster=_safe(row, "poster") or f"https://via.placeholder.com/300x450?text={row['title']}",
+            backdrop=_safe(row, "backdrop"),
             duration=int(row["duration"]) if pd.notnull(row.get("duration")) else None
         ))
-
-    intent_debug = {
-        "mode": mode,
-        "llm_parsed": intent_obj,
-        "final_constraints": {k: v for k, v in constraints.items() if v}
-    }
-
-    return RecommendResponse(
-        intent=intent_debug,
-        recommendations=recs
-    )
+    return {"movieId": movie_id, "source": r.neighbors.source, "recommendations": recs}
 
 
 @app.post("/feedback", response_model=FeedbackResponse)
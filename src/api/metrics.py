@@ -0,0 +1,282 @@
+# Minimal in-process metrics registry rendered in the Prometheus text exposition format.
+# Dependency-free on purpose: an observation is a bisect + two adds under a lock (~1us).
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; dense below 200ms (README latency target)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str, **kw: str):
+        if kw:
+            values = tuple(str(kw[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(child.value)}")
+        return lines
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children = {}
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(child.value)}")
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cum = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, values, le)} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, values)} {repr(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, values)} {cum}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY: Histogram = REGISTRY.register(Histogram(
+    "recommend_stage_seconds",
+    "Latency of /recommend pipeline stages.",
+    labelnames=("stage",),
+))
+REQUEST_LATENCY: Histogram = REGISTRY.register(Histogram(
+    "recommend_request_seconds",
+    "End-to-end latency of /recommend.",
+))
+MODE_SELECTED: Counter = REGISTRY.register(Counter(
+    "recommend_mode_total",
+    "Recommendation mode actually served (read from the returned score column, after fallbacks).",
+    labelnames=("mode",),
+))
+RELAXATION_FALLBACKS: Counter = REGISTRY.register(Counter(
+    "recommend_relaxation_total",
+    "Constraint relaxation fallbacks triggered by empty results.",
+    labelnames=("level",),
+))
+EMPTY_RESULTS: Counter = REGISTRY.register(Counter(
+    "recommend_empty_results_total",
+    "Requests that returned no recommendations at all.",
+))
+MODEL_INFO: Gauge = REGISTRY.register(Gauge(
+    "recommender_model_info",
+    "Loaded model run (value is always 1).",
+    labelnames=("run_dir", "cf_enabled"),
+))
+CATALOG_SIZE: Gauge = REGISTRY.register(Gauge(
+    "recommender_catalog_size",
+    "Number of movies in the serving catalog.",
+))
+BASELINE_SIZE: Gauge = REGISTRY.register(Gauge(
+    "recommender_baseline_size",
+    "Number of rows in the baseline popularity table.",
+))
+
+
+# Per-request stage trace; None (the default) means tracing is off for this request
+_TRACE: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stage_trace", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into recommend_stage_seconds{stage=name} (and the request trace, if on)."""
+    child = STAGE_LATENCY.labels(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        child.observe(dt)
+        trace = _TRACE.get()
+        if trace is not None:
+            trace.append((name, dt))
+
+
+@contextmanager
+def trace_stages(enabled: bool) -> Iterator[Optional[List[Tuple[str, float]]]]:
+    """Collect (stage, seconds) for every stage() timed in this context; yields None when disabled."""
+    if not enabled:
+        yield None
+        return
+    trace: List[Tuple[str, float]] = []
+    token = _TRACE.set(trace)
+    try:
+        yield trace
+    finally:
+        _TRACE.reset(token)
+
+
+def summarize_trace(trace: List[Tuple[str, float]]) -> Dict[str, object]:
+    """Stage-by-stage breakdown in ms, in execution order, plus per-stage totals."""
+    totals: Dict[str, float] = {}
+    for name, dt in trace:
+        totals[name] = totals.get(name, 0.0) + dt * 1000.0
+    return {
+        "stages": [{"stage": name, "ms": round(dt * 1000.0, 3)} for name, dt in trace],
+        "totals_ms": {k: round(v, 3) for k, v in totals.items()},
+    }
+
+
+def set_model_gauges(recommender) -> None:
+    run_dir = getattr(recommender, "run_dir", None)
+    MODEL_INFO.clear()
+    MODEL_INFO.labels(str(run_dir) if run_dir else "none", str(bool(recommender.cf_enabled)).lower()).set(1)
+    movies = recommender.movies
+    CATALOG_SIZE.set(0 if movies is None else len(movies))
+    top = recommender.top_global
+    BASELINE_SIZE.set(0 if top is None else len(top))
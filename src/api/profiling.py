@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Literal, Optional
+
+# pstats.Stats.sort_stats keys (anything else raises KeyError)
+SortKey = Literal["calls", "cumtime", "cumulative", "filename", "line", "module", "name", "ncalls",
+                  "nfl", "pcalls", "stdname", "time", "tottime"]
+
+class RequestProfiler:
+    """
+    On-demand cProfile sampling for the serving path.
+    - arm(n) profiles the next n requests (one at a time; concurrent ones are skipped)
+    - report() returns the aggregated pstats of everything sampled since arming
+    Disarmed cost per request: one int comparison.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._remaining = 0
+        self._sampled = 0
+        self._stats: Optional[pstats.Stats] = None
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    def arm(self, n_requests: int) -> None:
+        with self._lock:
+            self._remaining = max(0, int(n_requests))
+            self._sampled = 0
+            self._stats = None
+
+    def disarm(self) -> None:
+        with self._lock:
+            self._remaining = 0
+
+    def _claim(self) -> bool:
+        if self._remaining <= 0:
+            return False
+        if not self._busy.acquire(blocking=False):
+            return False
+        with self._lock:
+            if self._remaining <= 0:
+                self._busy.release()
+                return False
+            self._remaining -= 1
+        return True
+
+    @contextmanager
+    def maybe_profile(self) -> Iterator[None]:
+        if not self._claim():
+            yield
+            return
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(prof)
+                else:
+                    self._stats.add(prof)
+                self._sampled += 1
+            self._busy.release()
+
+    def report(self, sort: SortKey = "cumulative", limit: int = 40) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {"sampled_requests": self._sampled, "remaining": self._remaining, "profile": ""}
+            if self._stats is None:
+                return out
+            buf = io.StringIO()
+            self._stats.stream = buf
+            self._stats.sort_stats(sort).print_stats(int(limit))
+            out["profile"] = buf.getvalue()
+            return out
+
+
+profiler = RequestProfiler()
@@ -7,8 +7,9 @@ class RecommendRequest(BaseModel):
     user_id: Optional[int] = Field(default=None, description="User id for personalized mode (CF)")
     query: str = Field(default="", description="Free text (LLM later / optional)")
     k: int = Field(default=5, ge=1, le=50)
-    mode: Literal["baseline", "cf", "auto"] = "auto"
+    mode: Literal["baseline", "trending", "cf", "auto"] = "auto"
     candidate_pool: int = Field(default=2000, ge=100, le=20000)
+    debug: bool = Field(default=False, description="Return a stage-by-stage timing breakdown in intent.timings")
 
     constraints: Optional[Dict[str, Any]] = None
     # Expected keys:
@@ -56,6 +57,12 @@ class RecommendResponse(BaseModel):
     recommendations: List[MovieRecommendation]
 
 
+class SimilarResponse(BaseModel):
+    movieId: int
+    source: str
+    recommendations: List[MovieRecommendation]
+
+
 class FeedbackResponse(BaseModel):
     status: str
     received: dict
@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.shared_arrays import SHARED, attach, release, share
+
+
+@dataclass
+class BatchEvalConfig:
+    k: int = 10
+    mode: str = "baseline"        # baseline | trending | cf | auto (cf when a CF model is loaded)
+    candidate_pool: int = 2000    # cf: Top-N of top_global scored per user, as in Recommender.recommend_cf
+    max_users: Optional[int] = None   # None / 0 = every user with test rows
+    block_users: int = 2048       # users scored per matrix product
+    workers: int = 1              # >1: user shards scored in a process pool over shared-memory arrays
+    ks: Tuple[int, ...] = ()      # extra cutoffs: every metric at each of ks + (k,), from one top-max(K) list
+    seed: int = 42
+
+    def cutoffs(self) -> List[int]:
+        return sorted({int(self.k), *(int(k) for k in self.ks)})
+
+
+def eval_users(test_df: pd.DataFrame, max_users: Optional[int], seed: int) -> np.ndarray:
+    """Users with test rows (ascending), sampled exactly like evaluation.evaluate when max_users is set."""
+    users = np.sort(test_df["userId"].astype(int).unique()) if len(test_df) else np.empty(0, dtype=int)
+    if max_users and len(users) > max_users:
+        users = np.random.default_rng(seed).choice(users, size=max_users, replace=False)
+    return users
+
+
+def _inner_uids(model, users: np.ndarray) -> np.ndarray:
+    if getattr(model, "ids_sorted", False):
+        j = np.searchsorted(model.user_ids, users)
+        hit = j < len(model.user_ids)
+        hit[hit] = model.user_ids[j[hit]] == users[hit]
+        return np.where(hit, j, -1)
+    return pd.Index(np.asarray(model.user_ids)).get_indexer(users)
+
+
+def _resolve_mode(recommender, mode: str) -> str:
+    mode = (mode or "auto").lower()
+    cf_ok = recommender.cf_enabled and recommender.cf_model is not None
+    if mode == "auto":
+        mode = "cf" if cf_ok else "baseline"
+    if mode == "cf" and not cf_ok:
+        mode = "baseline"
+    if mode == "trending" and recommender.trending is None:
+        mode = "baseline"
+    if mode not in ("baseline", "trending", "cf"):
+        raise ValueError(f"unsupported mode: {mode}")
+    return mode
+
+
+def score_arrays(recommender, mode: str, candidate_pool: int, users: np.ndarray) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    (candidate movieIds, scoring arrays) for one serving mode, over the same candidates and
+    ordering as Recommender.recommend(mode=...) without constraints.
+    - baseline / trending: one ranking shared by every user, "rank" = -position
+    - cf: user rows "P"/"b_u" aligned with `users` (zeros for unknown users), candidate rows "Q"/"b_i",
+      "params" = [mu, rating_min, rating_max] (NaN bounds = no clipping), as in FactorModel.score_items
+    """
+    mode = _resolve_mode(recommender, mode)
+    if mode in ("baseline", "trending"):
+        table = recommender.refresh_trending() if mode == "trending" else recommender.top_global
+        cand = table["movieId"].astype(np.int64).to_numpy()
+        return cand, {"rank": -np.arange(len(cand), dtype=np.float32)}
+
+    from src.model_bundle import _as_factor_model
+
+    m = _as_factor_model(recommender.cf_model)
+    cand = recommender.top_global.head(int(candidate_pool))["movieId"].astype(np.int64).to_numpy()
+    n_f = m.item_factors.shape[1]
+    j = m.inner_iids(cand)
+    known = j >= 0
+    Q = np.zeros((len(cand), n_f), dtype=np.float32)
+    Q[known] = m.item_factors[j[known]]
+    b_i = np.zeros(len(cand), dtype=np.float32)
+    b_i[known] = m.item_bias[j[known]]
+
+    u = _inner_uids(m, users)
+    ok = u >= 0
+    P = np.zeros((len(users), n_f), dtype=np.float32)
+    P[ok] = m.user_factors[u[ok]]
+    b_u = np.zeros(len(users), dtype=np.float32)
+    b_u[ok] = m.user_bias[u[ok]]
+    bounds = [np.nan, np.nan] if m.rating_min is None or m.rating_max is None else [m.rating_min, m.rating_max]
+    return cand, {"P": P, "b_u": b_u, "Q": Q, "b_i": b_i,
+                  "params": np.array([m.global_mean] + bounds, dtype=np.float64)}
+
+
+def _pair_csr(df: pd.DataFrame, users: pd.Index, items: pd.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """(indptr, indices) of the binary users x items matrix of df's pairs (both indexed, duplicates collapsed)."""
+    r = users.get_indexer(df["userId"].astype(np.int64).to_numpy())
+    c = items.get_indexer(df["movieId"].astype(np.int64).to_numpy())
+    ok = (r >= 0) & (c >= 0)
+    keys = np.unique(r[ok].astype(np.int64) * max(len(items), 1) + c[ok])
+    rows, cols = np.divmod(keys, max(len(items), 1))
+    indptr = np.zeros(len(users) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(users)), out=indptr[1:])
+    return indptr, cols
+
+
+def prepare_arrays(recommender, train_df: pd.DataFrame, test_df: pd.DataFrame, cfg: BatchEvalConfig,
+                   users: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Everything a block of users needs, as plain arrays (shareable across processes):
+    users, the mode's scoring arrays, the train seen-index over candidates (CSR) and the
+    test relevance matrix over every test item (CSR, as sorted row * n_items + col keys).
+    users: these users in this order instead of eval_users' (cfg.max_users is then ignored).
+    """
+    users = (eval_users(test_df, cfg.max_users, cfg.seed) if users is None else np.asarray(users)).astype(np.int64)
+    cand, scoring = score_arrays(recommender, cfg.mode, cfg.candidate_pool, users)
+
+    user_index = pd.Index(users)
+    test_items = pd.Index(np.unique(test_df["movieId"].astype(np.int64).to_numpy())) if len(test_df) else pd.Index([], dtype=np.int64)
+    seen_indptr, seen_indices = _pair_csr(train_df, user_index, pd.Index(cand))
+    rel_indptr, rel_indices = _pair_csr(test_df, user_index, test_items)
+    n_test_items = max(len(test_items), 1)
+    return {
+        "users": users,
+        "cand": cand,
+        **scoring,
+        "seen_indptr": seen_indptr,
+        "seen_indices": seen_indices,
+        "n_relevant": np.diff(rel_indptr),
+        "rel_keys": np.repeat(np.arange(len(users), dtype=np.int64), np.diff(rel_indptr)) * n_test_items + rel_indices,
+        "n_test_items": np.array([n_test_items], dtype=np.int64),
+        # top-K candidate column -> test item column (-1: never relevant)
+        "cand_to_test": test_items.get_indexer(cand).astype(np.int64),
+    }
+
+
+def top_k(S: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k best scores per row, best first; -1 where the row ran out (-inf)."""
+    k = min(k, S.shape[1])
+    if k == 0:
+        return np.empty((S.shape[0], 0), dtype=np.int64)
+    # ties broken by candidate position (the serving order of equal scores in top_global), also
+    # at the k-th place: everything above the k-th score + the first equal ones up to k per row
+    kth = -np.partition(-S, k - 1, axis=1)[:, k - 1:k]
+    tied = S == kth
+    need = k - (S > kth).sum(axis=1, keepdims=True)
+    chosen = (S > kth) | (tied & (np.cumsum(tied, axis=1) <= need))
+    part = np.nonzero(chosen)[1].reshape(S.shape[0], k)
+    vals = np.take_along_axis(S, part, axis=1)
+    order = np.lexsort((part, -vals), axis=1)
+    idx = np.take_along_axis(part, order, axis=1)
+    return np.where(np.isneginf(np.take_along_axis(vals, order, axis=1)), -1, idx)
+
+
+def block_top_hits(a: Dict[str, np.ndarray], lo: int, hi: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Users lo:hi: score, mask train items, top-K -> (candidate columns (-1 = none), hit matrix)."""
+    if "rank" in a:
+        S = np.broadcast_to(a["rank"], (hi - lo, len(a["rank"]))).astype(np.float64)
+    else:
+        mu, rmin, rmax = a["params"].tolist()
+        S = (a["P"][lo:hi] @ a["Q"].T).astype(np.float64) + a["b_u"][lo:hi, None] + a["b_i"][None, :] + mu
+        if not np.isnan(rmin):
+            S = np.clip(S, rmin, rmax)
+
+    s, e = a["seen_indptr"][lo], a["seen_indptr"][hi]
+    rows = np.repeat(np.arange(hi - lo), np.diff(a["seen_indptr"][lo:hi + 1]))
+    S[rows, a["seen_indices"][s:e]] = -np.inf
+
+    top = top_k(S, k)
+    cols = np.where(top >= 0, a["cand_to_test"][np.maximum(top, 0)], -1)
+    keys = np.arange(lo, hi, dtype=np.int64)[:, None] * int(a["n_test_items"][0]) + cols
+    if not len(a["rel_keys"]):
+        return top, np.zeros(cols.shape, dtype=bool)
+    pos = np.minimum(np.searchsorted(a["rel_keys"], keys), len(a["rel_keys"]) - 1)
+    return top, (cols >= 0) & (a["rel_keys"][pos] == keys)
+
+
+def ranking_metrics(hits: np.ndarray, n_relevant: np.ndarray, k: int) -> Dict[str, np.ndarray]:
+    """recall / ndcg / hit rate / MAP / MRR @k from the first k columns of a (users x K) hit matrix."""
+    hits = hits[:, :k]
+    n_rel = n_relevant.astype(np.float64)
+    width = hits.shape[1]
+    disc = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (hits * disc[:width]).sum(axis=1)
+    ideal = np.concatenate([[0.0], np.cumsum(disc)])[np.minimum(n_relevant, k)]
+    n_hits = hits.sum(axis=1)
+    prec = np.cumsum(hits, axis=1) / np.arange(1, width + 1)
+    first = np.where(n_hits > 0, hits.argmax(axis=1) + 1, np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            f"recall@{k}": np.where(n_rel > 0, n_hits / n_rel, np.nan),
+            f"ndcg@{k}": np.where(ideal > 0, dcg / ideal, np.nan),
+            f"hit@{k}": np.where(n_rel > 0, (n_hits > 0).astype(np.float64), np.nan),
+            f"map@{k}": np.where(n_rel > 0, (prec * hits).sum(axis=1) / np.minimum(n_rel, k), np.nan),
+            f"mrr@{k}": np.where(n_rel > 0, 1.0 / first, np.nan),
+        }
+
+
+def candidate_features(recommender, train_df: pd.DataFrame, cand: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per candidate: log(1 + train ratings) and a multi-hot genre matrix (movies metadata, "A|B" strings;
+    "(no genres listed)" and unknown movies get an empty genre set).
+    """
+    counts = train_df["movieId"].astype(np.int64).value_counts()
+    log_pop = np.log1p(counts.reindex(cand, fill_value=0).to_numpy(np.float64))
+
+    movies = recommender.movies_by_id() if recommender is not None else None
+    if movies is None or "genres" not in movies.columns:
+        return log_pop, np.zeros((len(cand), 0), dtype=np.float32)
+    genres = movies["genres"].reindex(cand).fillna("").astype(str).str.replace("(no genres listed)", "", regex=False)
+    G = genres.str.get_dummies(sep="|")
+    return log_pop, G.to_numpy(np.float32)
+
+
+def beyond_accuracy(top: np.ndarray, ks: List[int], log_pop: np.ndarray, G: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per user, over the first k recommendations, for every k in ks:
+    - pop@k: mean log(1 + train ratings) of the recommended items (popularity bias)
+    - ild@k: intra-list diversity, mean pairwise genre Jaccard distance (NaN below 2 items or without genres)
+    Pair distances are computed once at max(ks); each cutoff sums its leading k x k corner.
+    """
+    valid = top >= 0
+    idx = np.maximum(top, 0)
+    out: Dict[str, np.ndarray] = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for k in ks:
+            n = valid[:, :k].sum(axis=1)
+            out[f"pop@{k}"] = np.where(n > 0, (log_pop[idx[:, :k]] * valid[:, :k]).sum(axis=1) / n, np.nan)
+            out[f"ild@{k}"] = np.full(len(top), np.nan)
+
+        width = top.shape[1]
+        if not G.shape[1] or width < 2:
+            return out
+        upper = np.triu(np.ones((width, width), dtype=bool), 1)
+        for lo in range(0, len(top), 2048):
+            sl = slice(lo, lo + 2048)
+            X = G[idx[sl]] * valid[sl, :, None]
+            inter = X @ X.transpose(0, 2, 1)
+            size = X.sum(axis=2)
+            union = size[:, :, None] + size[:, None, :] - inter
+            dist = 1.0 - np.divide(inter, union, out=np.ones_like(inter), where=union > 0)
+            pairs = valid[sl, :, None] & valid[sl, None, :] & upper
+            for k in ks:
+                n_pairs = pairs[:, :k, :k].sum(axis=(1, 2))
+                total = (dist[:, :k, :k] * pairs[:, :k, :k]).sum(axis=(1, 2))
+                out[f"ild@{k}"][sl] = np.where(n_pairs > 0, total / n_pairs, np.nan)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Process pool: one shared-memory copy of the arrays for every worker
+# ---------------------------------------------------------------------------
+
+def _shard_top_hits(blocks: List[Tuple[int, int]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    parts = [block_top_hits(SHARED, int(lo), int(hi), k) for lo, hi in blocks]
+    return np.concatenate([t for t, _ in parts]).astype(np.int32), np.concatenate([h for _, h in parts])
+
+
+def _top_hits(a: Dict[str, np.ndarray], cfg: BatchEvalConfig, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(users x K) candidate columns + hits, in user order, single process or over a shared-memory pool."""
+    n_users = len(a["users"])
+    blocks = [(lo, min(lo + cfg.block_users, n_users)) for lo in range(0, n_users, cfg.block_users)]
+    width = min(k, len(a["cand_to_test"]))
+    n_workers = min(cfg.workers or os.cpu_count() or 1, len(blocks))
+    if not blocks:
+        return np.zeros((0, width), dtype=np.int32), np.zeros((0, width), dtype=bool)
+    if n_workers <= 1:
+        parts = [block_top_hits(a, lo, hi, k) for lo, hi in blocks]
+        return np.concatenate([t for t, _ in parts]).astype(np.int32), np.concatenate([h for _, h in parts])
+
+    shards = [list(part) for part in np.array_split(np.array(blocks), n_workers) if len(part)]
+    specs, handles = share(a)
+    try:
+        # spawn: same behaviour on Linux and Windows; workers map the arrays instead of unpickling them
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_context("spawn"),
+                                 initializer=attach, initargs=(specs,)) as pool:
+            parts = list(pool.map(_shard_top_hits, shards, [k] * len(shards)))
+    finally:
+        release(handles)
+    return np.concatenate([t for t, _ in parts]), np.concatenate([h for _, h in parts])
+
+
+def evaluate_report(
+    recommender,
+    train_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    cfg: BatchEvalConfig,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    One pass at K = max(cfg.cutoffs()), every metric at every cutoff from that single list:
+    - per user: recall / ndcg / hit / map / mrr, pop (mean log popularity), ild (genre diversity) @k
+    - summary (tidy: metric, k, value, users): per-user means + coverage@k, the share of the
+      train catalogue recommended to at least one user
+    """
+    cutoffs = cfg.cutoffs()
+    a = prepare_arrays(recommender, train_df, test_df, cfg)
+    top, hits = _top_hits(a, cfg, cutoffs[-1])
+    log_pop, G = candidate_features(recommender, train_df, a["cand"])
+
+    per_user = pd.DataFrame({"userId": a["users"].astype(int), "n_relevant": a["n_relevant"]})
+    n_catalog = max(int(train_df["movieId"].nunique()), 1)
+    extra = beyond_accuracy(top, cutoffs, log_pop, G)
+    coverage = {}
+    for k in cutoffs:
+        for name, values in ranking_metrics(hits, a["n_relevant"], k).items():
+            per_user[name] = values
+        per_user[f"pop@{k}"] = extra[f"pop@{k}"]
+        per_user[f"ild@{k}"] = extra[f"ild@{k}"]
+        shown = top[:, :k]
+        coverage[k] = len(np.unique(shown[shown >= 0])) / n_catalog
+
+    rows = []
+    for col in [c for c in per_user.columns if "@" in c]:
+        metric, k = col.split("@")
+        values = per_user[col].to_numpy(np.float64)
+        rows.append({"metric": metric, "k": int(k), "value": float(np.nanmean(values)) if np.isfinite(values).any() else np.nan,
+                     "users": int(np.isfinite(values).sum())})
+    rows += [{"metric": "coverage", "k": k, "value": v, "users": len(per_user)} for k, v in coverage.items()]
+    summary = pd.DataFrame(rows).sort_values(["metric", "k"], kind="stable").reset_index(drop=True)
+    return per_user, summary
+
+
+def evaluate_batched(
+    recommender,
+    train_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    cfg: BatchEvalConfig,
+) -> pd.DataFrame:
+    """
+    Same per-user report as evaluation.evaluate (+ hit, map, mrr, pop, ild; at every cfg cutoff)
+    without the per-user serving path: blocks of users are scored against every candidate at once,
+    train items are masked from the sparse train matrix, top-K comes from argpartition, and hits
+    are looked up in the sparse test (relevance) matrix.
+    With workers > 1 the arrays go to shared memory once and contiguous shards of blocks
+    run in a process pool; block boundaries do not depend on the worker count and shards
+    are concatenated in user order, so the report is identical to the single-process one.
+    """
+    return evaluate_report(recommender, train_df, test_df, cfg)[0]
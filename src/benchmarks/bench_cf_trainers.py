@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.factorization import FactorModel, MFConfig, fit_factor_model
+
+
+def synthetic_ratings(n_ratings: int, seed: int = 42, rank: int = 10) -> pd.DataFrame:
+    """
+    MovieLens-shaped synthetic ratings: low-rank taste + user/item biases + noise,
+    Zipf-like item popularity, 0.5-step ratings in [0.5, 5]. Duplicate pairs are dropped.
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(1_000, n_ratings // 100)
+    n_items = max(2_000, n_ratings // 500)
+
+    P = rng.normal(0, 0.5, size=(n_users, rank)).astype(np.float32)
+    Q = rng.normal(0, 0.5, size=(n_items, rank)).astype(np.float32)
+    bu = rng.normal(0, 0.4, size=n_users).astype(np.float32)
+    bi = rng.normal(0, 0.5, size=n_items).astype(np.float32)
+
+    pop = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    pop /= pop.sum()
+    u = rng.integers(0, n_users, size=n_ratings).astype(np.int32)
+    i = rng.choice(n_items, size=n_ratings, p=pop).astype(np.int32)
+
+    r = np.empty(n_ratings, dtype=np.float32)
+    step = 2_000_000
+    for s in range(0, n_ratings, step):
+        e = min(s + step, n_ratings)
+        r[s:e] = 3.5 + bu[u[s:e]] + bi[i[s:e]] + np.einsum("ij,ij->i", P[u[s:e]], Q[i[s:e]])
+    r += rng.normal(0, 0.6, size=n_ratings).astype(np.float32)
+    r = np.clip(np.round(r * 2) / 2, 0.5, 5.0)
+
+    df = pd.DataFrame({"userId": u + 1, "movieId": i + 1, "rating": r})
+    return df.drop_duplicates(subset=["userId", "movieId"]).reset_index(drop=True)
+
+
+def _holdout(df: pd.DataFrame, frac: float, seed: int):
+    mask = np.random.default_rng(seed).random(len(df)) < frac
+    return df[~mask].reset_index(drop=True), df[mask].reset_index(drop=True)
+
+
+def _rmse(model: FactorModel, test: pd.DataFrame) -> float:
+    u = pd.Index(model.user_ids).get_indexer(test["userId"].to_numpy())
+    j = model.inner_iids(test["movieId"].to_numpy())
+    ok = (u >= 0) & (j >= 0)
+    est = (model.global_mean + model.user_bias[u[ok]] + model.item_bias[j[ok]]
+           + np.einsum("ij,ij->i", model.user_factors[u[ok]], model.item_factors[j[ok]]))
+    est = np.clip(est, model.rating_min, model.rating_max)
+    return float(np.sqrt(np.mean((est - test["rating"].to_numpy()[ok]) ** 2)))
+
+
+def _recall(model: FactorModel, train: pd.DataFrame, test: pd.DataFrame, k: int, n_users: int, seed: int) -> float:
+    """Full-catalog recall@k over test items rated >= 4, train items excluded."""
+    rel = test[test["rating"] >= 4.0]
+    users = rel["userId"].unique()
+    rng = np.random.default_rng(seed)
+    if len(users) > n_users:
+        users = rng.choice(users, size=n_users, replace=False)
+    rel_sets = rel[rel["userId"].isin(users)].groupby("userId")["movieId"].apply(set).to_dict()
+    seen = train[train["userId"].isin(users)].groupby("userId")["movieId"].apply(np.asarray).to_dict()
+
+    base = model.global_mean + model.item_bias
+    out = []
+    for uid in users:
+        u = model.inner_uid(uid)
+        if u < 0:
+            continue
+        s = base + model.item_factors @ model.user_factors[u]
+        js = model.inner_iids(seen.get(uid, np.array([], dtype=np.int64)))
+        s[js[js >= 0]] = -np.inf
+        top = model.item_ids[np.argpartition(-s, k)[:k]]
+        out.append(len(rel_sets[uid].intersection(top.tolist())) / len(rel_sets[uid]))
+    return float(np.mean(out)) if out else float("nan")
+
+
+def _train_surprise(train: pd.DataFrame, n_factors: int, n_epochs: int, lr: float, reg: float, seed: int) -> FactorModel:
+    from src.cf_training import CFConfig, train_svd
+    algo, _ = train_svd(train, CFConfig(n_factors=n_factors, n_epochs=n_epochs, lr_all=lr, reg_all=reg, seed=seed))
+    return FactorModel.from_surprise(algo)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Surprise SVD vs built-in ALS/SGD factorization trainers.")
+    parser.add_argument("--sizes", default="1000000,10000000,25000000")
+    parser.add_argument("--trainers", default="surprise,als,sgd")
+    parser.add_argument("--surprise_max_rows", type=int, default=10_000_000,
+                        help="Skip Surprise above this size (single-threaded, Python-object trainset)")
+    parser.add_argument("--n_factors", type=int, default=100)
+    parser.add_argument("--n_epochs", type=int, default=20)
+    parser.add_argument("--als_epochs", type=int, default=10)
+    parser.add_argument("--als_reg", type=float, default=0.02)
+    parser.add_argument("--n_threads", type=int, default=0)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--eval_users", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    results: List[Dict] = []
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        df = synthetic_ratings(n, seed=args.seed)
+        train, test = _holdout(df, 0.1, args.seed)
+        print(f"\n[INFO] size={n:,}: train={len(train):,} test={len(test):,} "
+              f"users={df['userId'].nunique():,} items={df['movieId'].nunique():,}")
+
+        for name in args.trainers.split(","):
+            if name == "surprise" and len(train) > args.surprise_max_rows:
+                print(f"[INFO] skip surprise at {n:,} rows (> --surprise_max_rows)")
+                continue
+            t0 = time.perf_counter()
+            if name == "surprise":
+                model = _train_surprise(train, args.n_factors, args.n_epochs, 0.005, 0.02, args.seed)
+            elif name == "als":
+                model, _ = fit_factor_model(train, MFConfig(
+                    algo="als", n_factors=args.n_factors, n_epochs=args.als_epochs,
+                    reg=args.als_reg, n_threads=args.n_threads, seed=args.seed,
+                ))
+            elif name == "sgd":
+                model, _ = fit_factor_model(train, MFConfig(
+                    algo="sgd", n_factors=args.n_factors, n_epochs=args.n_epochs, seed=args.seed,
+                ))
+            else:
+                raise ValueError(f"unknown trainer: {name}")
+            secs = time.perf_counter() - t0
+
+            row = {
+                "n_ratings": n,
+                "trainer": name,
+                "train_seconds": round(secs, 2),
+                "rmse": round(_rmse(model, test), 4),
+                f"recall@{args.k}": round(_recall(model, train, test, args.k, args.eval_users, args.seed), 4),
+            }
+            print(row)
+            results.append(row)
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(results).to_string(index=False))
+
+    out = Path(args.out) / f"bench_cf_trainers_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.cf_training import CFConfig, load_interactions, train_svd, warm_start_svd
+from src.evaluation import split_by_user_time
+
+
+def _rmse(algo, test_df: pd.DataFrame) -> float:
+    est = np.array([algo.predict(int(u), int(i)).est for u, i in zip(test_df["userId"], test_df["movieId"])])
+    return float(np.sqrt(np.mean((est - test_df["rating"].to_numpy()) ** 2)))
+
+
+def _recall_at_k(algo, train_df: pd.DataFrame, test_df: pd.DataFrame, k: int = 10) -> pd.Series:
+    """
+    Per-user full-catalog recall@k over every test user: rank every trained item, train items
+    excluded; users the model does not know get the bias-only ranking (mu + b_i), as serving would.
+    """
+    ts = algo.trainset
+    scores_items = ts.global_mean + algo.bi
+    seen = train_df.groupby("userId")["movieId"].apply(set).to_dict()
+    relevant = test_df.groupby("userId")["movieId"].apply(set).to_dict()
+    raw_items = np.array([ts.to_raw_iid(j) for j in range(ts.n_items)])
+
+    recalls = {}
+    for uid, rel in relevant.items():
+        u = ts._raw2inner_id_users.get(uid)
+        s = scores_items + (algo.bu[u] + algo.qi @ algo.pu[u] if u is not None else 0.0)
+        s[np.isin(raw_items, list(seen.get(uid, ())))] = -np.inf
+        top = raw_items[np.argpartition(-s, k)[:k]]
+        recalls[uid] = len(set(top.tolist()) & rel) / len(rel)
+    return pd.Series(recalls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm-start CF update vs full retrain.")
+    parser.add_argument("--interactions", default="data/interactions.parquet")
+    parser.add_argument("--n_ratings", type=int, default=0,
+                        help="Synthetic ratings (random timestamps) instead of --interactions, for the timing at scale")
+    parser.add_argument("--new_frac", type=float, default=0.1, help="Most recent share of TRAIN treated as new events")
+    parser.add_argument("--n_epochs", type=int, default=20)
+    parser.add_argument("--warm_epochs", type=int, default=5)
+    parser.add_argument("--warm_update_items", action="store_true")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--holdout_pct", type=float, default=0.2, help="Newest share of each user's ratings held out")
+    parser.add_argument("--seeds", type=int, default=3, help="Repeats (parent, retrain and update seeds); recall is noisy")
+    args = parser.parse_args()
+
+    if args.n_ratings:
+        from src.benchmarks.bench_cf_trainers import synthetic_ratings
+
+        df = synthetic_ratings(args.n_ratings)
+        df["timestamp"] = np.random.default_rng(0).permutation(len(df))
+    else:
+        df = load_interactions(args.interactions)
+    train_df, test_df = split_by_user_time(df, holdout="lastpct", holdout_pct=args.holdout_pct)
+    cut = int(train_df["timestamp"].quantile(1.0 - args.new_frac))
+    old_df = train_df[train_df["timestamp"] <= cut]
+    print(f"[INFO] old={len(old_df):,} rows, new={len(train_df) - len(old_df):,} rows, test={len(test_df):,} rows")
+    changed = set(train_df.loc[train_df["timestamp"] > cut, "userId"])
+
+    rows = []
+    for seed in range(args.seeds):
+        cfg = CFConfig(n_epochs=args.n_epochs, warm_epochs=args.warm_epochs,
+                       warm_update_items=args.warm_update_items, seed=seed)
+        parent, _ = train_svd(old_df, cfg)
+
+        t0 = time.perf_counter()
+        full, _ = train_svd(train_df, cfg)
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        warm, stats = warm_start_svd(parent, train_df, cfg, since_ts=cut)
+        t_warm = time.perf_counter() - t0
+
+        for name, algo, secs in [("stale_parent", parent, 0.0), ("full_retrain", full, t_full), ("warm_start", warm, t_warm)]:
+            recall = _recall_at_k(algo, train_df, test_df, k=args.k)
+            rows.append({
+                "model": name,
+                "seed": seed,
+                "seconds": secs,
+                "rmse": _rmse(algo, test_df),
+                f"recall@{args.k}": float(recall.mean()),
+                # users with new events (with frozen items, the only users whose ranking can change)
+                f"recall@{args.k}_new_events": float(recall[recall.index.isin(changed)].mean()),
+            })
+
+    print(f"\n[INFO] warm-start stats: {stats}")
+    print(f"\n=== Warm start vs full retrain (mean / std over {args.seeds} seeds) ===")
+    table = pd.DataFrame(rows).drop(columns="seed").groupby("model", sort=False).agg(["mean", "std"]).round(4)
+    print(table.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+CONSUMERS = ["training", "cf_training", "evaluation", "serving"]
+
+
+# -- the per-consumer loading code as it was before the encoded artifact ------
+
+def _legacy_load(path: str) -> pd.DataFrame:
+    df = pd.read_parquet(path)
+    df = df.dropna(subset=["userId", "movieId", "rating"]).copy()
+    df["userId"] = df["userId"].astype(int)
+    df["movieId"] = df["movieId"].astype(int)
+    df["rating"] = df["rating"].astype(float)
+    return df
+
+
+def _legacy(consumer: str, path: str, probe_users: np.ndarray):
+    from src.evaluation import split_by_user_time
+    from src.training import build_popularity_table
+
+    if consumer == "training":
+        return build_popularity_table(_legacy_load(path))
+    if consumer == "cf_training":
+        return _legacy_load(path)
+    if consumer == "evaluation":
+        return split_by_user_time(pd.read_parquet(path))
+    df = pd.read_parquet(path, columns=["userId", "movieId"]).dropna()
+    df["userId"] = df["userId"].astype(int)
+    df["movieId"] = df["movieId"].astype(int)
+    seen = {int(uid): set(map(int, grp.values)) for uid, grp in df.groupby("userId")["movieId"]}
+    return [len(seen.get(int(u), set())) for u in probe_users]
+
+
+def _encoded(consumer: str, path: str, probe_users: np.ndarray):
+    from src.encoded import load_encoded
+    from src.evaluation import split_by_user_time
+    from src.training import rank_popularity
+
+    enc = load_encoded(path)
+    if consumer == "training":
+        return rank_popularity(*enc.item_rating_stats())
+    if consumer == "cf_training":
+        return enc.frame()
+    if consumer == "evaluation":
+        return split_by_user_time(enc)
+    return [len(enc.user_items(u)) for u in probe_users]
+
+
+def _child(args: argparse.Namespace) -> None:
+    import src.encoded  # noqa: F401  (import cost is not part of the measurement)
+    import src.evaluation  # noqa: F401
+    import src.training  # noqa: F401
+
+    probe = pd.read_parquet(args.path, columns=["userId"])["userId"].dropna().unique()[:1000].astype(np.int64)
+    fn = _legacy if args.impl == "parquet" else _encoded
+    pool = pa.default_memory_pool()
+    pool_before = pool.max_memory()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(args.consumer, args.path, probe)
+    secs = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del out
+    print(json.dumps({
+        "consumer": args.consumer,
+        "impl": args.impl,
+        "seconds": round(secs, 4),
+        # numpy/pandas allocations + Arrow pool growth; memory-mapped pages are not allocations
+        "peak_alloc_mb": round((peak + max(0, pool.max_memory() - pool_before)) / 2**20, 1),
+    }))
+
+
+def _run_all(path: str) -> List[Dict]:
+    from src.encoded import build_encoded
+
+    t0 = time.perf_counter()
+    enc_dir = build_encoded(path)
+    build_s = time.perf_counter() - t0
+    manifest = json.loads((enc_dir / "manifest.json").read_text(encoding="utf-8"))
+    print(f"[INFO] {path}: {manifest['rows']:,} rows, artifact {manifest['nbytes'] / 2**20:.1f} MB "
+          f"(one-off build {build_s:.2f}s)")
+
+    rows = []
+    for consumer in CONSUMERS:
+        for impl in ["parquet", "encoded"]:
+            cmd = [sys.executable, "-m", "src.benchmarks.bench_encoded", "--child",
+                   "--consumer", consumer, "--impl", impl, "--path", path]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            row = {"rows": manifest["rows"], **json.loads(out.strip().splitlines()[-1])}
+            print(row)
+            rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parquet re-load/re-cast vs shared encoded interactions, per consumer.")
+    parser.add_argument("--interactions", default="data/interactions.parquet")
+    parser.add_argument("--synthetic_rows", type=int, default=5_000_000, help="Also run on a synthetic file (0 = skip)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    # internal: measure one (consumer, impl) in a fresh process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--consumer", choices=CONSUMERS, help=argparse.SUPPRESS)
+    parser.add_argument("--impl", choices=["parquet", "encoded"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    results = _run_all(args.interactions)
+    if args.synthetic_rows:
+        from src.benchmarks.bench_cf_trainers import synthetic_ratings
+
+        with tempfile.TemporaryDirectory() as tmp:
+            df = synthetic_ratings(args.synthetic_rows, seed=args.seed)
+            df["timestamp"] = np.random.default_rng(args.seed).integers(10**9, 1.7 * 10**9, size=len(df))
+            path = str(Path(tmp) / "interactions.parquet")
+            df.to_parquet(path, index=False)
+            del df
+            results += _run_all(path)
+
+    table = pd.DataFrame(results).pivot_table(index=["rows", "consumer"], columns="impl",
+                                              values=["seconds", "peak_alloc_mb"])
+    print("\n=== Summary ===")
+    print(table.to_string())
+
+    out = Path(args.out) / f"bench_encoded_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
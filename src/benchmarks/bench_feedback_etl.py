@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from src.etl.merge_feedback import DEFAULT_BLOCK_SIZE, read_feedback
+
+ACTIONS = np.array(["like", "save", "dislike", "skip", "helpful", "not_helpful"])
+
+
+def write_synthetic_feedback(path: Path, n_events: int, seed: int = 42, chunk: int = 500_000) -> None:
+    """Write a JSONL file shaped like data/feedback.jsonl (incl. the nested context)."""
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2026, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, n_events, chunk):
+            n = min(chunk, n_events - start)
+            users = rng.integers(1, 50_000, size=n)
+            anon = rng.random(n) < 0.3
+            movies = rng.integers(1, 30_000, size=n)
+            actions = ACTIONS[rng.integers(0, len(ACTIONS), size=n)]
+            secs = np.sort(rng.integers(0, 86_400 * 30, size=n))
+            lines = []
+            for u, a, m, act, s in zip(users, anon, movies, actions, secs):
+                ts = (t0 + timedelta(seconds=int(s))).isoformat()
+                uid = "null" if a else str(int(u))
+                lines.append(
+                    f'{{"user_id": {uid}, "movieId": {int(m)}, "action": "{act}", '
+                    f'"context": {{"screen": "results", "source": "swipe"}}, "_ts": "{ts}"}}\n'
+                )
+            f.write("".join(lines))
+
+
+def legacy_parse(path: Path) -> int:
+    """Line-by-line json.loads + fromisoformat, as merge_feedback did before the columnar reader."""
+    n = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if rec.get("_ts"):
+                datetime.fromisoformat(rec["_ts"])
+            n += 1
+    return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Throughput benchmark for the feedback ETL reader.")
+    parser.add_argument("--n_events", type=int, default=3_000_000)
+    parser.add_argument("--block_size_mb", type=int, default=DEFAULT_BLOCK_SIZE >> 20)
+    parser.add_argument("--compare_legacy", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "feedback.jsonl"
+        print(f"[INFO] Generating {args.n_events:,} synthetic events...")
+        write_synthetic_feedback(path, args.n_events, seed=args.seed)
+        size_mb = path.stat().st_size / 2**20
+        print(f"[INFO] File size: {size_mb:,.1f} MiB")
+
+        df, stats = read_feedback([path], block_size=args.block_size_mb << 20)
+        print("\n=== Columnar reader ===")
+        print(f"events:      {stats['events']:,}")
+        print(f"pairs kept:  {len(df):,}")
+        print(f"seconds:     {stats['seconds']:.2f}")
+        print(f"events/s:    {stats['events_per_sec']:,.0f}")
+        print(f"MiB/s:       {size_mb / stats['seconds']:,.1f}")
+
+        if args.compare_legacy:
+            t0 = time.perf_counter()
+            n = legacy_parse(path)
+            dt = time.perf_counter() - t0
+            print("\n=== Legacy line-by-line parse ===")
+            print(f"events:      {n:,}")
+            print(f"seconds:     {dt:.2f}")
+            print(f"events/s:    {n / dt:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
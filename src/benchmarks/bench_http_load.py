@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.llm.fake import FakeLLMConfig, install_fake_llm
+
+_ROOT = Path(__file__).resolve().parents[2]
+
+# Relative weights; the "recommend" block shapes the /recommend bodies
+DEFAULT_WORKLOAD: Dict = {
+    "mix": {"recommend": 0.7, "feedback": 0.2, "genres": 0.1},
+    "recommend": {
+        "query_share": 0.5,        # requests with free text (-> LLM intent parse)
+        "known_user_share": 0.6,   # user_id drawn from the interactions; else anonymous
+        "modes": {"auto": 0.7, "baseline": 0.2, "cf": 0.1},
+        "k": [5, 10, 20],
+        "exclude_share": 0.3,      # requests carrying a swipe history (exclude_movieIds)
+        "exclude_size": [5, 50],
+    },
+    "queries": ["something funny for tonight", "a tense thriller from the 90s", "feel-good romance",
+                "mind-bending sci-fi", "classic western", "scary horror for halloween", "80s action"],
+    "feedback_actions": {"like": 0.4, "skip": 0.3, "dislike": 0.2, "save": 0.1},
+}
+
+
+def load_workload(path: Optional[str]) -> Dict:
+    """DEFAULT_WORKLOAD with the top-level keys of a JSON spec replaced (nested blocks merged one level)."""
+    spec = json.loads(json.dumps(DEFAULT_WORKLOAD))
+    if path:
+        for key, value in json.loads(Path(path).read_text(encoding="utf-8")).items():
+            if key not in spec:
+                raise ValueError(f"unknown workload key: {key}")
+            spec[key] = {**spec[key], **value} if isinstance(spec[key], dict) else value
+    return spec
+
+
+def _pick(rng: np.random.Generator, weights: Dict[str, float]) -> str:
+    keys = list(weights)
+    p = np.asarray([weights[k] for k in keys], dtype=float)
+    return keys[rng.choice(len(keys), p=p / p.sum())]
+
+
+def build_requests(spec: Dict, n: int, user_ids: np.ndarray, movie_ids: np.ndarray, seed: int = 42) -> List[Tuple[str, str, str, Optional[Dict]]]:
+    """n (endpoint, method, path, json body) tuples drawn from the workload spec (same seed -> same traffic)."""
+    rng = np.random.default_rng(seed)
+    rc = spec["recommend"]
+    out = []
+    for _ in range(n):
+        endpoint = _pick(rng, spec["mix"])
+        if endpoint == "genres":
+            out.append(("genres", "GET", "/genres", None))
+            continue
+        known = len(user_ids) and rng.random() < rc["known_user_share"]
+        user_id = int(rng.choice(user_ids)) if known else None
+        if endpoint == "feedback":
+            out.append(("feedback", "POST", "/feedback", {
+                "user_id": user_id, "movieId": int(rng.choice(movie_ids)),
+                "action": _pick(rng, spec["feedback_actions"]), "context": {"screen": "loadtest"}}))
+            continue
+        body = {"user_id": user_id, "k": int(rng.choice(rc["k"])), "mode": _pick(rng, rc["modes"])}
+        if rng.random() < rc["query_share"]:
+            body["query"] = str(rng.choice(spec["queries"]))
+        if rng.random() < rc["exclude_share"]:
+            size = int(rng.integers(rc["exclude_size"][0], rc["exclude_size"][1] + 1))
+            body["constraints"] = {"exclude_movieIds": rng.choice(movie_ids, size=size).astype(int).tolist()}
+        out.append(("recommend", "POST", "/recommend", body))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Server: in-process thread or subprocess, both with the fake LLM, in a scratch workspace
+# ---------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def scratch_workspace(root: Path) -> Path:
+    """
+    A cwd for the server: models/ and data/* linked from the repo, except feedback.jsonl,
+    so /feedback traffic appends to a scratch log instead of the real one.
+    """
+    ws = Path(tempfile.mkdtemp(prefix="loadtest_"))
+    (ws / "data").mkdir()
+    for p in (root / "data").iterdir():
+        if p.name != "feedback.jsonl":
+            (ws / "data" / p.name).symlink_to(p.resolve())
+    if (root / "models").exists():
+        (ws / "models").symlink_to((root / "models").resolve())
+    return ws
+
+
+def serve(port: int, llm: FakeLLMConfig) -> None:
+    """Blocking: the API with the fake LLM on 127.0.0.1:port (what --serve_only and --target subprocess run)."""
+    import uvicorn
+
+    install_fake_llm(llm)
+    from src.api.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+class InProcessServer:
+    """uvicorn.Server on a daemon thread (shares the GIL with the load generator: use subprocess for capacity numbers)."""
+
+    def __init__(self, port: int, llm: FakeLLMConfig) -> None:
+        import uvicorn
+
+        install_fake_llm(llm)
+        from src.api.main import app
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _wait_healthy(url: str, timeout_s: float = 120.0) -> None:
+    import httpx
+
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"server at {url} not healthy after {timeout_s:.0f}s")
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+async def _send(client, req, results: List, t_sched: float) -> None:
+    endpoint, method, path, body = req
+    try:
+        res = await client.request(method, path, json=body)
+        ok = res.status_code < 400
+    except Exception:
+        ok = False
+    # from the scheduled send time: open-loop queueing delay counts (no coordinated omission)
+    results.append((endpoint, time.perf_counter() - t_sched, ok))
+
+
+async def closed_loop(url: str, requests: List, concurrency: int, duration_s: float, timeout_s: float) -> Tuple[List, float]:
+    """`concurrency` users, each sending its next request as soon as the previous one returns."""
+    import httpx
+
+    results: List = []
+    cursor = iter(range(10**12))
+    async with httpx.AsyncClient(base_url=url, timeout=timeout_s,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        t0 = time.perf_counter()
+
+        async def user() -> None:
+            while time.perf_counter() - t0 < duration_s:
+                await _send(client, requests[next(cursor) % len(requests)], results, time.perf_counter())
+
+        await asyncio.gather(*[user() for _ in range(concurrency)])
+        return results, time.perf_counter() - t0
+
+
+async def open_loop(url: str, requests: List, rate: float, duration_s: float, timeout_s: float,
+                    max_in_flight: int, seed: int) -> Tuple[List, float]:
+    """Poisson arrivals at `rate` req/s whatever the response times; arrivals beyond max_in_flight fail."""
+    import httpx
+
+    results: List = []
+    rng = np.random.default_rng(seed)
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, size=int(rate * duration_s * 1.5) + 10))
+    arrivals = arrivals[arrivals < duration_s]
+    async with httpx.AsyncClient(base_url=url, timeout=timeout_s,
+                                 limits=httpx.Limits(max_connections=max_in_flight)) as client:
+        t0 = time.perf_counter()
+        tasks = set()
+        for i, at in enumerate(arrivals):
+            delay = t0 + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            req = requests[i % len(requests)]
+            if len(tasks) >= max_in_flight:
+                results.append((req[0], 0.0, False))
+                continue
+            task = asyncio.create_task(_send(client, req, results, t0 + at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return results, time.perf_counter() - t0
+
+
+def summarize(results: List, elapsed_s: float) -> Dict[str, Dict]:
+    """Per endpoint (+ "all"): requests, QPS, latency percentiles (ms) over successes, error rate."""
+    df = pd.DataFrame(results, columns=["endpoint", "latency", "ok"])
+    out = {}
+    for name, grp in [("all", df)] + list(df.groupby("endpoint")):
+        lat = grp.loc[grp["ok"], "latency"].to_numpy() * 1e3
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (np.nan,) * 3
+        out[name] = {
+            "requests": int(len(grp)),
+            "qps": round(int(grp["ok"].sum()) / elapsed_s, 2),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "error_rate": round(float(1 - grp["ok"].mean()), 4) if len(grp) else 0.0,
+        }
+    return out
+
+
+def run_sweep(url: str, requests: List, mode: str, levels: List[float], duration_s: float,
+              timeout_s: float = 30.0, max_in_flight: int = 512, seed: int = 42) -> List[Dict]:
+    """One step per concurrency (closed) / arrival rate (open) level; rows per (level, endpoint)."""
+    rows = []
+    for level in levels:
+        if mode == "closed":
+            results, elapsed = asyncio.run(closed_loop(url, requests, int(level), duration_s, timeout_s))
+        else:
+            results, elapsed = asyncio.run(open_loop(url, requests, float(level), duration_s, timeout_s, max_in_flight, seed))
+        for endpoint, stats in summarize(results, elapsed).items():
+            rows.append({"mode": mode, "level": level, "endpoint": endpoint, **stats})
+        print(f"[OK] {mode} level={level}: " + json.dumps(next(r for r in rows[::-1] if r["endpoint"] == "all")))
+    return rows
+
+
+def saturation(rows: List[Dict], p95_budget_ms: float, min_gain: float = 0.05) -> Optional[float]:
+    """First level whose overall QPS gained < min_gain over the previous one, or whose p95 broke the budget."""
+    steps = [r for r in rows if r["endpoint"] == "all"]
+    for prev, cur in zip(steps, steps[1:]):
+        if cur["qps"] < prev["qps"] * (1 + min_gain) or cur["p95_ms"] > p95_budget_ms:
+            return cur["level"]
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP load test of the API (fake LLM) with a concurrency / rate sweep.")
+    parser.add_argument("--target", default="subprocess",
+                        help="subprocess (uvicorn process, fake LLM) | inprocess (server thread) | http://host:port (running server)")
+    parser.add_argument("--workload", default=None, help="JSON spec overriding DEFAULT_WORKLOAD keys")
+    parser.add_argument("--loop", default="closed", choices=["closed", "open"])
+    parser.add_argument("--levels", default="1,2,4,8,16", help="Concurrency (closed) or requests/s (open) per step")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per step")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s)")
+    parser.add_argument("--max_in_flight", type=int, default=512, help="Open loop: arrivals beyond this fail")
+    parser.add_argument("--llm_latency_ms", type=float, default=300.0)
+    parser.add_argument("--llm_jitter_ms", type=float, default=100.0)
+    parser.add_argument("--llm_failure_rate", type=float, default=0.0)
+    parser.add_argument("--p95_budget_ms", type=float, default=200.0, help="Saturation: p95 above this")
+    parser.add_argument("--port", type=int, default=0, help="Local server port (0 = any free port)")
+    parser.add_argument("--serve_only", action="store_true", help="Only run the fake-LLM server on --port")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    llm = FakeLLMConfig(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+                        failure_rate=args.llm_failure_rate, seed=args.seed)
+    if args.serve_only:
+        serve(args.port or 8000, llm)
+        return
+
+    spec = load_workload(args.workload)
+    inter = Path("data/interactions.parquet")
+    ids = pd.read_parquet(inter, columns=["userId", "movieId"]) if inter.exists() else None
+    user_ids = np.unique(ids["userId"].to_numpy()) if ids is not None else np.arange(1, 1001)
+    movie_ids = np.unique(ids["movieId"].to_numpy()) if ids is not None else np.arange(1, 5001)
+    requests = build_requests(spec, 5000, user_ids, movie_ids, seed=args.seed)
+
+    out_dir = Path(args.out).resolve()
+    proc, server, ws = None, None, None
+    if args.target.startswith("http"):
+        url = args.target.rstrip("/")
+        print("[WARN] external target: its LLM is whatever that server runs (start it with --serve_only for the fake)")
+    else:
+        port = args.port or _free_port()
+        url = f"http://127.0.0.1:{port}"
+        ws = scratch_workspace(Path.cwd())
+        if args.target == "subprocess":
+            cmd = [sys.executable, "-m", "src.benchmarks.bench_http_load", "--serve_only", "--port", str(port),
+                   "--llm_latency_ms", str(args.llm_latency_ms), "--llm_jitter_ms", str(args.llm_jitter_ms),
+                   "--llm_failure_rate", str(args.llm_failure_rate), "--seed", str(args.seed)]
+            env = {**os.environ, "PYTHONPATH": str(_ROOT), "LOG_LEVEL": "WARNING"}
+            proc = subprocess.Popen(cmd, cwd=ws, env=env, stdout=subprocess.DEVNULL)
+        elif args.target == "inprocess":
+            os.environ["LOG_LEVEL"] = "WARNING"
+            os.chdir(ws)
+            server = InProcessServer(port, llm)
+            server.start()
+        else:
+            raise SystemExit(f"[ERROR] unknown --target {args.target}")
+    print(f"[INFO] target {url} ({args.target}), scratch workspace: {ws}")
+
+    try:
+        _wait_healthy(url)
+        # warm-up: loads the recommender and the per-user history index outside the measured steps
+        asyncio.run(closed_loop(url, requests[:20], 1, 2.0, 120.0))
+        levels = [float(x) for x in args.levels.split(",")]
+        rows = run_sweep(url, requests, args.loop, levels, args.duration, args.timeout, args.max_in_flight, args.seed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if server is not None:
+            server.stop()
+        if ws is not None:
+            shutil.rmtree(ws, ignore_errors=True)
+
+    table = pd.DataFrame(rows)
+    print("\n=== Summary ===")
+    print(table.to_string(index=False))
+    sat = saturation(rows, args.p95_budget_ms)
+    print(f"\n[INFO] saturation: {'level ' + str(sat) if sat is not None else 'not reached in this sweep'}")
+
+    out = out_dir / f"bench_http_load_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": vars(args), "workload": spec, "saturation_level": sat, "results": rows},
+                              indent=2, default=str), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.implicit import ImplicitConfig, build_weights, train_wals_cg
+
+
+def synthetic_events(nnz: int, seed: int = 42) -> pd.DataFrame:
+    """Swipe-log-shaped events: Zipf item popularity, ~50 actions per user, like/save/dislike/skip mix."""
+    rng = np.random.default_rng(seed)
+    n_users = max(500, nnz // 50)
+    n_items = max(1_000, nnz // 200)
+    pop = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    pop /= pop.sum()
+    df = pd.DataFrame({
+        "userId": rng.integers(1, n_users + 1, size=nnz),
+        "movieId": rng.choice(n_items, size=nnz, p=pop) + 1,
+        "action": rng.choice(["like", "save", "dislike", "skip"], size=nnz, p=[0.35, 0.1, 0.2, 0.35]),
+    })
+    return df.drop_duplicates(subset=["userId", "movieId"]).reset_index(drop=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Implicit WALS-CG: training time vs number of nonzeros.")
+    parser.add_argument("--sizes", default="250000,500000,1000000,2000000")
+    parser.add_argument("--n_factors", type=int, default=64)
+    parser.add_argument("--n_epochs", type=int, default=3)
+    parser.add_argument("--cg_steps", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    cfg = ImplicitConfig(n_factors=args.n_factors, n_epochs=args.n_epochs, cg_steps=args.cg_steps, seed=args.seed)
+
+    results: List[Dict] = []
+    for n in [int(x) for x in args.sizes.split(",") if x]:
+        w = build_weights(None, synthetic_events(n, seed=args.seed), cfg)
+        u, user_ids = pd.factorize(w["userId"].to_numpy())
+        i, item_ids = pd.factorize(w["movieId"].to_numpy())
+
+        t0 = time.perf_counter()
+        train_wals_cg(u.astype(np.int32), i.astype(np.int32), w["weight"].to_numpy(np.float32),
+                      len(user_ids), len(item_ids), cfg)
+        secs = time.perf_counter() - t0
+
+        row = {
+            "nnz": int(len(w)),
+            "users": int(len(user_ids)),
+            "items": int(len(item_ids)),
+            "seconds": round(secs, 3),
+            "seconds_per_epoch": round(secs / args.n_epochs, 3),
+            "ns_per_nnz_epoch": round(secs / args.n_epochs / len(w) * 1e9, 1),
+        }
+        print(row)
+        results.append(row)
+
+    report: Dict = {"config": vars(args), "results": results}
+    if len(results) >= 2:
+        x = np.log([r["nnz"] for r in results])
+        y = np.log([r["seconds"] for r in results])
+        slope = float(np.polyfit(x, y, 1)[0])
+        report["loglog_slope"] = round(slope, 3)
+        print(f"\n[INFO] log-log slope of time vs nnz: {slope:.3f} (1.0 = linear)")
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(results).to_string(index=False))
+
+    out = Path(args.out) / f"bench_implicit_scaling_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
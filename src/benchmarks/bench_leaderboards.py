@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.predictions import load_recommender
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Filtered baseline requests: global Top-N scan vs genre/decade leaderboards.")
+    parser.add_argument("--models_dir", default="models", help="Run (LATEST) trained with leaderboards")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--user_id", type=int, default=1)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    rec = load_recommender(models_dir=args.models_dir)
+    lb = rec.leaderboards
+    if lb is None:
+        raise SystemExit("[ERROR] LATEST run has no leaderboards; retrain with src.training")
+
+    # one request per (genre, decade) leaderboard: the narrow filters that used to come back empty
+    requests = []
+    for key in lb.keys.tolist():
+        if "|" in key:
+            genre, decade = (part.split("=", 1)[1] for part in key.split("|"))
+            requests.append({"genres_in": [genre], "min_year": int(decade), "max_year": int(decade) + 9})
+    print(f"[INFO] {len(requests)} genre x decade requests, top_global={len(rec.top_global)} rows, "
+          f"ranked={len(lb.ranked)} rows")
+
+    rows = []
+    for impl in ["top_global", "leaderboards"]:
+        rec.leaderboards = lb if impl == "leaderboards" else None
+        lat, sizes = [], []
+        for c in requests:
+            t0 = time.perf_counter()
+            df = rec.recommend_baseline(user_id=args.user_id, k=args.k, constraints=c)
+            lat.append(time.perf_counter() - t0)
+            sizes.append(len(df))
+        sizes = np.asarray(sizes)
+        rows.append({
+            "impl": impl,
+            "requests": len(requests),
+            "empty": int((sizes == 0).sum()),
+            "short_of_k": int((sizes < args.k).sum()),
+            "p50_ms": round(float(np.percentile(lat, 50)) * 1e3, 2),
+            "p95_ms": round(float(np.percentile(lat, 95)) * 1e3, 2),
+        })
+    rec.leaderboards = lb
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    out = Path(args.out) / f"bench_leaderboards_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
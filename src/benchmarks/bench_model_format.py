@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+def _proc_kb(pid, path: str, keys: List[str]) -> Dict[str, float]:
+    """Selected 'Key:  N kB' fields of /proc/<pid>/<path>, in MB."""
+    out = {}
+    for line in Path(f"/proc/{pid}/{path}").read_text().splitlines():
+        key = line.split(":")[0]
+        if key in keys:
+            out[key] = int(line.split()[1]) / 1024.0
+    return out
+
+
+def _child(args: argparse.Namespace) -> None:
+    """One 'worker': load the model, serve one request per probe user, report, then idle until stdin closes."""
+    # libraries every serving worker has imported anyway
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+
+    before = _proc_kb("self", "status", ["VmRSS"])["VmRSS"]
+    t0 = time.perf_counter()
+    if args.format == "joblib":
+        import joblib
+        model = joblib.load(Path(args.run_dir) / args.model_file)
+    else:
+        from src.model_bundle import BUNDLE_DIR, load_bundle
+        model = load_bundle(Path(args.run_dir) / BUNDLE_DIR)
+    load_s = time.perf_counter() - t0
+
+    items = np.load(args.items)
+    users = np.load(args.users)
+    t1 = time.perf_counter()
+    if hasattr(model, "score_items"):
+        for u in users:
+            model.score_items(int(u), items)
+    else:
+        for u in users:
+            [model.predict(int(u), int(i)).est for i in items]
+    serve_s = time.perf_counter() - t1
+
+    print(json.dumps({
+        "load_seconds": round(load_s, 4),
+        "serve_seconds": round(serve_s, 4),
+        "rss_before_mb": round(before, 1),
+    }), flush=True)
+    sys.stdin.read()
+
+
+def _measure(fmt: str, run_dir: Path, model_file: str, probe: Dict[str, Path], n_workers: int) -> Dict:
+    cmd = [sys.executable, "-m", "src.benchmarks.bench_model_format", "--child", "--format", fmt,
+           "--run_dir", str(run_dir), "--model_file", model_file,
+           "--items", str(probe["items"]), "--users", str(probe["users"])]
+    procs = [subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(n_workers)]
+    try:
+        reports = [json.loads(p.stdout.readline()) for p in procs]
+        # all workers alive at once: Pss splits shared pages between them, Private_* is what each adds
+        mem = [_proc_kb(p.pid, "smaps_rollup", ["Rss", "Pss", "Private_Clean", "Private_Dirty"]) for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+
+    return {
+        "format": fmt,
+        "workers": n_workers,
+        "load_seconds": round(float(np.median([r["load_seconds"] for r in reports])), 4),
+        "serve_seconds": round(float(np.median([r["serve_seconds"] for r in reports])), 4),
+        "model_rss_mb": round(float(np.median([m["Rss"] - r["rss_before_mb"] for m, r in zip(mem, reports)])), 1),
+        "rss_per_worker_mb": round(float(np.median([m["Rss"] for m in mem])), 1),
+        "pss_per_worker_mb": round(float(np.median([m["Pss"] for m in mem])), 1),
+        "private_per_worker_mb": round(float(np.median([m["Private_Clean"] + m["Private_Dirty"] for m in mem])), 1),
+    }
+
+
+def _bench_run(label: str, run_dir: Path, model_file: str, n_workers: int, n_users: int, tmp: Path) -> List[Dict]:
+    import joblib
+    from src.model_bundle import BUNDLE_DIR, export_bundle
+
+    manifest_path = run_dir / BUNDLE_DIR / "manifest.json"
+    if not manifest_path.exists() or json.loads(manifest_path.read_text(encoding="utf-8")).get("model_file") != model_file:
+        export_bundle(joblib.load(run_dir / model_file), run_dir, model_file=model_file)
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    rng = np.random.default_rng(0)
+    probe = {"items": tmp / f"{label}_items.npy", "users": tmp / f"{label}_users.npy"}
+    items = np.load(run_dir / BUNDLE_DIR / "item_ids.npy")
+    users = np.load(run_dir / BUNDLE_DIR / "user_ids.npy")
+    np.save(probe["items"], items[: min(len(items), 2000)])
+    np.save(probe["users"], rng.choice(users, size=min(n_users, len(users)), replace=False))
+
+    pickle_mb = (run_dir / model_file).stat().st_size / 2**20
+    bundle_mb = sum(f["bytes"] for f in manifest["files"].values()) / 2**20
+    print(f"[INFO] {label}: {manifest['n_users']:,} users x {manifest['n_items']:,} items x {manifest['n_factors']} "
+          f"factors; {model_file} {pickle_mb:.1f} MB, cf_bundle {bundle_mb:.1f} MB")
+
+    rows = []
+    for fmt in ["joblib", "bundle"]:
+        row = {"model": label, "file_mb": round(pickle_mb if fmt == "joblib" else bundle_mb, 1),
+               **_measure(fmt, run_dir, model_file, probe, n_workers)}
+        print(row)
+        rows.append(row)
+    return rows
+
+
+def _synthetic_run(tmp: Path, n_ratings: int, n_factors: int, seed: int) -> Path:
+    """A Surprise SVD pickled the way training saves it (trainset included), at a larger scale."""
+    import joblib
+    from surprise import SVD, Dataset, Reader
+
+    from src.benchmarks.bench_cf_trainers import synthetic_ratings
+
+    df = synthetic_ratings(n_ratings, seed=seed)
+    data = Dataset.load_from_df(df[["userId", "movieId", "rating"]], Reader(rating_scale=(0.5, 5.0)))
+    algo = SVD(n_factors=n_factors, n_epochs=1, random_state=seed)
+    algo.fit(data.build_full_trainset())
+    run_dir = tmp / "synthetic_run"
+    run_dir.mkdir()
+    joblib.dump(algo, run_dir / "cf_svd.joblib")
+    return run_dir
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CF model startup time and per-worker memory: joblib pickle vs mmap bundle.")
+    parser.add_argument("--run_dir", default=None, help="Run to measure (default: models/LATEST)")
+    parser.add_argument("--models_dir", default="models")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent worker processes per format")
+    parser.add_argument("--probe_users", type=int, default=20, help="Requests served per worker before measuring")
+    parser.add_argument("--synthetic_ratings", type=int, default=2_000_000, help="Also measure a synthetic SVD (0 = skip)")
+    parser.add_argument("--synthetic_factors", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    # internal: one worker process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--format", choices=["joblib", "bundle"], help=argparse.SUPPRESS)
+    parser.add_argument("--model_file", help=argparse.SUPPRESS)
+    parser.add_argument("--items", help=argparse.SUPPRESS)
+    parser.add_argument("--users", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    from src.predictions import ModelPaths, _cf_model_files
+
+    run_dir = Path(args.run_dir) if args.run_dir else ModelPaths(Path(args.models_dir)).latest_run_dir()
+    model_file = next((f for f in _cf_model_files(run_dir) if (run_dir / f).exists()), None)
+    if model_file is None:
+        raise SystemExit(f"[ERROR] No CF model in {run_dir}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        results = _bench_run("run", run_dir, model_file, args.workers, args.probe_users, tmp)
+        if args.synthetic_ratings:
+            syn_dir = _synthetic_run(tmp, args.synthetic_ratings, args.synthetic_factors, args.seed)
+            results += _bench_run("synthetic", syn_dir, "cf_svd.joblib", args.workers, args.probe_users, tmp)
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(results).to_string(index=False))
+
+    out = Path(args.out) / f"bench_model_format_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": {k: v for k, v in vars(args).items()
+                                          if k not in ("child", "format", "model_file", "items", "users")},
+                               "results": results}, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
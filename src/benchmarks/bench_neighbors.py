@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.bench_cf_trainers import synthetic_ratings
+from src.encoded import EncodedInteractions
+from src.neighbors import ItemNeighbors, NeighborsConfig, cooccurrence_neighbors, save_neighbors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Item-item neighbors: blocked co-rating cosine build + O(K) lookups.")
+    parser.add_argument("--n_ratings", type=int, default=2_000_000)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--threads", default="1,0", help="Comma-separated n_threads to time (0 = cpu count)")
+    parser.add_argument("--block_mb", type=int, default=64)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    enc = EncodedInteractions.from_frame(synthetic_ratings(args.n_ratings, seed=args.seed))
+    print(f"[INFO] {enc.n_rows:,} ratings, {enc.n_users:,} users, {enc.n_items:,} movies")
+
+    rows, arrays = [], None
+    for n_threads in [int(t) for t in args.threads.split(",")]:
+        cfg = NeighborsConfig(k=args.k, block_mb=args.block_mb, n_threads=n_threads)
+        t0 = time.perf_counter()
+        arrays = cooccurrence_neighbors(enc, cfg)
+        rows.append({"op": "build", "n_threads": n_threads, "seconds": round(time.perf_counter() - t0, 3)})
+        print(rows[-1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_neighbors(Path(tmp), arrays, "cooccurrence")
+        size_mb = path.stat().st_size / 2**20
+        nb = ItemNeighbors.load(Path(tmp))
+    rng = np.random.default_rng(args.seed)
+    ids = rng.choice(nb.movie_ids, size=args.lookups)
+    lat = []
+    for mid in ids:
+        t0 = time.perf_counter()
+        nb.similar(int(mid))
+        lat.append(time.perf_counter() - t0)
+    rows.append({"op": "lookup", "n_threads": 1, "seconds": round(float(np.sum(lat)), 4),
+                 "p50_us": round(float(np.percentile(lat, 50)) * 1e6, 1),
+                 "p99_us": round(float(np.percentile(lat, 99)) * 1e6, 1),
+                 "artifact_mb": round(size_mb, 2)})
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    out = Path(args.out) / f"bench_neighbors_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": vars(args), "results": rows}, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
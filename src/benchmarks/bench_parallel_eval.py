@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.batch_eval import BatchEvalConfig, evaluate_batched
+from src.benchmarks.bench_cf_trainers import synthetic_ratings
+from src.encoded import EncodedInteractions
+from src.evaluation import split_by_user_time
+from src.factorization import FactorModel
+from src.model_bundle import export_bundle
+from src.predictions import Recommender
+from src.training import rank_popularity
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batched evaluation: single process vs process pool over shared memory.")
+    parser.add_argument("--n_ratings", type=int, default=5_000_000)
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidate_pool", type=int, default=2000)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--modes", default="baseline,cf")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    df = synthetic_ratings(args.n_ratings, seed=args.seed)
+    df["timestamp"] = rng.integers(10**9, 10**9 + 10**8, len(df))
+    enc = EncodedInteractions.from_frame(df)
+    train, test = split_by_user_time(enc)
+    print(f"[INFO] {len(df):,} ratings, {test['userId'].nunique():,} test users, {os.cpu_count()} cpu(s)")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        run = Path(tmp) / "run_bench"
+        run.mkdir()
+        (Path(tmp) / "LATEST").write_text(str(run))
+        agg, C = enc.item_rating_stats()
+        rank_popularity(agg, C).head(args.candidate_pool).to_parquet(run / "top_global.parquet", index=False)
+        model = FactorModel(
+            user_factors=rng.normal(0, 0.1, (enc.n_users, args.factors)).astype(np.float32),
+            item_factors=rng.normal(0, 0.1, (enc.n_items, args.factors)).astype(np.float32),
+            user_bias=rng.normal(0, 0.1, enc.n_users).astype(np.float32),
+            item_bias=rng.normal(0, 0.1, enc.n_items).astype(np.float32),
+            global_mean=3.5, user_ids=np.asarray(enc.user_ids), item_ids=np.asarray(enc.item_ids),
+            rating_min=0.5, rating_max=5.0,
+        )
+        export_bundle(model, run, model_file="cf_mf.joblib")
+        rec = Recommender(models_dir=tmp, interactions_path=str(Path(tmp) / "none.parquet"), interactions_df=train)
+
+        for mode in args.modes.split(","):
+            ref, base_s = None, None
+            for n in [int(w) for w in args.workers.split(",")]:
+                cfg = BatchEvalConfig(k=args.k, mode=mode, candidate_pool=args.candidate_pool,
+                                      max_users=None, workers=n, seed=args.seed)
+                t0 = time.perf_counter()
+                per_user = evaluate_batched(rec, train, test, cfg)
+                elapsed = time.perf_counter() - t0
+                if ref is None:
+                    ref, base_s = per_user, elapsed
+                rows.append({
+                    "mode": mode,
+                    "workers": n,
+                    "users": len(per_user),
+                    "seconds": round(elapsed, 3),
+                    "speedup": round(base_s / elapsed, 2),
+                    "identical": bool(per_user.equals(ref)),
+                })
+                print(rows[-1])
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    out = Path(args.out) / f"bench_parallel_eval_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": vars(args), "cpus": os.cpu_count(), "results": rows}, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
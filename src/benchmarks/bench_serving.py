@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.bench_cf_trainers import synthetic_ratings
+from src.encoded import EncodedInteractions, load_encoded
+from src.factorization import FactorModel
+from src.leaderboards import build_leaderboards, save_leaderboards
+from src.model_bundle import export_bundle
+from src.predictions import Recommender, load_recommender
+from src.training import rank_popularity
+
+GENRES = ["Action", "Adventure", "Comedy", "Crime", "Documentary", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller"]
+CONSTRAINTS = ["none", "genre", "year_range", "exclude_large"]
+
+
+def synthetic_recommender(models_dir: Path, n_ratings: int = 1_000_000, factors: int = 64,
+                          topn: int = 2000, seed: int = 42) -> Recommender:
+    """
+    A serving run over MovieLens-shaped synthetic ratings, laid out like src.training's:
+    top_global (Top-N) + leaderboards + a FactorModel bundle, movies with genres/year.
+    """
+    rng = np.random.default_rng(seed)
+    df = synthetic_ratings(n_ratings, seed=seed)
+    enc = EncodedInteractions.from_frame(df)
+    run = models_dir / "run_bench"
+    run.mkdir(parents=True, exist_ok=True)
+    (models_dir / "LATEST").write_text(str(run), encoding="utf-8")
+
+    movies = pd.DataFrame({
+        "movieId": np.asarray(enc.item_ids, dtype=np.int64),
+        "title": [f"Movie {i}" for i in enc.item_ids],
+        "genres": ["|".join(rng.choice(GENRES, size=rng.integers(1, 4), replace=False)) for _ in enc.item_ids],
+        "year": rng.integers(1950, 2024, enc.n_items),
+    })
+    agg, C = enc.item_rating_stats()
+    pop = rank_popularity(agg, C, min_ratings=5)
+    pop.head(topn).to_parquet(run / "top_global.parquet", index=False)
+    save_leaderboards(run, pop, build_leaderboards(pop, movies))
+    movies.to_parquet(run / "movies.parquet", index=False)
+    model = FactorModel(
+        user_factors=rng.normal(0, 0.1, (enc.n_users, factors)).astype(np.float32),
+        item_factors=rng.normal(0, 0.1, (enc.n_items, factors)).astype(np.float32),
+        user_bias=rng.normal(0, 0.1, enc.n_users).astype(np.float32),
+        item_bias=rng.normal(0, 0.1, enc.n_items).astype(np.float32),
+        global_mean=3.5, user_ids=np.asarray(enc.user_ids), item_ids=np.asarray(enc.item_ids),
+        rating_min=0.5, rating_max=5.0,
+    )
+    export_bundle(model, run, model_file="cf_mf.joblib")
+    rec = Recommender(models_dir=str(models_dir), interactions_path=str(models_dir / "none.parquet"),
+                      interactions_df=df)
+    rec.movies = movies   # the synthetic catalogue, not data/movies_enriched.parquet
+    return rec
+
+
+def constraint_sets(rec: Recommender, n_exclude: int) -> Dict[str, Optional[Dict]]:
+    """The request filter mixes: none, one genre, a decade, a large swipe-history exclusion list."""
+    top_ids = rec.top_global["movieId"].astype(int).tolist()
+    return {
+        "none": None,
+        "genre": {"genres_in": ["Drama"]},
+        "year_range": {"min_year": 1990, "max_year": 1999},
+        "exclude_large": {"exclude_movieIds": top_ids[1::2][:n_exclude]},
+    }
+
+
+def measure(call: Callable[[int], pd.DataFrame], users: Sequence[int], n_calls: int,
+            n_alloc_calls: int = 20, warmup: int = 5) -> Dict:
+    """
+    Latency percentiles + calls/s over n_calls (users cycled), then the mean tracemalloc
+    peak per call over n_alloc_calls separate calls (tracing is off while timing).
+    """
+    for j in range(warmup):
+        call(users[j % len(users)])
+
+    lat = np.empty(n_calls)
+    rows = 0
+    t_all = time.perf_counter()
+    for j in range(n_calls):
+        t0 = time.perf_counter()
+        rows += len(call(users[j % len(users)]))
+        lat[j] = time.perf_counter() - t0
+    total = time.perf_counter() - t_all
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for j in range(n_alloc_calls):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call(users[j % len(users)])
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99]) * 1e3
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(lat.max() * 1e3), 3),
+        "calls_per_s": round(n_calls / total, 1),
+        "alloc_peak_kb": round(float(np.mean(peaks)) / 1024, 1) if peaks else None,
+        "rows_per_call": round(rows / n_calls, 2),
+    }
+
+
+def run_cases(rec: Recommender, known_users: Sequence[int], unknown_users: Sequence[int],
+              methods: List[str], pools: List[int], ks: List[int], constraints: List[str],
+              n_calls: int, n_alloc_calls: int = 20, n_exclude: int = 1000) -> List[Dict]:
+    """
+    One result per (method, pool, k, constraints, user kind).
+    pool: candidate_pool for recommend_cf; the served Top-N (top_global rows) for recommend_baseline.
+    """
+    full_top = rec.top_global
+    filters = constraint_sets(rec, n_exclude)
+    rows = []
+    try:
+        for method, pool, k, cname, kind in itertools.product(methods, pools, ks, constraints, ["known", "unknown"]):
+            c = filters[cname]
+            users = known_users if kind == "known" else unknown_users
+            if method == "baseline":
+                rec.top_global = full_top.head(pool)
+                call = lambda u: rec.recommend_baseline(user_id=u, k=k, constraints=c)
+            else:
+                rec.top_global = full_top
+                call = lambda u: rec.recommend_cf(user_id=u, k=k, candidate_pool=pool, constraints=c)
+            rows.append({"method": method, "pool": pool, "k": k, "constraints": cname, "users": kind,
+                         **measure(call, users, n_calls, n_alloc_calls)})
+            print(rows[-1])
+    finally:
+        rec.top_global = full_top
+    return rows
+
+
+def _case_key(row: Dict) -> tuple:
+    return tuple(row[c] for c in ["method", "pool", "k", "constraints", "users"])
+
+
+def compare(rows: List[Dict], previous: str) -> pd.DataFrame:
+    """p95 / calls-per-second of this run against an earlier report, per matching case."""
+    prev = {_case_key(r): r for r in json.loads(Path(previous).read_text(encoding="utf-8"))["results"]}
+    out = []
+    for r in rows:
+        p = prev.get(_case_key(r))
+        if p:
+            out.append({**dict(zip(["method", "pool", "k", "constraints", "users"], _case_key(r))),
+                        "p95_ms": r["p95_ms"], "prev_p95_ms": p["p95_ms"],
+                        "p95_ratio": round(r["p95_ms"] / p["p95_ms"], 2) if p["p95_ms"] else None,
+                        "calls_per_s_ratio": round(r["calls_per_s"] / p["calls_per_s"], 2) if p["calls_per_s"] else None})
+    return pd.DataFrame(out)
+
+
+def save_report(rows: List[Dict], config: Dict, out_dir: str) -> Path:
+    """models/bench_serving_<utc>.json: config + environment + one result per case (diff with --compare)."""
+    env = {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+           "cpus": os.cpu_count(), "machine": platform.machine()}
+    out = Path(out_dir) / f"bench_serving_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": config, "env": env, "results": rows}, indent=2), encoding="utf-8")
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serving latency / throughput of Recommender.recommend_baseline and recommend_cf.")
+    parser.add_argument("--models_dir", default=None, help="Benchmark this LATEST run (default: a synthetic run)")
+    parser.add_argument("--interactions", default="data/interactions.parquet", help="Seen items for --models_dir")
+    parser.add_argument("--n_ratings", type=int, default=1_000_000, help="Synthetic run size")
+    parser.add_argument("--factors", type=int, default=64, help="Synthetic run CF factors")
+    parser.add_argument("--methods", default="baseline,cf")
+    parser.add_argument("--pools", default="200,2000")
+    parser.add_argument("--ks", default="10,50")
+    parser.add_argument("--constraints", default=",".join(CONSTRAINTS))
+    parser.add_argument("--n_calls", type=int, default=200, help="Timed calls per case")
+    parser.add_argument("--n_alloc_calls", type=int, default=20, help="tracemalloc calls per case")
+    parser.add_argument("--n_exclude", type=int, default=1000, help="exclude_movieIds size for exclude_large")
+    parser.add_argument("--n_users", type=int, default=100, help="Distinct known / unknown users cycled")
+    parser.add_argument("--compare", default=None, help="Earlier bench_serving JSON to diff p95 / throughput against")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.models_dir:
+            rec = load_recommender(models_dir=args.models_dir, interactions_path=args.interactions)
+            user_ids = np.asarray(load_encoded(args.interactions).user_ids)
+        else:
+            rec = synthetic_recommender(Path(tmp), args.n_ratings, args.factors, topn=max(int(p) for p in args.pools.split(",")),
+                                        seed=args.seed)
+            user_ids = np.asarray(rec._interactions_df["userId"].unique())
+        known = rng.choice(user_ids, size=min(args.n_users, len(user_ids)), replace=False).astype(int).tolist()
+        unknown = (int(user_ids.max()) + 1 + np.arange(args.n_users)).tolist()
+        rec.seen_count(known[0])   # build the per-user history index outside the timings
+        print(f"[INFO] top_global={len(rec.top_global)} rows, cf={'on' if rec.cf_enabled else 'off'}, "
+              f"leaderboards={'on' if rec.leaderboards is not None else 'off'}")
+
+        rows = run_cases(rec, known, unknown,
+                         methods=args.methods.split(","),
+                         pools=[int(p) for p in args.pools.split(",")],
+                         ks=[int(k) for k in args.ks.split(",")],
+                         constraints=args.constraints.split(","),
+                         n_calls=args.n_calls, n_alloc_calls=args.n_alloc_calls, n_exclude=args.n_exclude)
+
+    table = pd.DataFrame(rows)
+    print("\n=== Summary ===")
+    print(table.to_string(index=False))
+    print(f"\n[INFO] worst p95: {table['p95_ms'].max():.1f} ms, worst p99: {table['p99_ms'].max():.1f} ms")
+    if args.compare:
+        print("\n=== vs previous ===")
+        print(compare(rows, args.compare).to_string(index=False))
+
+    out = save_report(rows, vars(args), args.out)
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
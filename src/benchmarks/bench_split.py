@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.bench_cf_trainers import synthetic_ratings
+from src.encoded import EncodedInteractions, load_encoded
+from src.evaluation import cached_split, split_by_user_time
+
+
+def _split_loop(df: pd.DataFrame, holdout: str, holdout_pct: float):
+    """The per-user groupby loop split_by_user_time ran before it was vectorized (reference)."""
+    df = df.dropna(subset=["userId", "movieId", "timestamp"]).copy()
+    df["userId"] = df["userId"].astype(int)
+    df["movieId"] = df["movieId"].astype(int)
+    df = df.sort_values(["userId", "timestamp"])
+    train_parts, test_parts = [], []
+    for _, grp in df.groupby("userId", sort=False):
+        n = len(grp)
+        if n < 2:
+            continue
+        cut = n - 1 if holdout == "last1" else n - max(1, int(np.ceil(n * holdout_pct)))
+        train_parts.append(grp.iloc[:cut])
+        test_parts.append(grp.iloc[cut:])
+    return pd.concat(train_parts, ignore_index=True), pd.concat(test_parts, ignore_index=True)
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-user time split: groupby loop vs vectorized vs encoded vs parquet cache.")
+    parser.add_argument("--sizes", default="1000000,25000000", help="Comma-separated rating counts")
+    parser.add_argument("--holdout", default="last1", choices=["last1", "lastpct"])
+    parser.add_argument("--holdout_pct", type=float, default=0.2)
+    parser.add_argument("--loop_max_rows", type=int, default=25_000_000, help="Skip the reference loop above this size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    rows = []
+    for n in [int(s) for s in args.sizes.split(",")]:
+        df = synthetic_ratings(n, seed=args.seed)
+        df["timestamp"] = np.random.default_rng(args.seed).integers(10**9, 10**9 + 10**8, len(df))
+        row = {"ratings": len(df), "users": int(df["userId"].nunique())}
+
+        (train, test), row["vectorized_s"] = _timed(lambda: split_by_user_time(df, args.holdout, args.holdout_pct))
+        if len(df) <= args.loop_max_rows:
+            (ref_train, ref_test), row["loop_s"] = _timed(lambda: _split_loop(df, args.holdout, args.holdout_pct))
+            pd.testing.assert_frame_equal(train, ref_train)
+            pd.testing.assert_frame_equal(test, ref_test)
+            row["identical"] = True
+            row["speedup"] = round(row["loop_s"] / row["vectorized_s"], 1)
+            del ref_train, ref_test
+
+        enc = EncodedInteractions.from_frame(df)
+        _, row["encoded_s"] = _timed(lambda: split_by_user_time(enc, args.holdout, args.holdout_pct))
+        del enc, train, test
+        gc.collect()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "interactions.parquet"
+            df.to_parquet(path, index=False)
+            del df
+            gc.collect()
+            _, row["cache_build_s"] = _timed(lambda: cached_split(str(path), args.holdout, args.holdout_pct))
+            _, row["cache_hit_s"] = _timed(lambda: cached_split(str(path), args.holdout, args.holdout_pct))
+            # what a hit replaces: re-splitting the (already built) encoded arrays
+            _, row["recompute_s"] = _timed(lambda: split_by_user_time(load_encoded(str(path)), args.holdout, args.holdout_pct))
+        rows.append({k: round(v, 3) if isinstance(v, float) else v for k, v in row.items()})
+        print(rows[-1])
+        gc.collect()
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    out = Path(args.out) / f"bench_split_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": vars(args), "results": rows}, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from src.benchmarks.bench_cf_trainers import _holdout, _rmse, synthetic_ratings
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM resets on exec; ru_maxrss (KiB on Linux) survives it and would report the parent's peak
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _child(args: argparse.Namespace) -> None:
+    """Train once in a fresh process and print one JSON line (peak RSS is per process)."""
+    from src.cf_training import load_interactions
+    from src.factorization import MFConfig, fit_factor_model
+    from src.streaming import StreamConfig, train_streaming_sgd
+
+    # warm up the parquet/compute code paths so their library pages are not billed to training
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    pc.is_valid(next(pq.ParquetFile(args.train_path).iter_batches(batch_size=1024)).column(0))
+    pd.read_parquet(args.test_path).head()
+
+    base_rss = _peak_rss_mb()
+    pool = pa.default_memory_pool()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if args.child == "memory":
+        df = load_interactions(args.train_path)
+        model, _ = fit_factor_model(df, MFConfig(
+            algo="sgd", n_factors=args.n_factors, n_epochs=args.n_epochs, seed=args.seed,
+        ))
+        del df
+        info = {}
+    else:
+        model, info = train_streaming_sgd(args.train_path, StreamConfig(
+            memory_budget_mb=args.budget_mb, n_factors=args.n_factors, n_epochs=args.n_epochs, seed=args.seed,
+        ))
+    secs = time.perf_counter() - t0
+    peak = _peak_rss_mb()
+    numpy_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    test = pd.read_parquet(args.test_path)
+    print(json.dumps({
+        "mode": args.child,
+        "train_seconds": round(secs, 2),
+        "rmse": round(_rmse(model, test), 4),
+        # numpy/python allocations (tracemalloc) + Arrow pool high-water mark: what the budget governs
+        "buffers_peak_mb": round((numpy_peak + pool.max_memory()) / 2**20, 1),
+        "rss_after_warmup_mb": round(base_rss, 1),
+        "peak_rss_mb": round(peak, 1),
+        "training_rss_mb": round(peak - base_rss, 1),
+        "window_rows": info.get("window_rows"),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Streaming (out-of-core) vs in-memory SGD: quality and peak memory.")
+    parser.add_argument("--n_ratings", type=int, default=5_000_000)
+    parser.add_argument("--budget_mb", type=int, default=64)
+    parser.add_argument("--row_group_rows", type=int, default=250_000)
+    parser.add_argument("--n_factors", type=int, default=50)
+    parser.add_argument("--n_epochs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    # internal: run one mode in this process
+    parser.add_argument("--child", choices=["memory", "stream"], default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--train_path", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--test_path", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        df = synthetic_ratings(args.n_ratings, seed=args.seed)
+        train, test = _holdout(df, 0.1, args.seed)
+        # user-sorted on disk (the order an encoded, user-clustered export has): worst case for chunked SGD
+        train = train.sort_values(["userId", "movieId"]).reset_index(drop=True)
+        train_path, test_path = Path(tmp) / "train.parquet", Path(tmp) / "test.parquet"
+        train.to_parquet(train_path, index=False, row_group_size=args.row_group_rows)
+        test.to_parquet(test_path, index=False)
+        print(f"[INFO] train={len(train):,} rows ({train_path.stat().st_size / 2**20:.0f} MB parquet, "
+              f"{train.memory_usage(deep=True).sum() / 2**20:.0f} MB in memory), budget={args.budget_mb} MB")
+        del df, train, test
+
+        results = []
+        for mode in ["memory", "stream"]:
+            cmd = [sys.executable, "-m", "src.benchmarks.bench_streaming", "--child", mode,
+                   "--train_path", str(train_path), "--test_path", str(test_path),
+                   "--budget_mb", str(args.budget_mb), "--n_factors", str(args.n_factors),
+                   "--n_epochs", str(args.n_epochs), "--seed", str(args.seed)]
+            out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            row = json.loads(out.strip().splitlines()[-1])
+            print(row)
+            results.append(row)
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(results).to_string(index=False))
+
+    report = {"config": {k: v for k, v in vars(args).items() if k not in ("child", "train_path", "test_path")},
+              "results": results}
+    out_path = Path(args.out) / f"bench_streaming_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
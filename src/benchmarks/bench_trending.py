@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.bench_cf_trainers import synthetic_ratings
+from src.trending import TrendingConfig, TrendingState
+
+
+def _best_of(fn, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trending baseline: one-pass build vs incremental feedback updates.")
+    parser.add_argument("--n_ratings", type=int, default=5_000_000)
+    parser.add_argument("--half_life_days", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="models", help="Directory for the JSON report")
+    args = parser.parse_args()
+
+    df = synthetic_ratings(args.n_ratings, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    ts = np.sort(rng.integers(1_000_000_000, 1_450_000_000, len(df)))
+    movies, ratings = df["movieId"].to_numpy(), df["rating"].to_numpy()
+    cfg = TrendingConfig(half_life_days=args.half_life_days)
+
+    build_s = _best_of(lambda: TrendingState.from_history(movies, ratings, ts, cfg), repeat=3)
+    state = TrendingState.from_history(movies, ratings, ts, cfg)
+    print(f"[INFO] history: {len(df):,} ratings, {len(state.movie_ids):,} movies, one-pass build {build_s:.3f}s")
+
+    rows = [{"op": "full_build", "events": len(df), "seconds": round(build_s, 5)}]
+    t_last = int(ts[-1])
+    for batch in [1, 10, 100, 1_000, 10_000]:
+        ev_movies = rng.choice(movies, size=batch)
+        ev_ratings = rng.choice([1.0, 5.0], size=batch)
+        ev_ts = np.full(batch, t_last + 3600)
+        secs = _best_of(lambda: state.update(ev_movies, ev_ratings, ev_ts))
+        rows.append({"op": "update", "events": batch, "seconds": round(secs, 6),
+                     "speedup_vs_rebuild": round(build_s / secs, 1)})
+        print(rows[-1])
+    rank_s = _best_of(state.ranked)
+    rows.append({"op": "rank_table", "events": 0, "seconds": round(rank_s, 5)})
+
+    print("\n=== Summary ===")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    out = Path(args.out) / f"bench_trending_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"config": vars(args), "results": rows}, indent=2), encoding="utf-8")
+    print(f"\nReport saved to: {out}")
+
+
+if __name__ == "__main__":
+    main()
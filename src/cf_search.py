@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cf_training import CFConfig, _new_run_dir, get_latest_run_dir, load_interactions, train_svd
+from src.evaluation import split_by_user_time
+from src.factorization import TRAINERS, FactorModel, MFConfig, fit_factor_model
+from src.model_bundle import export_bundle
+from src.shared_arrays import SHARED, attach, release, share
+
+# Default search space (CFConfig field names)
+GRID_SPACE: Dict[str, List] = {
+    "n_factors": [50, 100, 150],
+    "n_epochs": [20],
+    "lr_all": [0.005, 0.01],
+    "reg_all": [0.02, 0.05, 0.1],
+}
+
+# Random / successive-halving sampling ranges: (low, high, scale)
+RANDOM_SPACE: Dict[str, Tuple[float, float, str]] = {
+    "n_factors": (16, 200, "int"),
+    "n_epochs": (10, 40, "int"),
+    "lr_all": (1e-3, 2e-2, "log"),
+    "reg_all": (5e-3, 0.2, "log"),
+}
+
+
+@dataclass
+class SearchConfig:
+    interactions_path: str = "data/interactions.parquet"
+    models_dir: str = "models"
+    algo: str = "svd"              # svd (Surprise) | sgd | als (src/factorization.py)
+    strategy: str = "grid"         # grid | random | halving
+    n_trials: int = 20             # random/halving: number of sampled configs
+    grid: Dict[str, List] = field(default_factory=lambda: dict(GRID_SPACE))
+    metric: str = "ndcg"           # ndcg | recall (leaderboard sort key)
+    k: int = 10
+    holdout: str = "last1"
+    holdout_pct: float = 0.2
+    max_users: Optional[int] = 2000
+    n_workers: int = 0             # 0 = os.cpu_count()
+    # successive halving: epochs budget grows by eta per rung, top 1/eta configs survive
+    eta: int = 3
+    min_epochs: int = 5
+    max_epochs: int = 45
+    promote: bool = False
+    seed: int = 42
+
+
+# ---------------------------------------------------------------------------
+# Train + score one configuration (runs inside a worker)
+# ---------------------------------------------------------------------------
+
+def _train_factors(params: Dict, algo: str, seed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]:
+    """Factors aligned with the shared dense codes: (pu, qi, bu, bi, mu)."""
+    u, i, r = SHARED["u"], SHARED["i"], SHARED["r"]
+    n_users, n_items = int(SHARED["n"][0]), int(SHARED["n"][1])
+
+    if algo == "svd":
+        df = pd.DataFrame({"userId": u, "movieId": i, "rating": r})
+        algo_obj, _ = train_svd(df, CFConfig(
+            n_factors=int(params["n_factors"]), n_epochs=int(params["n_epochs"]),
+            lr_all=float(params["lr_all"]), reg_all=float(params["reg_all"]), seed=seed,
+        ))
+        m = FactorModel.from_surprise(algo_obj)
+        ju = np.empty(n_users, dtype=np.int64)
+        ji = np.empty(n_items, dtype=np.int64)
+        ju[m.user_ids.astype(np.int64)] = np.arange(len(m.user_ids))
+        ji[m.item_ids.astype(np.int64)] = np.arange(len(m.item_ids))
+        return m.user_factors[ju], m.item_factors[ji], m.user_bias[ju], m.item_bias[ji], m.global_mean
+
+    cfg = MFConfig(
+        algo=algo, n_factors=int(params["n_factors"]), n_epochs=int(params["n_epochs"]),
+        lr=float(params["lr_all"]), reg=float(params["reg_all"]), n_threads=1, seed=seed,
+    )
+    return TRAINERS[algo](u, i, r, n_users, n_items, cfg)
+
+
+def _topk_metrics(pu, qi, bu, bi, k: int, batch: int = 512) -> Tuple[float, float]:
+    """
+    Full-catalog top-k for the shared eval users (train items excluded), against their test items.
+    recall/ndcg definitions follow src/evaluation.py; test items unseen in train count as misses.
+    User bias and global mean do not change a user's ranking, so only p_u . q_i + b_i is scored.
+    """
+    users = SHARED["eval_users"]
+    seen_ptr, seen_idx = SHARED["seen_ptr"], SHARED["seen_idx"]
+    rel_ptr, rel_idx = SHARED["rel_ptr"], SHARED["rel_idx"]
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+
+    recalls, ndcgs = [], []
+    item_base = bi.astype(np.float64)
+    for s in range(0, len(users), batch):
+        ub = users[s:s + batch]
+        scores = pu[ub].astype(np.float64) @ qi.T.astype(np.float64) + item_base
+        for row, uu in enumerate(ub):
+            scores[row, seen_idx[seen_ptr[uu]:seen_ptr[uu + 1]]] = -np.inf
+        kk = min(k, scores.shape[1])
+        top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+        for row, uu in enumerate(ub):
+            rel = rel_idx[rel_ptr[uu]:rel_ptr[uu + 1]]
+            hits = np.isin(top[row], rel[rel >= 0])
+            recalls.append(hits.sum() / len(rel))
+            idcg = discounts[:min(len(rel), k)].sum()
+            ndcgs.append(float(discounts[:kk][hits].sum() / idcg))
+    return float(np.mean(recalls)), float(np.mean(ndcgs))
+
+
+def run_trial(params: Dict, algo: str, k: int, seed: int) -> Dict:
+    t0 = time.perf_counter()
+    pu, qi, bu, bi, _ = _train_factors(params, algo, seed)
+    train_s = time.perf_counter() - t0
+    recall, ndcg = _topk_metrics(pu, qi, bu, bi, k)
+    return {
+        **params,
+        f"recall@{k}": recall,
+        f"ndcg@{k}": ndcg,
+        "train_seconds": round(train_s, 3),
+        "eval_seconds": round(time.perf_counter() - t0 - train_s, 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def _csr_by_user(users: np.ndarray, items: np.ndarray, n_users: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(users, kind="stable")
+    ptr = np.zeros(n_users + 1, dtype=np.int64)
+    np.cumsum(np.bincount(users, minlength=n_users), out=ptr[1:])
+    return ptr, items[order].astype(np.int32)
+
+
+def prepare_shared_arrays(interactions: pd.DataFrame, cfg: SearchConfig) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Split once (split_by_user_time), encode to dense codes and build the eval structures."""
+    train_df, test_df = split_by_user_time(interactions, holdout=cfg.holdout, holdout_pct=cfg.holdout_pct)
+
+    u, user_ids = pd.factorize(train_df["userId"].to_numpy(), sort=True)
+    i, item_ids = pd.factorize(train_df["movieId"].to_numpy(), sort=True)
+    n_users, n_items = len(user_ids), len(item_ids)
+
+    tu = pd.Index(user_ids).get_indexer(test_df["userId"].to_numpy())
+    ti = pd.Index(item_ids).get_indexer(test_df["movieId"].to_numpy())
+    keep = tu >= 0
+    tu, ti = tu[keep], ti[keep]
+
+    eval_users = np.unique(tu)
+    rng = np.random.default_rng(cfg.seed)
+    if cfg.max_users is not None and len(eval_users) > cfg.max_users:
+        eval_users = np.sort(rng.choice(eval_users, size=cfg.max_users, replace=False))
+
+    seen_ptr, seen_idx = _csr_by_user(u, i, n_users)
+    rel_ptr, rel_idx = _csr_by_user(tu, ti, n_users)
+
+    arrays = {
+        "u": u.astype(np.int32),
+        "i": i.astype(np.int32),
+        "r": train_df["rating"].to_numpy(dtype=np.float32),
+        "n": np.array([n_users, n_items], dtype=np.int64),
+        "eval_users": eval_users.astype(np.int32),
+        "seen_ptr": seen_ptr,
+        "seen_idx": seen_idx,
+        "rel_ptr": rel_ptr,
+        "rel_idx": rel_idx,
+    }
+    meta = {
+        "train_rows": int(len(train_df)),
+        "test_rows": int(len(test_df)),
+        "num_users": int(n_users),
+        "num_movies": int(n_items),
+        "eval_users": int(len(eval_users)),
+    }
+    return arrays, meta
+
+
+def grid_configs(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid)
+    combos = [{}]
+    for key in keys:
+        combos = [{**c, key: v} for c in combos for v in grid[key]]
+    return combos
+
+
+def random_configs(n: int, seed: int, space: Dict[str, Tuple[float, float, str]] = RANDOM_SPACE) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(int(n)):
+        params = {}
+        for key, (lo, hi, scale) in space.items():
+            if scale == "int":
+                params[key] = int(rng.integers(lo, hi + 1))
+            elif scale == "log":
+                params[key] = float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
+            else:
+                params[key] = float(rng.uniform(lo, hi))
+        out.append(params)
+    return out
+
+
+def _with_ids(configs: List[Dict]) -> List[Dict]:
+    return [{"config_id": j, **c} for j, c in enumerate(configs)]
+
+
+def _run_batch(pool: ProcessPoolExecutor, configs: List[Dict], cfg: SearchConfig, rung: int) -> List[Dict]:
+    futures = [pool.submit(run_trial, params, cfg.algo, cfg.k, cfg.seed) for params in configs]
+    rows = []
+    for fut in futures:
+        row = {"rung": rung, **fut.result()}
+        print(f"[INFO] rung={rung} "
+              + " ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items() if k != "rung"))
+        rows.append(row)
+    return rows
+
+
+def search(interactions: pd.DataFrame, cfg: SearchConfig) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Evaluate configurations in a process pool over one shared split.
+    Returns the leaderboard (best first) and split metadata.
+    """
+    arrays, meta = prepare_shared_arrays(interactions, cfg)
+    specs, handles = share(arrays)
+    metric_col = f"{cfg.metric}@{cfg.k}"
+    n_workers = cfg.n_workers or os.cpu_count() or 1
+
+    try:
+        # spawn: same behaviour on Linux and Windows; workers get the data via shared memory, not pickling
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=get_context("spawn"),
+                                 initializer=attach, initargs=(specs,)) as pool:
+            if cfg.strategy == "grid":
+                rows = _run_batch(pool, _with_ids(grid_configs(cfg.grid)), cfg, rung=0)
+            elif cfg.strategy == "random":
+                rows = _run_batch(pool, _with_ids(random_configs(cfg.n_trials, cfg.seed)), cfg, rung=0)
+            elif cfg.strategy == "halving":
+                configs = _with_ids(random_configs(cfg.n_trials, cfg.seed))
+                rows, rung, epochs = [], 0, cfg.min_epochs
+                while configs:
+                    batch = [{**c, "n_epochs": int(epochs)} for c in configs]
+                    res = _run_batch(pool, batch, cfg, rung=rung)
+                    rows.extend(res)
+                    if epochs >= cfg.max_epochs or len(configs) == 1:
+                        break
+                    keep = max(1, len(configs) // cfg.eta)
+                    best = sorted(range(len(res)), key=lambda j: res[j][metric_col], reverse=True)[:keep]
+                    configs = [configs[j] for j in best]
+                    rung += 1
+                    epochs = min(epochs * cfg.eta, cfg.max_epochs)
+            else:
+                raise ValueError("strategy must be 'grid', 'random' or 'halving'")
+    finally:
+        release(handles)
+
+    board = pd.DataFrame(rows)
+    # halving: only the last rung a config reached is comparable at full budget
+    board = board.sort_values(["rung", metric_col], ascending=[False, False]).reset_index(drop=True)
+    return board, meta
+
+
+def promote_best(best: Dict, interactions: pd.DataFrame, cfg: SearchConfig, leaderboard_path: Path) -> Path:
+    """Retrain the winning config on all interactions into a new run dir and point LATEST at it."""
+    import joblib
+
+    parent_dir = get_latest_run_dir(cfg.models_dir)
+    out_dir = _new_run_dir(cfg.models_dir, parent_dir)
+    params = {
+        "n_factors": int(best["n_factors"]),
+        "n_epochs": int(best["n_epochs"]),
+        "lr_all": float(best["lr_all"]),
+        "reg_all": float(best["reg_all"]),
+    }
+
+    df = interactions[["userId", "movieId", "rating"]]
+    if cfg.algo == "svd":
+        model, scale_info = train_svd(df, CFConfig(seed=cfg.seed, **params))
+        joblib.dump(model, out_dir / "cf_svd.joblib")
+        export_bundle(model, out_dir, model_file="cf_svd.joblib")
+        cf_info = {"model_type": "surprise_svd", "model_file": "cf_svd.joblib", **params, **scale_info}
+    else:
+        model, cf_info = fit_factor_model(df, MFConfig(
+            algo=cfg.algo, n_factors=params["n_factors"], n_epochs=params["n_epochs"],
+            lr=params["lr_all"], reg=params["reg_all"], seed=cfg.seed,
+        ))
+        joblib.dump(model, out_dir / "cf_mf.joblib")
+        export_bundle(model, out_dir, model_file="cf_mf.joblib")
+        cf_info["model_file"] = "cf_mf.joblib"
+
+    cf_info.update({
+        "trained_rows": int(len(df)),
+        "num_users": int(df["userId"].nunique()),
+        "num_movies": int(df["movieId"].nunique()),
+        "max_timestamp": int(interactions["timestamp"].max()) if "timestamp" in interactions.columns else None,
+        "trained_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "update_mode": "search",
+        "parent_run": str(parent_dir),
+        "search_leaderboard": str(leaderboard_path),
+        f"search_{cfg.metric}@{cfg.k}": float(best[f"{cfg.metric}@{cfg.k}"]),
+    })
+    (out_dir / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
+    (Path(cfg.models_dir) / "LATEST").write_text(str(out_dir), encoding="utf-8")
+    return out_dir
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search for the CF model.")
+    parser.add_argument("--interactions", default=SearchConfig.interactions_path)
+    parser.add_argument("--models_dir", default=SearchConfig.models_dir)
+    parser.add_argument("--algo", default=SearchConfig.algo, choices=["svd", "sgd", "als"])
+    parser.add_argument("--strategy", default=SearchConfig.strategy, choices=["grid", "random", "halving"])
+    parser.add_argument("--n_trials", type=int, default=SearchConfig.n_trials)
+    parser.add_argument("--grid", default=None,
+                        help='JSON grid override, e.g. \'{"n_factors": [50, 100], "reg_all": [0.02]}\'')
+    parser.add_argument("--metric", default=SearchConfig.metric, choices=["ndcg", "recall"])
+    parser.add_argument("--k", type=int, default=SearchConfig.k)
+    parser.add_argument("--holdout", default=SearchConfig.holdout)
+    parser.add_argument("--holdout_pct", type=float, default=SearchConfig.holdout_pct)
+    parser.add_argument("--max_users", type=int, default=SearchConfig.max_users)
+    parser.add_argument("--n_workers", type=int, default=SearchConfig.n_workers)
+    parser.add_argument("--eta", type=int, default=SearchConfig.eta)
+    parser.add_argument("--min_epochs", type=int, default=SearchConfig.min_epochs)
+    parser.add_argument("--max_epochs", type=int, default=SearchConfig.max_epochs)
+    parser.add_argument("--promote", action="store_true", help="Retrain the best config on all data and update LATEST")
+    parser.add_argument("--seed", type=int, default=SearchConfig.seed)
+    args = parser.parse_args()
+
+    grid = dict(GRID_SPACE)
+    if args.grid:
+        grid.update(json.loads(args.grid))
+
+    cfg = SearchConfig(
+        interactions_path=args.interactions,
+        models_dir=args.models_dir,
+        algo=args.algo,
+        strategy=args.strategy,
+        n_trials=args.n_trials,
+        grid=grid,
+        metric=args.metric,
+        k=args.k,
+        holdout=args.holdout,
+        holdout_pct=args.holdout_pct,
+        max_users=args.max_users,
+        n_workers=args.n_workers,
+        eta=args.eta,
+        min_epochs=args.min_epochs,
+        max_epochs=args.max_epochs,
+        promote=args.promote,
+        seed=args.seed,
+    )
+
+    interactions = load_interactions(cfg.interactions_path)
+    t0 = time.perf_counter()
+    board, meta = search(interactions, cfg)
+    elapsed = time.perf_counter() - t0
+    print(f"[INFO] {len(board)} trials in {elapsed:.1f}s "
+          f"(train={meta['train_rows']:,} rows, eval users={meta['eval_users']:,})")
+
+    print("\n=== Leaderboard ===")
+    print(board.head(10).to_string(index=False))
+
+    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    out_path = Path(cfg.models_dir) / f"cf_search_{cfg.strategy}_{ts}.parquet"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    board.assign(algo=cfg.algo, strategy=cfg.strategy).to_parquet(out_path, index=False)
+    (out_path.with_suffix(".json")).write_text(
+        json.dumps({**asdict(cfg), **meta, "seconds": round(elapsed, 2)}, indent=2), encoding="utf-8"
+    )
+    print(f"\n[OK] Leaderboard saved to: {out_path}")
+
+    if cfg.promote and len(board):
+        run_dir = promote_best(board.iloc[0].to_dict(), interactions, cfg, out_path)
+        print(f"[OK] Best config promoted: {run_dir} (LATEST updated)")
+
+
+if __name__ == "__main__":
+    main()
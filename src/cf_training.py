@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import argparse
 import json
+import shutil
+import time
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+from src.factorization import sgd_epoch_per_rating
+from src.leaderboards import LEADERBOARDS_FILE, RANKED_FILE
+from src.model_bundle import export_bundle
+from src.neighbors import NEIGHBORS_FILE
+from src.trending import TRENDING_FILE
+
 
 @dataclass
 class CFConfig:
@@ -14,7 +25,7 @@ class CFConfig:
     models_dir: str = "models"
     seed: int = 42
 
-    # SVD hyperparams 
+    # SVD hyperparams
     n_factors: int = 100
     n_epochs: int = 20
     lr_all: float = 0.005
@@ -22,19 +33,20 @@ class CFConfig:
 
     # Speed / memory
     train_on_sample: bool = False
-    sample_n: int = 2_000_000  
+    sample_n: int = 2_000_000
+    stream: bool = False             # out-of-core SGD over parquet batches (src/streaming.py)
+    memory_budget_mb: int = 256
+
+    # Warm-start incremental updates (from the LATEST CF model)
+    incremental: bool = False
+    warm_epochs: int = 5
+    warm_update_items: bool = False  # also move existing items with new ratings (off: only users + new items)
 
 
 def load_interactions(path: str) -> pd.DataFrame:
-    df = pd.read_parquet(path)
-    for c in ["userId", "movieId", "rating"]:
-        if c not in df.columns:
-            raise ValueError(f"Missing column in interactions: {c}")
-    df = df.dropna(subset=["userId", "movieId", "rating"]).copy()
-    df["userId"] = df["userId"].astype(int)
-    df["movieId"] = df["movieId"].astype(int)
-    df["rating"] = df["rating"].astype(float)
-    return df
+    """(userId, movieId, rating, timestamp) from the shared encoded artifact (built once per data version)."""
+    from src.encoded import load_encoded
+    return load_encoded(path).frame()
 
 
 def get_latest_run_dir(models_dir: str) -> Path:
@@ -42,7 +54,7 @@ def get_latest_run_dir(models_dir: str) -> Path:
     latest = p / "LATEST"
     if not latest.exists():
         raise FileNotFoundError("models/LATEST not found. Run baseline training first.")
-    run_dir = Path(latest.read_text(encoding="utf-8").strip())
+    run_dir = Path(latest.read_text(encoding="utf-8").strip().replace("\\", "/"))
     if not run_dir.exists():
         raise FileNotFoundError(f"LATEST points to missing directory: {run_dir}")
     return run_dir
@@ -72,11 +84,252 @@ def train_svd(df: pd.DataFrame, cfg: CFConfig):
     return algo, {"rating_min": rmin, "rating_max": rmax}
 
 
+def _extend_ids(raw2inner: Dict, raw: np.ndarray) -> Tuple[Dict, np.ndarray, int]:
+    """Parent raw -> inner map extended with unseen raw ids (appended in order of appearance), inner id per row."""
+    keys = list(raw2inner)
+    pos = pd.Index(keys).get_indexer(raw) if keys else np.full(len(raw), -1)
+    inner = np.asarray([raw2inner[k] for k in keys], dtype=np.int64)[np.maximum(pos, 0)] if keys else np.zeros(len(raw), dtype=np.int64)
+    fresh = pd.unique(raw[pos < 0])
+    n_old = len(raw2inner)
+    mapping = {**raw2inner, **{k: n_old + j for j, k in enumerate(fresh.tolist())}}
+    if len(fresh):
+        inner[pos < 0] = n_old + pd.Index(fresh).get_indexer(raw[pos < 0])
+    return mapping, inner, n_old
+
+
+def _trainset(u: np.ndarray, i: np.ndarray, r: np.ndarray, users: Dict, items: Dict, scale: Tuple[float, float]):
+    """A Surprise Trainset (same ur/ir/id maps as build_full_trainset would hold) built from inner-id arrays."""
+    from collections import defaultdict
+
+    from surprise import Trainset
+
+    def lists(rows: np.ndarray, cols: np.ndarray) -> defaultdict:
+        order = np.argsort(rows, kind="stable")
+        pairs = list(zip(cols[order].tolist(), r[order].tolist()))
+        ids, starts = np.unique(rows[order], return_index=True)
+        ends = np.r_[starts[1:], len(order)]
+        return defaultdict(list, {int(k): pairs[s:e] for k, s, e in zip(ids.tolist(), starts.tolist(), ends.tolist())})
+
+    ts = Trainset(lists(u, i), lists(i, u), len(users), len(items), len(r), scale, users, items)
+    ts._global_mean = float(r.mean())
+    return ts
+
+
+def warm_start_svd(
+    parent,
+    df: pd.DataFrame,
+    cfg: CFConfig,
+    since_ts: Optional[int] = None,
+) -> Tuple[object, Dict]:
+    """
+    Incrementally update a fitted Surprise SVD on the current interactions.
+    - parent inner ids and factors are kept; new users/items are appended with Surprise-style random init
+    - SGD passes (Surprise's per-rating rule, factorization.sgd_epoch_per_rating) run over the
+      events newer than since_ts plus every rating of new users/items
+    - the users of those events and new items move; existing items stay frozen unless
+      cfg.warm_update_items (a few hours of ratings shift popular items enough to hurt everyone
+      else's ranking; the full retrain refreshes them), everything else stays frozen
+    Returns a new SVD object (servable exactly like a fully trained one) and update stats.
+    """
+    from surprise import SVD
+
+    rmin = float(df["rating"].min())
+    rmax = float(df["rating"].max())
+    pts = parent.trainset
+    users, u, n_old_users = _extend_ids(pts._raw2inner_id_users, df["userId"].to_numpy())
+    items, i, n_old_items = _extend_ids(pts._raw2inner_id_items, df["movieId"].to_numpy())
+    r = df["rating"].to_numpy(dtype=np.float64)
+
+    rng = np.random.default_rng(cfg.seed)
+    f = parent.pu.shape[1]
+    init_std = float(getattr(parent, "init_std_dev", 0.1))
+    pu = np.vstack([parent.pu, rng.normal(0.0, init_std, size=(len(users) - n_old_users, f))])
+    qi = np.vstack([parent.qi, rng.normal(0.0, init_std, size=(len(items) - n_old_items, f))])
+    bu = np.r_[parent.bu, np.zeros(len(users) - n_old_users)]
+    bi = np.r_[parent.bi, np.zeros(len(items) - n_old_items)]
+
+    new_users = np.arange(len(users)) >= n_old_users
+    new_items = np.arange(len(items)) >= n_old_items
+    events = new_users[u] | new_items[i]
+    if since_ts is not None and "timestamp" in df.columns:
+        events |= (df["timestamp"] > since_ts).fillna(False).to_numpy(dtype=bool)
+    user_mask = np.zeros(len(users), dtype=bool)
+    item_mask = np.zeros(len(items), dtype=bool)
+    user_mask[u[events]] = True
+    item_mask[i[events]] = True
+    if not cfg.warm_update_items:
+        item_mask &= new_items
+
+    trainset = _trainset(u, i, r, users, items, (rmin, rmax))
+    mu = trainset.global_mean
+    for _ in range(int(cfg.warm_epochs)):
+        sgd_epoch_per_rating(
+            pu, qi, bu, bi, u[events], i[events], r[events], mu,
+            lr=cfg.lr_all, reg=cfg.reg_all, rng=rng,
+            user_mask=user_mask, item_mask=item_mask,
+        )
+
+    algo = SVD(
+        n_factors=f,
+        n_epochs=parent.n_epochs,
+        lr_all=cfg.lr_all,
+        reg_all=cfg.reg_all,
+        random_state=cfg.seed,
+    )
+    algo.trainset = trainset
+    algo.pu, algo.qi, algo.bu, algo.bi = pu, qi, bu, bi
+
+    stats = {
+        "new_users": int(new_users.sum()),
+        "new_items": int(new_items.sum()),
+        "affected_users": int(user_mask.sum()),
+        "affected_items": int(item_mask.sum()),
+        "updated_ratings": int(events.sum()),
+        "rating_min": rmin,
+        "rating_max": rmax,
+    }
+    return algo, stats
+
+
+def _new_run_dir(models_dir: str, parent_dir: Path) -> Path:
+    """Create models/run_<ts>/ seeded with the parent's non-CF artifacts."""
+    run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    out_dir = Path(models_dir) / f"run_{run_id}"
+    out_dir.mkdir(parents=True, exist_ok=False)
+    for name in ["config.json", "top_global.parquet", "movies.parquet", RANKED_FILE, LEADERBOARDS_FILE, TRENDING_FILE,
+                 NEIGHBORS_FILE]:
+        if (parent_dir / name).exists():
+            shutil.copy2(parent_dir / name, out_dir / name)
+    return out_dir
+
+
+def run_incremental(cfg: CFConfig, df: pd.DataFrame) -> Path:
+    import joblib
+
+    parent_dir = get_latest_run_dir(cfg.models_dir)
+    parent_model = parent_dir / "cf_svd.joblib"
+    if not parent_model.exists():
+        raise FileNotFoundError(f"No CF model to warm-start from in {parent_dir}. Run a full CF training first.")
+
+    parent_info_path = parent_dir / "cf_info.json"
+    parent_info = json.loads(parent_info_path.read_text(encoding="utf-8")) if parent_info_path.exists() else {}
+    since_ts = parent_info.get("max_timestamp")
+    if since_ts is None:
+        print("[WARN] Parent cf_info has no max_timestamp; only new users/items will be updated.")
+
+    t0 = time.perf_counter()
+    parent = joblib.load(parent_model)
+    algo, stats = warm_start_svd(parent, df, cfg, since_ts=since_ts)
+    elapsed = time.perf_counter() - t0
+
+    out_dir = _new_run_dir(cfg.models_dir, parent_dir)
+    model_path = out_dir / "cf_svd.joblib"
+    joblib.dump(algo, model_path)
+    export_bundle(algo, out_dir, model_file=model_path.name)
+
+    lineage = list(parent_info.get("lineage", [])) + [str(parent_dir)]
+    cf_info = {
+        **asdict(cfg),
+        **stats,
+        "trained_rows": int(len(df)),
+        "num_users": int(df["userId"].nunique()),
+        "num_movies": int(df["movieId"].nunique()),
+        "max_timestamp": int(df["timestamp"].max()) if "timestamp" in df.columns else None,
+        "trained_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "model_type": "surprise_svd",
+        "model_file": model_path.name,
+        "update_mode": "warm_start",
+        "parent_run": str(parent_dir),
+        "parent_max_timestamp": since_ts,
+        "lineage": lineage,
+        "update_seconds": round(elapsed, 3),
+    }
+    (out_dir / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
+    (Path(cfg.models_dir) / "LATEST").write_text(str(out_dir), encoding="utf-8")
+
+    print(f"[OK] Warm-started CF model saved: {model_path} ({elapsed:.1f}s)")
+    print(f"[OK] Affected users={stats['affected_users']} items={stats['affected_items']} "
+          f"(new users={stats['new_users']}, new items={stats['new_items']})")
+    return out_dir
+
+
+def run_streaming(cfg: CFConfig) -> Path:
+    """Train the SGD model out-of-core into the LATEST run (same folder as the baseline)."""
+    import joblib
+    from src.streaming import StreamConfig, train_streaming_sgd
+
+    run_dir = get_latest_run_dir(cfg.models_dir)
+    model, stream_info = train_streaming_sgd(cfg.interactions_path, StreamConfig(
+        memory_budget_mb=cfg.memory_budget_mb,
+        n_factors=cfg.n_factors,
+        n_epochs=cfg.n_epochs,
+        lr=cfg.lr_all,
+        reg=cfg.reg_all,
+        seed=cfg.seed,
+    ))
+    model_path = run_dir / "cf_mf.joblib"
+    joblib.dump(model, model_path)
+    export_bundle(model, run_dir, model_file=model_path.name)
+
+    cf_info = {
+        **asdict(cfg),
+        **stream_info,
+        "model_file": model_path.name,
+        "trained_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+        "update_mode": "full",
+    }
+    (run_dir / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
+    print(f"[OK] Streaming CF model saved: {model_path} ({stream_info['train_seconds']:.1f}s, "
+          f"window={stream_info['window_rows']:,} rows)")
+    return run_dir
+
+
 def main():
-    cfg = CFConfig()
+    parser = argparse.ArgumentParser(description="Train (or warm-start update) the Surprise SVD CF model.")
+    parser.add_argument("--interactions", default=CFConfig.interactions_path)
+    parser.add_argument("--models_dir", default=CFConfig.models_dir)
+    parser.add_argument("--n_factors", type=int, default=CFConfig.n_factors)
+    parser.add_argument("--n_epochs", type=int, default=CFConfig.n_epochs)
+    parser.add_argument("--lr_all", type=float, default=CFConfig.lr_all)
+    parser.add_argument("--reg_all", type=float, default=CFConfig.reg_all)
+    parser.add_argument("--train_on_sample", action="store_true")
+    parser.add_argument("--stream", action="store_true",
+                        help="Out-of-core SGD over parquet batches instead of loading (or sampling) the interactions")
+    parser.add_argument("--memory_budget_mb", type=int, default=CFConfig.memory_budget_mb)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Warm-start from the LATEST CF model and write a new run directory")
+    parser.add_argument("--warm_epochs", type=int, default=CFConfig.warm_epochs)
+    parser.add_argument("--warm_update_items", action="store_true",
+                        help="Incremental: also update existing items that received new ratings")
+    parser.add_argument("--seed", type=int, default=CFConfig.seed)
+    args = parser.parse_args()
+
+    cfg = CFConfig(
+        interactions_path=args.interactions,
+        models_dir=args.models_dir,
+        seed=args.seed,
+        n_factors=args.n_factors,
+        n_epochs=args.n_epochs,
+        lr_all=args.lr_all,
+        reg_all=args.reg_all,
+        train_on_sample=args.train_on_sample,
+        stream=args.stream,
+        memory_budget_mb=args.memory_budget_mb,
+        incremental=args.incremental,
+        warm_epochs=args.warm_epochs,
+        warm_update_items=args.warm_update_items,
+    )
+
+    if cfg.stream:
+        run_streaming(cfg)
+        return
 
     df = load_interactions(cfg.interactions_path)
 
+    if cfg.incremental:
+        run_incremental(cfg, df)
+        return
+
     # sampling for speed if dataset is huge
     if cfg.train_on_sample and len(df) > cfg.sample_n:
         df = df.sample(cfg.sample_n, random_state=cfg.seed).copy()
@@ -89,6 +342,7 @@ def main():
     import joblib
     model_path = run_dir / "cf_svd.joblib"
     joblib.dump(algo, model_path)
+    export_bundle(algo, run_dir, model_file=model_path.name)
 
     cf_info = {
         **asdict(cfg),
@@ -96,8 +350,11 @@ def main():
         "trained_rows": int(len(df)),
         "num_users": int(df["userId"].nunique()),
         "num_movies": int(df["movieId"].nunique()),
+        "max_timestamp": int(df["timestamp"].max()) if "timestamp" in df.columns else None,
         "trained_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
         "model_type": "surprise_svd",
+        "model_file": model_path.name,
+        "update_mode": "full",
     }
     (run_dir / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
 
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# One .npy per array; rows are sorted by (user, timestamp), ties keep source order
+ROW_ARRAYS = {"user": np.int32, "item": np.int32, "rating": np.float32, "ts": np.int32}
+INDEX_ARRAYS = {"user_ptr": np.int64, "user_ids": np.int64, "item_ids": np.int64}
+FORMAT_VERSION = 2
+
+_INT32_MAX = np.iinfo(np.int32).max
+MISSING_TS = -1   # null timestamps: kept (seen items, item stats), sorted first, never split
+
+
+@dataclass
+class EncodedInteractions:
+    """
+    Interactions as dense int32 codes, sorted by (user, timestamp).
+    - rows of user code u are user_ptr[u]:user_ptr[u + 1]
+    - user_ids / item_ids map codes back to raw ids (both sorted, so codes preserve raw order)
+    Loaded from disk the arrays are read-only memory maps; every accessor below returns
+    views or small per-user gathers, never a full re-cast of the table.
+    """
+    user: np.ndarray
+    item: np.ndarray
+    rating: np.ndarray
+    ts: np.ndarray
+    user_ptr: np.ndarray
+    user_ids: np.ndarray
+    item_ids: np.ndarray
+    manifest: Dict = field(default_factory=dict)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.user)
+
+    @property
+    def n_users(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def n_items(self) -> int:
+        return len(self.item_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in [*ROW_ARRAYS, *INDEX_ARRAYS])
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "EncodedInteractions":
+        """Encode a (userId, movieId, rating[, timestamp]) frame in memory."""
+        df = df.dropna(subset=["userId", "movieId", "rating"])
+        u, user_ids = pd.factorize(df["userId"].to_numpy(dtype=np.int64), sort=True)
+        i, item_ids = pd.factorize(df["movieId"].to_numpy(dtype=np.int64), sort=True)
+        if "timestamp" in df.columns:
+            missing = df["timestamp"].isna().to_numpy()
+            ts = df["timestamp"].fillna(0).to_numpy(dtype=np.int64)
+        else:
+            missing = np.zeros(len(df), dtype=bool)
+            ts = np.zeros(len(df), dtype=np.int64)
+        if len(ts) and (ts.min() < 0 or ts.max() > _INT32_MAX):
+            raise ValueError("timestamps outside the int32 range (1970-2038 unix seconds)")
+        ts = np.where(missing, MISSING_TS, ts)
+
+        order = np.lexsort((ts, u))
+        u = u[order].astype(np.int32)
+        ptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=len(user_ids)), out=ptr[1:])
+        return cls(
+            user=u,
+            item=i[order].astype(np.int32),
+            rating=df["rating"].to_numpy(dtype=np.float32)[order],
+            ts=ts[order].astype(np.int32),
+            user_ptr=ptr,
+            user_ids=np.asarray(user_ids, dtype=np.int64),
+            item_ids=np.asarray(item_ids, dtype=np.int64),
+            manifest={"rows": int(len(u)), "n_users": int(len(user_ids)), "n_items": int(len(item_ids)),
+                      "null_timestamps": int(df["timestamp"].isna().sum()) if "timestamp" in df.columns else None},
+        )
+
+    # -- per-user access (serving) --------------------------------------------
+
+    def user_code(self, user_id) -> int:
+        j = int(np.searchsorted(self.user_ids, int(user_id)))
+        return j if j < len(self.user_ids) and self.user_ids[j] == int(user_id) else -1
+
+    def user_count(self, user_id) -> int:
+        u = self.user_code(user_id)
+        return 0 if u < 0 else int(self.user_ptr[u + 1] - self.user_ptr[u])
+
+    def user_items(self, user_id) -> np.ndarray:
+        """Raw movieIds the user interacted with (time order)."""
+        u = self.user_code(user_id)
+        if u < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.item_ids[self.item[self.user_ptr[u]:self.user_ptr[u + 1]]]
+
+    # -- table access (training / evaluation) ---------------------------------
+
+    def frame(self, rows: Optional[np.ndarray] = None, raw_ids: bool = True) -> pd.DataFrame:
+        """
+        (userId, movieId, rating, timestamp) frame. rating/timestamp columns wrap the arrays
+        without copying; raw ids are one int64 gather each (raw_ids=False keeps the int32 codes).
+        """
+        pick = (lambda a: a) if rows is None else (lambda a: a[rows])
+        u, i = pick(self.user), pick(self.item)
+        return pd.DataFrame({
+            "userId": self.user_ids[u] if raw_ids else u,
+            "movieId": self.item_ids[i] if raw_ids else i,
+            "rating": pick(self.rating),
+            "timestamp": pick(self.ts),
+        }, copy=False)
+
+    def item_rating_stats(self) -> Tuple[pd.DataFrame, float]:
+        """Per-movie (n_ratings, avg_rating, std_rating) and the global mean, via bincount on codes."""
+        r = self.rating.astype(np.float64)
+        cnt = np.bincount(self.item, minlength=self.n_items)
+        s1 = np.bincount(self.item, weights=r, minlength=self.n_items)
+        s2 = np.bincount(self.item, weights=r * r, minlength=self.n_items)
+        mean = np.divide(s1, cnt, out=np.zeros_like(s1), where=cnt > 0)
+        var = np.divide(s2 - cnt * mean ** 2, cnt - 1, out=np.zeros_like(s1), where=cnt > 1)
+        agg = pd.DataFrame({
+            "movieId": self.item_ids,
+            "n_ratings": cnt,
+            "avg_rating": mean,
+            "std_rating": np.sqrt(np.clip(var, 0.0, None)),
+        })
+        agg = agg[agg["n_ratings"] > 0].reset_index(drop=True)
+        return agg, float(r.mean()) if len(r) else float("nan")
+
+    def split_rows(self, holdout: str = "last1", holdout_pct: float = 0.2) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row indices of the per-user time split (same rules as evaluation.split_by_user_time):
+        rows without a timestamp and users with < 2 timed rows are dropped; last1 / last
+        ceil(n * pct) timed rows of each user go to test.
+        """
+        untimed = np.bincount(self.user[self.ts == MISSING_TS], minlength=self.n_users)
+        rows = np.diff(self.user_ptr)
+        counts = rows - untimed
+        if holdout == "last1":
+            cut = counts - 1
+        elif holdout == "lastpct":
+            cut = counts - np.maximum(1, np.ceil(counts * holdout_pct).astype(np.int64))
+        else:
+            raise ValueError("holdout must be 'last1' or 'lastpct'")
+
+        # untimed rows sort first within the user: timed position < 0
+        pos = np.arange(self.n_rows, dtype=np.int64) - np.repeat(self.user_ptr[:-1] + untimed, rows)
+        eligible = np.repeat(counts >= 2, rows) & (pos >= 0)
+        is_test = pos >= np.repeat(cut, rows)
+        return np.flatnonzero(eligible & ~is_test), np.flatnonzero(eligible & is_test)
+
+
+# ---------------------------------------------------------------------------
+# Persistence: data/encoded/<content hash>/{*.npy, manifest.json}
+# ---------------------------------------------------------------------------
+
+def _file_sha256(path: Path, chunk: int = 8 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(chunk)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
+
+
+def _source_stat(path: Path) -> Dict:
+    st = path.stat()
+    return {"path": str(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def save_encoded(enc: EncodedInteractions, out_dir: Path, manifest: Dict) -> Path:
+    """Write arrays + manifest into a temp dir and rename it into place (readers never see a partial set)."""
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name in [*ROW_ARRAYS, *INDEX_ARRAYS]:
+        np.save(tmp / f"{name}.npy", getattr(enc, name))
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    if out_dir.exists():
+        shutil.rmtree(tmp)
+    else:
+        os.replace(tmp, out_dir)
+    return out_dir
+
+
+def read_encoded(enc_dir: Path, mmap: bool = True) -> EncodedInteractions:
+    enc_dir = Path(enc_dir)
+    manifest = json.loads((enc_dir / "manifest.json").read_text(encoding="utf-8"))
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{enc_dir}: unsupported encoded format {manifest.get('format_version')}")
+    arrays = {
+        name: np.load(enc_dir / f"{name}.npy", mmap_mode="r" if mmap else None)
+        for name in [*ROW_ARRAYS, *INDEX_ARRAYS]
+    }
+    return EncodedInteractions(**arrays, manifest=manifest)
+
+
+def _find_cached(cache_dir: Path, src: Path, stat: Dict) -> Optional[Path]:
+    for mf in cache_dir.glob("*/manifest.json"):
+        try:
+            manifest = json.loads(mf.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        source = manifest.get("source", {})
+        if manifest.get("format_version") == FORMAT_VERSION and Path(source.get("path", "")).name == src.name and source.get("size") == stat["size"] \
+                and source.get("mtime_ns") == stat["mtime_ns"]:
+            return mf.parent
+    return None
+
+
+def build_encoded(path: str, cache_dir: Optional[str] = None) -> Path:
+    """Encode the parquet once per content hash; returns the artifact directory."""
+    src = Path(path)
+    cache = Path(cache_dir) if cache_dir else src.parent / "encoded"
+    stat = _source_stat(src)
+    sha = _file_sha256(src)
+    out_dir = cache / sha[:16]
+    if (out_dir / "manifest.json").exists():
+        manifest = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+        if manifest.get("format_version") == FORMAT_VERSION:
+            # same content under a new mtime: refresh the fast-path key
+            manifest["source"] = {**stat, "sha256": sha}
+            (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            return out_dir
+        shutil.rmtree(out_dir, ignore_errors=True)   # built by an older format: re-encode
+
+    t0 = time.perf_counter()
+    cols = ["userId", "movieId", "rating", "timestamp"]
+    names = pq.ParquetFile(src).schema_arrow.names
+    missing = {"userId", "movieId", "rating"} - set(names)
+    if missing:
+        raise ValueError(f"interactions missing columns: {missing}")
+    enc = EncodedInteractions.from_frame(pd.read_parquet(src, columns=[c for c in cols if c in names]))
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "source": {**stat, "sha256": sha},
+        **enc.manifest,
+        "dtypes": {name: np.dtype(dt).name for name, dt in {**ROW_ARRAYS, **INDEX_ARRAYS}.items()},
+        "sort": ["user", "ts"],
+        "nbytes": int(enc.nbytes),
+        "build_seconds": round(time.perf_counter() - t0, 3),
+        "created_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return save_encoded(enc, out_dir, manifest)
+
+
+def cached_source_sha256(path: str, cache_dir: Optional[str] = None) -> Optional[str]:
+    """Content hash of the parquet from an artifact manifest matching its size + mtime (no hashing, no arrays)."""
+    src = Path(path)
+    cache = Path(cache_dir) if cache_dir else src.parent / "encoded"
+    enc_dir = _find_cached(cache, src, _source_stat(src)) if cache.exists() else None
+    if enc_dir is None:
+        return None
+    return json.loads((enc_dir / "manifest.json").read_text(encoding="utf-8"))["source"]["sha256"]
+
+
+def load_encoded(path: str = "data/interactions.parquet", cache_dir: Optional[str] = None) -> EncodedInteractions:
+    """
+    Memory-mapped encoded interactions for the parquet at `path`.
+    Reuses the artifact whose manifest matches the file (size + mtime, else content hash);
+    builds it on first use for a new data version.
+    """
+    src = Path(path)
+    cache = Path(cache_dir) if cache_dir else src.parent / "encoded"
+    enc_dir = _find_cached(cache, src, _source_stat(src)) if cache.exists() else None
+    if enc_dir is None:
+        enc_dir = build_encoded(path, cache_dir=str(cache))
+    return read_encoded(enc_dir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build (or reuse) the encoded interactions artifact.")
+    parser.add_argument("--interactions", default="data/interactions.parquet")
+    parser.add_argument("--cache_dir", default=None, help="Default: <interactions dir>/encoded")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    enc = load_encoded(args.interactions, cache_dir=args.cache_dir)
+    m = enc.manifest
+    print(f"[OK] Encoded interactions: {m['rows']:,} rows, {m['n_users']:,} users, {m['n_items']:,} items, "
+          f"{m['nbytes'] / 2**20:.1f} MB ({time.perf_counter() - t0:.2f}s)")
+    print(f"[OK] Source sha256: {m['source']['sha256'][:16]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
+import argparse
+import io
 import json
 import shutil
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
 from pathlib import Path
 from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 ACTION_RATING_MAP = {
     "like": 5.0,
@@ -13,82 +19,247 @@ ACTION_RATING_MAP = {
 
 FEEDBACK_USER_ID = 1337  # Placeholder for anonymous web users
 
+# Only the columns the ETL needs; everything else (e.g. the free-form "context") is skipped by the parser
+FEEDBACK_SCHEMA = pa.schema([
+    ("user_id", pa.int64()),
+    ("movieId", pa.int64()),
+    ("action", pa.string()),
+    ("_ts", pa.string()),
+])
+
+DEFAULT_BLOCK_SIZE = 16 << 20  # 16 MiB of JSONL per chunk
+
+
+def iter_jsonl_blocks(path: Path, block_size: int = DEFAULT_BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Yield newline-aligned byte blocks of a JSONL file.
+    Memory stays bounded by block_size (+ one partial line), whatever the file size.
+    """
+    with open(path, "rb") as f:
+        tail = b""
+        while True:
+            buf = f.read(block_size)
+            if not buf:
+                break
+            buf = tail + buf
+            cut = buf.rfind(b"\n")
+            if cut < 0:
+                tail = buf
+                continue
+            tail = buf[cut + 1:]
+            yield buf[:cut + 1]
+        if tail.strip():
+            yield tail + b"\n"
+
+
+def _parse_block_lenient(block: bytes) -> pa.Table:
+    """Slow path for blocks with malformed lines: keep every line that parses."""
+    rows = []
+    for line in block.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(rec, dict):
+            continue
+        rows.append({name: rec.get(name) for name in FEEDBACK_SCHEMA.names})
+
+    df = pd.DataFrame(rows, columns=FEEDBACK_SCHEMA.names)
+    for c in ["user_id", "movieId"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    for c in ["action", "_ts"]:
+        df[c] = df[c].where(df[c].map(lambda v: isinstance(v, str)), None)
+    return pa.Table.from_pandas(df, preserve_index=False).select(FEEDBACK_SCHEMA.names)
+
+
+def parse_block(block: bytes) -> pa.Table:
+    """Parse one JSONL block with the columnar reader, falling back to line-by-line on bad input."""
+    try:
+        return pa_json.read_json(
+            io.BytesIO(block),
+            read_options=pa_json.ReadOptions(use_threads=True, block_size=1 << 20),
+            parse_options=pa_json.ParseOptions(
+                explicit_schema=FEEDBACK_SCHEMA,
+                unexpected_field_behavior="ignore",
+            ),
+        )
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _parse_block_lenient(block)
+
+
+def _event_columns(events: pd.DataFrame, keep: pd.Series, now_ts: Optional[int] = None) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    (userId, movieId, timestamp) of the kept events with a numeric movieId, and the final row mask.
+    - missing/invalid _ts falls back to now
+    - missing user_id falls back to FEEDBACK_USER_ID
+    """
+    if now_ts is None:
+        now_ts = int(datetime.utcnow().timestamp())
+
+    movie_id = pd.to_numeric(events["movieId"], errors="coerce")
+    keep = keep & movie_id.notna()
+    ev = events[keep]
+    # API writes naive UTC isoformat strings; interpret naive values as UTC
+    ts = pd.to_datetime(ev["_ts"], errors="coerce", utc=True, format="ISO8601")
+    seconds = (ts - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+    user_id = pd.to_numeric(ev["user_id"], errors="coerce").fillna(FEEDBACK_USER_ID)
+
+    return pd.DataFrame({
+        "userId": user_id.astype("int64").to_numpy(),
+        "movieId": movie_id[keep].astype("int64").to_numpy(),
+        "timestamp": seconds.fillna(now_ts).astype("int64").to_numpy(),
+    }), keep
+
+
+def events_to_interactions(events: pd.DataFrame, now_ts: Optional[int] = None) -> pd.DataFrame:
+    """
+    Vectorized mapping of raw feedback events to (userId, movieId, rating, timestamp).
+    - actions outside ACTION_RATING_MAP are dropped
+    - ids / timestamps as in _event_columns
+    """
+    rating = events["action"].map(ACTION_RATING_MAP)
+    out, keep = _event_columns(events, rating.notna(), now_ts)
+    out.insert(2, "rating", rating[keep].astype("float64").to_numpy())
+    return out
+
+
+def _latest_per_pair(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep the most recent rating per (userId, movieId); later rows win ties."""
+    df = df.sort_values("timestamp", kind="stable")
+    df = df.drop_duplicates(subset=["userId", "movieId"], keep="last")
+    return df.reset_index(drop=True)
+
+
+def read_feedback(
+    paths: Iterable[Path],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    now_ts: Optional[int] = None,
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    Stream one or more JSONL feedback files through the columnar reader.
+    Each chunk is reduced to the latest rating per (user, movie) before being folded
+    into the running result, so memory is bounded by distinct pairs, not by log size.
+    Returns (interactions, stats).
+    """
+    acc: Optional[pd.DataFrame] = None
+    n_events = 0
+    n_bytes = 0
+    t0 = time.perf_counter()
+
+    for path in paths:
+        for block in iter_jsonl_blocks(path, block_size=block_size):
+            n_bytes += len(block)
+            table = parse_block(block)
+            n_events += table.num_rows
+            chunk = events_to_interactions(table.to_pandas(), now_ts=now_ts)
+            if chunk.empty:
+                continue
+            acc = chunk if acc is None else pd.concat([acc, chunk], ignore_index=True)
+            acc = _latest_per_pair(acc)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "events": n_events,
+        "bytes": n_bytes,
+        "seconds": elapsed,
+        "events_per_sec": n_events / elapsed if elapsed > 0 else float("nan"),
+    }
+    if acc is None:
+        acc = events_to_interactions(pd.DataFrame(columns=FEEDBACK_SCHEMA.names), now_ts=now_ts)
+    return acc, stats
+
+
+def read_feedback_events(
+    paths: Iterable[Path],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    actions: Optional[Iterable[str]] = None,
+    now_ts: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Raw swipe actions as (userId, movieId, action, timestamp), skips included.
+    Same chunked reader, id / timestamp mapping (_event_columns) and fold as read_feedback;
+    the latest action per (user, movie) wins.
+    Used by the implicit-feedback trainer, which weights actions instead of mapping them to ratings.
+    """
+    keep_actions = set(actions) if actions is not None else None
+    acc: Optional[pd.DataFrame] = None
+    for path in paths:
+        for block in iter_jsonl_blocks(path, block_size=block_size):
+            ev = parse_block(block).to_pandas()
+            keep = ev["action"].notna()
+            if keep_actions is not None:
+                keep &= ev["action"].isin(keep_actions)
+            chunk, keep = _event_columns(ev, keep, now_ts)
+            if chunk.empty:
+                continue
+            chunk.insert(2, "action", ev["action"][keep].to_numpy())
+            acc = chunk if acc is None else pd.concat([acc, chunk], ignore_index=True)
+            acc = _latest_per_pair(acc)
+
+    if acc is None:
+        return pd.DataFrame({
+            "userId": pd.Series(dtype="int64"), "movieId": pd.Series(dtype="int64"),
+            "action": pd.Series(dtype="object"), "timestamp": pd.Series(dtype="int64"),
+        })
+    return acc
+
+
 def main():
-    data_dir = Path("data")
+    parser = argparse.ArgumentParser(description="Merge swipe feedback into the interactions parquet.")
+    parser.add_argument("--data_dir", default="data")
+    parser.add_argument("--include_archive", action="store_true",
+                        help="Also re-read data/archive/*.jsonl (idempotent: pairs are deduplicated)")
+    parser.add_argument("--block_size_mb", type=int, default=DEFAULT_BLOCK_SIZE >> 20)
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
     feedback_file = data_dir / "feedback.jsonl"
     interactions_file = data_dir / "interactions.parquet"
-    
-    if not feedback_file.exists():
+    archive_dir = data_dir / "archive"
+
+    sources: List[Path] = []
+    if args.include_archive and archive_dir.exists():
+        sources.extend(sorted(archive_dir.glob("*.jsonl")))
+    if feedback_file.exists():
+        sources.append(feedback_file)
+
+    if not sources:
         print(f"[INFO] No feedback file found at {feedback_file}. Skipping.")
         return
 
-    # 1. Load Feedback
-    print(f"[INFO] Reading {feedback_file}...")
-    new_rows = []
-    with open(feedback_file, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                rec = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-                
-            action = rec.get("action")
-            if action not in ACTION_RATING_MAP:
-                continue
-            
-            # Map attributes
-            rating = ACTION_RATING_MAP[action]
-            movie_id = rec.get("movieId")
-            user_id = rec.get("user_id")
-            ts_str = rec.get("_ts")
-            
-            # Timestamp handling
-            timestamp = int(datetime.utcnow().timestamp())
-            if ts_str:
-                try:
-                    dt = datetime.fromisoformat(ts_str)
-                    timestamp = int(dt.timestamp())
-                except ValueError:
-                    pass
-            
-            # User ID fallback
-            if user_id is None:
-                user_id = FEEDBACK_USER_ID
-            
-            if movie_id is not None:
-                new_rows.append({
-                    "userId": int(user_id),
-                    "movieId": int(movie_id),
-                    "rating": float(rating),
-                    "timestamp": timestamp
-                })
-                
-    if not new_rows:
+    # 1. Load Feedback (chunked, columnar)
+    print(f"[INFO] Reading {len(sources)} feedback file(s)...")
+    new_df, stats = read_feedback(sources, block_size=args.block_size_mb << 20)
+    print(
+        f"[INFO] Parsed {stats['events']:,} events in {stats['seconds']:.2f}s "
+        f"({stats['events_per_sec']:,.0f} events/s)"
+    )
+
+    if new_df.empty:
         print("[INFO] No valid rating actions found in feedback.")
         return
 
-    new_df = pd.DataFrame(new_rows)
     print(f"[INFO] Found {len(new_df)} valid interactions.")
 
     # 2. Load Existing Interactions
     if interactions_file.exists():
         print(f"[INFO] Loading existing interactions from {interactions_file}...")
         existing_df = pd.read_parquet(interactions_file)
-        
+
         # Ensure timestamp exists
         if "timestamp" not in existing_df.columns:
             existing_df["timestamp"] = int(datetime.utcnow().timestamp())
-            
+
         # 3. Merge & Deduplicate
         # Strategy: Concat, then sort by timestamp desc, drop duplicates on [userId, movieId], keep first (latest)
         combined_df = pd.concat([existing_df, new_df], ignore_index=True)
         before_len = len(combined_df)
-        
+
         combined_df = combined_df.sort_values("timestamp", ascending=False)
         combined_df = combined_df.drop_duplicates(subset=["userId", "movieId"], keep="first")
-        
+
         print(f"[INFO] Merged: {len(existing_df)} + {len(new_df)} -> {before_len} -> {len(combined_df)} (deduped)")
     else:
         print("[INFO] No existing interactions found. Creating new.")
@@ -97,16 +268,19 @@ def main():
     # 4. Save
     print(f"[INFO] Saving to {interactions_file}...")
     combined_df.to_parquet(interactions_file, index=False)
-    
+
+    if not feedback_file.exists():
+        print("[SUCCESS] ETL Complete.")
+        return
+
     # 5. Archive Feedback
-    archive_dir = data_dir / "archive"
     archive_dir.mkdir(exist_ok=True)
     timestamp_str = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     archive_path = archive_dir / f"feedback_{timestamp_str}.jsonl"
-    
+
     print(f"[INFO] Archiving processed feedback to {archive_path}...")
     shutil.move(str(feedback_file), str(archive_path))
-    
+
     # Create empty feedback file to prevent errors
     feedback_file.touch()
     print("[SUCCESS] ETL Complete.")
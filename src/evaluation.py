@@ -1,15 +1,22 @@
 from __future__ import annotations
 
 import argparse
+import os
+import shutil
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
 
+from src.batch_eval import BatchEvalConfig, evaluate_report
+from src.encoded import EncodedInteractions, cached_source_sha256, load_encoded
 from src.predictions import load_recommender
+from src.progressive_eval import ProgressiveEvalConfig, progressive_evaluate
+from src.sampled_eval import SampledEvalConfig, evaluate_sampled
 
 
 @dataclass
@@ -19,13 +26,41 @@ class EvalConfig:
     mode: str = "baseline"     # baseline | cf | auto
     holdout: str = "last1"     # last1 | lastpct
     holdout_pct: float = 0.2
-    max_users: int | None = 2000
+    max_users: int | None = 2000   # None / 0 = every test user
     candidate_pool: int = 2000
+    engine: str = "batched"    # batched (src/batch_eval.py, matrix form) | loop (one recommend() per user)
+    workers: int = 1           # batched engine: processes over shared-memory arrays (0 = cpu count)
+    ks: Tuple[int, ...] = ()   # batched engine: extra cutoffs evaluated from the same top-max(K) lists
+    protocol: str = "full"     # full (rank every candidate) | sampled (src/sampled_eval.py, held-out item vs N negatives)
+    n_negatives: int = 100     # sampled protocol
+    sampler: str = "uniform"   # sampled protocol: uniform | popularity
+    correct: bool = False      # sampled protocol: also estimate the full-ranking metrics
+    n_boot: int = 1000         # sampled protocol: bootstrap resamples for the confidence intervals
+    progressive: bool = False  # randomized user batches until the CI is narrower than target_width (src/progressive_eval.py)
+    target_width: float = 0.02
+    batch_users: int = 500
+    metric: str = "recall"     # progressive: primary metric
+    compare_mode: Optional[str] = None        # progressive: second model = this mode ...
+    compare_models_dir: Optional[str] = None  # ... and/or this run's LATEST; the CI is then on the difference
     seed: int = 42
 
 
+def _user_time_order(users: np.ndarray, ts: np.ndarray) -> np.ndarray:
+    """
+    Stable (userId, timestamp) order, i.e. the same rows order as df.sort_values(["userId", "timestamp"]).
+    Integer columns are packed into one int64 key (one stable argsort); anything else uses np.lexsort.
+    """
+    if len(users) and users.dtype.kind in "iu" and ts.dtype.kind in "iu":
+        u0, t0 = int(users.min()), int(ts.min())
+        span = int(ts.max()) - t0 + 1
+        if (int(users.max()) - u0 + 1) * span < 2**63:
+            key = (users.astype(np.int64) - u0) * span + (ts.astype(np.int64) - t0)
+            return np.argsort(key, kind="stable")
+    return np.lexsort((ts, users))
+
+
 def split_by_user_time(
-    interactions: pd.DataFrame,
+    interactions: Union[pd.DataFrame, EncodedInteractions],
     holdout: str = "last1",
     holdout_pct: float = 0.2,
 ) -> Tuple[pd.DataFrame, pd.DataFrame]:
@@ -33,31 +68,82 @@ def split_by_user_time(
     Time-based split PER USER to avoid looking into the future.
     - last1: last interaction per user goes to test
     - lastpct: last X% interactions per user go to test
+    Encoded interactions are already sorted by (user, timestamp): the split is pure offset arithmetic.
     """
+    if isinstance(interactions, EncodedInteractions):
+        train_rows, test_rows = interactions.split_rows(holdout=holdout, holdout_pct=holdout_pct)
+        return interactions.frame(train_rows), interactions.frame(test_rows)
+
+    if holdout not in ("last1", "lastpct"):
+        raise ValueError("holdout must be 'last1' or 'lastpct'")
+
     df = interactions.dropna(subset=["userId", "movieId", "timestamp"]).copy()
     df["userId"] = df["userId"].astype(int)
     df["movieId"] = df["movieId"].astype(int)
-    df = df.sort_values(["userId", "timestamp"])
-
-    train_parts, test_parts = [], []
-    for uid, grp in df.groupby("userId", sort=False):
-        n = len(grp)
-        if n < 2:
-            continue
-
-        if holdout == "last1":
-            cut = n - 1
-        elif holdout == "lastpct":
-            test_size = max(1, int(np.ceil(n * holdout_pct)))
-            cut = n - test_size
-        else:
-            raise ValueError("holdout must be 'last1' or 'lastpct'")
-
-        train_parts.append(grp.iloc[:cut])
-        test_parts.append(grp.iloc[cut:])
-
-    train_df = pd.concat(train_parts, ignore_index=True) if train_parts else df.iloc[0:0]
-    test_df = pd.concat(test_parts, ignore_index=True) if test_parts else df.iloc[0:0]
+    df = df.take(_user_time_order(df["userId"].to_numpy(), df["timestamp"].to_numpy()))
+
+    # position of each row inside its user's history + that user's size -> cut point, in one pass
+    groups = df.groupby("userId", sort=False)
+    pos = groups.cumcount().to_numpy()
+    n = groups["userId"].transform("size").to_numpy()
+    if holdout == "last1":
+        cut = n - 1
+    else:
+        cut = n - np.maximum(1, np.ceil(n * holdout_pct).astype(np.int64))
+
+    eligible = n >= 2
+    is_test = pos >= cut
+    if not eligible.any():
+        return df.iloc[0:0], df.iloc[0:0]
+    train_df = df[eligible & ~is_test].reset_index(drop=True)
+    test_df = df[eligible & is_test].reset_index(drop=True)
+    return train_df, test_df
+
+
+def split_key(source_sha256: str, holdout: str = "last1", holdout_pct: float = 0.2) -> str:
+    """Cache key of a split: input content hash + holdout parameters."""
+    return f"{source_sha256[:16]}_{holdout}" + (f"_{holdout_pct:g}" if holdout == "lastpct" else "")
+
+
+def _read_split(split_dir: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    return pd.read_parquet(split_dir / "train.parquet"), pd.read_parquet(split_dir / "test.parquet")
+
+
+def cached_split(
+    interactions_path: str,
+    holdout: str = "last1",
+    holdout_pct: float = 0.2,
+    cache_dir: Optional[str] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    split_by_user_time of a parquet file, persisted once per (content hash, holdout params)
+    as <cache_dir>/<key>/{train,test}.parquet (default cache_dir: <data dir>/splits).
+    Every evaluation of the same data version then scores exactly the same holdout rows.
+    The content hash comes from the encoded manifest matching the file's size + mtime, so a hit
+    reads only the two split files; the encoded arrays are loaded (or built) on a miss.
+    """
+    root = Path(cache_dir) if cache_dir else Path(interactions_path).parent / "splits"
+    sha = cached_source_sha256(interactions_path)
+    hit = root / split_key(sha, holdout, holdout_pct) if sha is not None else None
+    if hit is not None and (hit / "test.parquet").exists():
+        return _read_split(hit)
+
+    encoded = load_encoded(interactions_path)
+    out_dir = root / split_key(encoded.manifest["source"]["sha256"], holdout, holdout_pct)
+    if (out_dir / "test.parquet").exists():
+        # same content under a new mtime: load_encoded re-keyed the manifest
+        return _read_split(out_dir)
+
+    train_df, test_df = split_by_user_time(encoded, holdout=holdout, holdout_pct=holdout_pct)
+    tmp = out_dir.with_name(out_dir.name + f".tmp{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+    train_df.to_parquet(tmp / "train.parquet", index=False)
+    test_df.to_parquet(tmp / "test.parquet", index=False)
+    try:
+        os.replace(tmp, out_dir)
+    except OSError:
+        # another process cached the same split first
+        shutil.rmtree(tmp, ignore_errors=True)
     return train_df, test_df
 
 
@@ -124,6 +210,92 @@ def evaluate(
     return pd.DataFrame(rows)
 
 
+def run_sampled(rec, train_df: pd.DataFrame, test_df: pd.DataFrame, cfg: EvalConfig, compare_full: bool = True) -> None:
+    """
+    Sampled protocol with its run time, next to the full protocol's (metrics and time) unless
+    compare_full is off; writes models/eval_<mode>_<ts>_sampled.csv (+ _summary.csv).
+    """
+    t0 = time.perf_counter()
+    per_user, summary_df = evaluate_sampled(rec, train_df, test_df, SampledEvalConfig(
+        k=cfg.k,
+        ks=cfg.ks,
+        mode=cfg.mode,
+        candidate_pool=cfg.candidate_pool,
+        max_users=cfg.max_users,
+        n_negatives=cfg.n_negatives,
+        sampler=cfg.sampler,
+        correct=cfg.correct,
+        n_boot=cfg.n_boot,
+        seed=cfg.seed,
+    ))
+    sampled_s = time.perf_counter() - t0
+    print(f"[INFO] sampled protocol ({cfg.n_negatives} {cfg.sampler} negatives): {len(per_user):,} users in {sampled_s:.2f}s")
+
+    if compare_full:
+        t0 = time.perf_counter()
+        _, full_df = evaluate_report(rec, train_df, test_df, BatchEvalConfig(
+            k=cfg.k, mode=cfg.mode, candidate_pool=cfg.candidate_pool, max_users=cfg.max_users,
+            workers=cfg.workers, ks=cfg.ks, seed=cfg.seed,
+        ))
+        full_s = time.perf_counter() - t0
+        print(f"[INFO] full protocol: {full_s:.2f}s (sampled is {full_s / max(sampled_s, 1e-9):.1f}x faster)")
+        full = full_df.set_index(["metric", "k"])["value"]
+        # recall_est@k / ndcg_est@k estimate the full protocol's recall@k / ndcg@k
+        summary_df["full"] = [full.get((m.replace("_est", ""), k), np.nan) for m, k in zip(summary_df["metric"], summary_df["k"])]
+
+    print("\n=== Summary (sampled) ===")
+    print(summary_df.to_string(index=False))
+
+    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    out_path = Path("models") / f"eval_{cfg.mode}_{ts}_sampled.csv"
+    per_user.to_csv(out_path, index=False)
+    summary_path = out_path.with_name(out_path.stem + "_summary.csv")
+    summary_df.to_csv(summary_path, index=False)
+    print(f"\nPer-user report saved to: {out_path}")
+    print(f"Summary saved to: {summary_path}")
+
+
+def run_progressive(rec, train_df: pd.DataFrame, test_df: pd.DataFrame, cfg: EvalConfig) -> None:
+    """
+    Progressive evaluation of one model, or of two (the difference) with cfg.compare_mode /
+    cfg.compare_models_dir; writes models/eval_<mode>_<ts>_progressive.csv (+ _trace.csv).
+    """
+    arms = {cfg.mode: (rec, cfg.mode)}
+    if cfg.compare_mode or cfg.compare_models_dir:
+        other = load_recommender(models_dir=cfg.compare_models_dir, interactions_df=train_df) if cfg.compare_models_dir else rec
+        other_mode = cfg.compare_mode or cfg.mode
+        arms[other_mode if other_mode != cfg.mode else f"{other_mode}_compare"] = (other, other_mode)
+
+    per_user, trace, info = progressive_evaluate(arms, train_df, test_df, ProgressiveEvalConfig(
+        k=cfg.k,
+        metric=cfg.metric,
+        target_width=cfg.target_width,
+        batch_users=cfg.batch_users,
+        max_users=cfg.max_users,
+        candidate_pool=cfg.candidate_pool,
+        seed=cfg.seed,
+    ))
+    if info["stopped"] == "target_width":
+        print(f"[OK] stopped at {info['users']:,} of {info['total_users']:,} users "
+              f"(CI width {info['width']:.4f} < {info['target_width']})")
+    else:
+        print(f"[WARN] all {info['total_users']:,} users evaluated, CI width {info['width']:.4f} "
+              f"still >= {info['target_width']}")
+    print(f"[INFO] {info['wall_s']:.2f}s (setup {info['setup_s']:.2f}s); every user would take "
+          f"~{info['est_full_s']:.2f}s, saved ~{info['saved_s']:.2f}s")
+
+    print("\n=== Summary (progressive) ===")
+    print(trace.tail(1).to_string(index=False))
+
+    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    out_path = Path("models") / f"eval_{cfg.mode}_{ts}_progressive.csv"
+    per_user.to_csv(out_path, index=False)
+    trace_path = out_path.with_name(out_path.stem + "_trace.csv")
+    trace.to_csv(trace_path, index=False)
+    print(f"\nPer-user report saved to: {out_path}")
+    print(f"Trace saved to: {trace_path}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--interactions", default="data/interactions.parquet")
@@ -131,8 +303,32 @@ def main() -> None:
     parser.add_argument("--mode", default="baseline")          # baseline|cf|auto
     parser.add_argument("--holdout", default="last1")          # last1|lastpct
     parser.add_argument("--holdout_pct", type=float, default=0.2)
-    parser.add_argument("--max_users", type=int, default=2000)
+    parser.add_argument("--max_users", type=int, default=None,
+                        help="0 = every user with test rows (default 2000; --progressive: every user)")
     parser.add_argument("--candidate_pool", type=int, default=2000, help="Number of candidate items considered for CF reranking")
+    parser.add_argument("--engine", default="batched", choices=["batched", "loop"],
+                        help="batched: users scored in blocks by matrix products; loop: recommend() per user")
+    parser.add_argument("--ks", default="",
+                        help="Extra comma-separated cutoffs (batched engine), e.g. 5,20,50: one pass at max(K)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Batched engine: user shards scored in N processes over shared memory (0 = cpu count)")
+    parser.add_argument("--protocol", default="full", choices=["full", "sampled"],
+                        help="sampled: rank each held-out item against --n_negatives sampled unseen items")
+    parser.add_argument("--n_negatives", type=int, default=100)
+    parser.add_argument("--sampler", default="uniform", choices=["uniform", "popularity"])
+    parser.add_argument("--correct", action="store_true", help="Sampled protocol: add estimated full-ranking metrics")
+    parser.add_argument("--n_boot", type=int, default=1000, help="Sampled protocol: bootstrap resamples for the CIs")
+    parser.add_argument("--skip_full", action="store_true",
+                        help="Sampled protocol: do not also time the full protocol for comparison")
+    parser.add_argument("--progressive", action="store_true",
+                        help="Randomized user batches until the CI on --metric (or on the difference) is below --target_width")
+    parser.add_argument("--target_width", type=float, default=0.02, help="Progressive: full CI width to stop at")
+    parser.add_argument("--batch_users", type=int, default=500, help="Progressive: users per batch")
+    parser.add_argument("--metric", default="recall", choices=["recall", "ndcg", "hit", "map", "mrr"])
+    parser.add_argument("--compare_mode", default=None, help="Progressive: compare against this mode")
+    parser.add_argument("--compare_models_dir", default=None, help="Progressive: compare against this run's LATEST")
+    parser.add_argument("--split_cache", nargs="?", const="", default=None,
+                        help="Reuse/persist the train/test split as parquet (optional dir, default <data dir>/splits)")
     args = parser.parse_args()
     
     cfg = EvalConfig(
@@ -141,32 +337,78 @@ def main() -> None:
         mode=args.mode,
         holdout=args.holdout,
         holdout_pct=args.holdout_pct,
-        max_users=args.max_users,
+        max_users=((0 if args.progressive else 2000) if args.max_users is None else args.max_users) or None,
         candidate_pool=args.candidate_pool,
+        engine=args.engine,
+        workers=args.workers,
+        ks=tuple(int(k) for k in args.ks.split(",") if k),
+        protocol=args.protocol,
+        n_negatives=args.n_negatives,
+        sampler=args.sampler,
+        correct=args.correct,
+        n_boot=args.n_boot,
+        progressive=args.progressive,
+        target_width=args.target_width,
+        batch_users=args.batch_users,
+        metric=args.metric,
+        compare_mode=args.compare_mode,
+        compare_models_dir=args.compare_models_dir,
     )
+    if cfg.ks and cfg.engine != "batched":
+        raise SystemExit("--ks needs --engine batched")
+    if cfg.protocol == "sampled" and cfg.engine != "batched":
+        raise SystemExit("--protocol sampled needs --engine batched")
+    if cfg.progressive and (cfg.engine != "batched" or cfg.protocol != "full"):
+        raise SystemExit("--progressive needs --engine batched and --protocol full")
 
 
-    interactions = pd.read_parquet(cfg.interactions_path)
-    train_df, test_df = split_by_user_time(interactions, holdout=cfg.holdout, holdout_pct=cfg.holdout_pct)
+    if args.split_cache is not None:
+        train_df, test_df = cached_split(cfg.interactions_path, holdout=cfg.holdout, holdout_pct=cfg.holdout_pct,
+                                         cache_dir=args.split_cache or None)
+    else:
+        interactions = load_encoded(cfg.interactions_path)
+        train_df, test_df = split_by_user_time(interactions, holdout=cfg.holdout, holdout_pct=cfg.holdout_pct)
 
     # build recommender with TRAIN interactions only (avoid leakage)
     rec = load_recommender(interactions_df=train_df)
 
-    per_user = evaluate(
-        recommender=rec,
-        train_df=train_df,
-        test_df=test_df,
-        k=cfg.k,
-        mode=cfg.mode,
-        candidate_pool=cfg.candidate_pool,
-        max_users=cfg.max_users,
-        seed=cfg.seed,
-    )
-
+    if cfg.progressive:
+        run_progressive(rec, train_df, test_df, cfg)
+        return
+    if cfg.protocol == "sampled":
+        run_sampled(rec, train_df, test_df, cfg, compare_full=not args.skip_full)
+        return
+
+    t0 = time.perf_counter()
+    summary_df = None
+    if cfg.engine == "batched":
+        per_user, summary_df = evaluate_report(rec, train_df, test_df, BatchEvalConfig(
+            k=cfg.k,
+            mode=cfg.mode,
+            candidate_pool=cfg.candidate_pool,
+            max_users=cfg.max_users,
+            workers=cfg.workers,
+            ks=cfg.ks,
+            seed=cfg.seed,
+        ))
+    else:
+        per_user = evaluate(
+            recommender=rec,
+            train_df=train_df,
+            test_df=test_df,
+            k=cfg.k,
+            mode=cfg.mode,
+            candidate_pool=cfg.candidate_pool,
+            max_users=cfg.max_users,
+            seed=cfg.seed,
+        )
+    print(f"[INFO] {cfg.engine} engine: {len(per_user):,} users in {time.perf_counter() - t0:.2f}s")
 
-    summary = per_user[[f"recall@{cfg.k}", f"ndcg@{cfg.k}"]].mean(numeric_only=True)
     print("\n=== Summary ===")
-    print(summary)
+    if summary_df is not None:
+        print(summary_df.pivot(index="metric", columns="k", values="value").to_string())
+    else:
+        print(per_user[[c for c in per_user.columns if "@" in c]].mean(numeric_only=True))
     
 
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -176,6 +418,11 @@ def main() -> None:
     # out_path = Path("models") / "eval_report.csv"
     per_user.to_csv(out_path, index=False)
     print(f"\nPer-user report saved to: {out_path}")
+    if summary_df is not None:
+        # tidy (metric, k, value, users), next to the per-user report
+        summary_path = out_path.with_name(out_path.stem + "_summary.csv")
+        summary_df.to_csv(summary_path, index=False)
+        print(f"Summary saved to: {summary_path}")
 
 
 if __name__ == "__main__":
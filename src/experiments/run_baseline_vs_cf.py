@@ -1,30 +1,17 @@
-import subprocess
+from pathlib import Path
 
+from src.experiments.runner import ExperimentSpec, run_experiment, save_results
 
-def run(cmd: str):
-    print(f"\n>>> {cmd}")
-    subprocess.run(cmd, shell=True, check=True)
+SPEC = Path(__file__).resolve().parent / "specs" / "baseline_vs_cf.json"
 
 
 if __name__ == "__main__":
     print(" Experiment: Baseline vs Collaborative Filtering ")
 
-    # Baseline
-    run(
-        "python -m src.evaluation "
-        "--mode baseline "
-        "--k 10 "
-        "--holdout last1 "
-        "--candidate_pool 2000"
-    )
+    # one process: the data is loaded and split once for every configuration
+    spec = ExperimentSpec.load(str(SPEC))
+    results = run_experiment(spec)
+    print(results.to_string(index=False))
+    save_results(results, spec)
 
-    # Collaborative Filtering
-    run(
-        "python -m src.evaluation "
-        "--mode cf "
-        "--k 10 "
-        "--holdout last1 "
-        "--candidate_pool 2000"
-    )
-
-    print("\n[OK] Baseline vs CF experiment completed.")
+    print("\n[OK] Baseline vs Collaborative Filtering experiment completed.")
@@ -1,24 +1,17 @@
-import subprocess
+from pathlib import Path
 
+from src.experiments.runner import ExperimentSpec, run_experiment, save_results
 
-def run(cmd: str):
-    print(f"\n>>> {cmd}")
-    subprocess.run(cmd, shell=True, check=True)
+SPEC = Path(__file__).resolve().parent / "specs" / "candidate_pool.json"
 
 
 if __name__ == "__main__":
     print(" Experiment: Candidate Pool Size Impact (CF) ")
 
-    pools = [500, 2000]
+    # one process: the data is loaded and split once for every configuration
+    spec = ExperimentSpec.load(str(SPEC))
+    results = run_experiment(spec)
+    print(results.to_string(index=False))
+    save_results(results, spec)
 
-    for pool in pools:
-        print(f"\n--- Candidate pool = {pool} ---")
-        run(
-            f"python -m src.evaluation "
-            f"--mode cf "
-            f"--k 10 "
-            f"--holdout last1 "
-            f"--candidate_pool {pool}"
-        )
-
-    print("\n[OK] Candidate pool experiment completed.")
+    print("\n[OK] Candidate Pool Size Impact experiment completed.")
@@ -1,32 +1,17 @@
-import subprocess
+from pathlib import Path
 
+from src.experiments.runner import ExperimentSpec, run_experiment, save_results
 
-def run(cmd: str):
-    print(f"\n>>> {cmd}")
-    subprocess.run(cmd, shell=True, check=True)
+SPEC = Path(__file__).resolve().parent / "specs" / "dense_vs_full.json"
 
 
 if __name__ == "__main__":
     print(" Experiment: Dense CF vs Full CF Dataset ")
 
-    # CF trained on full interactions
-    run(
-        "python -m src.evaluation "
-        "--mode cf "
-        "--k 10 "
-        "--holdout last1 "
-        "--candidate_pool 2000 "
-        "--interactions data/interactions.parquet"
-    )
+    # one process: the data is loaded and split once for every configuration
+    spec = ExperimentSpec.load(str(SPEC))
+    results = run_experiment(spec)
+    print(results.to_string(index=False))
+    save_results(results, spec)
 
-    # CF trained on dense interactions
-    run(
-        "python -m src.evaluation "
-        "--mode cf "
-        "--k 10 "
-        "--holdout last1 "
-        "--candidate_pool 2000 "
-        "--interactions data/cf_interactions.parquet"
-    )
-
-    print("\n[OK] Dense vs full CF experiment completed.")
+    print("\n[OK] Dense CF vs Full CF Dataset experiment completed.")
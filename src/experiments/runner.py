@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.batch_eval import BatchEvalConfig, evaluate_batched
+from src.training import TrainConfig
+
+GRID_KEYS = ["mode", "k", "candidate_pool", "max_users"]
+
+
+@dataclass
+class ExperimentSpec:
+    """
+    Declarative experiment: every dataset x model x grid combination is evaluated.
+    - datasets: {name: interactions parquet}; each is loaded and time-split once
+    - models: {name: None | {"models_dir": dir} | TrainConfig overrides}
+        None / models_dir: the artifacts under <models_dir>/LATEST (default "models")
+        overrides: trained on the train split (src.holdout_eval, cached by split + config)
+    - grid: lists per key of GRID_KEYS (mode, k, candidate_pool, max_users; max_users 0 = all)
+    """
+    name: str = "experiment"
+    datasets: Dict[str, str] = field(default_factory=lambda: {"full": "data/interactions.parquet"})
+    models: Dict[str, Optional[Dict]] = field(default_factory=lambda: {"latest": None})
+    grid: Dict[str, List] = field(default_factory=lambda: {"mode": ["baseline"]})
+    holdout: str = "last1"
+    holdout_pct: float = 0.2
+    block_users: int = 2048
+    cache_dir: str = "models/.holdout_cache"
+    seed: int = 42
+
+    @classmethod
+    def from_dict(cls, doc: Dict) -> "ExperimentSpec":
+        known = {f.name for f in fields(cls)}
+        unknown = set(doc) - known
+        if unknown:
+            raise ValueError(f"unknown spec keys: {sorted(unknown)}")
+        spec = cls(**doc)
+        bad_grid = set(spec.grid) - set(GRID_KEYS)
+        if bad_grid:
+            raise ValueError(f"unknown grid keys: {sorted(bad_grid)} (expected {GRID_KEYS})")
+        train_keys = {f.name for f in fields(TrainConfig)}
+        for model, overrides in spec.models.items():
+            extra = set(overrides or {}) - train_keys - {"models_dir"}
+            if extra:
+                raise ValueError(f"model {model!r}: unknown TrainConfig fields {sorted(extra)}")
+        return spec
+
+    @classmethod
+    def load(cls, path: str) -> "ExperimentSpec":
+        """JSON, or YAML (.yaml/.yml, needs PyYAML)."""
+        text = Path(path).read_text(encoding="utf-8")
+        if Path(path).suffix.lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except Exception as e:
+                raise RuntimeError("PyYAML is not installed. Install with: pip install pyyaml") from e
+            return cls.from_dict(yaml.safe_load(text))
+        return cls.from_dict(json.loads(text))
+
+
+def expand_grid(spec: ExperimentSpec) -> List[Dict]:
+    """Every (mode, k, candidate_pool, max_users) combination, in spec order (unset keys: BatchEvalConfig defaults)."""
+    defaults = BatchEvalConfig()
+    axes = [spec.grid.get(key, [getattr(defaults, key)]) for key in GRID_KEYS]
+    return [dict(zip(GRID_KEYS, combo)) for combo in itertools.product(*axes)]
+
+
+# ---------------------------------------------------------------------------
+# Execution: one task per (dataset, model); datasets are split once per process
+# ---------------------------------------------------------------------------
+
+_SPLITS: Dict[Tuple[str, str, float], Tuple[pd.DataFrame, pd.DataFrame, str, float]] = {}
+
+
+def _split(path: str, holdout: str, holdout_pct: float) -> Tuple[pd.DataFrame, pd.DataFrame, str, float]:
+    """(train, test, split key, seconds), memoized for the life of the process."""
+    key = (path, holdout, holdout_pct)
+    if key not in _SPLITS:
+        from src.encoded import load_encoded
+        from src.evaluation import split_by_user_time, split_key
+
+        t0 = time.perf_counter()
+        encoded = load_encoded(path)
+        train_df, test_df = split_by_user_time(encoded, holdout=holdout, holdout_pct=holdout_pct)
+        fp = split_key(encoded.manifest["source"]["sha256"], holdout, holdout_pct)
+        _SPLITS[key] = (train_df, test_df, fp, time.perf_counter() - t0)
+    return _SPLITS[key]
+
+
+def run_group(spec: ExperimentSpec, dataset: str, model: str, configs: List[Dict]) -> List[Dict]:
+    """Load/split the dataset (memoized), build the model once, evaluate every grid config on it."""
+    from src.holdout_eval import trained_models
+    from src.predictions import load_recommender
+
+    path = spec.datasets[dataset]
+    train_df, test_df, split_fp, split_s = _split(path, spec.holdout, spec.holdout_pct)
+
+    t0 = time.perf_counter()
+    overrides = dict(spec.models[model] or {})
+    models_dir = overrides.pop("models_dir", "models")
+    if overrides:
+        train_cfg = replace(TrainConfig(), interactions_path=path, seed=spec.seed, **overrides)
+        models_dir = str(trained_models(train_df, train_cfg, spec.cache_dir, split_fp=split_fp))
+    rec = load_recommender(models_dir=models_dir, interactions_path=path, interactions_df=train_df)
+    model_s = time.perf_counter() - t0
+
+    rows = []
+    for c in configs:
+        t0 = time.perf_counter()
+        per_user = evaluate_batched(rec, train_df, test_df, BatchEvalConfig(
+            k=c["k"], mode=c["mode"], candidate_pool=c["candidate_pool"], max_users=c["max_users"] or None,
+            block_users=spec.block_users, seed=spec.seed))
+        k = c["k"]
+        rows.append({
+            "dataset": dataset, "model": model, **c,
+            "users": int(len(per_user)),
+            **{m: float(per_user[f"{m}@{k}"].mean()) for m in ["recall", "ndcg", "hit", "map"]},
+            "eval_s": round(time.perf_counter() - t0, 3),
+            "model_s": round(model_s, 3),
+            "split_s": round(split_s, 3),
+        })
+        print(f"[OK] {dataset}/{model} {c}: recall@{k}={rows[-1]['recall']:.4f} ({rows[-1]['eval_s']:.2f}s)")
+    return rows
+
+
+def run_experiment(spec: ExperimentSpec, workers: int = 1) -> pd.DataFrame:
+    """
+    One row per configuration (metrics are means over the evaluated users, at the row's k).
+    workers > 1: (dataset, model) groups run in a spawn process pool; a worker splits
+    each dataset it sees once. model_s / split_s are the group's shared setup costs.
+    """
+    configs = expand_grid(spec)
+    groups = [(d, m) for d in spec.datasets for m in spec.models]
+    print(f"[INFO] {spec.name}: {len(groups)} dataset x model group(s) x {len(configs)} config(s)")
+    if workers > 1 and len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups)), mp_context=get_context("spawn")) as pool:
+            parts = list(pool.map(run_group, *zip(*[(spec, d, m, configs) for d, m in groups])))
+    else:
+        parts = [run_group(spec, d, m, configs) for d, m in groups]
+    return pd.DataFrame([row for part in parts for row in part])
+
+
+def save_results(results: pd.DataFrame, spec: ExperimentSpec, out: str = "models") -> Path:
+    """Write results to <out>/experiment_<name>_<utc timestamp>.csv; returns the path."""
+    path = Path(out) / f"experiment_{spec.name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(path, index=False)
+    print(f"\nResults saved to: {path}")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an experiment grid (JSON/YAML spec) in-process.")
+    parser.add_argument("spec", help="Experiment spec (.json, or .yaml with PyYAML)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes over (dataset, model) groups")
+    parser.add_argument("--out", default="models", help="Directory for the results CSV")
+    args = parser.parse_args()
+
+    spec = ExperimentSpec.load(args.spec)
+    t0 = time.perf_counter()
+    results = run_experiment(spec, workers=args.workers)
+    print(f"\n=== {spec.name} ({time.perf_counter() - t0:.1f}s) ===")
+    print(results.to_string(index=False))
+    save_results(results, spec, args.out)
+
+
+if __name__ == "__main__":
+    main()
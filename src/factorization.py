@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class MFConfig:
+    algo: str = "als"          # als | sgd
+    n_factors: int = 100
+    n_epochs: int = 20
+    reg: float = 0.02          # SGD: per-rating L2 (Surprise reg_all); ALS: scaled by ratings per row
+    lr: float = 0.005          # SGD only (Surprise lr_all)
+    als_shrink: float = 5.0    # ALS only: constant ridge per row, keeps rows with few ratings near zero
+    init_std: float = 0.1
+    batch_size: int = 4096     # SGD mini-batch
+    n_threads: int = 0         # ALS worker threads (0 = os.cpu_count())
+    seed: int = 42
+
+
+class Prediction(NamedTuple):
+    """Same fields as surprise.Prediction so serving code can use .est on either model."""
+    uid: object
+    iid: object
+    r_ui: Optional[float]
+    est: float
+    details: dict
+
+
+@dataclass
+class FactorModel:
+    """
+    Biased matrix factorization: est = mu + b_u + b_i + p_u . q_i (clipped to the rating scale).
+    Exposes the same predict(uid, iid).est interface as a fitted Surprise SVD, plus
+    score_items() to score many items for one user in a single mat-vec.
+    """
+    user_factors: np.ndarray
+    item_factors: np.ndarray
+    user_bias: np.ndarray
+    item_bias: np.ndarray
+    global_mean: float
+    user_ids: np.ndarray        # raw userId per inner index
+    item_ids: np.ndarray        # raw movieId per inner index
+    rating_min: Optional[float] = None
+    rating_max: Optional[float] = None
+    model_type: str = "numpy_mf"
+    ids_sorted: bool = False    # user_ids/item_ids ascending: lookups by searchsorted, no per-process index
+    _uindex: Optional[Dict[int, int]] = field(default=None, repr=False, compare=False)
+    _iindex: Optional[pd.Index] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_surprise(cls, algo) -> "FactorModel":
+        """Export a fitted Surprise SVD (pu/qi/bu/bi + raw id maps) without the trainset."""
+        ts = algo.trainset
+        user_ids = np.array([ts.to_raw_uid(j) for j in range(ts.n_users)])
+        item_ids = np.array([ts.to_raw_iid(j) for j in range(ts.n_items)])
+        rmin, rmax = ts.rating_scale
+        return cls(
+            user_factors=np.asarray(algo.pu, dtype=np.float32),
+            item_factors=np.asarray(algo.qi, dtype=np.float32),
+            user_bias=np.asarray(algo.bu, dtype=np.float32),
+            item_bias=np.asarray(algo.bi, dtype=np.float32),
+            global_mean=float(ts.global_mean),
+            user_ids=user_ids,
+            item_ids=item_ids,
+            rating_min=float(rmin),
+            rating_max=float(rmax),
+            model_type="surprise_svd",
+        )
+
+    def _user_index(self) -> Dict[int, int]:
+        if self._uindex is None:
+            self._uindex = {int(u): j for j, u in enumerate(self.user_ids.tolist())}
+        return self._uindex
+
+    def _item_index(self) -> pd.Index:
+        if self._iindex is None:
+            self._iindex = pd.Index(np.asarray(self.item_ids))
+        return self._iindex
+
+    def inner_uid(self, uid) -> int:
+        """Inner user index, -1 if unknown."""
+        if self.ids_sorted:
+            j = int(np.searchsorted(self.user_ids, int(uid)))
+            return j if j < len(self.user_ids) and self.user_ids[j] == int(uid) else -1
+        return self._user_index().get(int(uid), -1)
+
+    def inner_iids(self, item_ids) -> np.ndarray:
+        """Inner item indices, -1 for unknown items."""
+        if self.ids_sorted:
+            raw = np.asarray(item_ids, dtype=np.int64)
+            j = np.searchsorted(self.item_ids, raw)
+            hit = j < len(self.item_ids)
+            hit[hit] = self.item_ids[j[hit]] == raw[hit]
+            return np.where(hit, j, -1)
+        return self._item_index().get_indexer(np.asarray(item_ids))
+
+    def knows_user(self, uid) -> bool:
+        return self.inner_uid(uid) >= 0
+
+    def _clip(self, est):
+        if self.rating_min is None or self.rating_max is None:
+            return est
+        return np.clip(est, self.rating_min, self.rating_max)
+
+    def _estimate(self, uid, item_ids) -> np.ndarray:
+        u = self.inner_uid(uid)
+        j = self.inner_iids(item_ids)
+        known = j >= 0
+        est = np.full(len(j), self.global_mean, dtype=np.float64)
+        est[known] += self.item_bias[j[known]]
+        if u >= 0:
+            est += self.user_bias[u]
+            est[known] += self.item_factors[j[known]] @ self.user_factors[u]
+        return est
+
+    def score_items(self, uid, item_ids) -> np.ndarray:
+        """Vectorized estimates for one user over many raw item ids (unknown ids fall back to biases)."""
+        return self._clip(self._estimate(uid, item_ids))
+
+    def predict(self, uid, iid, r_ui: Optional[float] = None, clip: bool = True) -> Prediction:
+        est = self._estimate(uid, [iid])
+        if clip:
+            est = self._clip(est)
+        return Prediction(uid, iid, r_ui, float(est[0]), {"was_impossible": False})
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_uindex"] = None
+        state["_iindex"] = None
+        return state
+
+
+def encode_ratings(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(userId, movieId, rating) -> dense int32 codes, float32 ratings and the raw id arrays."""
+    u, user_ids = pd.factorize(df["userId"].to_numpy(), sort=True)
+    i, item_ids = pd.factorize(df["movieId"].to_numpy(), sort=True)
+    r = df["rating"].to_numpy(dtype=np.float32)
+    return u.astype(np.int32), i.astype(np.int32), r, np.asarray(user_ids), np.asarray(item_ids)
+
+
+def _scatter_add_rows(M: np.ndarray, rows: np.ndarray, vals: np.ndarray) -> None:
+    """M[rows] += vals with repeated rows accumulated (1-D ufunc.at on the flat view is ~3x faster)."""
+    f = M.shape[1]
+    flat = (rows.astype(np.int64)[:, None] * f + np.arange(f)).ravel()
+    np.add.at(M.reshape(-1), flat, vals.ravel())
+
+
+def sgd_epoch(
+    pu: np.ndarray,
+    qi: np.ndarray,
+    bu: np.ndarray,
+    bi: np.ndarray,
+    u: np.ndarray,
+    i: np.ndarray,
+    r: np.ndarray,
+    mu: float,
+    lr: float,
+    reg: float,
+    batch_size: int,
+    rng: np.random.Generator,
+    user_mask: Optional[np.ndarray] = None,
+    item_mask: Optional[np.ndarray] = None,
+) -> None:
+    """
+    One epoch of mini-batch biased SGD with Surprise's SVD gradients, in place.
+    Steps of a row rated several times in one batch are summed from the batch-start factors,
+    so this is per-rating SGD only when rows rarely repeat within a batch (large catalogues,
+    shuffled data); sgd_epoch_per_rating is the exact per-rating form.
+    If masks are given, only flagged user/item rows are updated; the rest stay frozen.
+    """
+    order = rng.permutation(len(r))
+    for start in range(0, len(order), batch_size):
+        b = order[start:start + batch_size]
+        ub, ib, rb = u[b], i[b], r[b]
+        p, q = pu[ub], qi[ib]
+        err = rb - (mu + bu[ub] + bi[ib] + np.einsum("ij,ij->i", p, q))
+
+        if user_mask is not None:
+            mu_b = user_mask[ub]
+            ub_u, err_u, p_u, q_u = ub[mu_b], err[mu_b], p[mu_b], q[mu_b]
+        else:
+            ub_u, err_u, p_u, q_u = ub, err, p, q
+        if item_mask is not None:
+            mi_b = item_mask[ib]
+            ib_i, err_i, p_i, q_i = ib[mi_b], err[mi_b], p[mi_b], q[mi_b]
+        else:
+            ib_i, err_i, p_i, q_i = ib, err, p, q
+
+        np.add.at(bu, ub_u, lr * (err_u - reg * bu[ub_u]))
+        np.add.at(bi, ib_i, lr * (err_i - reg * bi[ib_i]))
+        _scatter_add_rows(pu, ub_u, lr * (err_u[:, None] * q_u - reg * p_u))
+        _scatter_add_rows(qi, ib_i, lr * (err_i[:, None] * p_i - reg * q_i))
+
+
+def _conflict_free_rounds(u: np.ndarray, i: np.ndarray, user_mask: np.ndarray, item_mask: np.ndarray) -> np.ndarray:
+    """
+    Round per rating (in the given order) such that no updated user or item occurs twice in a
+    round: a rating goes one round after the last one that touched its user / its item.
+    """
+    last_u: Dict[int, int] = {}
+    last_i: Dict[int, int] = {}
+    out = np.empty(len(u), dtype=np.int64)
+    for n, (uu, ii, mu_, mi_) in enumerate(zip(u.tolist(), i.tolist(), user_mask[u].tolist(), item_mask[i].tolist())):
+        r = max(last_u.get(uu, -1) if mu_ else -1, last_i.get(ii, -1) if mi_ else -1) + 1
+        if mu_:
+            last_u[uu] = r
+        if mi_:
+            last_i[ii] = r
+        out[n] = r
+    return out
+
+
+def sgd_epoch_per_rating(
+    pu: np.ndarray,
+    qi: np.ndarray,
+    bu: np.ndarray,
+    bi: np.ndarray,
+    u: np.ndarray,
+    i: np.ndarray,
+    r: np.ndarray,
+    mu: float,
+    lr: float,
+    reg: float,
+    rng: np.random.Generator,
+    user_mask: Optional[np.ndarray] = None,
+    item_mask: Optional[np.ndarray] = None,
+) -> None:
+    """
+    One epoch of Surprise's per-rating SVD update over shuffled ratings, in place.
+    Ratings are grouped into rounds where no updated user/item repeats, so each vectorized
+    round equals running its ratings one after another; cost is one Python step per rating
+    to build the rounds, meant for small update sets (warm starts), not full training.
+    If masks are given, only flagged user/item rows are updated; the rest stay frozen.
+    """
+    user_mask = np.ones(len(bu), dtype=bool) if user_mask is None else user_mask
+    item_mask = np.ones(len(bi), dtype=bool) if item_mask is None else item_mask
+    order = rng.permutation(len(r))
+    u, i, r = u[order], i[order], r[order]
+    rounds = _conflict_free_rounds(u, i, user_mask, item_mask)
+    by_round = np.argsort(rounds, kind="stable")
+    bounds = np.flatnonzero(np.diff(rounds[by_round])) + 1
+    for b in np.split(by_round, bounds):
+        ub, ib = u[b], i[b]
+        p, q = pu[ub], qi[ib]
+        err = r[b] - (mu + bu[ub] + bi[ib] + np.einsum("ij,ij->i", p, q))
+        mu_b, mi_b = user_mask[ub], item_mask[ib]
+        # rows are unique within the round among updated rows: plain fancy-index assignment
+        bu[ub[mu_b]] += lr * (err[mu_b] - reg * bu[ub[mu_b]])
+        bi[ib[mi_b]] += lr * (err[mi_b] - reg * bi[ib[mi_b]])
+        pu[ub[mu_b]] += lr * (err[mu_b, None] * q[mu_b] - reg * p[mu_b])
+        qi[ib[mi_b]] += lr * (err[mi_b, None] * p[mi_b] - reg * q[mi_b])
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, n_rows: int):
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], vals[order]
+
+
+def _als_blocks(counts: np.ndarray, width: int, chunk: int, budget: int) -> List[np.ndarray]:
+    """
+    Row ids grouped for padded batched solves: rows sorted by rating count, each block holding
+    at most `chunk` rows and (rows x longest row x width) <= budget padded entries.
+    """
+    order = np.argsort(counts, kind="stable")
+    c = np.maximum(counts[order], 1)
+    blocks, s = [], 0
+    while s < len(order):
+        B = min(chunk, len(order) - s)
+        while B > 1 and B * int(c[s + B - 1]) * width > budget:
+            B //= 2
+        blocks.append(order[s:s + B])
+        s += B
+    return blocks
+
+
+def _als_half_step(
+    indptr: np.ndarray,
+    cols: np.ndarray,
+    resid: np.ndarray,
+    fixed: np.ndarray,
+    reg: float,
+    shrink: float,
+    n_threads: int,
+    chunk: int = 2048,
+    budget: int = 1 << 22,
+) -> np.ndarray:
+    """
+    Solve every row of one side given the other side fixed (ridge regression per row).
+    fixed is the augmented [factors, 1] matrix so the row bias is solved jointly.
+    Rows of similar length are padded into (rows, longest, k) blocks: the Gram matrices and
+    right-hand sides of a block are one batched matmul, the ridge systems one batched
+    np.linalg.solve; blocks run on a thread pool (numpy releases the GIL in each call).
+    """
+    n_rows = len(indptr) - 1
+    k = fixed.shape[1]
+    out = np.zeros((n_rows, k), dtype=fixed.dtype)
+    counts = np.diff(indptr)
+    eye = np.eye(k, dtype=np.float64)
+    # padding gathers a zero row, so padded slots add nothing to the products
+    fixed0 = np.vstack([fixed, np.zeros((1, k), dtype=fixed.dtype)])
+    cols0 = np.r_[cols, len(fixed)]
+    resid0 = np.r_[resid, 0.0].astype(fixed.dtype)
+
+    def solve_block(rows: np.ndarray) -> None:
+        n = counts[rows]
+        pos = np.arange(int(n.max()) if len(n) else 0)
+        idx = np.where(pos < n[:, None], indptr[rows][:, None] + pos, len(cols))
+        Y = fixed0[cols0[idx]]
+        Yt = Y.transpose(0, 2, 1)
+        A = (Yt @ Y).astype(np.float64) + (reg * np.maximum(n, 1) + shrink)[:, None, None] * eye
+        b = (Yt @ resid0[idx][..., None]).astype(np.float64)
+        out[rows] = np.linalg.solve(A, b)[..., 0]
+
+    blocks = _als_blocks(counts, k, chunk, budget)
+    if n_threads <= 1 or len(blocks) == 1:
+        for rows in blocks:
+            solve_block(rows)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            list(pool.map(solve_block, blocks))
+    return out
+
+
+def train_als(
+    u: np.ndarray,
+    i: np.ndarray,
+    r: np.ndarray,
+    n_users: int,
+    n_items: int,
+    cfg: MFConfig,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]:
+    """Biased ALS (weighted-lambda regularization + constant shrink). Returns (pu, qi, bu, bi, mu)."""
+    rng = np.random.default_rng(cfg.seed)
+    f = cfg.n_factors
+    n_threads = cfg.n_threads or os.cpu_count() or 1
+    mu = float(r.mean())
+
+    pu = rng.normal(0.0, cfg.init_std, size=(n_users, f)).astype(np.float32)
+    qi = rng.normal(0.0, cfg.init_std, size=(n_items, f)).astype(np.float32)
+    bu = np.zeros(n_users, dtype=np.float32)
+    bi = np.zeros(n_items, dtype=np.float32)
+
+    u_ptr, u_cols, u_r = _csr(u, i, r, n_users)
+    i_ptr, i_cols, i_r = _csr(i, u, r, n_items)
+
+    for _ in range(int(cfg.n_epochs)):
+        # users | items fixed: target r - mu - b_i, design [q_i, 1]
+        fixed = np.hstack([qi, np.ones((n_items, 1), dtype=np.float32)])
+        sol = _als_half_step(u_ptr, u_cols, u_r - mu - bi[u_cols], fixed, cfg.reg, cfg.als_shrink, n_threads)
+        pu, bu = sol[:, :f].astype(np.float32), sol[:, f].astype(np.float32)
+
+        # items | users fixed: target r - mu - b_u, design [p_u, 1]
+        fixed = np.hstack([pu, np.ones((n_users, 1), dtype=np.float32)])
+        sol = _als_half_step(i_ptr, i_cols, i_r - mu - bu[i_cols], fixed, cfg.reg, cfg.als_shrink, n_threads)
+        qi, bi = sol[:, :f].astype(np.float32), sol[:, f].astype(np.float32)
+
+    return pu, qi, bu, bi, mu
+
+
+def train_sgd(
+    u: np.ndarray,
+    i: np.ndarray,
+    r: np.ndarray,
+    n_users: int,
+    n_items: int,
+    cfg: MFConfig,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]:
+    """Vectorized mini-batch biased SGD. Returns (pu, qi, bu, bi, mu)."""
+    rng = np.random.default_rng(cfg.seed)
+    f = cfg.n_factors
+    mu = float(r.mean())
+    pu = rng.normal(0.0, cfg.init_std, size=(n_users, f)).astype(np.float32)
+    qi = rng.normal(0.0, cfg.init_std, size=(n_items, f)).astype(np.float32)
+    bu = np.zeros(n_users, dtype=np.float32)
+    bi = np.zeros(n_items, dtype=np.float32)
+    for _ in range(int(cfg.n_epochs)):
+        sgd_epoch(pu, qi, bu, bi, u, i, r, mu, lr=cfg.lr, reg=cfg.reg, batch_size=cfg.batch_size, rng=rng)
+    return pu, qi, bu, bi, mu
+
+
+TRAINERS = {"als": train_als, "sgd": train_sgd}
+
+
+def fit_factor_model(df: pd.DataFrame, cfg: MFConfig) -> Tuple[FactorModel, Dict]:
+    """Train on a (userId, movieId, rating) frame; returns the servable model and a cf_info dict."""
+    return fit_factor_model_codes(*encode_ratings(df), cfg)
+
+
+def fit_factor_model_codes(
+    u: np.ndarray,
+    i: np.ndarray,
+    r: np.ndarray,
+    user_ids: np.ndarray,
+    item_ids: np.ndarray,
+    cfg: MFConfig,
+) -> Tuple[FactorModel, Dict]:
+    """Same as fit_factor_model on already-encoded dense codes (e.g. src/encoded.py arrays)."""
+    if cfg.algo not in TRAINERS:
+        raise ValueError(f"algo must be one of {sorted(TRAINERS)}")
+
+    t0 = time.perf_counter()
+    pu, qi, bu, bi, mu = TRAINERS[cfg.algo](u, i, r, len(user_ids), len(item_ids), cfg)
+    elapsed = time.perf_counter() - t0
+
+    model = FactorModel(
+        user_factors=pu,
+        item_factors=qi,
+        user_bias=bu,
+        item_bias=bi,
+        global_mean=mu,
+        user_ids=user_ids,
+        item_ids=item_ids,
+        rating_min=float(r.min()),
+        rating_max=float(r.max()),
+        model_type=f"numpy_{cfg.algo}",
+    )
+    info = {
+        "model_type": model.model_type,
+        "n_factors": cfg.n_factors,
+        "n_epochs": cfg.n_epochs,
+        "reg": cfg.reg,
+        "lr": cfg.lr if cfg.algo == "sgd" else None,
+        "rating_min": model.rating_min,
+        "rating_max": model.rating_max,
+        "num_users": int(len(user_ids)),
+        "num_movies": int(len(item_ids)),
+        "trained_rows": int(len(r)),
+        "train_seconds": round(elapsed, 3),
+    }
+    return model, info
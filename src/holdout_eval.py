@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.batch_eval import BatchEvalConfig, evaluate_batched
+from src.encoded import EncodedInteractions, _file_sha256, load_encoded
+from src.evaluation import split_by_user_time, split_key
+from src.pipeline import _BASELINE_KEYS, _CF_KEYS
+from src.predictions import load_recommender
+from src.training import TrainConfig
+
+# Bump to invalidate every cached holdout model (e.g. after changing what gets trained)
+HOLDOUT_VERSION = 1
+_SRC = Path(__file__).resolve().parent
+_CODE = ["training.py", "factorization.py", "implicit.py", "model_bundle.py", "trending.py"]
+
+
+@dataclass
+class HoldoutEvalConfig:
+    """
+    Train on the train split, evaluate on the test split (no test rating reaches any model).
+    - train: which artifacts to fit (popularity/trending always; CF if train.train_cf)
+    - models are cached under cache_dir by (split fingerprint, model config, trainer code),
+      so changing k / candidate_pool / modes / max_users reuses them
+    """
+    train: TrainConfig = field(default_factory=lambda: TrainConfig(train_cf=True, cf_model="als"))
+    modes: List[str] = field(default_factory=lambda: ["baseline", "cf"])
+    k: int = 10
+    holdout: str = "last1"
+    holdout_pct: float = 0.2
+    max_users: Optional[int] = None   # None = every test user
+    candidate_pool: int = 2000
+    workers: int = 1                  # batched engine processes
+    cache_dir: str = "models/.holdout_cache"
+    force: bool = False               # retrain even if cached
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a (userId, movieId, rating, timestamp) frame, for splits that have no source file."""
+    h = hashlib.sha256()
+    for col in ["userId", "movieId", "rating", "timestamp"]:
+        if col in df.columns:
+            h.update(col.encode("utf-8"))
+            h.update(np.ascontiguousarray(df[col].to_numpy(np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def model_params(cfg: TrainConfig) -> Dict:
+    """The TrainConfig fields that change a trained artifact (same keys as the pipeline stages)."""
+    params = {"baseline": {k: getattr(cfg, k) for k in _BASELINE_KEYS}, "cf": None}
+    if cfg.train_cf:
+        params["cf"] = {k: getattr(cfg, k) for k in _CF_KEYS}
+        if cfg.cf_model == "implicit":
+            params["cf"].update(feedback_glob=cfg.feedback_glob, implicit_alpha=cfg.implicit_alpha)
+    return params
+
+
+def model_fingerprint(split_fp: str, cfg: TrainConfig) -> str:
+    doc = {
+        "holdout_version": HOLDOUT_VERSION,
+        "split": split_fp,
+        "params": model_params(cfg),
+        "code": {m: _file_sha256(_SRC / m) for m in _CODE},
+    }
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def train_on_split(train_df: pd.DataFrame, cfg: TrainConfig, run_dir: Path) -> Dict:
+    """
+    Fit the serving artifacts from the train split only, laid out like a training run:
+    top_global.parquet + trending.npz, and cf_bundle/ + cf_info.json if cfg.train_cf.
+    (Leaderboards, movies and neighbors are skipped: unconstrained top-K never reads them.)
+    """
+    from src.training import rank_popularity, train_cf_factorization, train_cf_implicit, train_cf_surprise_svd
+    from src.trending import TrendingConfig, TrendingState
+
+    encoded = EncodedInteractions.from_frame(train_df)
+    agg, C = encoded.item_rating_stats()
+    pop = rank_popularity(agg, C, min_ratings=cfg.min_ratings, bayes_m=cfg.bayes_m)
+    pop.head(cfg.topn).to_parquet(run_dir / "top_global.parquet", index=False)
+    trend_cfg = TrendingConfig(half_life_days=cfg.trending_half_life_days, prior_m=cfg.trending_prior_m)
+    TrendingState.from_history(encoded.item_ids[encoded.item], encoded.rating, encoded.ts, trend_cfg).save(run_dir)
+    info = {"ranked_movies": int(len(pop))}
+
+    if cfg.train_cf:
+        if cfg.cf_model == "svd":
+            cf_info, model_file = train_cf_surprise_svd(encoded.frame(), cfg, run_dir), "cf_svd.joblib"
+        elif cfg.cf_model == "implicit":
+            cf_info, model_file = train_cf_implicit(encoded.frame(), cfg, run_dir), "cf_mf.joblib"
+        else:
+            cf_info, model_file = train_cf_factorization(encoded, cfg, run_dir), "cf_mf.joblib"
+        cf_info["model_file"] = model_file
+        (run_dir / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
+        info["cf"] = cf_info
+    return info
+
+
+def trained_models(
+    train_df: pd.DataFrame,
+    cfg: TrainConfig,
+    cache_dir: str,
+    split_fp: Optional[str] = None,
+    force: bool = False,
+) -> Path:
+    """
+    A models dir (LATEST -> run/) holding artifacts trained on train_df, from the cache when
+    the (split, config, code) fingerprint was trained before. Built in a temp dir and renamed
+    into place, so a crashed or concurrent build never leaves a half-written entry.
+    """
+    split_fp = split_fp or frame_fingerprint(train_df)
+    fp = model_fingerprint(split_fp, cfg)
+    entry = Path(cache_dir) / fp[:16]
+    if (entry / "model.json").exists() and not force:
+        print(f"[OK] Holdout models cached ({fp[:12]})")
+        return entry
+
+    print(f"[INFO] Training on the train split ({len(train_df):,} ratings, {fp[:12]})")
+    tmp = entry.with_name(entry.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    (tmp / "run").mkdir(parents=True)
+    t0 = time.perf_counter()
+    info = train_on_split(train_df, cfg, tmp / "run")
+    meta = {"fingerprint": fp, "split": split_fp, "params": model_params(cfg), "info": info,
+            "seconds": round(time.perf_counter() - t0, 3),
+            "created_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}
+    (tmp / "model.json").write_text(json.dumps(meta, indent=2, default=str), encoding="utf-8")
+    (tmp / "LATEST").write_text(str(entry / "run"), encoding="utf-8")
+    if entry.exists():
+        shutil.rmtree(entry)
+    os.replace(tmp, entry)
+    print(f"[OK] Holdout models trained in {meta['seconds']:.1f}s: {entry}")
+    return entry
+
+
+def evaluate_on_split(
+    train_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    cfg: HoldoutEvalConfig,
+    split_fp: Optional[str] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Per-user reports {mode: frame} of models trained on train_df (cached), scored on test_df."""
+    models_dir = trained_models(train_df, cfg.train, cfg.cache_dir, split_fp=split_fp, force=cfg.force)
+    rec = load_recommender(models_dir=str(models_dir), interactions_path=cfg.train.interactions_path,
+                           interactions_df=train_df)
+    reports = {}
+    for mode in cfg.modes:
+        reports[mode] = evaluate_batched(rec, train_df, test_df, BatchEvalConfig(
+            k=cfg.k, mode=mode, candidate_pool=cfg.candidate_pool, max_users=cfg.max_users,
+            workers=cfg.workers, seed=cfg.train.seed))
+    return reports
+
+
+def holdout_evaluate(cfg: HoldoutEvalConfig) -> Dict[str, pd.DataFrame]:
+    """Split the interactions parquet by user time, then evaluate_on_split (split keyed by file content)."""
+    encoded = load_encoded(cfg.train.interactions_path)
+    train_df, test_df = split_by_user_time(encoded, holdout=cfg.holdout, holdout_pct=cfg.holdout_pct)
+    split_fp = split_key(encoded.manifest["source"]["sha256"], cfg.holdout, cfg.holdout_pct)
+    return evaluate_on_split(train_df, test_df, cfg, split_fp=split_fp)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train on the time split's train part, evaluate on its test part (cached models).")
+    parser.add_argument("--interactions", default="data/interactions.parquet")
+    parser.add_argument("--cache_dir", default="models/.holdout_cache")
+    parser.add_argument("--modes", default="baseline,cf", help="Comma-separated modes to evaluate")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--holdout", default="last1")            # last1|lastpct
+    parser.add_argument("--holdout_pct", type=float, default=0.2)
+    parser.add_argument("--max_users", type=int, default=0, help="0 = every test user")
+    parser.add_argument("--candidate_pool", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1, help="Batched engine processes (0 = cpu count)")
+    parser.add_argument("--topn", type=int, default=2000)
+    parser.add_argument("--min_ratings", type=int, default=20)
+    parser.add_argument("--bayes_m", type=int, default=50)
+    parser.add_argument("--no_cf", action="store_true", help="Popularity/trending only")
+    parser.add_argument("--cf_model", default="als", choices=["svd", "als", "sgd", "implicit"])
+    parser.add_argument("--cf_factors", type=int, default=100)
+    parser.add_argument("--cf_epochs", type=int, default=20)
+    parser.add_argument("--cf_lr_all", type=float, default=0.005)
+    parser.add_argument("--cf_reg_all", type=float, default=0.02)
+    parser.add_argument("--force", action="store_true", help="Retrain even if a cached model matches")
+    parser.add_argument("--out", default="models", help="Directory for the per-user CSVs")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    train = replace(
+        TrainConfig(),
+        interactions_path=args.interactions,
+        topn=args.topn,
+        min_ratings=args.min_ratings,
+        bayes_m=args.bayes_m,
+        seed=args.seed,
+        train_cf=not args.no_cf,
+        cf_model=args.cf_model,
+        cf_factors=args.cf_factors,
+        cf_epochs=args.cf_epochs,
+        cf_lr_all=args.cf_lr_all,
+        cf_reg_all=args.cf_reg_all,
+    )
+    modes = [m for m in args.modes.split(",") if m]
+    if args.no_cf and "cf" in modes:
+        raise SystemExit("--no_cf: drop 'cf' from --modes")
+    cfg = HoldoutEvalConfig(
+        train=train,
+        modes=modes,
+        k=args.k,
+        holdout=args.holdout,
+        holdout_pct=args.holdout_pct,
+        max_users=args.max_users or None,
+        candidate_pool=args.candidate_pool,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        force=args.force,
+    )
+
+    t0 = time.perf_counter()
+    reports = holdout_evaluate(cfg)
+    print(f"[INFO] holdout evaluation in {time.perf_counter() - t0:.2f}s")
+
+    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    for mode, per_user in reports.items():
+        print(f"\n=== {mode} ({len(per_user):,} users) ===")
+        print(per_user[[c for c in per_user.columns if "@" in c]].mean(numeric_only=True))
+        out_path = Path(args.out) / f"eval_holdout_{mode}_{ts}.csv"
+        per_user.to_csv(out_path, index=False)
+        print(f"Per-user report saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# <run dir>/popularity_ranked.parquet: every stable movie in Bayesian rank order (top_global is its head)
+# <run dir>/leaderboards.npz: keys + CSR offsets + int32 row positions into that table, ascending (= rank order)
+RANKED_FILE = "popularity_ranked.parquet"
+LEADERBOARDS_FILE = "leaderboards.npz"
+
+# same rule as build_artifacts.data_enrichement.extract_release_year, so decades agree with serving's "year"
+_YEAR_RE = r"\((\d{4})\)"
+
+
+def _genre_list(genres) -> List[str]:
+    # same normalisation as api.filters._split_genres
+    if not isinstance(genres, str) or not genres.strip():
+        return []
+    return [g for g in (p.strip().lower() for p in genres.split("|")) if g]
+
+
+def _decade(year) -> int:
+    return int(year) // 10 * 10
+
+
+def movie_years(movies: pd.DataFrame) -> pd.Series:
+    """Release year per movie: the `year` column if present, else parsed from the title."""
+    if "year" in movies.columns:
+        return pd.to_numeric(movies["year"], errors="coerce").astype("Int64")
+    return movies["title"].astype(str).str.extract(_YEAR_RE)[0].astype("float").astype("Int64")
+
+
+def build_leaderboards(ranked: pd.DataFrame, movies: pd.DataFrame, depth: int = 500) -> Dict[str, np.ndarray]:
+    """
+    Ranked leaderboards per genre, per decade and per (genre, decade), as positions into `ranked`.
+    - keys: "genre=<genre>", "decade=<1950>", "genre=<genre>|decade=<1950>"
+    - each keeps its best `depth` movies (0 = all); `totals` counts all matches
+    """
+    meta = ranked[["movieId"]].merge(
+        pd.DataFrame({"movieId": movies["movieId"], "genres": movies.get("genres"), "year": movie_years(movies)}),
+        on="movieId", how="left",
+    )
+    boards: Dict[str, List[int]] = {}
+    totals: Dict[str, int] = {}
+    for pos, (genres, year) in enumerate(zip(meta["genres"].tolist(), meta["year"].tolist())):
+        gs = _genre_list(genres)
+        keys = [f"genre={g}" for g in gs]
+        if not pd.isna(year):
+            dec = _decade(year)
+            keys += [f"decade={dec}"] + [f"genre={g}|decade={dec}" for g in gs]
+        for key in keys:
+            board = boards.setdefault(key, [])
+            totals[key] = totals.get(key, 0) + 1
+            if depth <= 0 or len(board) < depth:
+                board.append(pos)
+
+    keys = sorted(boards)
+    sizes = np.array([len(boards[k]) for k in keys], dtype=np.int64)
+    return {
+        "keys": np.array(keys, dtype=str),
+        "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        "positions": np.array([p for k in keys for p in boards[k]], dtype=np.int32),
+        "totals": np.array([totals[k] for k in keys], dtype=np.int64),
+    }
+
+
+def save_leaderboards(out_dir: Path, ranked: pd.DataFrame, boards: Dict[str, np.ndarray]) -> None:
+    ranked.to_parquet(Path(out_dir) / RANKED_FILE, index=False)
+    np.savez(Path(out_dir) / LEADERBOARDS_FILE, **boards)
+
+
+@dataclass
+class Leaderboards:
+    """Serving-side lookup over leaderboards.npz; positions index the ranked table."""
+    ranked: pd.DataFrame
+    keys: np.ndarray
+    offsets: np.ndarray
+    positions: np.ndarray
+    totals: np.ndarray
+
+    @classmethod
+    def load(cls, run_dir: Path) -> Optional["Leaderboards"]:
+        run_dir = Path(run_dir)
+        if not (run_dir / LEADERBOARDS_FILE).exists() or not (run_dir / RANKED_FILE).exists():
+            return None
+        with np.load(run_dir / LEADERBOARDS_FILE, allow_pickle=False) as z:
+            arrays = {name: z[name] for name in ["keys", "offsets", "positions", "totals"]}
+        return cls(ranked=pd.read_parquet(run_dir / RANKED_FILE), **arrays)
+
+    def _board(self, key: str) -> Optional[Tuple[np.ndarray, bool]]:
+        j = int(np.searchsorted(self.keys, key))
+        if j >= len(self.keys) or self.keys[j] != key:
+            return None
+        pos = self.positions[self.offsets[j]:self.offsets[j + 1]]
+        return pos, len(pos) == int(self.totals[j])
+
+    def _decades(self, min_year: Optional[int], max_year: Optional[int]) -> List[int]:
+        known = sorted(int(k.split("=", 1)[1]) for k in self.keys if k.startswith("decade="))
+        lo = _decade(min_year) if min_year is not None else -10**9
+        hi = _decade(max_year) if max_year is not None else 10**9
+        return [d for d in known if lo <= d <= hi]
+
+    def candidates(
+        self,
+        include_genres: Optional[Iterable[str]] = None,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None,
+    ) -> Optional[Tuple[np.ndarray, bool]]:
+        """
+        Rank-ordered positions of the smallest set of leaderboards covering every movie that can
+        pass the genre / year constraints, and whether those boards are complete (not truncated).
+        None when neither constraint is set (use the global table).
+        - genres only: union of genre=<g>; years only: union of the overlapping decade=<d>
+        - both: union of genre=<g>|decade=<d>
+        """
+        genres = sorted({g.strip().lower() for g in (include_genres or []) if isinstance(g, str) and g.strip()})
+        has_years = min_year is not None or max_year is not None
+        if not genres and not has_years:
+            return None
+
+        decades = self._decades(min_year, max_year) if has_years else []
+        if genres and has_years:
+            keys = [f"genre={g}|decade={d}" for g in genres for d in decades]
+        elif genres:
+            keys = [f"genre={g}" for g in genres]
+        else:
+            keys = [f"decade={d}" for d in decades]
+
+        parts, complete = [], True
+        for key in keys:
+            board = self._board(key)
+            if board is not None:
+                parts.append(board[0])
+                complete &= board[1]
+        if not parts:
+            return np.empty(0, dtype=np.int32), True
+        return (np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0]), complete
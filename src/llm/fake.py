@@ -0,0 +1,94 @@
+"""
+Deterministic stand-in for Gemini (load tests, offline runs).
+
+install_fake_llm() swaps get_llm() in src.llm.intent_parser and src.llm.reasoning, so the
+real prompt -> chain -> JSON parsing -> fallback path still runs; only the model call is faked:
+- latency: latency_ms +/- jitter_ms (uniform), drawn from a seeded stream
+- failures: failure_rate share of calls raise (the callers fall back as they do for Gemini errors)
+- answers: intent JSON from genre / decade keywords of the query, one-line pitches for reasons
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Optional
+
+import numpy as np
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama", "Fantasy",
+          "Horror", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western"]
+MOODS = ["happy", "sad", "tense", "curious", "nostalgic", "neutral"]
+
+
+@dataclass
+class FakeLLMConfig:
+    latency_ms: float = 300.0
+    jitter_ms: float = 100.0
+    failure_rate: float = 0.0
+    seed: int = 42
+
+
+class FakeLLM:
+    """Callable used where a chat model goes in `prompt | llm` (langchain coerces callables to runnables)."""
+
+    def __init__(self, kind: str, cfg: FakeLLMConfig) -> None:
+        self.kind = kind
+        self.cfg = cfg
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _draw(self) -> np.ndarray:
+        with self._lock:
+            n = self._calls
+            self._calls += 1
+        # call n of a given seed always gets the same latency / failure draw, whatever the thread
+        return np.random.default_rng([self.cfg.seed, n, 0 if self.kind == "intent" else 1]).random(2)
+
+    def __call__(self, prompt: Any) -> SimpleNamespace:
+        u_latency, u_fail = self._draw()
+        delay = self.cfg.latency_ms + (2 * u_latency - 1) * self.cfg.jitter_ms
+        time.sleep(max(delay, 0.0) / 1e3)
+        if u_fail < self.cfg.failure_rate:
+            raise RuntimeError("fake LLM: injected failure")
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        return SimpleNamespace(content=intent_answer(text) if self.kind == "intent" else reason_answer(text))
+
+
+def intent_answer(prompt: str) -> str:
+    m = re.search(r'User Input: "(.*)"', prompt)
+    query = (m.group(1) if m else prompt).lower()
+    genres = [g for g in GENRES if g.lower() in query]
+    if not genres:
+        genres = [GENRES[sum(query.encode("utf-8")) % len(GENRES)]]
+    decade = re.search(r"\b(19[2-9]0|20[0-2]0)s\b", query) or re.search(r"\b([2-9]0)s\b", query)
+    year_range = None
+    if decade:
+        start = int(decade.group(1))
+        start = start if start > 100 else 1900 + start
+        year_range = [start, start + 9]
+    return json.dumps({
+        "intent": "explore",
+        "mood": MOODS[len(query) % len(MOODS)],
+        "constraints": {"genres": genres[:2], "year_range": year_range},
+        "explanation": f"Picked for '{query[:60]}'.",
+    })
+
+
+def reason_answer(prompt: str) -> str:
+    m = re.search(r'Proposed Match: "(.*)"', prompt)
+    return f"If you liked your recent favourites, {m.group(1) if m else 'this one'} is a natural next watch."
+
+
+def install_fake_llm(cfg: Optional[FakeLLMConfig] = None) -> FakeLLMConfig:
+    """Route both LLM call sites to FakeLLM instances (process-wide; for servers started by load tests)."""
+    from src.llm import intent_parser, reasoning
+
+    cfg = cfg or FakeLLMConfig()
+    intent_llm, reason_llm = FakeLLM("intent", cfg), FakeLLM("reason", cfg)
+    intent_parser.get_llm = lambda: intent_llm
+    reasoning.get_llm = lambda: reason_llm
+    return cfg
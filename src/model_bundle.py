@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+
+from src.encoded import _file_sha256
+from src.factorization import FactorModel
+
+# <run dir>/cf_bundle/{*.npy, manifest.json}: a pickle-free export of the CF model
+BUNDLE_DIR = "cf_bundle"
+BUNDLE_ARRAYS = {
+    "user_factors": np.float32,
+    "item_factors": np.float32,
+    "user_bias": np.float32,
+    "item_bias": np.float32,
+    "user_ids": np.int64,       # ascending; row j of user_factors/user_bias belongs to user_ids[j]
+    "item_ids": np.int64,       # ascending; same for items
+}
+FORMAT_VERSION = 1
+
+
+def _as_factor_model(model) -> FactorModel:
+    if isinstance(model, FactorModel):
+        return model
+    if hasattr(model, "trainset") and hasattr(model, "pu"):
+        return FactorModel.from_surprise(model)
+    raise TypeError(f"cannot export {type(model).__name__} as a CF bundle")
+
+
+def export_bundle(model, run_dir: Union[str, Path], model_file: str = "") -> Path:
+    """
+    Write <run_dir>/cf_bundle from a FactorModel or a fitted Surprise SVD.
+    Rows are reordered so raw ids are ascending (serving looks ids up with searchsorted
+    on the mapped arrays instead of building a dict per worker).
+    """
+    m = _as_factor_model(model)
+    uo = np.argsort(np.asarray(m.user_ids, dtype=np.int64), kind="stable")
+    io = np.argsort(np.asarray(m.item_ids, dtype=np.int64), kind="stable")
+    arrays = {
+        "user_factors": np.asarray(m.user_factors)[uo],
+        "item_factors": np.asarray(m.item_factors)[io],
+        "user_bias": np.asarray(m.user_bias)[uo],
+        "item_bias": np.asarray(m.item_bias)[io],
+        "user_ids": np.asarray(m.user_ids, dtype=np.int64)[uo],
+        "item_ids": np.asarray(m.item_ids, dtype=np.int64)[io],
+    }
+
+    out_dir = Path(run_dir) / BUNDLE_DIR
+    tmp = out_dir.with_name(out_dir.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    files = {}
+    for name, dtype in BUNDLE_ARRAYS.items():
+        arr = np.ascontiguousarray(arrays[name], dtype=dtype)
+        np.save(tmp / f"{name}.npy", arr)
+        files[name] = {
+            "shape": list(arr.shape),
+            "dtype": np.dtype(dtype).name,
+            "bytes": (tmp / f"{name}.npy").stat().st_size,
+            "sha256": _file_sha256(tmp / f"{name}.npy"),
+        }
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_type": m.model_type,
+        "model_file": model_file,
+        "global_mean": float(m.global_mean),
+        "rating_min": None if m.rating_min is None else float(m.rating_min),
+        "rating_max": None if m.rating_max is None else float(m.rating_max),
+        "n_users": int(len(arrays["user_ids"])),
+        "n_items": int(len(arrays["item_ids"])),
+        "n_factors": int(arrays["user_factors"].shape[1]) if arrays["user_factors"].ndim == 2 else 0,
+        "files": files,
+        "created_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # swap directories so a worker starting mid-export sees the old bundle or the new one, never a mix
+    old = out_dir.with_name(out_dir.name + f".old{os.getpid()}")
+    if out_dir.exists():
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return out_dir
+
+
+def read_manifest(bundle_dir: Union[str, Path]) -> Dict:
+    manifest = json.loads((Path(bundle_dir) / "manifest.json").read_text(encoding="utf-8"))
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{bundle_dir}: unsupported bundle format {manifest.get('format_version')}")
+    return manifest
+
+
+def verify_bundle(bundle_dir: Union[str, Path]) -> List[str]:
+    """Problems found (empty = OK): missing files, size or checksum mismatches against the manifest."""
+    bundle_dir = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+    problems = []
+    for name in BUNDLE_ARRAYS:
+        meta = manifest["files"].get(name)
+        path = bundle_dir / f"{name}.npy"
+        if meta is None or not path.exists():
+            problems.append(f"{name}: missing")
+        elif path.stat().st_size != meta["bytes"]:
+            problems.append(f"{name}: size {path.stat().st_size} != {meta['bytes']}")
+        elif _file_sha256(path) != meta["sha256"]:
+            problems.append(f"{name}: sha256 mismatch")
+    return problems
+
+
+def load_bundle(bundle_dir: Union[str, Path], mmap: bool = True, verify: bool = False) -> FactorModel:
+    """
+    FactorModel over the bundle arrays. With mmap (default) the arrays are read-only
+    memory maps: pages are loaded on first touch and shared by every process mapping the file.
+    verify=True checks every checksum first (reads the files once).
+    Shapes and dtypes are always checked against the manifest.
+    """
+    bundle_dir = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+    if verify:
+        problems = verify_bundle(bundle_dir)
+        if problems:
+            raise ValueError(f"{bundle_dir}: corrupt bundle: {'; '.join(problems)}")
+
+    arrays = {}
+    for name in BUNDLE_ARRAYS:
+        arr = np.load(bundle_dir / f"{name}.npy", mmap_mode="r" if mmap else None)
+        meta = manifest["files"][name]
+        if list(arr.shape) != meta["shape"] or arr.dtype.name != meta["dtype"]:
+            raise ValueError(f"{bundle_dir}: {name} is {arr.dtype.name}{list(arr.shape)}, "
+                             f"manifest says {meta['dtype']}{meta['shape']}")
+        arrays[name] = arr
+
+    return FactorModel(
+        **arrays,
+        global_mean=manifest["global_mean"],
+        rating_min=manifest["rating_min"],
+        rating_max=manifest["rating_max"],
+        model_type=manifest["model_type"],
+        ids_sorted=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or verify the pickle-free CF model bundle of a run.")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--run_dir", default=None, help="Default: the run models/LATEST points to")
+    parser.add_argument("--models_dir", default="models")
+    args = parser.parse_args()
+
+    if args.run_dir:
+        run_dir = Path(args.run_dir)
+    else:
+        from src.predictions import ModelPaths
+        run_dir = ModelPaths(Path(args.models_dir)).latest_run_dir()
+
+    if args.command == "verify":
+        problems = verify_bundle(run_dir / BUNDLE_DIR)
+        for p in problems:
+            print(f"[ERROR] {p}")
+        if problems:
+            raise SystemExit(1)
+        print(f"[OK] Bundle verified: {run_dir / BUNDLE_DIR}")
+        return
+
+    # export: convert the run's existing joblib model (runs trained before bundles existed)
+    import joblib
+    from src.predictions import _cf_model_files
+
+    for name in _cf_model_files(run_dir):
+        if (run_dir / name).exists():
+            t0 = time.perf_counter()
+            out = export_bundle(joblib.load(run_dir / name), run_dir, model_file=name)
+            print(f"[OK] Exported {run_dir / name} -> {out} ({time.perf_counter() - t0:.2f}s)")
+            return
+    raise SystemExit(f"[ERROR] No CF model in {run_dir}")
+
+
+if __name__ == "__main__":
+    main()
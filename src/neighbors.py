@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from src.encoded import EncodedInteractions
+
+# <run dir>/neighbors.npz: top-K similar movies per movie
+# - movie_ids int32 (n,) ascending; row j of neighbors/scores belongs to movie_ids[j]
+# - neighbors int32 (n, K) raw movieIds, best first, -1 padded; scores float16 (n, K) cosine
+NEIGHBORS_FILE = "neighbors.npz"
+SOURCES = ("cooccurrence", "factors")
+
+
+@dataclass
+class NeighborsConfig:
+    source: str = "cooccurrence"   # cooccurrence (co-rating cosine) | factors (cosine of CF item factors)
+    k: int = 50
+    min_ratings: int = 5           # cooccurrence: movies with fewer ratings get no list and are never a neighbor
+    block_mb: int = 64             # dense similarity block held per thread
+    n_threads: int = 0             # 0 = os.cpu_count()
+
+
+def _top_k_rows(sim: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k largest entries per row, best first (argpartition + small sort)."""
+    k = min(k, sim.shape[1])
+    part = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(sim, part, axis=1)
+    order = np.argsort(-vals, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+def _blocked_top_k(
+    n_rows: int,
+    n_cols: int,
+    block_sim,
+    cfg: NeighborsConfig,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-K per row of an (n_rows x n_cols) similarity matrix that is never materialized:
+    block_sim(lo, hi) returns rows lo:hi densely (self-similarity already masked).
+    Blocks are sized to block_mb and run on a thread pool (scipy/BLAS products release the GIL).
+    """
+    k = min(cfg.k, max(n_cols - 1, 1))
+    idx = np.full((n_rows, k), -1, dtype=np.int64)
+    val = np.zeros((n_rows, k), dtype=np.float32)
+    rows = max(1, (cfg.block_mb << 20) // max(4 * n_cols, 1))
+
+    def run(lo: int, hi: int) -> None:
+        top_i, top_v = _top_k_rows(block_sim(lo, hi), k)
+        keep = top_v > 0
+        idx[lo:hi] = np.where(keep, top_i, -1)
+        val[lo:hi] = np.where(keep, top_v, 0.0)
+
+    bounds = [(lo, min(lo + rows, n_rows)) for lo in range(0, n_rows, rows)]
+    n_threads = cfg.n_threads or os.cpu_count() or 1
+    if n_threads <= 1 or len(bounds) == 1:
+        for lo, hi in bounds:
+            run(lo, hi)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            list(pool.map(lambda b: run(*b), bounds))
+    return idx, val
+
+
+def _pack(movie_ids: np.ndarray, idx: np.ndarray, val: np.ndarray) -> Dict[str, np.ndarray]:
+    """Rows sorted by movieId, column positions mapped to raw movieIds, compact dtypes."""
+    order = np.argsort(movie_ids, kind="stable")
+    neighbors = np.where(idx >= 0, movie_ids[np.maximum(idx, 0)], -1)
+    return {
+        "movie_ids": movie_ids[order].astype(np.int32),
+        "neighbors": neighbors[order].astype(np.int32),
+        "scores": val[order].astype(np.float16),
+    }
+
+
+def cooccurrence_neighbors(encoded: EncodedInteractions, cfg: NeighborsConfig) -> Dict[str, np.ndarray]:
+    """
+    Cosine over the movie x user rating matrix: sim(i, j) = r_i . r_j / (|r_i| |r_j|),
+    computed block by block as sparse products against the transposed matrix.
+    """
+    n_items = encoded.n_items
+    counts = np.bincount(encoded.item, minlength=n_items)
+    X = sp.csr_matrix(
+        (np.asarray(encoded.rating, dtype=np.float32), (encoded.item, encoded.user)),
+        shape=(n_items, encoded.n_users),
+    )
+    keep = np.flatnonzero(counts >= cfg.min_ratings)
+    X = X[keep]
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    X = sp.diags(1.0 / np.maximum(norms, 1e-12)).astype(np.float32) @ X
+    XT = X.T.tocsc()
+
+    def block_sim(lo: int, hi: int) -> np.ndarray:
+        sim = (X[lo:hi] @ XT).toarray()
+        sim[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        return sim
+
+    idx, val = _blocked_top_k(len(keep), len(keep), block_sim, cfg)
+    return _pack(np.asarray(encoded.item_ids, dtype=np.int64)[keep], idx, val)
+
+
+def factor_neighbors(model, cfg: NeighborsConfig) -> Dict[str, np.ndarray]:
+    """Cosine over the item factors of a FactorModel / Surprise SVD (dense blocks of Q_norm @ Q_norm.T)."""
+    from src.model_bundle import _as_factor_model
+
+    m = _as_factor_model(model)
+    Q = np.asarray(m.item_factors, dtype=np.float32)
+    Q = Q / np.maximum(np.linalg.norm(Q, axis=1, keepdims=True), 1e-12)
+
+    def block_sim(lo: int, hi: int) -> np.ndarray:
+        sim = Q[lo:hi] @ Q.T
+        sim[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        return sim
+
+    idx, val = _blocked_top_k(len(Q), len(Q), block_sim, cfg)
+    return _pack(np.asarray(m.item_ids, dtype=np.int64), idx, val)
+
+
+def save_neighbors(out_dir: Path, arrays: Dict[str, np.ndarray], source: str) -> Path:
+    path = Path(out_dir) / NEIGHBORS_FILE
+    np.savez(path, source=np.array(source), **arrays)
+    return path
+
+
+@dataclass
+class ItemNeighbors:
+    """Serving-side lookup over neighbors.npz: one searchsorted + one row slice per movie."""
+    movie_ids: np.ndarray
+    neighbors: np.ndarray
+    scores: np.ndarray
+    source: str
+
+    @property
+    def k(self) -> int:
+        return int(self.neighbors.shape[1]) if self.neighbors.ndim == 2 else 0
+
+    @classmethod
+    def load(cls, run_dir: Path) -> Optional["ItemNeighbors"]:
+        path = Path(run_dir) / NEIGHBORS_FILE
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as z:
+            return cls(movie_ids=z["movie_ids"], neighbors=z["neighbors"], scores=z["scores"], source=str(z["source"]))
+
+    def similar(self, movie_id: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(neighbor movieIds, cosine scores) best first, or None for a movie without a list."""
+        j = int(np.searchsorted(self.movie_ids, movie_id))
+        if j >= len(self.movie_ids) or int(self.movie_ids[j]) != int(movie_id):
+            return None
+        ids = self.neighbors[j]
+        n = int(np.count_nonzero(ids >= 0))
+        return ids[:n].astype(np.int64), self.scores[j, :n].astype(np.float32)
+
+
+def build_neighbors(cfg: NeighborsConfig, interactions_path: str = "", model=None) -> Dict[str, np.ndarray]:
+    if cfg.source == "cooccurrence":
+        from src.encoded import load_encoded
+        return cooccurrence_neighbors(load_encoded(interactions_path), cfg)
+    if cfg.source == "factors":
+        if model is None:
+            raise ValueError("source='factors' needs a trained CF model")
+        return factor_neighbors(model, cfg)
+    raise ValueError(f"source must be one of {SOURCES}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compute item-item neighbors (neighbors.npz) for a run.")
+    parser.add_argument("--run_dir", default=None, help="Default: the run models/LATEST points to")
+    parser.add_argument("--models_dir", default="models")
+    parser.add_argument("--interactions", default="data/interactions.parquet")
+    parser.add_argument("--source", default="cooccurrence", choices=list(SOURCES))
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--min_ratings", type=int, default=5)
+    parser.add_argument("--block_mb", type=int, default=64)
+    parser.add_argument("--n_threads", type=int, default=0)
+    args = parser.parse_args()
+
+    from src.predictions import ModelPaths, _cf_model_files, _load_cf_bundle
+
+    run_dir = Path(args.run_dir) if args.run_dir else ModelPaths(Path(args.models_dir)).latest_run_dir()
+    cfg = NeighborsConfig(source=args.source, k=args.k, min_ratings=args.min_ratings,
+                          block_mb=args.block_mb, n_threads=args.n_threads)
+
+    model = None
+    if cfg.source == "factors":
+        model = _load_cf_bundle(run_dir)
+        if model is None:
+            import joblib
+            for name in _cf_model_files(run_dir):
+                if (run_dir / name).exists():
+                    model = joblib.load(run_dir / name)
+                    break
+        if model is None:
+            raise SystemExit(f"[ERROR] No CF model in {run_dir}")
+
+    t0 = time.perf_counter()
+    arrays = build_neighbors(cfg, interactions_path=args.interactions, model=model)
+    path = save_neighbors(run_dir, arrays, cfg.source)
+    print(f"[OK] Neighbors ({cfg.source}, k={arrays['neighbors'].shape[1]}) for "
+          f"{len(arrays['movie_ids']):,} movies in {time.perf_counter() - t0:.1f}s -> {path}")
+
+
+if __name__ == "__main__":
+    main()
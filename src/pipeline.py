@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.encoded import _file_sha256
+from src.training import TrainConfig
+
+# Bump to invalidate every cached stage (e.g. after changing how outputs are laid out)
+PIPELINE_VERSION = 1
+_SRC = Path(__file__).resolve().parent
+
+
+@dataclass
+class PipelineConfig:
+    train: TrainConfig = field(default_factory=TrainConfig)
+    eval_modes: List[str] = field(default_factory=lambda: ["baseline"])   # [] = no evaluation stage
+    k: int = 10
+    holdout: str = "last1"
+    holdout_pct: float = 0.2
+    max_users: Optional[int] = None   # None = every test user
+    candidate_pool: int = 2000
+    cache_dir: str = "models/.pipeline_cache"
+    workers: int = 0               # 0 = os.cpu_count(); 1 = run stages in this process
+    force: List[str] = field(default_factory=list)   # stages to rerun even if cached
+
+
+@dataclass
+class Stage:
+    """
+    One step of the DAG.
+    - fn(inputs, params, out_dir) writes `outputs` into out_dir and returns a small info dict
+    - inputs: file paths (content-hashed) + "stage:<name>" output dirs of the `deps`
+    - the fingerprint covers params, input file hashes, dep fingerprints and the `code` modules
+    """
+    name: str
+    fn: Callable[[Dict[str, str], Dict, str], Dict]
+    params: Dict
+    files: Dict[str, str] = field(default_factory=dict)
+    deps: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    code: List[str] = field(default_factory=list)
+    publish: bool = True           # copy outputs into the run directory
+
+
+# ---------------------------------------------------------------------------
+# Stage functions (top level: they run in worker processes)
+# ---------------------------------------------------------------------------
+
+def stage_encode(inputs: Dict[str, str], params: Dict, out_dir: str) -> Dict:
+    """Encoded interactions artifact, shared by the downstream stages through the data/encoded cache."""
+    from src.encoded import build_encoded
+
+    enc_dir = build_encoded(inputs["interactions"])
+    manifest = json.loads((enc_dir / "manifest.json").read_text(encoding="utf-8"))
+    (Path(out_dir) / "encoded.json").write_text(json.dumps({"dir": str(enc_dir), **manifest}, indent=2), encoding="utf-8")
+    return {"rows": manifest["rows"], "n_users": manifest["n_users"], "n_items": manifest["n_items"]}
+
+
+def stage_baseline(inputs: Dict[str, str], params: Dict, out_dir: str) -> Dict:
+    """Popularity table, genre/decade leaderboards, trending state, movies metadata."""
+    from src.encoded import load_encoded
+    from src.leaderboards import build_leaderboards, save_leaderboards
+    from src.training import _load_movies, rank_popularity
+    from src.trending import TrendingConfig, TrendingState
+
+    out = Path(out_dir)
+    encoded = load_encoded(inputs["interactions"])
+    agg, C = encoded.item_rating_stats()
+    pop = rank_popularity(agg, C, min_ratings=params["min_ratings"], bayes_m=params["bayes_m"])
+    pop.head(params["topn"]).to_parquet(out / "top_global.parquet", index=False)
+
+    movies = _load_movies(inputs.get("movies"))
+    if movies is not None:
+        movies.to_parquet(out / "movies.parquet", index=False)
+        save_leaderboards(out, pop, build_leaderboards(pop, movies, depth=params["leaderboard_depth"]))
+
+    trend_cfg = TrendingConfig(half_life_days=params["trending_half_life_days"], prior_m=params["trending_prior_m"])
+    TrendingState.from_history(encoded.item_ids[encoded.item], encoded.rating, encoded.ts, trend_cfg).save(out)
+    return {"ranked_movies": int(len(pop))}
+
+
+def stage_cf(inputs: Dict[str, str], params: Dict, out_dir: str) -> Dict:
+    """CF model (+ bundle and cf_info.json), same trainers as src.training --train_cf."""
+    from src.encoded import load_encoded
+    from src.training import train_cf_factorization, train_cf_implicit, train_cf_surprise_svd
+
+    out = Path(out_dir)
+    cfg = replace(TrainConfig(), interactions_path=inputs["interactions"], **params)
+    encoded = load_encoded(inputs["interactions"])
+    if cfg.cf_model == "svd":
+        cf_info, model_file = train_cf_surprise_svd(encoded.frame(), cfg, out), "cf_svd.joblib"
+    elif cfg.cf_model == "implicit":
+        cf_info, model_file = train_cf_implicit(encoded.frame(), cfg, out), "cf_mf.joblib"
+    else:
+        cf_info, model_file = train_cf_factorization(encoded, cfg, out), "cf_mf.joblib"
+    cf_info["model_file"] = model_file
+    (out / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
+    return {"model_file": model_file}
+
+
+def stage_neighbors(inputs: Dict[str, str], params: Dict, out_dir: str) -> Dict:
+    """Item-item neighbors for /similar: co-rating cosine, or cosine of the cf stage's item factors."""
+    from src.model_bundle import BUNDLE_DIR, load_bundle
+    from src.neighbors import NeighborsConfig, build_neighbors, save_neighbors
+
+    cfg = NeighborsConfig(source=params["source"], k=params["k"])
+    model = load_bundle(Path(inputs["stage:cf"]) / BUNDLE_DIR) if cfg.source == "factors" else None
+    arrays = build_neighbors(cfg, interactions_path=inputs["interactions"], model=model)
+    save_neighbors(Path(out_dir), arrays, cfg.source)
+    return {"movies": int(len(arrays["movie_ids"])), "k": int(arrays["neighbors"].shape[1])}
+
+
+def stage_evaluate(inputs: Dict[str, str], params: Dict, out_dir: str) -> Dict:
+    """Time-split evaluation of the assembled baseline (+ CF) artifacts, one report per mode."""
+    import tempfile
+
+    from src.batch_eval import BatchEvalConfig, evaluate_batched
+    from src.encoded import load_encoded
+    from src.evaluation import split_by_user_time
+    from src.predictions import load_recommender
+
+    out = Path(out_dir)
+    encoded = load_encoded(inputs["interactions"])
+    train_df, test_df = split_by_user_time(encoded, holdout=params["holdout"], holdout_pct=params["holdout_pct"])
+
+    summary = {}
+    with tempfile.TemporaryDirectory(dir=out) as tmp:
+        # a throwaway models dir whose LATEST is the upstream outputs, so the Recommender loads them as a run
+        run = Path(tmp) / "run"
+        run.mkdir()
+        for key, src in inputs.items():
+            if key.startswith("stage:"):
+                _link_tree(Path(src), run)
+        (Path(tmp) / "LATEST").write_text(str(run), encoding="utf-8")
+        rec = load_recommender(models_dir=tmp, interactions_path=inputs["interactions"], interactions_df=train_df)
+
+        k = params["k"]
+        for mode in params["modes"]:
+            per_user = evaluate_batched(rec, train_df, test_df, BatchEvalConfig(
+                k=k, mode=mode, candidate_pool=params["candidate_pool"], max_users=params["max_users"],
+                seed=params["seed"]))
+            per_user.to_csv(out / f"eval_{mode}.csv", index=False)
+            summary[mode] = {m: float(per_user[m].mean()) for m in per_user.columns if "@" in m}
+            summary[mode]["users"] = int(len(per_user))
+    (out / "eval_summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# DAG definition + fingerprints
+# ---------------------------------------------------------------------------
+
+_BASELINE_KEYS = ["topn", "min_ratings", "bayes_m", "leaderboard_depth", "trending_half_life_days", "trending_prior_m"]
+_CF_KEYS = ["cf_model", "cf_factors", "cf_epochs", "cf_lr_all", "cf_reg_all", "seed"]
+
+
+def build_stages(cfg: PipelineConfig) -> List[Stage]:
+    t = cfg.train
+    data = {"interactions": t.interactions_path}
+    stages = [
+        Stage("encode", stage_encode, params={}, files=data, outputs=["encoded.json"],
+              code=["encoded.py"], publish=False),
+        Stage("baseline", stage_baseline, params={k: getattr(t, k) for k in _BASELINE_KEYS},
+              files={**data, **({"movies": t.movies_path} if t.movies_path and Path(t.movies_path).exists() else {})},
+              deps=["encode"], outputs=["top_global.parquet", "trending.npz"],
+              code=["training.py", "leaderboards.py", "trending.py"]),
+    ]
+    if t.train_cf:
+        params = {k: getattr(t, k) for k in _CF_KEYS}
+        files = dict(data)
+        if t.cf_model == "implicit":
+            params.update(feedback_glob=t.feedback_glob, implicit_alpha=t.implicit_alpha)
+            for i, p in enumerate(sorted({p for pat in t.feedback_glob.split(",") if pat for p in glob.glob(pat)})):
+                files[f"feedback{i}"] = p
+        stages.append(Stage("cf", stage_cf, params=params, files=files, deps=["encode"],
+                            outputs=["cf_info.json", "cf_bundle"],
+                            code=["training.py", "factorization.py", "implicit.py", "model_bundle.py"]))
+    if t.neighbors_k:
+        from_factors = t.neighbors_source == "factors"
+        stages.append(Stage("neighbors", stage_neighbors, files=data,
+                            params={"source": t.neighbors_source, "k": t.neighbors_k},
+                            deps=["encode"] + (["cf"] if from_factors else []), outputs=["neighbors.npz"],
+                            code=["neighbors.py"]))
+    if cfg.eval_modes:
+        deps = ["encode", "baseline"] + (["cf"] if t.train_cf else [])
+        stages.append(Stage("evaluate", stage_evaluate, files=data, deps=deps,
+                            params={"modes": list(cfg.eval_modes), "k": cfg.k, "holdout": cfg.holdout,
+                                    "holdout_pct": cfg.holdout_pct, "max_users": cfg.max_users,
+                                    "candidate_pool": cfg.candidate_pool, "seed": t.seed},
+                            outputs=["eval_summary.json"], code=["evaluation.py", "batch_eval.py", "predictions.py"]))
+    names = {s.name for s in stages}
+    for st in stages:
+        missing = [d for d in st.deps if d not in names]
+        if missing:
+            hint = " (neighbors_source='factors' needs train_cf)" if "cf" in missing else ""
+            raise ValueError(f"stage {st.name!r} depends on {missing}, which this config does not build{hint}")
+    return stages
+
+
+class _HashMemo:
+    """sha256 per file, reused while (size, mtime_ns) is unchanged; persisted in the cache dir."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        try:
+            self.memo = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.memo = {}
+
+    def sha256(self, file: str) -> str:
+        p = Path(file).resolve()
+        st = p.stat()
+        hit = self.memo.get(str(p))
+        if hit and hit["size"] == st.st_size and hit["mtime_ns"] == st.st_mtime_ns:
+            return hit["sha256"]
+        sha = _file_sha256(p)
+        self.memo[str(p)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+        return sha
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_text(json.dumps(self.memo, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def fingerprint(stage: Stage, dep_fps: Dict[str, str], hashes: _HashMemo) -> str:
+    doc = {
+        "pipeline_version": PIPELINE_VERSION,
+        "stage": stage.name,
+        "params": stage.params,
+        "files": {k: hashes.sha256(v) for k, v in sorted(stage.files.items())},
+        "deps": {d: dep_fps[d] for d in sorted(stage.deps)},
+        "code": {m: hashes.sha256(str(_SRC / m)) for m in sorted(stage.code)},
+    }
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """Hard-link (copy across filesystems) every file under src into dst, skipping stage bookkeeping."""
+    for path in src.rglob("*"):
+        if path.is_dir() or path.name == "stage.json":
+            continue
+        target = dst / path.relative_to(src)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+
+
+def run_stage(stage: Stage, inputs: Dict[str, str], out_dir: str, fp: str) -> Dict:
+    """Run into a temp dir, check the declared outputs, then rename into the cache (all or nothing)."""
+    final = Path(out_dir)
+    tmp = final.with_name(final.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    t0 = time.perf_counter()
+    info = stage.fn(inputs, stage.params, str(tmp))
+    missing = [o for o in stage.outputs if not (tmp / o).exists()]
+    if missing:
+        raise RuntimeError(f"stage {stage.name} did not write {missing}")
+    meta = {"stage": stage.name, "fingerprint": fp, "params": stage.params, "inputs": inputs,
+            "seconds": round(time.perf_counter() - t0, 3), "info": info,
+            "created_at_utc": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}
+    (tmp / "stage.json").write_text(json.dumps(meta, indent=2, default=str), encoding="utf-8")
+    if final.exists():
+        shutil.rmtree(final)
+    os.replace(tmp, final)
+    return meta
+
+
+def _write_latest(models_dir: Path, run_dir: Path) -> None:
+    tmp = models_dir / f"LATEST.tmp{os.getpid()}"
+    tmp.write_text(str(run_dir), encoding="utf-8")
+    os.replace(tmp, models_dir / "LATEST")
+
+
+def assemble_run(stages: List[Stage], stage_dirs: Dict[str, Path], fps: Dict[str, str], cfg: PipelineConfig) -> Path:
+    """Link the published stage outputs into models/run_<ts>.tmp, rename it into place, then swap LATEST."""
+    models_dir = Path(cfg.train.out_dir)
+    run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    if (models_dir / f"run_{run_id}").exists():
+        run_id += f"_{os.getpid()}"
+    run_dir = models_dir / f"run_{run_id}"
+    staging = models_dir / f"run_{run_id}.tmp{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for st in stages:
+        if st.publish:
+            _link_tree(stage_dirs[st.name], staging)
+
+    cfg_dict = asdict(cfg.train)
+    cfg_dict["run_id"] = run_id
+    cfg_dict["utc_time"] = run_id
+    (staging / "config.json").write_text(json.dumps(cfg_dict, indent=2), encoding="utf-8")
+    (staging / "pipeline.json").write_text(json.dumps({
+        "run_fingerprint": _run_fingerprint(fps),
+        "stages": {name: {"fingerprint": fp, "cache_dir": str(stage_dirs[name])} for name, fp in fps.items()},
+        "config": asdict(cfg),
+    }, indent=2, default=str), encoding="utf-8")
+
+    os.replace(staging, run_dir)
+    _write_latest(models_dir, run_dir)
+    return run_dir
+
+
+def _run_fingerprint(fps: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(fps, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _latest_run_fingerprint(models_dir: Path) -> Optional[str]:
+    try:
+        run_dir = Path((models_dir / "LATEST").read_text(encoding="utf-8").strip())
+        return json.loads((run_dir / "pipeline.json").read_text(encoding="utf-8")).get("run_fingerprint")
+    except (OSError, ValueError):
+        return None
+
+
+def run_pipeline(cfg: PipelineConfig) -> Dict:
+    """
+    Topological run: a stage is fingerprinted once its deps are known, reused from the cache
+    if that fingerprint was built before, else submitted; independent stages run concurrently.
+    Returns {"run_dir", "stages": {name: {"fingerprint", "cached", "seconds"}}}.
+    """
+    stages = build_stages(cfg)
+    by_name = {s.name: s for s in stages}
+    cache = Path(cfg.cache_dir)
+    hashes = _HashMemo(cache / "file_hashes.json")
+
+    fps: Dict[str, str] = {}
+    stage_dirs: Dict[str, Path] = {}
+    report: Dict[str, Dict] = {}
+    running: Dict[Future, str] = {}
+    pending = [s.name for s in stages]
+
+    n_workers = cfg.workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=get_context("spawn")) if n_workers > 1 else None
+    try:
+        while pending or running:
+            ready = [n for n in pending if all(d in stage_dirs for d in by_name[n].deps)]
+            if not ready and not running:
+                raise RuntimeError(f"stages {pending} wait on dependencies that will never finish")
+            for name in ready:
+                st = by_name[name]
+                pending.remove(name)
+                fps[name] = fingerprint(st, fps, hashes)
+                out_dir = cache / name / fps[name][:16]
+                inputs = {**st.files, **{f"stage:{d}": str(stage_dirs[d]) for d in st.deps}}
+                if (out_dir / "stage.json").exists() and name not in cfg.force:
+                    stage_dirs[name] = out_dir
+                    report[name] = {"fingerprint": fps[name], "cached": True, "seconds": 0.0}
+                    print(f"[OK] {name}: cached ({fps[name][:12]})")
+                    continue
+                print(f"[INFO] {name}: running ({fps[name][:12]})")
+                if pool is None:
+                    meta = run_stage(st, inputs, str(out_dir), fps[name])
+                    stage_dirs[name] = out_dir
+                    report[name] = {"fingerprint": fps[name], "cached": False, "seconds": meta["seconds"]}
+                    print(f"[OK] {name}: done in {meta['seconds']:.1f}s")
+                else:
+                    running[pool.submit(run_stage, st, inputs, str(out_dir), fps[name])] = name
+            if not running:
+                # inline / cached stages may have unblocked the rest: next pass picks them up
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                meta = fut.result()
+                stage_dirs[name] = cache / name / fps[name][:16]
+                report[name] = {"fingerprint": fps[name], "cached": False, "seconds": meta["seconds"]}
+                print(f"[OK] {name}: done in {meta['seconds']:.1f}s")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        hashes.save()
+
+    models_dir = Path(cfg.train.out_dir)
+    if _latest_run_fingerprint(models_dir) == _run_fingerprint(fps) and not cfg.force:
+        run_dir = Path((models_dir / "LATEST").read_text(encoding="utf-8").strip())
+        print(f"[OK] LATEST already has these outputs: {run_dir}")
+    else:
+        run_dir = assemble_run(stages, stage_dirs, fps, cfg)
+        print(f"[OK] Run assembled: {run_dir} (LATEST updated)")
+    return {"run_dir": str(run_dir), "stages": report}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cached training pipeline: encode -> baseline / cf / neighbors -> evaluate -> run dir.")
+    parser.add_argument("--interactions", default="data/interactions.parquet")
+    parser.add_argument("--movies", default="data/movies.parquet")
+    parser.add_argument("--out_dir", default="models")
+    parser.add_argument("--cache_dir", default=None, help="Default: <out_dir>/.pipeline_cache")
+    parser.add_argument("--topn", type=int, default=200)
+    parser.add_argument("--min_ratings", type=int, default=20)
+    parser.add_argument("--bayes_m", type=int, default=50)
+    parser.add_argument("--leaderboard_depth", type=int, default=TrainConfig.leaderboard_depth)
+    parser.add_argument("--trending_half_life_days", type=float, default=TrainConfig.trending_half_life_days)
+    parser.add_argument("--trending_prior_m", type=float, default=TrainConfig.trending_prior_m)
+    parser.add_argument("--neighbors_k", type=int, default=TrainConfig.neighbors_k)
+    parser.add_argument("--neighbors_source", default=TrainConfig.neighbors_source, choices=["cooccurrence", "factors"])
+    parser.add_argument("--train_cf", action="store_true")
+    parser.add_argument("--cf_model", default="svd", choices=["svd", "als", "sgd", "implicit"])
+    parser.add_argument("--cf_factors", type=int, default=100)
+    parser.add_argument("--cf_epochs", type=int, default=20)
+    parser.add_argument("--cf_lr_all", type=float, default=0.005)
+    parser.add_argument("--cf_reg_all", type=float, default=0.02)
+    parser.add_argument("--feedback", default=TrainConfig.feedback_glob)
+    parser.add_argument("--implicit_alpha", type=float, default=10.0)
+    parser.add_argument("--eval_modes", default="baseline", help="Comma-separated modes to evaluate ('' = skip)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--holdout", default="last1")
+    parser.add_argument("--holdout_pct", type=float, default=0.2)
+    parser.add_argument("--max_users", type=int, default=0, help="0 = every test user")
+    parser.add_argument("--candidate_pool", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=0, help="Parallel stages (0 = cpu count, 1 = in-process)")
+    parser.add_argument("--force", default="", help="Comma-separated stages to rerun despite a cache hit")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    train = TrainConfig(
+        interactions_path=args.interactions,
+        movies_path=args.movies,
+        out_dir=args.out_dir,
+        topn=args.topn,
+        min_ratings=args.min_ratings,
+        bayes_m=args.bayes_m,
+        leaderboard_depth=args.leaderboard_depth,
+        trending_half_life_days=args.trending_half_life_days,
+        trending_prior_m=args.trending_prior_m,
+        neighbors_k=args.neighbors_k,
+        neighbors_source=args.neighbors_source,
+        seed=args.seed,
+        train_cf=args.train_cf,
+        cf_model=args.cf_model,
+        cf_factors=args.cf_factors,
+        cf_epochs=args.cf_epochs,
+        cf_lr_all=args.cf_lr_all,
+        cf_reg_all=args.cf_reg_all,
+        feedback_glob=args.feedback,
+        implicit_alpha=args.implicit_alpha,
+    )
+    cfg = PipelineConfig(
+        train=train,
+        eval_modes=[m for m in args.eval_modes.split(",") if m],
+        k=args.k,
+        holdout=args.holdout,
+        holdout_pct=args.holdout_pct,
+        max_users=args.max_users or None,
+        candidate_pool=args.candidate_pool,
+        cache_dir=args.cache_dir or str(Path(args.out_dir) / ".pipeline_cache"),
+        workers=args.workers,
+        force=[s for s in args.force.split(",") if s],
+    )
+
+    t0 = time.perf_counter()
+    result = run_pipeline(cfg)
+    ran = [n for n, r in result["stages"].items() if not r["cached"]]
+    print(f"[OK] Pipeline finished in {time.perf_counter() - t0:.1f}s "
+          f"(ran: {', '.join(ran) or 'nothing'}; cached: {len(result['stages']) - len(ran)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,59 @@
 from __future__ import annotations
 
+import json
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
 from src.api.filters import apply_filters
+from src.api.metrics import stage
+from src.api.log import get_logger
+from src.encoded import EncodedInteractions, load_encoded
+from src.leaderboards import Leaderboards
+from src.neighbors import ItemNeighbors
+from src.trending import FeedbackTail, TrendingState
 
 import numpy as np
 import pandas as pd
 
+logger = get_logger(__name__)
+
+# CF model artifacts, in lookup order (one per run directory)
+CF_MODEL_FILES = ("cf_svd.joblib", "cf_mf.joblib")
+
+
+def _cf_model_files(run_dir: Path) -> Tuple[str, ...]:
+    """CF_MODEL_FILES, with the file named by cf_info.json (the most recently trained one) first."""
+    info_path = run_dir / "cf_info.json"
+    try:
+        preferred = json.loads(info_path.read_text(encoding="utf-8")).get("model_file")
+    except (OSError, ValueError):
+        preferred = None
+    if preferred in CF_MODEL_FILES:
+        return (preferred,) + tuple(f for f in CF_MODEL_FILES if f != preferred)
+    return CF_MODEL_FILES
+
+
+def _load_cf_bundle(run_dir: Path):
+    """Memory-mapped FactorModel from run_dir/cf_bundle, or None (missing, stale or unreadable)."""
+    from src.model_bundle import BUNDLE_DIR, load_bundle, read_manifest
+
+    bundle_dir = run_dir / BUNDLE_DIR
+    if not (bundle_dir / "manifest.json").exists():
+        return None
+    try:
+        # the bundle must be the export of the model cf_info.json names, not of an older one
+        info_path = run_dir / "cf_info.json"
+        expected = json.loads(info_path.read_text(encoding="utf-8")).get("model_file") if info_path.exists() else None
+        exported = read_manifest(bundle_dir).get("model_file")
+        if expected and exported and exported != expected:
+            logger.warning("cf_bundle_stale", extra={"bundle_of": exported, "model_file": expected})
+            return None
+        return load_bundle(bundle_dir)
+    except Exception:
+        logger.warning("cf_bundle_load_failed", extra={"path": str(bundle_dir)}, exc_info=True)
+        return None
+
 
 @dataclass
 class ModelPaths:
@@ -31,8 +77,12 @@ class ModelPaths:
 class Recommender:
     """
     Serving-time recommender.
-    - Baseline: Bayesian-smoothed popularity ranking (top_global.parquet)
-    - CF: Surprise SVD model (cf_svd.joblib)
+    - Baseline: Bayesian-smoothed popularity ranking (top_global.parquet); genre/year-filtered
+      requests start from the matching leaderboard (leaderboards.npz over popularity_ranked.parquet)
+    - Trending: time-decayed Bayesian ranking (trending.npz) + feedback.jsonl appended since startup
+    - CF: Surprise SVD model (cf_svd.joblib) or built-in ALS/SGD FactorModel (cf_mf.joblib);
+      cf_format="auto" prefers the memory-mapped export of either (cf_bundle/)
+    - Similar: precomputed top-K item neighbors per movie (neighbors.npz), for "more like this"
     """
 
     def __init__(
@@ -40,18 +90,24 @@ class Recommender:
         models_dir: str = "models",
         interactions_path: str = "data/interactions.parquet",
         interactions_df: Optional[pd.DataFrame] = None, 
+        cf_format: str = "auto",
     ) -> None:
+        if cf_format not in ("auto", "bundle", "joblib"):
+            raise ValueError("cf_format must be 'auto', 'bundle' or 'joblib'")
         self.paths = ModelPaths(Path(models_dir))
 
         # 1. Always load data/movies_enriched.parquet first (Source of Truth for UI)
         movies_enriched_path = Path("data/movies_enriched.parquet")
         self.movies = None
         if movies_enriched_path.exists():
-            print(f"[INFO] Loading enriched movies from {movies_enriched_path}")
+            logger.info("loading_enriched_movies", extra={"path": str(movies_enriched_path)})
             self.movies = pd.read_parquet(movies_enriched_path)
         
         # 2. Try to load attributes from training run (Models)
         self.top_global = None
+        self.leaderboards: Optional[Leaderboards] = None
+        self.trending: Optional[TrendingState] = None
+        self.neighbors: Optional[ItemNeighbors] = None
         self.cf_model = None
         self.cf_enabled = False
         
@@ -62,16 +118,42 @@ class Recommender:
             top_path = self.run_dir / "top_global.parquet"
             if top_path.exists():
                 self.top_global = pd.read_parquet(top_path)
+
+            # Per-genre / per-decade leaderboards (starting point for filtered baseline requests)
+            try:
+                self.leaderboards = Leaderboards.load(self.run_dir)
+            except Exception:
+                logger.warning("leaderboards_load_failed", extra={"run_dir": str(self.run_dir)}, exc_info=True)
             
-            # Load CF
-            cf_path = self.run_dir / "cf_svd.joblib"
-            if cf_path.exists():
-                try:
-                    import joblib
-                    self.cf_model = joblib.load(cf_path)
-                    self.cf_enabled = True
-                except Exception:
-                    print("[WARN] Failed to load CF model, skipping.")
+            # Time-decayed trending state (mode="trending"); live feedback is folded in per request
+            try:
+                self.trending = TrendingState.load(self.run_dir)
+            except Exception:
+                logger.warning("trending_load_failed", extra={"run_dir": str(self.run_dir)}, exc_info=True)
+
+            # Item-item neighbors (/similar)
+            try:
+                self.neighbors = ItemNeighbors.load(self.run_dir)
+            except Exception:
+                logger.warning("neighbors_load_failed", extra={"run_dir": str(self.run_dir)}, exc_info=True)
+
+            # Load CF: the memory-mapped bundle if present, else the joblib pickle
+            # (Surprise SVD, or the built-in ALS/SGD FactorModel)
+            if cf_format in ("auto", "bundle"):
+                self.cf_model = _load_cf_bundle(self.run_dir)
+                self.cf_enabled = self.cf_model is not None
+            if self.cf_model is None and cf_format in ("auto", "joblib"):
+                for cf_name in _cf_model_files(self.run_dir):
+                    cf_path = self.run_dir / cf_name
+                    if not cf_path.exists():
+                        continue
+                    try:
+                        import joblib
+                        self.cf_model = joblib.load(cf_path)
+                        self.cf_enabled = True
+                    except Exception:
+                        logger.warning("cf_model_load_failed", extra={"path": str(cf_path)}, exc_info=True)
+                    break
 
             # Fallback for movies if not enriched
             if self.movies is None:
@@ -80,17 +162,22 @@ class Recommender:
                     self.movies = pd.read_parquet(movies_path)
 
         except Exception as e:
-            print(f"[WARN] Model artifacts not found or invalid ({e}). Running in DATA-ONLY mode.")
+            logger.warning("model_artifacts_unavailable_data_only_mode", extra={"error": str(e)})
 
         self.interactions_path = Path(interactions_path)
         self._interactions_df = interactions_df
-        self._user_seen: Optional[Dict[int, set]] = None
+        self._user_seen: Optional[EncodedInteractions] = None
+        self._feedback_tail = FeedbackTail(self.interactions_path.parent / "feedback.jsonl")
+        self._trending_lock = threading.Lock()
+        self._trending_table: Optional[pd.DataFrame] = None
+        self._movie_stats: Optional[pd.DataFrame] = None
+        self._movies_by_id: Optional[pd.DataFrame] = None
 
         # 3. Critical Fallback: If top_global is missing, create it from movies
         if self.top_global is None:
             if self.movies is not None:
                 # Create a dummy popularity table from available movies
-                print("[INFO] Creating fallback baseline from movies_enriched")
+                logger.info("fallback_baseline_from_movies")
                 self.top_global = self.movies.copy()
                 # Ensure compatibility columns
                 for col in ["bayes_score", "n_ratings", "avg_rating"]:
@@ -103,33 +190,49 @@ class Recommender:
 
     def _load_user_seen(self) -> None:
         """
-        Build user -> seen movieIds.
+        Per-user history as encoded interactions (CSR-style, sorted by user).
         IMPORTANT:
-        - In production: read from full interactions parquet
+        - In production: the encoded artifact of the full interactions parquet (memory-mapped)
         - In evaluation: interactions_df should be TRAIN ONLY (to avoid leakage)
         """
         if self._user_seen is not None:
             return
 
         if self._interactions_df is not None:
-            df = self._interactions_df[["userId", "movieId"]].copy()
-        else:
-            if not self.interactions_path.exists():
-                raise FileNotFoundError(f"Missing interactions parquet: {self.interactions_path}")
-            df = pd.read_parquet(self.interactions_path, columns=["userId", "movieId"])
+            self._user_seen = EncodedInteractions.from_frame(self._interactions_df)
+            return
+
+        if not self.interactions_path.exists():
+            raise FileNotFoundError(f"Missing interactions parquet: {self.interactions_path}")
+        try:
+            self._user_seen = load_encoded(str(self.interactions_path))
+        except OSError:
+            # read-only data dir: encode in memory instead of persisting the artifact
+            logger.warning("encoded_interactions_unavailable", exc_info=True)
+            self._user_seen = EncodedInteractions.from_frame(pd.read_parquet(self.interactions_path))
+
+    def seen_items(self, user_id: int) -> np.ndarray:
+        """Raw movieIds the user has already interacted with."""
+        self._load_user_seen()
+        return self._user_seen.user_items(user_id)
 
-        df = df.dropna(subset=["userId", "movieId"]).copy()
-        df["userId"] = df["userId"].astype(int)
-        df["movieId"] = df["movieId"].astype(int)
+    def seen_count(self, user_id: int) -> int:
+        self._load_user_seen()
+        return self._user_seen.user_count(user_id)
 
-        user_seen: Dict[int, set] = {}
-        for uid, grp in df.groupby("userId")["movieId"]:
-            user_seen[int(uid)] = set(map(int, grp.values))
-        self._user_seen = user_seen
+    def movies_by_id(self) -> Optional[pd.DataFrame]:
+        """Movies metadata indexed by movieId (built once)."""
+        if self._movies_by_id is None and self.movies is not None and "movieId" in self.movies.columns:
+            self._movies_by_id = self.movies.drop_duplicates("movieId").set_index("movieId")
+        return self._movies_by_id
 
     def _enrich(self, recs: pd.DataFrame) -> pd.DataFrame:
+        with stage("enrichment"):
+            return self._enrich_impl(recs)
+
+    def _enrich_impl(self, recs: pd.DataFrame) -> pd.DataFrame:
         if self.movies is None:
-            print("[WARN] _enrich: movies_enriched.parquet not loaded")
+            logger.warning("enrich_movies_not_loaded")
             return recs
         
         if recs.empty:
@@ -137,11 +240,11 @@ class Recommender:
         
         # Verify movieId column exists
         if "movieId" not in recs.columns:
-            print("[ERROR] _enrich: recs missing 'movieId' column")
+            logger.error("enrich_recs_missing_movieId")
             return recs
         
         if "movieId" not in self.movies.columns:
-            print("[ERROR] _enrich: movies missing 'movieId' column")
+            logger.error("enrich_movies_missing_movieId")
             return recs
         
         # Identify columns to add (avoid duplicates/_x/_y suffixes)
@@ -161,46 +264,144 @@ class Recommender:
         
         # Validate merge success
         if len(merged) != len(recs):
-            print(f"[WARN] _enrich: merge changed row count {len(recs)} -> {len(merged)}")
+            logger.warning("enrich_row_count_changed", extra={"before": len(recs), "after": len(merged)})
         
         # Check how many movies were successfully enriched
         enriched_count = merged["title"].notna().sum() if "title" in merged.columns else 0
         poster_count = merged["poster"].notna().sum() if "poster" in merged.columns else 0
         if enriched_count < len(merged):
-            print(f"[WARN] _enrich: only {enriched_count}/{len(merged)} movies have title, {poster_count}/{len(merged)} have poster")
+            logger.warning("enrich_incomplete_metadata", extra={
+                "rows": len(merged), "with_title": int(enriched_count), "with_poster": int(poster_count),
+            })
         
         return merged
 
     def recommend_baseline(self, user_id: Optional[int], k: int = 10, constraints: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
-        df = self.top_global.copy()
+        board = None
+        if constraints and self.leaderboards is not None:
+            # start from the most selective matching leaderboard instead of the global Top-N
+            with stage("candidate_filtering"):
+                board = self.leaderboards.candidates(
+                    include_genres=constraints.get("genres_in"),
+                    min_year=constraints.get("min_year"),
+                    max_year=constraints.get("max_year"),
+                )
+        if board is None:
+            return self._rank_baseline(self.top_global, user_id, k, constraints)
+
+        positions, complete = board
+        out = self._rank_baseline(self.leaderboards.ranked.iloc[positions], user_id, k, constraints)
+        if len(out) < int(k) and not complete:
+            # a truncated leaderboard ran dry under the remaining filters: scan the full ranked table
+            out = self._rank_baseline(self.leaderboards.ranked, user_id, k, constraints)
+        return out
+
+    def _rank_baseline(self, candidates: pd.DataFrame, user_id: Optional[int], k: int, constraints: Optional[Dict[str, Any]]) -> pd.DataFrame:
+        df = candidates.copy()
 
         if user_id is not None:
-            self._load_user_seen()
-            seen = self._user_seen.get(int(user_id), set()) if self._user_seen else set()
-            if seen:
-                df = df[~df["movieId"].isin(seen)]
+            seen = self.seen_items(user_id)
+            if len(seen):
+                with stage("candidate_filtering"):
+                    df = df[~df["movieId"].isin(seen)]
 
         # ENRICH EARLY: Ensure genres, year, etc are available for filtering
         df = self._enrich(df)
 
         # Apply constraints if present
         if constraints:
-            df = apply_filters(
-                df,
-                include_genres=constraints.get("genres_in"),
-                exclude_genres=constraints.get("genres_out"),
-                min_n_ratings=constraints.get("min_n_ratings"),
-                min_avg_rating=constraints.get("min_avg_rating"),
-                min_year=constraints.get("min_year"),
-                max_year=constraints.get("max_year"),
-                exclude_movieIds=constraints.get("exclude_movieIds")
-            )
+            with stage("candidate_filtering"):
+                df = apply_filters(
+                    df,
+                    include_genres=constraints.get("genres_in"),
+                    exclude_genres=constraints.get("genres_out"),
+                    min_n_ratings=constraints.get("min_n_ratings"),
+                    min_avg_rating=constraints.get("min_avg_rating"),
+                    min_year=constraints.get("min_year"),
+                    max_year=constraints.get("max_year"),
+                    exclude_movieIds=constraints.get("exclude_movieIds")
+                )
 
         df = df.head(int(k)).copy()
 
         # Keep all relevant columns
         cols = [c for c in [
-            "movieId", "bayes_score", "n_ratings", "avg_rating", "title", "genres",
+            "movieId", "trend_score", "trend_count", "bayes_score", "n_ratings", "avg_rating", "title", "genres",
+            "poster", "backdrop", "description", "year", "rating", "duration"
+        ] if c in df.columns]
+        return df[cols] if cols else df
+
+    def refresh_trending(self) -> pd.DataFrame:
+        """Fold feedback appended since the last call into the trending state; returns the ranked table."""
+        with self._trending_lock:
+            events = self._feedback_tail.read_new()
+            if len(events):
+                self.trending.update(events["movieId"].to_numpy(), events["rating"].to_numpy(),
+                                     events["timestamp"].to_numpy())
+                self._trending_table = None
+            if self._trending_table is None:
+                table = self.trending.ranked()
+                # all-time stats so min_n_ratings / min_avg_rating constraints keep working
+                stats = self.leaderboards.ranked if self.leaderboards is not None else self.top_global
+                keep = [c for c in ["movieId", "bayes_score", "n_ratings", "avg_rating"] if c in stats.columns]
+                self._trending_table = table.merge(stats[keep], on="movieId", how="left")
+            return self._trending_table
+
+    def recommend_trending(self, user_id: Optional[int], k: int = 10, constraints: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        if self.trending is None:
+            return self.recommend_baseline(user_id=user_id, k=k, constraints=constraints)
+        with stage("trending_update"):
+            table = self.refresh_trending()
+        return self._rank_baseline(table, user_id, k, constraints)
+
+    def recommend_similar(self, movie_id: int, k: int = 10, user_id: Optional[int] = None, constraints: Optional[Dict[str, Any]] = None) -> Optional[pd.DataFrame]:
+        """
+        Up to k precomputed neighbors of movie_id (best first), filtered like the other modes.
+        Only the movie's K stored neighbors are looked at, so strict filters can return fewer than k.
+        None when there is no neighbors artifact or no list for this movie.
+        """
+        if self.neighbors is None:
+            return None
+        hit = self.neighbors.similar(int(movie_id))
+        if hit is None:
+            return None
+        ids, scores = hit
+        df = pd.DataFrame({"movieId": ids, "similarity": scores})
+
+        if self._movie_stats is None:
+            # all-time stats so min_n_ratings / min_avg_rating constraints keep working
+            stats = self.leaderboards.ranked if self.leaderboards is not None else self.top_global
+            keep = [c for c in ["bayes_score", "n_ratings", "avg_rating"] if c in stats.columns]
+            self._movie_stats = stats.drop_duplicates("movieId").set_index("movieId")[keep]
+        df = df.join(self._movie_stats, on="movieId")
+
+        if user_id is not None:
+            seen = self.seen_items(user_id)
+            if len(seen):
+                with stage("candidate_filtering"):
+                    df = df[~df["movieId"].isin(seen)]
+
+        movies = self.movies_by_id()
+        if movies is not None:
+            # K index lookups instead of a merge against the whole movies table
+            with stage("enrichment"):
+                df = df.join(movies[[c for c in movies.columns if c not in df.columns]], on="movieId")
+        if constraints:
+            with stage("candidate_filtering"):
+                df = apply_filters(
+                    df,
+                    include_genres=constraints.get("genres_in"),
+                    exclude_genres=constraints.get("genres_out"),
+                    min_n_ratings=constraints.get("min_n_ratings"),
+                    min_avg_rating=constraints.get("min_avg_rating"),
+                    min_year=constraints.get("min_year"),
+                    max_year=constraints.get("max_year"),
+                    exclude_movieIds=constraints.get("exclude_movieIds")
+                )
+
+        df = df.head(int(k)).copy()
+        cols = [c for c in [
+            "movieId", "similarity", "bayes_score", "n_ratings", "avg_rating", "title", "genres",
             "poster", "backdrop", "description", "year", "rating", "duration"
         ] if c in df.columns]
         return df[cols] if cols else df
@@ -210,43 +411,50 @@ class Recommender:
         if not self.cf_enabled or self.cf_model is None:
             return self.recommend_baseline(user_id=user_id, k=k, constraints=constraints)
 
-        self._load_user_seen()
-        seen = self._user_seen.get(int(user_id), set()) if self._user_seen else set()
+        seen = self.seen_items(user_id)
 
         cand = self.top_global.head(int(candidate_pool)).copy()
-        if seen:
-            cand = cand[~cand["movieId"].isin(seen)]
+        if len(seen):
+            with stage("candidate_filtering"):
+                cand = cand[~cand["movieId"].isin(seen)]
 
         # ENRICH EARLY: Ensure genres, year, etc are available for filtering
         cand = self._enrich(cand)
 
         # Apply constraints to the candidate pool
         if constraints:
-            cand = apply_filters(
-                cand,
-                include_genres=constraints.get("genres_in"),
-                exclude_genres=constraints.get("genres_out"),
-                min_n_ratings=constraints.get("min_n_ratings"),
-                min_avg_rating=constraints.get("min_avg_rating"),
-                min_year=constraints.get("min_year"),
-                max_year=constraints.get("max_year"),
-                exclude_movieIds=constraints.get("exclude_movieIds")
-            )
+            with stage("candidate_filtering"):
+                cand = apply_filters(
+                    cand,
+                    include_genres=constraints.get("genres_in"),
+                    exclude_genres=constraints.get("genres_out"),
+                    min_n_ratings=constraints.get("min_n_ratings"),
+                    min_avg_rating=constraints.get("min_avg_rating"),
+                    min_year=constraints.get("min_year"),
+                    max_year=constraints.get("max_year"),
+                    exclude_movieIds=constraints.get("exclude_movieIds")
+                )
 
         if cand.empty:
             return pd.DataFrame()
 
         uid = int(user_id)
         scores = []
-        for mid in cand["movieId"].astype(int).tolist():
-            try:
-                est = float(self.cf_model.predict(uid, int(mid)).est)
-            except Exception:
-                est = np.nan
-            scores.append(est)
+        with stage("cf_scoring"):
+            if hasattr(self.cf_model, "score_items"):
+                # FactorModel: one mat-vec for the whole pool
+                scores = self.cf_model.score_items(uid, cand["movieId"].astype(int).to_numpy())
+            else:
+                for mid in cand["movieId"].astype(int).tolist():
+                    try:
+                        est = float(self.cf_model.predict(uid, int(mid)).est)
+                    except Exception:
+                        est = np.nan
+                    scores.append(est)
 
         cand = cand.assign(cf_score=scores).dropna(subset=["cf_score"])
-        cand = cand.sort_values("cf_score", ascending=False).head(int(k)).copy()
+        # stable: equal (e.g. clipped) scores keep pool order, as batch_eval.top_k ranks them
+        cand = cand.sort_values("cf_score", ascending=False, kind="stable").head(int(k)).copy()
         cand = self._enrich(cand)
 
         # Keep all relevant columns
@@ -261,6 +469,8 @@ class Recommender:
         mode = (mode or "auto").lower()
         if mode == "baseline":
             return self.recommend_baseline(user_id=user_id, k=k, constraints=constraints)
+        if mode == "trending":
+            return self.recommend_trending(user_id=user_id, k=k, constraints=constraints)
         if mode == "cf":
             # CF requires a valid user_id, use -1 as fallback if None
             uid = user_id if user_id is not None else -1
@@ -275,8 +485,14 @@ def load_recommender(
     models_dir: str = "models",
     interactions_path: str = "data/interactions.parquet",
     interactions_df: Optional[pd.DataFrame] = None,
+    cf_format: str = "auto",
 ) -> Recommender:
-    return Recommender(models_dir=models_dir, interactions_path=interactions_path, interactions_df=interactions_df)
+    return Recommender(
+        models_dir=models_dir,
+        interactions_path=interactions_path,
+        interactions_df=interactions_df,
+        cf_format=cf_format,
+    )
 
 
 if __name__ == "__main__":
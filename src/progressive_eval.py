@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from src.batch_eval import BatchEvalConfig, block_top_hits, eval_users, prepare_arrays, ranking_metrics
+
+
+@dataclass
+class ProgressiveEvalConfig:
+    """
+    Users are evaluated in randomized batches until the confidence interval on the primary
+    metric (one model) or on the per-user difference (two models) is narrower than target_width.
+    """
+    k: int = 10
+    metric: str = "recall"        # recall | ndcg | hit | map | mrr
+    target_width: float = 0.02    # stop once the full interval width (high - low) is below this
+    ci: float = 0.95
+    batch_users: int = 500
+    min_users: int = 500          # never stop earlier (normal approximation + first-look noise)
+    max_users: Optional[int] = None   # cap on the randomized user order (None / 0 = every test user)
+    candidate_pool: int = 2000
+    block_users: int = 2048
+    seed: int = 42
+
+
+def mean_ci(values: np.ndarray, ci: float = 0.95) -> Tuple[float, float]:
+    """(mean, full interval width) of the mean under the normal approximation (NaNs dropped)."""
+    v = np.asarray(values, dtype=np.float64)
+    v = v[np.isfinite(v)]
+    if len(v) < 2:
+        return (float(v.mean()) if len(v) else np.nan), np.inf
+    return float(v.mean()), float(2 * norm.ppf((1 + ci) / 2) * v.std(ddof=1) / np.sqrt(len(v)))
+
+
+def _rows_by_batch(df: pd.DataFrame, order: np.ndarray, batch_users: int, n_batches: int) -> Tuple[pd.DataFrame, np.ndarray]:
+    """df rows grouped by the batch of their user in `order` (rows of other users dropped) + batch offsets."""
+    pos = pd.Index(order).get_indexer(df["userId"].astype(np.int64).to_numpy())
+    batch = np.where(pos >= 0, pos // batch_users, -1)
+    rows = np.argsort(batch, kind="stable")
+    at = np.searchsorted(batch[rows], np.arange(n_batches + 1))
+    return df.iloc[rows], at
+
+
+def progressive_evaluate(
+    arms: Dict[str, Tuple[object, str]],
+    train_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    cfg: ProgressiveEvalConfig,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    arms: {name: (recommender, mode)}, one model or two compared on the same users.
+    - every arm sees the same seeded random user order; after each batch the running mean and
+      interval of <metric>@k (and, for two arms, of the paired difference first - second) are updated
+    - stops after the first batch (past min_users) whose interval is narrower than target_width
+    - arrays (seen / relevance CSR, user factors) are prepared per batch, so stopping early
+      skips their cost too; only the split of the rows by batch is done up front
+    - returns (per-user values of the evaluated users, one trace row per batch, run info:
+      users evaluated / available, stop reason, wall time, and the time saved against the
+      estimate for every user: setup + observed per-user batch time x all users)
+    The intervals are not adjusted for the repeated looks; min_users keeps the noisy early ones out.
+    """
+    if not 1 <= len(arms) <= 2:
+        raise ValueError("progressive evaluation takes one model or two to compare")
+    t0 = time.perf_counter()
+    order = np.random.default_rng(cfg.seed).permutation(eval_users(test_df, None, cfg.seed))
+    if cfg.max_users:
+        order = order[:cfg.max_users]
+    n_batches = -(-len(order) // cfg.batch_users)
+    train_b, train_at = _rows_by_batch(train_df, order, cfg.batch_users, n_batches)
+    test_b, test_at = _rows_by_batch(test_df, order, cfg.batch_users, n_batches)
+    base = BatchEvalConfig(k=cfg.k, candidate_pool=cfg.candidate_pool, block_users=cfg.block_users, seed=cfg.seed)
+    setup_s = time.perf_counter() - t0
+
+    col = f"{cfg.metric}@{cfg.k}"
+    names = list(arms)
+    values: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+    n_relevant: List[np.ndarray] = []
+    trace = []
+    n, reason, width = 0, "exhausted", np.nan
+    t0 = time.perf_counter()
+    for j in range(n_batches):
+        hi = min(n + cfg.batch_users, len(order))
+        tr = train_b.iloc[train_at[j]:train_at[j + 1]]
+        te = test_b.iloc[test_at[j]:test_at[j + 1]]
+        for name, (rec, mode) in arms.items():
+            a = prepare_arrays(rec, tr, te, replace(base, mode=mode), users=order[n:hi])
+            for lo in range(0, hi - n, cfg.block_users):
+                end = min(lo + cfg.block_users, hi - n)
+                _, hits = block_top_hits(a, lo, end, cfg.k)
+                values[name].append(ranking_metrics(hits, a["n_relevant"][lo:end], cfg.k)[col])
+        n_relevant.append(a["n_relevant"])
+        n = hi
+
+        row = {"users": n}
+        for name in names:
+            row[f"{name}_mean"], row[f"{name}_width"] = mean_ci(np.concatenate(values[name]), cfg.ci)
+        if len(names) == 2:
+            row["diff_mean"], row["diff_width"] = mean_ci(np.concatenate(values[names[0]]) - np.concatenate(values[names[1]]), cfg.ci)
+        row["elapsed_s"] = round(setup_s + time.perf_counter() - t0, 4)
+        trace.append(row)
+
+        width = row["diff_width" if len(names) == 2 else f"{names[0]}_width"]
+        print(f"[INFO] {n:,}/{len(order):,} users: "
+              + ", ".join(f"{name} {col}={row[f'{name}_mean']:.4f}+/-{row[f'{name}_width'] / 2:.4f}" for name in names)
+              + (f", diff={row['diff_mean']:+.4f}+/-{row['diff_width'] / 2:.4f}" if len(names) == 2 else ""))
+        if n >= cfg.min_users and width < cfg.target_width:
+            reason = "target_width"
+            break
+    batches_s = time.perf_counter() - t0
+
+    per_user = pd.DataFrame({"userId": order[:n].astype(int),
+                             "n_relevant": np.concatenate(n_relevant) if n_relevant else np.empty(0, dtype=np.int64)})
+    for name in names:
+        per_user[f"{name}_{col}"] = np.concatenate(values[name]) if values[name] else np.empty(0)
+    wall_s = setup_s + batches_s
+    full_s = setup_s + batches_s / max(n, 1) * len(order)
+    info = {
+        "metric": col,
+        "users": n,
+        "total_users": int(len(order)),
+        "stopped": reason,
+        "width": float(width),
+        "target_width": cfg.target_width,
+        "setup_s": round(setup_s, 3),
+        "wall_s": round(wall_s, 3),
+        "est_full_s": round(full_s, 3),
+        "saved_s": round(full_s - wall_s, 3),
+    }
+    return per_user, pd.DataFrame(trace), info
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Worker-side views of the parent's arrays, filled by attach() (one process pool per worker process)
+SHARED: Dict[str, np.ndarray] = {}
+_HANDLES: List[shared_memory.SharedMemory] = []
+
+ShmSpecs = Dict[str, Tuple[str, str, Tuple[int, ...]]]
+
+
+def share(arrays: Dict[str, np.ndarray]) -> Tuple[ShmSpecs, List[shared_memory.SharedMemory]]:
+    """Copy arrays into named shared-memory blocks; returns (specs for workers, handles to release)."""
+    specs, handles = {}, []
+    for key, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        specs[key] = (shm.name, arr.dtype.str, arr.shape)
+        handles.append(shm)
+    return specs, handles
+
+
+def attach(specs: ShmSpecs) -> None:
+    """Worker initializer: map the shared blocks into SHARED as read-only numpy views (no copy)."""
+    for key, (name, dtype, shape) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        SHARED[key] = view
+        _HANDLES.append(shm)
+
+
+def release(handles: List[shared_memory.SharedMemory]) -> None:
+    """Parent side, once the pool is closed: free the blocks created by share()."""
+    for shm in handles:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.factorization import FactorModel, sgd_epoch
+
+COLUMNS = ["userId", "movieId", "rating"]
+
+# Bytes per buffered rating while training: int32 user + int32 item + float32 rating
+# in the window, plus the int64 shuffle permutation sgd_epoch draws over it
+_WINDOW_ROW_BYTES = 20
+# Parquet reader working set (page/dictionary decode buffers), measured roughly flat in batch size
+_READER_BYTES = 12 << 20
+# One decoded record batch (int64, int64, double) + the numpy views/filters taken from it, per open row group
+_DECODE_ROW_BYTES = 48
+# pd.Index lookup table per known id (values + hash table)
+_ID_BYTES = 40
+
+
+@dataclass
+class StreamConfig:
+    memory_budget_mb: int = 256
+    batch_rows: int = 65_536     # parquet record batch size
+    mix_groups: int = 8          # row groups read round-robin into one shuffle window
+    n_factors: int = 100
+    n_epochs: int = 20
+    lr: float = 0.005
+    reg: float = 0.02
+    init_std: float = 0.1
+    batch_size: int = 4096       # SGD mini-batch
+    seed: int = 42
+
+
+class IncrementalIdMap:
+    """Raw id -> dense index, assigned in first-seen order as batches stream by."""
+
+    def __init__(self) -> None:
+        self.ids = np.empty(0, dtype=np.int64)
+        self._index = pd.Index(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def update(self, raw: np.ndarray) -> np.ndarray:
+        idx = self._index.get_indexer(raw)
+        unseen = idx < 0
+        if unseen.any():
+            self.ids = np.concatenate([self.ids, pd.unique(raw[unseen]).astype(np.int64)])
+            self._index = pd.Index(self.ids)
+            idx = self._index.get_indexer(raw)
+        return idx
+
+    def encode(self, raw: np.ndarray) -> np.ndarray:
+        return self._index.get_indexer(raw)
+
+
+def _valid_batches(pf: pq.ParquetFile, batch_rows: int, row_groups: Optional[List[int]] = None) -> Iterator[pa.RecordBatch]:
+    for batch in pf.iter_batches(batch_size=batch_rows, row_groups=row_groups, columns=COLUMNS):
+        valid = pc.and_(pc.and_(pc.is_valid(batch.column("userId")), pc.is_valid(batch.column("movieId"))),
+                        pc.is_valid(batch.column("rating")))
+        if not pc.all(valid).as_py():
+            batch = batch.filter(valid)
+        if batch.num_rows:
+            yield batch
+
+
+def _columns(batch: pa.RecordBatch) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        batch.column("userId").to_numpy().astype(np.int64, copy=False),
+        batch.column("movieId").to_numpy().astype(np.int64, copy=False),
+        batch.column("rating").to_numpy().astype(np.float32),
+    )
+
+
+def scan_ids(path: str, batch_rows: int = 65_536) -> Tuple[IncrementalIdMap, IncrementalIdMap, Dict]:
+    """One streaming pass: user/item id maps plus rating count, mean and range."""
+    pf = pq.ParquetFile(path)
+    users, items = IncrementalIdMap(), IncrementalIdMap()
+    n, total = 0, 0.0
+    rmin, rmax = np.inf, -np.inf
+    for batch in _valid_batches(pf, batch_rows):
+        u, i, r = _columns(batch)
+        users.update(u)
+        items.update(i)
+        n += len(r)
+        total += float(r.sum(dtype=np.float64))
+        rmin, rmax = min(rmin, float(r.min())), max(rmax, float(r.max()))
+    if n == 0:
+        raise ValueError(f"no valid ratings in {path}")
+    return users, items, {"rows": n, "global_mean": total / n, "rating_min": rmin, "rating_max": rmax}
+
+
+def movie_rating_stats(path: str, batch_rows: int = 65_536) -> Tuple[pd.DataFrame, float]:
+    """
+    Streaming per-movie (n_ratings, avg_rating, std_rating) and the global mean rating,
+    i.e. the aggregates build_popularity_table computes, without loading the interactions.
+    """
+    pf = pq.ParquetFile(path)
+    items = IncrementalIdMap()
+    cnt = np.zeros(0, dtype=np.int64)
+    s1 = np.zeros(0, dtype=np.float64)
+    s2 = np.zeros(0, dtype=np.float64)
+    for batch in _valid_batches(pf, batch_rows):
+        _, i, r = _columns(batch)
+        j = items.update(i)
+        grow = len(items) - len(cnt)
+        if grow:
+            cnt, s1, s2 = np.pad(cnt, (0, grow)), np.pad(s1, (0, grow)), np.pad(s2, (0, grow))
+        r64 = r.astype(np.float64)
+        cnt += np.bincount(j, minlength=len(items))
+        s1 += np.bincount(j, weights=r64, minlength=len(items))
+        s2 += np.bincount(j, weights=r64 * r64, minlength=len(items))
+
+    mean = np.divide(s1, cnt, out=np.zeros_like(s1), where=cnt > 0)
+    var = np.divide(s2 - cnt * mean ** 2, cnt - 1, out=np.zeros_like(s1), where=cnt > 1)
+    agg = pd.DataFrame({
+        "movieId": items.ids,
+        "n_ratings": cnt,
+        "avg_rating": mean,
+        "std_rating": np.sqrt(np.clip(var, 0.0, None)),
+    }).sort_values("movieId").reset_index(drop=True)
+    global_mean = float(s1.sum() / cnt.sum()) if cnt.sum() else float("nan")
+    return agg, global_mean
+
+
+def plan_memory(n_users: int, n_items: int, cfg: StreamConfig) -> Dict[str, int]:
+    """
+    Split the budget: factors + id maps + parquet reader/decoded batches + SGD mini-batch
+    temporaries are fixed costs; whatever is left becomes the shuffle window.
+    Covers the trainer's own buffers, not the interpreter and loaded libraries.
+    """
+    budget = int(cfg.memory_budget_mb) << 20
+    model = (n_users + n_items) * (cfg.n_factors + 1) * 4
+    id_maps = (n_users + n_items) * _ID_BYTES
+    decode = _READER_BYTES + cfg.mix_groups * cfg.batch_rows * _DECODE_ROW_BYTES
+    sgd = cfg.batch_size * cfg.n_factors * 4 * 8
+    free = budget - model - id_maps - decode - sgd
+    window_rows = free // _WINDOW_ROW_BYTES
+    if window_rows < cfg.batch_rows:
+        need = (model + id_maps + decode + sgd + cfg.batch_rows * _WINDOW_ROW_BYTES) >> 20
+        raise ValueError(f"memory_budget_mb={cfg.memory_budget_mb} too small: need at least ~{need + 1} MB")
+    return {"budget": budget, "model": model, "id_maps": id_maps, "decode": decode, "sgd": sgd,
+            "window_rows": int(window_rows)}
+
+
+def _iter_windows(
+    pf: pq.ParquetFile,
+    users: IncrementalIdMap,
+    items: IncrementalIdMap,
+    window_rows: int,
+    cfg: StreamConfig,
+    rng: np.random.Generator,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Fill a fixed buffer of window_rows ratings, pulling record batches round-robin from up to
+    mix_groups row groups (visited in a fresh random order each epoch), and yield it full.
+    Rows within a window are shuffled by sgd_epoch; shuffling across windows is row-group deep.
+    """
+    ub = np.empty(window_rows, dtype=np.int32)
+    ib = np.empty(window_rows, dtype=np.int32)
+    rb = np.empty(window_rows, dtype=np.float32)
+    fill = 0
+
+    pending = list(rng.permutation(pf.metadata.num_row_groups))
+    active: List[Iterator[pa.RecordBatch]] = []
+    while pending or active:
+        while pending and len(active) < cfg.mix_groups:
+            active.append(_valid_batches(pf, cfg.batch_rows, row_groups=[int(pending.pop())]))
+        for it in list(active):
+            batch = next(it, None)
+            if batch is None:
+                active.remove(it)
+                continue
+            u, i, r = _columns(batch)
+            u, i = users.encode(u), items.encode(i)
+            pos = 0
+            while pos < len(r):
+                take = min(len(r) - pos, window_rows - fill)
+                ub[fill:fill + take] = u[pos:pos + take]
+                ib[fill:fill + take] = i[pos:pos + take]
+                rb[fill:fill + take] = r[pos:pos + take]
+                fill += take
+                pos += take
+                if fill == window_rows:
+                    yield ub, ib, rb
+                    fill = 0
+    if fill:
+        yield ub[:fill], ib[:fill], rb[:fill]
+
+
+def train_streaming_sgd(path: str, cfg: StreamConfig) -> Tuple[FactorModel, Dict]:
+    """
+    Out-of-core biased SGD (same update rule as train_sgd / Surprise SVD) over a parquet file.
+    - pass 0 streams the file once to build the id maps and the global mean
+    - each epoch streams it again in shuffled windows sized by memory_budget_mb
+    The full interactions table is never materialized.
+    """
+    t0 = time.perf_counter()
+    users, items, stats = scan_ids(path, cfg.batch_rows)
+    plan = plan_memory(len(users), len(items), cfg)
+    scan_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(cfg.seed)
+    f = cfg.n_factors
+    pu = rng.normal(0.0, cfg.init_std, size=(len(users), f)).astype(np.float32)
+    qi = rng.normal(0.0, cfg.init_std, size=(len(items), f)).astype(np.float32)
+    bu = np.zeros(len(users), dtype=np.float32)
+    bi = np.zeros(len(items), dtype=np.float32)
+    mu = float(stats["global_mean"])
+
+    pf = pq.ParquetFile(path)
+    n_windows = 0
+    window_rows = min(plan["window_rows"], int(stats["rows"]))
+    for _ in range(int(cfg.n_epochs)):
+        for u, i, r in _iter_windows(pf, users, items, window_rows, cfg, rng):
+            sgd_epoch(pu, qi, bu, bi, u, i, r, mu, lr=cfg.lr, reg=cfg.reg, batch_size=cfg.batch_size, rng=rng)
+            n_windows += 1
+    elapsed = time.perf_counter() - t0
+
+    model = FactorModel(
+        user_factors=pu,
+        item_factors=qi,
+        user_bias=bu,
+        item_bias=bi,
+        global_mean=mu,
+        user_ids=users.ids,
+        item_ids=items.ids,
+        rating_min=stats["rating_min"],
+        rating_max=stats["rating_max"],
+        model_type="numpy_sgd_stream",
+    )
+    info = {
+        "model_type": model.model_type,
+        "n_factors": cfg.n_factors,
+        "n_epochs": cfg.n_epochs,
+        "lr": cfg.lr,
+        "reg": cfg.reg,
+        "rating_min": model.rating_min,
+        "rating_max": model.rating_max,
+        "num_users": int(len(users)),
+        "num_movies": int(len(items)),
+        "trained_rows": int(stats["rows"]),
+        "memory_budget_mb": cfg.memory_budget_mb,
+        "window_rows": window_rows,
+        "windows_per_epoch": n_windows // max(int(cfg.n_epochs), 1),
+        "row_groups": pf.metadata.num_row_groups,
+        "scan_seconds": round(scan_s, 3),
+        "train_seconds": round(elapsed, 3),
+    }
+    return model, info
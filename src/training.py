@@ -6,11 +6,17 @@ import os
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from src.encoded import EncodedInteractions, load_encoded
+from src.leaderboards import build_leaderboards, save_leaderboards
+from src.model_bundle import export_bundle
+from src.neighbors import NeighborsConfig, build_neighbors, save_neighbors
+from src.trending import TrendingConfig, TrendingState, trending_from_parquet
+
 
 @dataclass
 class TrainConfig:
@@ -20,15 +26,26 @@ class TrainConfig:
     topn: int = 2000
     min_ratings: int = 20  # stability for popularity table
     bayes_m: int = 50      # Bayesian smoothing strength (m)
+    leaderboard_depth: int = 500  # movies kept per genre / decade / (genre, decade) leaderboard (0 = all)
+    trending_half_life_days: float = 30.0  # time decay of the trending baseline (mode="trending")
+    trending_prior_m: float = 5.0
+    neighbors_k: int = 50          # item-item neighbors per movie for /similar (0 = skip)
+    neighbors_source: str = "cooccurrence"  # cooccurrence (co-rating cosine) | factors (CF item factors, needs --train_cf)
     seed: int = 42
 
     # CF params 
     train_cf: bool = False
-    cf_model: str = "svd"  
+    cf_model: str = "svd"  # svd (Surprise) | als | sgd (src/factorization.py) | implicit (src/implicit.py)
     cf_factors: int = 100
     cf_epochs: int = 20
     cf_lr_all: float = 0.005
     cf_reg_all: float = 0.02
+    feedback_glob: str = "data/feedback.jsonl,data/archive/*.jsonl"  # swipe logs for cf_model=implicit
+    implicit_alpha: float = 10.0
+
+    # Out-of-core mode: stream parquet batches instead of loading the interactions
+    stream: bool = False
+    memory_budget_mb: int = 256
 
 
 def _ensure_dir(p: Path) -> None:
@@ -36,20 +53,8 @@ def _ensure_dir(p: Path) -> None:
 
 
 def _load_interactions(path: str) -> pd.DataFrame:
-    df = pd.read_parquet(path)
-    required = {"userId", "movieId", "rating"}
-    missing = required - set(df.columns)
-    if missing:
-        raise ValueError(f"interactions missing columns: {missing}")
-
-    # timestamp is optional for training baseline/cf here
-    df = df.dropna(subset=["userId", "movieId", "rating"]).copy()
-
-    # enforce types (safe)
-    df["userId"] = df["userId"].astype(int)
-    df["movieId"] = df["movieId"].astype(int)
-    df["rating"] = df["rating"].astype(float)
-    return df
+    """(userId, movieId, rating, timestamp) from the shared encoded artifact (built once per data version)."""
+    return load_encoded(path).frame()
 
 
 def _load_movies(path: Optional[str]) -> Optional[pd.DataFrame]:
@@ -60,7 +65,7 @@ def _load_movies(path: Optional[str]) -> Optional[pd.DataFrame]:
         return None
     df = pd.read_parquet(p)
     # Keep only useful cols if present
-    keep = [c for c in ["movieId", "title", "genres"] if c in df.columns]
+    keep = [c for c in ["movieId", "title", "genres", "year"] if c in df.columns]
     if "movieId" not in keep:
         return None
     df = df[keep].copy()
@@ -90,7 +95,16 @@ def build_popularity_table(
         .reset_index()
     )
     agg["std_rating"] = agg["std_rating"].fillna(0.0)
+    return rank_popularity(agg, C, min_ratings=min_ratings, bayes_m=bayes_m)
+
 
+def rank_popularity(
+    agg: pd.DataFrame,
+    C: float,
+    min_ratings: int = 20,
+    bayes_m: int = 50,
+) -> pd.DataFrame:
+    """Bayesian score + stability filter + sort over per-movie (n_ratings, avg_rating) aggregates."""
     v = agg["n_ratings"].astype(float)
     R = agg["avg_rating"].astype(float)
     m = float(bayes_m)
@@ -114,6 +128,9 @@ def save_artifacts(
     popularity: pd.DataFrame,
     movies: Optional[pd.DataFrame],
     cf_info: Optional[Dict] = None,
+    ranked: Optional[pd.DataFrame] = None,
+    leaderboards: Optional[Dict[str, np.ndarray]] = None,
+    trending: Optional[TrendingState] = None,
 ) -> Path:
     run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     out_dir = out_root / f"run_{run_id}"
@@ -128,6 +145,14 @@ def save_artifacts(
     # Save popularity table
     popularity.to_parquet(out_dir / "top_global.parquet", index=False)
 
+    # Save per-genre / per-decade leaderboards over the full ranked table (optional)
+    if ranked is not None and leaderboards is not None:
+        save_leaderboards(out_dir, ranked, leaderboards)
+
+    # Save the decayed trending state; serving keeps folding live feedback into it (optional)
+    if trending is not None:
+        trending.save(out_dir)
+
     # Save movies metadata (optional)
     if movies is not None:
         movies.to_parquet(out_dir / "movies.parquet", index=False)
@@ -181,6 +206,7 @@ def train_cf_surprise_svd(
     # Save model
     import joblib
     joblib.dump(algo, out_dir / "cf_svd.joblib")
+    export_bundle(algo, out_dir, model_file="cf_svd.joblib")
 
     # Save mappings to help serving
     # Surprise internally maps raw ids to inner ids; we keep raw sets for quick checks
@@ -196,6 +222,92 @@ def train_cf_surprise_svd(
     return cf_info
 
 
+def train_cf_factorization(
+    interactions: Union[pd.DataFrame, EncodedInteractions],
+    cfg: TrainConfig,
+    out_dir: Path,
+) -> Dict:
+    """
+    Optional: Train the built-in NumPy factorization model (multi-threaded ALS or vectorized SGD).
+    Serves through the same predict(uid, iid).est interface as Surprise SVD.
+    Encoded interactions are trained on directly (their codes are already dense).
+    """
+    import joblib
+    from src.factorization import MFConfig, fit_factor_model, fit_factor_model_codes
+
+    mf_cfg = MFConfig(
+        algo=cfg.cf_model,
+        n_factors=cfg.cf_factors,
+        n_epochs=cfg.cf_epochs,
+        lr=cfg.cf_lr_all,
+        reg=cfg.cf_reg_all,
+        seed=cfg.seed,
+    )
+    if isinstance(interactions, EncodedInteractions):
+        model, cf_info = fit_factor_model_codes(
+            interactions.user, interactions.item, interactions.rating,
+            interactions.user_ids, interactions.item_ids, mf_cfg,
+        )
+    else:
+        model, cf_info = fit_factor_model(interactions[["userId", "movieId", "rating"]], mf_cfg)
+    joblib.dump(model, out_dir / "cf_mf.joblib")
+    export_bundle(model, out_dir, model_file="cf_mf.joblib")
+    return cf_info
+
+
+def train_cf_implicit(
+    interactions: pd.DataFrame,
+    cfg: TrainConfig,
+    out_dir: Path,
+) -> Dict:
+    """
+    Optional: Train the implicit-feedback WALS model from interactions + raw swipe logs
+    (like/save/dislike/skip weighted by action instead of mapped to ratings).
+    """
+    import glob
+    import joblib
+    from src.etl.merge_feedback import read_feedback_events
+    from src.implicit import ImplicitConfig, fit_implicit_model
+
+    paths = sorted({Path(p) for pattern in cfg.feedback_glob.split(",") if pattern for p in glob.glob(pattern)})
+    events = read_feedback_events(paths) if paths else None
+
+    imp_cfg = ImplicitConfig(
+        n_factors=cfg.cf_factors,
+        n_epochs=cfg.cf_epochs,
+        reg=cfg.cf_reg_all,
+        alpha=cfg.implicit_alpha,
+        seed=cfg.seed,
+    )
+    model, cf_info = fit_implicit_model(interactions, events, imp_cfg)
+    cf_info["feedback_files"] = [str(p) for p in paths]
+    joblib.dump(model, out_dir / "cf_mf.joblib")
+    export_bundle(model, out_dir, model_file="cf_mf.joblib")
+    return cf_info
+
+
+def train_cf_streaming(cfg: TrainConfig, out_dir: Path) -> Dict:
+    """
+    Optional: Out-of-core SGD over the interactions parquet (src/streaming.py);
+    peak memory stays within cfg.memory_budget_mb.
+    """
+    import joblib
+    from src.streaming import StreamConfig, train_streaming_sgd
+
+    stream_cfg = StreamConfig(
+        memory_budget_mb=cfg.memory_budget_mb,
+        n_factors=cfg.cf_factors,
+        n_epochs=cfg.cf_epochs,
+        lr=cfg.cf_lr_all,
+        reg=cfg.cf_reg_all,
+        seed=cfg.seed,
+    )
+    model, cf_info = train_streaming_sgd(cfg.interactions_path, stream_cfg)
+    joblib.dump(model, out_dir / "cf_mf.joblib")
+    export_bundle(model, out_dir, model_file="cf_mf.joblib")
+    return cf_info
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Train baseline (and optional CF) recommender.")
     parser.add_argument("--interactions", default="data/interactions.parquet")
@@ -204,12 +316,26 @@ def main() -> None:
     parser.add_argument("--topn", type=int, default=200)
     parser.add_argument("--min_ratings", type=int, default=20)
     parser.add_argument("--bayes_m", type=int, default=50)
+    parser.add_argument("--trending_half_life_days", type=float, default=TrainConfig.trending_half_life_days)
+    parser.add_argument("--trending_prior_m", type=float, default=TrainConfig.trending_prior_m)
+    parser.add_argument("--leaderboard_depth", type=int, default=TrainConfig.leaderboard_depth,
+                        help="Movies kept per genre/decade leaderboard (0 = all)")
+    parser.add_argument("--neighbors_k", type=int, default=TrainConfig.neighbors_k,
+                        help="Similar movies kept per movie for /similar (0 = skip)")
+    parser.add_argument("--neighbors_source", default=TrainConfig.neighbors_source, choices=["cooccurrence", "factors"])
 
     parser.add_argument("--train_cf", action="store_true")
+    parser.add_argument("--cf_model", default="svd", choices=["svd", "als", "sgd", "implicit"])
     parser.add_argument("--cf_factors", type=int, default=100)
     parser.add_argument("--cf_epochs", type=int, default=20)
     parser.add_argument("--cf_lr_all", type=float, default=0.005)
     parser.add_argument("--cf_reg_all", type=float, default=0.02)
+    parser.add_argument("--feedback", default=TrainConfig.feedback_glob,
+                        help="Comma-separated swipe log globs (cf_model=implicit)")
+    parser.add_argument("--implicit_alpha", type=float, default=10.0)
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream the interactions parquet (baseline stats + cf_model=sgd) instead of loading it")
+    parser.add_argument("--memory_budget_mb", type=int, default=256)
     parser.add_argument("--seed", type=int, default=42)
 
     args = parser.parse_args()
@@ -221,40 +347,93 @@ def main() -> None:
         topn=args.topn,
         min_ratings=args.min_ratings,
         bayes_m=args.bayes_m,
+        leaderboard_depth=args.leaderboard_depth,
+        trending_half_life_days=args.trending_half_life_days,
+        trending_prior_m=args.trending_prior_m,
+        neighbors_k=args.neighbors_k,
+        neighbors_source=args.neighbors_source,
         seed=args.seed,
         train_cf=args.train_cf,
+        cf_model=args.cf_model,
         cf_factors=args.cf_factors,
         cf_epochs=args.cf_epochs,
         cf_lr_all=args.cf_lr_all,
         cf_reg_all=args.cf_reg_all,
+        feedback_glob=args.feedback,
+        implicit_alpha=args.implicit_alpha,
+        stream=args.stream,
+        memory_budget_mb=args.memory_budget_mb,
     )
 
     np.random.seed(cfg.seed)
 
-    interactions = _load_interactions(cfg.interactions_path)
-    movies = _load_movies(cfg.movies_path)
+    if cfg.stream and cfg.train_cf and cfg.cf_model != "sgd":
+        raise SystemExit("--stream supports --cf_model sgd only")
+    if cfg.neighbors_k and cfg.neighbors_source == "factors" and not cfg.train_cf:
+        raise SystemExit("--neighbors_source factors needs --train_cf")
 
-    pop = build_popularity_table(
-        interactions=interactions,
-        min_ratings=cfg.min_ratings,
-        bayes_m=cfg.bayes_m,
-    )
+    movies = _load_movies(cfg.movies_path)
+    trend_cfg = TrendingConfig(half_life_days=cfg.trending_half_life_days, prior_m=cfg.trending_prior_m)
+
+    if cfg.stream:
+        from src.streaming import movie_rating_stats
+        interactions = None
+        agg, C = movie_rating_stats(cfg.interactions_path)
+        pop = rank_popularity(agg, C, min_ratings=cfg.min_ratings, bayes_m=cfg.bayes_m)
+        trending = trending_from_parquet(cfg.interactions_path, trend_cfg)
+    else:
+        encoded = load_encoded(cfg.interactions_path)
+        agg, C = encoded.item_rating_stats()
+        pop = rank_popularity(agg, C, min_ratings=cfg.min_ratings, bayes_m=cfg.bayes_m)
+        trending = TrendingState.from_history(encoded.item_ids[encoded.item], encoded.rating, encoded.ts, trend_cfg)
+        # CF trainers that take a frame get zero-copy rating/timestamp columns over the artifact
+        interactions = encoded.frame() if cfg.train_cf and cfg.cf_model in ("svd", "implicit") else encoded
 
     # keep only Top-N in artifact (fast serving)
     pop_top = pop.head(cfg.topn).copy()
+    # filtered requests start from the matching leaderboard instead of the Top-N
+    boards = build_leaderboards(pop, movies, depth=cfg.leaderboard_depth) if movies is not None else None
 
     out_root = Path(cfg.out_dir)
     _ensure_dir(out_root)
 
     # Save first (baseline)
-    out_dir = save_artifacts(out_root, cfg, pop_top, movies, cf_info=None)
+    out_dir = save_artifacts(out_root, cfg, pop_top, movies, cf_info=None, ranked=pop, leaderboards=boards,
+                             trending=trending)
     print(f"[OK] Baseline artifacts saved to: {out_dir}")
+    if boards is not None:
+        print(f"[OK] Leaderboards: {len(boards['keys'])} (genre / decade / genre x decade), "
+              f"{len(boards['positions']):,} positions over {len(pop):,} ranked movies")
 
     # Optional CF
     if cfg.train_cf:
-        cf_info = train_cf_surprise_svd(interactions, cfg, out_dir)
+        if cfg.stream:
+            cf_info = train_cf_streaming(cfg, out_dir)
+            model_file = "cf_mf.joblib"
+        elif cfg.cf_model == "svd":
+            cf_info = train_cf_surprise_svd(interactions, cfg, out_dir)
+            model_file = "cf_svd.joblib"
+        elif cfg.cf_model == "implicit":
+            cf_info = train_cf_implicit(interactions, cfg, out_dir)
+            model_file = "cf_mf.joblib"
+        else:
+            cf_info = train_cf_factorization(interactions, cfg, out_dir)
+            model_file = "cf_mf.joblib"
+        cf_info["model_file"] = model_file
         (out_dir / "cf_info.json").write_text(json.dumps(cf_info, indent=2), encoding="utf-8")
-        print(f"[OK] CF model saved to: {out_dir / 'cf_svd.joblib'}")
+        print(f"[OK] CF model saved to: {out_dir / model_file}")
+
+    # Optional item-item neighbors ("more like this")
+    if cfg.neighbors_k:
+        if cfg.stream and cfg.neighbors_source == "cooccurrence":
+            print("[WARN] --stream: skipping co-rating neighbors (they need the full matrix); use --neighbors_source factors")
+        else:
+            from src.predictions import _load_cf_bundle
+            nb_cfg = NeighborsConfig(source=cfg.neighbors_source, k=cfg.neighbors_k)
+            model = _load_cf_bundle(out_dir) if cfg.neighbors_source == "factors" else None
+            arrays = build_neighbors(nb_cfg, interactions_path=cfg.interactions_path, model=model)
+            path = save_neighbors(out_dir, arrays, nb_cfg.source)
+            print(f"[OK] Neighbors ({nb_cfg.source}) for {len(arrays['movie_ids']):,} movies saved to: {path}")
 
 
 if __name__ == "__main__":
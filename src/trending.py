@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.etl.merge_feedback import events_to_interactions, parse_block
+
+# <run dir>/trending.npz
+TRENDING_FILE = "trending.npz"
+
+# Forward decay: an event at t is stored with weight exp(lam * (t - landmark)) and read back at
+# time `now` times exp(-lam * (now - landmark)). Adding events never touches other movies;
+# the landmark moves forward (one O(movies) rescale) only before the weights could overflow.
+_MAX_EXPONENT = 600.0
+
+
+@dataclass
+class TrendingConfig:
+    half_life_days: float = 30.0
+    prior_m: float = 5.0          # Bayesian smoothing strength, in decayed ratings
+
+
+@dataclass
+class TrendingState:
+    """
+    Exponentially time-decayed rating count and rating sum per movie.
+    - trend_count(now) = sum over events of 2^(-(now - t) / half_life)
+    - trend_score = Bayesian average of the decayed ratings (shrunk to the decayed global mean)
+    """
+    half_life_s: float
+    prior_m: float
+    landmark: float
+    movie_ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    weight: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    rating_sum: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    last_ts: float = float("-inf")
+    n_events: int = 0
+    _index: Optional[pd.Index] = field(default=None, repr=False, compare=False)
+
+    @property
+    def lam(self) -> float:
+        return np.log(2.0) / self.half_life_s
+
+    @classmethod
+    def from_history(
+        cls,
+        movie_ids: np.ndarray,
+        ratings: np.ndarray,
+        timestamps: np.ndarray,
+        cfg: TrendingConfig,
+    ) -> "TrendingState":
+        """One vectorized pass (factorize + two bincounts) over the full history."""
+        ts = np.asarray(timestamps, dtype=np.float64)
+        state = cls(half_life_s=cfg.half_life_days * 86400.0, prior_m=cfg.prior_m,
+                    landmark=float(ts.max()) if len(ts) else 0.0)
+        state.update(movie_ids, ratings, ts)
+        return state
+
+    def _rebase(self, landmark: float) -> None:
+        scale = np.exp(-self.lam * (landmark - self.landmark))
+        self.weight *= scale
+        self.rating_sum *= scale
+        self.landmark = landmark
+
+    def _codes(self, movie_ids: np.ndarray) -> np.ndarray:
+        if self._index is None:
+            self._index = pd.Index(self.movie_ids)
+        idx = self._index.get_indexer(movie_ids)
+        unseen = idx < 0
+        if unseen.any():
+            new = pd.unique(movie_ids[unseen]).astype(np.int64)
+            self.movie_ids = np.concatenate([self.movie_ids, new])
+            self.weight = np.concatenate([self.weight, np.zeros(len(new))])
+            self.rating_sum = np.concatenate([self.rating_sum, np.zeros(len(new))])
+            self._index = pd.Index(self.movie_ids)
+            idx = self._index.get_indexer(movie_ids)
+        return idx
+
+    def update(self, movie_ids, ratings, timestamps) -> None:
+        """Fold a batch of (movieId, rating, timestamp) events in; O(batch) unless the landmark moves."""
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        if not len(movie_ids):
+            return
+        ts = np.asarray(timestamps, dtype=np.float64)
+        r = np.asarray(ratings, dtype=np.float64)
+        t_max = float(ts.max())
+        if self.lam * (t_max - self.landmark) > _MAX_EXPONENT:
+            self._rebase(t_max)
+
+        j = self._codes(movie_ids)
+        w = np.exp(self.lam * (ts - self.landmark))
+        if len(j) > len(self.movie_ids) // 4:
+            self.weight += np.bincount(j, weights=w, minlength=len(self.movie_ids))
+            self.rating_sum += np.bincount(j, weights=w * r, minlength=len(self.movie_ids))
+        else:
+            np.add.at(self.weight, j, w)
+            np.add.at(self.rating_sum, j, w * r)
+        self.last_ts = max(self.last_ts, t_max)
+        self.n_events += len(movie_ids)
+
+    def ranked(self, now: Optional[float] = None) -> pd.DataFrame:
+        """
+        Movies by trend_score (ties by trend_count) as of `now` (default: the latest event,
+        so a quiet period does not shrink every movie to the prior).
+        """
+        now = self.last_ts if now is None else float(now)
+        decay = np.exp(-self.lam * (now - self.landmark))
+        count = self.weight * decay
+        total = self.weight.sum()
+        C = float(self.rating_sum.sum() / total) if total > 0 else 0.0
+        avg = np.divide(self.rating_sum, self.weight, out=np.full(len(self.weight), C), where=self.weight > 0)
+        m = self.prior_m
+        df = pd.DataFrame({
+            "movieId": self.movie_ids,
+            "trend_score": (count / (count + m)) * avg + (m / (count + m)) * C,
+            "trend_count": count,
+            "trend_avg": avg,
+        })
+        df = df[df["trend_count"] > 0]
+        return df.sort_values(["trend_score", "trend_count"], ascending=[False, False]).reset_index(drop=True)
+
+    def save(self, out_dir: Path) -> None:
+        np.savez(
+            Path(out_dir) / TRENDING_FILE,
+            movie_ids=self.movie_ids,
+            weight=self.weight,
+            rating_sum=self.rating_sum,
+            params=np.array([self.half_life_s, self.prior_m, self.landmark, self.last_ts, self.n_events]),
+        )
+
+    @classmethod
+    def load(cls, run_dir: Path) -> Optional["TrendingState"]:
+        path = Path(run_dir) / TRENDING_FILE
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as z:
+            half_life_s, prior_m, landmark, last_ts, n_events = z["params"].tolist()
+            return cls(half_life_s=half_life_s, prior_m=prior_m, landmark=landmark,
+                       movie_ids=z["movie_ids"], weight=z["weight"].copy(), rating_sum=z["rating_sum"].copy(),
+                       last_ts=last_ts, n_events=int(n_events))
+
+
+def _no_events() -> pd.DataFrame:
+    return events_to_interactions(pd.DataFrame(columns=["user_id", "movieId", "action", "_ts"]))
+
+
+class FeedbackTail:
+    """
+    Incremental reader for the append-only feedback JSONL: each read_new() parses only the
+    complete lines appended since the previous call. A rotated/truncated file (merge_feedback
+    archives it) is read again from the start.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.offset = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def read_new(self) -> pd.DataFrame:
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return _no_events()
+            if st.st_ino != self._inode or st.st_size < self.offset:
+                self._inode, self.offset = st.st_ino, 0
+            if st.st_size == self.offset:
+                return _no_events()
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                buf = f.read(st.st_size - self.offset)
+            cut = buf.rfind(b"\n")
+            if cut < 0:
+                # a line still being written
+                return _no_events()
+            self.offset += cut + 1
+            return events_to_interactions(parse_block(buf[:cut + 1]).to_pandas())
+
+
+
+def trending_from_parquet(path: str, cfg: TrendingConfig, batch_rows: int = 1 << 20) -> Optional[TrendingState]:
+    """Same state as from_history, folding record batches in with update() (out-of-core training)."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    if "timestamp" not in pf.schema_arrow.names:
+        return None
+    # landmark 0: update() moves it forward as soon as batch timestamps get near overflow
+    state = TrendingState(half_life_s=cfg.half_life_days * 86400.0, prior_m=cfg.prior_m, landmark=0.0)
+    for batch in pf.iter_batches(batch_size=batch_rows, columns=["movieId", "rating", "timestamp"]):
+        df = batch.to_pandas().dropna()
+        state.update(df["movieId"].to_numpy(), df["rating"].to_numpy(), df["timestamp"].to_numpy())
+    return state
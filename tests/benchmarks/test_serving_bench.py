@@ -0,0 +1,41 @@
+"""
+Opt-in serving latency benchmarks (skipped unless RUN_BENCHMARKS=1):
+
+    RUN_BENCHMARKS=1 python -m pytest -q tests/benchmarks
+
+Each case must stay within the README's 200 ms budget at p95; the results are also
+written as models/bench_serving_<utc>.json (BENCH_OUT overrides the directory).
+"""
+import os
+
+import numpy as np
+import pytest
+
+from src.benchmarks.bench_serving import CONSTRAINTS, run_cases, save_report, synthetic_recommender
+
+pytestmark = pytest.mark.skipif(os.environ.get("RUN_BENCHMARKS") != "1", reason="set RUN_BENCHMARKS=1 to run")
+
+P95_BUDGET_MS = 200.0
+RESULTS = []
+
+
+@pytest.fixture(scope="module")
+def serving(tmp_path_factory):
+    rec = synthetic_recommender(tmp_path_factory.mktemp("serving"), n_ratings=500_000, topn=2000)
+    user_ids = np.asarray(rec._interactions_df["userId"].unique())
+    known = np.random.default_rng(0).choice(user_ids, size=50, replace=False).astype(int).tolist()
+    unknown = (int(user_ids.max()) + 1 + np.arange(50)).tolist()
+    rec.seen_count(known[0])
+    yield rec, known, unknown
+    save_report(RESULTS, {"source": "pytest", "n_ratings": 500_000}, os.environ.get("BENCH_OUT", "models"))
+
+
+@pytest.mark.parametrize("constraints", CONSTRAINTS)
+@pytest.mark.parametrize("method", ["baseline", "cf"])
+def test_p95_within_budget(serving, method, constraints):
+    rec, known, unknown = serving
+    rows = run_cases(rec, known, unknown, methods=[method], pools=[200, 2000], ks=[10, 50],
+                     constraints=[constraints], n_calls=100, n_alloc_calls=5)
+    RESULTS.extend(rows)
+    slow = [r for r in rows if r["p95_ms"] > P95_BUDGET_MS]
+    assert not slow, slow
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.batch_eval import BatchEvalConfig, beyond_accuracy, evaluate_batched, evaluate_report, ranking_metrics
+from src.evaluation import evaluate, split_by_user_time
+from src.factorization import FactorModel
+from src.model_bundle import export_bundle
+from src.predictions import Recommender
+
+
+def build(tmp_path, clip=False):
+    rng = np.random.default_rng(5)
+    n_users, n_items = 120, 300
+    df = pd.DataFrame({
+        "userId": rng.integers(1, n_users + 1, 6000),
+        "movieId": rng.integers(1, n_items + 1, 6000) * 2,
+        "rating": rng.integers(1, 11, 6000) / 2.0,
+        "timestamp": rng.integers(0, 10**6, 6000),
+    }).drop_duplicates(["userId", "movieId"])
+    train, test = split_by_user_time(df, holdout="lastpct", holdout_pct=0.3)
+
+    run = tmp_path / "run_1"
+    run.mkdir()
+    (tmp_path / "LATEST").write_text(str(run))
+    items = np.arange(1, n_items + 1) * 2
+    pd.DataFrame({"movieId": rng.permutation(items)[:250], "bayes_score": np.linspace(5, 1, 250)}) \
+        .to_parquet(run / "top_global.parquet", index=False)
+    model = FactorModel(
+        user_factors=rng.normal(size=(n_users, 8)).astype(np.float32),
+        item_factors=rng.normal(size=(n_items, 8)).astype(np.float32),
+        user_bias=rng.normal(size=n_users).astype(np.float32),
+        item_bias=rng.normal(size=n_items).astype(np.float32),
+        global_mean=3.5, user_ids=np.arange(1, n_users + 1), item_ids=items,
+        # clipped like every trained model: many scores tie at the bounds
+        rating_min=0.5 if clip else None, rating_max=5.0 if clip else None,
+    )
+    export_bundle(model, run, model_file="cf_mf.joblib")
+    rec = Recommender(models_dir=str(tmp_path), interactions_path=str(tmp_path / "none.parquet"), interactions_df=train)
+    rec.movies = None
+    return rec, train, test
+
+
+@pytest.fixture
+def setup(tmp_path):
+    return build(tmp_path)
+
+
+@pytest.mark.parametrize("mode", ["baseline", "cf"])
+@pytest.mark.parametrize("max_users", [None, 40])
+@pytest.mark.parametrize("clip", [False, True])
+def test_batched_matches_per_user_loop(tmp_path, mode, max_users, clip):
+    rec, train, test = build(tmp_path, clip)
+    ref = evaluate(rec, train, test, k=10, mode=mode, candidate_pool=100, max_users=max_users)
+    got = evaluate_batched(rec, train, test, BatchEvalConfig(k=10, mode=mode, candidate_pool=100,
+                                                             max_users=max_users, block_users=16))
+    assert got["userId"].tolist() == ref["userId"].tolist()
+    for col in ["n_relevant", "recall@10", "ndcg@10"]:
+        np.testing.assert_allclose(got[col].to_numpy(float), ref[col].to_numpy(float))
+
+
+def test_ranking_metrics_by_hand():
+    hits = np.array([[True, False, True], [False, False, False]])
+    m = ranking_metrics(hits, np.array([4, 1]), k=3)
+    assert m["recall@3"].tolist() == [0.5, 0.0]
+    assert m["hit@3"].tolist() == [1.0, 0.0]
+    assert m["map@3"][0] == pytest.approx((1 / 1 + 2 / 3) / 3)
+    assert m["mrr@3"].tolist() == [1.0, 0.0]
+    assert ranking_metrics(hits, np.array([4, 1]), k=2)["recall@2"].tolist() == [0.25, 0.0]
+    idcg = 1 + 1 / np.log2(3) + 1 / np.log2(4)
+    assert m["ndcg@3"][0] == pytest.approx((1 + 1 / np.log2(4)) / idcg)
+
+
+@pytest.mark.parametrize("mode", ["baseline", "cf"])
+def test_process_pool_matches_single_process(setup, mode):
+    rec, train, test = setup
+    cfg = dict(k=10, mode=mode, candidate_pool=100, block_users=16)
+    ref = evaluate_batched(rec, train, test, BatchEvalConfig(**cfg))
+    got = evaluate_batched(rec, train, test, BatchEvalConfig(**cfg, workers=3))
+    pd.testing.assert_frame_equal(got, ref)
+
+
+@pytest.mark.parametrize("mode", ["baseline", "cf"])
+def test_one_pass_multi_k_matches_single_k_runs(setup, mode):
+    rec, train, test = setup
+    per_user, summary = evaluate_report(rec, train, test, BatchEvalConfig(k=10, ks=(3, 25), mode=mode, candidate_pool=100))
+    for k in [3, 10, 25]:
+        single = evaluate_batched(rec, train, test, BatchEvalConfig(k=k, mode=mode, candidate_pool=100))
+        cols = [c for c in single.columns if c.endswith(f"@{k}")]
+        pd.testing.assert_frame_equal(per_user[cols], single[cols])
+    assert set(summary["k"]) == {3, 10, 25}
+    assert {"recall", "ndcg", "map", "hit", "mrr", "pop", "ild", "coverage"} == set(summary["metric"])
+    cov = summary[summary["metric"] == "coverage"].sort_values("k")["value"].to_numpy()
+    assert (np.diff(cov) >= 0).all() and cov[-1] <= 1.0
+
+
+def test_beyond_accuracy_by_hand():
+    top = np.array([[0, 1, 2], [2, -1, -1]])
+    log_pop = np.log1p(np.array([9.0, 0.0, 3.0]))
+    G = np.array([[1, 0], [1, 1], [0, 1]], dtype=np.float32)   # {a}, {a, b}, {b}
+    out = beyond_accuracy(top, [2, 3], log_pop, G)
+    assert out["pop@2"][0] == pytest.approx(np.log(10) / 2)
+    assert out["pop@3"][1] == pytest.approx(np.log(4))
+    assert out["ild@2"][0] == pytest.approx(0.5)
+    assert out["ild@3"][0] == pytest.approx((0.5 + 1.0 + 0.5) / 3)
+    assert np.isnan(out["ild@3"][1])
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from src.cf_search import SearchConfig, grid_configs, search
+
+
+def _interactions(n_users=40, n_items=30, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [
+        (u, m, float(rng.integers(1, 6)), int(ts))
+        for u in range(1, n_users + 1)
+        for ts, m in enumerate(rng.choice(n_items, size=8, replace=False) + 1)
+    ]
+    return pd.DataFrame(rows, columns=["userId", "movieId", "rating", "timestamp"])
+
+
+def test_grid_configs_is_cartesian_product():
+    configs = grid_configs({"n_factors": [8, 16], "reg_all": [0.02, 0.1, 0.2]})
+    assert len(configs) == 6
+    assert {"n_factors": 16, "reg_all": 0.1} in configs
+
+
+def test_halving_search_in_process_pool():
+    cfg = SearchConfig(algo="sgd", strategy="halving", n_trials=4, eta=2, min_epochs=2, max_epochs=4, n_workers=2)
+    board, meta = search(_interactions(), cfg)
+
+    assert meta["eval_users"] == 40
+    # 4 configs at 2 epochs, best 2 rerun at 4 epochs
+    assert board["rung"].value_counts().to_dict() == {0: 4, 1: 2}
+    assert board.iloc[0]["rung"] == 1 and board.iloc[0]["n_epochs"] == 4
+    assert board["recall@10"].between(0, 1).all()
+    top = board[board["rung"] == 1]["ndcg@10"]
+    assert top.is_monotonic_decreasing
@@ -0,0 +1,96 @@
+import json
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("surprise")
+
+from src.cf_training import CFConfig, run_incremental, train_svd, warm_start_svd  # noqa: E402
+
+SINCE = 1_000
+
+
+@pytest.fixture
+def history():
+    """(parent ratings, current ratings): the current log adds newer events, a new user and a new item."""
+    rng = np.random.default_rng(0)
+    old = pd.DataFrame({
+        "userId": np.repeat(np.arange(1, 31) * 10, 12),
+        "movieId": np.concatenate([rng.choice(np.arange(1, 41) * 3, 12, replace=False) for _ in range(30)]),
+        "rating": rng.integers(1, 11, 360) / 2.0,
+        "timestamp": rng.integers(0, SINCE + 1, 360),
+    })
+    fresh = pd.DataFrame({
+        "userId": [10, 10, 20, 999, 999, 30],
+        "movieId": [3, 6, 9, 3, 500, 500],     # 999: new user; 500: new item (also rated by existing user 30)
+        "rating": [5.0, 1.0, 4.0, 3.5, 4.5, 2.0],
+        "timestamp": SINCE + np.arange(1, 7),
+    })
+    return old, pd.concat([old, fresh], ignore_index=True)
+
+
+def _parent(old):
+    algo, _ = train_svd(old, CFConfig(n_factors=4, n_epochs=5))
+    return algo
+
+
+def test_warm_start_keeps_parent_rows_and_appends_new_ids(history):
+    old, df = history
+    parent = _parent(old)
+    algo, stats = warm_start_svd(parent, df, CFConfig(warm_epochs=3), since_ts=SINCE)
+
+    pts, ts = parent.trainset, algo.trainset
+    for raw, inner in pts._raw2inner_id_users.items():
+        assert ts.to_inner_uid(raw) == inner
+    for raw, inner in pts._raw2inner_id_items.items():
+        assert ts.to_inner_iid(raw) == inner
+    assert ts.to_inner_uid(999) == pts.n_users and ts.to_inner_iid(500) == pts.n_items
+    assert algo.pu.shape == (pts.n_users + 1, 4) and algo.qi.shape == (pts.n_items + 1, 4)
+    assert stats["new_users"] == 1 and stats["new_items"] == 1 and stats["updated_ratings"] == 6
+
+    # only users with events after since_ts (or on a new item) move
+    moved = {pts.to_raw_uid(u) for u in range(pts.n_users)
+             if not (np.array_equal(algo.pu[u], parent.pu[u]) and algo.bu[u] == parent.bu[u])}
+    assert moved == {10, 20, 30}
+    # existing items stay bit-identical by default
+    np.testing.assert_array_equal(algo.qi[:pts.n_items], parent.qi)
+    np.testing.assert_array_equal(algo.bi[:pts.n_items], parent.bi)
+
+
+def test_warm_update_items_moves_rated_items(history):
+    old, df = history
+    parent = _parent(old)
+    algo, stats = warm_start_svd(parent, df, CFConfig(warm_epochs=3, warm_update_items=True), since_ts=SINCE)
+    pts = parent.trainset
+    moved = {pts.to_raw_iid(i) for i in range(pts.n_items) if not np.array_equal(algo.qi[i], parent.qi[i])}
+    assert moved == {3, 6, 9}
+    assert stats["affected_items"] == 4
+
+
+def test_warm_started_svd_predicts_from_updated_arrays(history):
+    old, df = history
+    algo, _ = warm_start_svd(_parent(old), df, CFConfig(warm_epochs=3), since_ts=SINCE)
+    ts = algo.trainset
+    for uid, iid in [(10, 3), (999, 500), (30, 6)]:
+        u, i = ts.to_inner_uid(uid), ts.to_inner_iid(iid)
+        est = ts.global_mean + algo.bu[u] + algo.bi[i] + algo.qi[i] @ algo.pu[u]
+        assert algo.predict(uid, iid).est == pytest.approx(np.clip(est, 0.5, 5.0))
+
+
+def test_run_incremental_records_lineage_and_repoints_latest(history, tmp_path):
+    old, df = history
+    parent_dir = tmp_path / "run_parent"
+    parent_dir.mkdir()
+    joblib.dump(_parent(old), parent_dir / "cf_svd.joblib")
+    (parent_dir / "cf_info.json").write_text(json.dumps({"max_timestamp": SINCE, "lineage": ["run_root"]}))
+    (tmp_path / "LATEST").write_text(str(parent_dir))
+
+    out_dir = run_incremental(CFConfig(models_dir=str(tmp_path), warm_epochs=2), df)
+    info = json.loads((out_dir / "cf_info.json").read_text())
+    assert info["parent_run"] == str(parent_dir)
+    assert info["lineage"] == ["run_root", str(parent_dir)]
+    assert info["parent_max_timestamp"] == SINCE and info["max_timestamp"] == SINCE + 6
+    assert (tmp_path / "LATEST").read_text() == str(out_dir)
+    assert (out_dir / "cf_svd.joblib").exists()
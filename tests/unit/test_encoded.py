@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.encoded import EncodedInteractions, load_encoded
+from src.evaluation import split_by_user_time
+
+
+@pytest.fixture
+def interactions():
+    rng = np.random.default_rng(0)
+    n = 600
+    return pd.DataFrame({
+        "userId": rng.integers(1, 60, n) * 7,
+        "movieId": rng.integers(1, 120, n) * 11,
+        "rating": rng.integers(1, 11, n) / 2.0,
+        "timestamp": rng.integers(10**9, 10**9 + 10**6, n),
+    })
+
+
+@pytest.mark.parametrize("holdout", ["last1", "lastpct"])
+def test_split_rows_matches_dataframe_split(interactions, holdout):
+    ref_train, ref_test = split_by_user_time(interactions, holdout=holdout, holdout_pct=0.3)
+    train, test = split_by_user_time(EncodedInteractions.from_frame(interactions), holdout=holdout, holdout_pct=0.3)
+
+    key = ["userId", "timestamp", "movieId"]
+    for got, ref in [(train, ref_train), (test, ref_test)]:
+        got = got.sort_values(key).reset_index(drop=True)
+        ref = ref.sort_values(key).reset_index(drop=True)
+        assert got[key].values.tolist() == ref[key].values.tolist()
+        assert np.allclose(got["rating"], ref["rating"])
+
+
+@pytest.mark.parametrize("holdout", ["last1", "lastpct"])
+def test_split_rows_drops_untimed_rows_like_dataframe_split(interactions, holdout):
+    dirty = interactions.astype({"timestamp": "float64", "movieId": "float64"})
+    rng = np.random.default_rng(1)
+    dirty.loc[rng.random(len(dirty)) < 0.2, "timestamp"] = np.nan
+    dirty.loc[rng.random(len(dirty)) < 0.05, "movieId"] = np.nan
+    ref_train, ref_test = split_by_user_time(dirty, holdout=holdout, holdout_pct=0.3)
+    enc = EncodedInteractions.from_frame(dirty)
+    train, test = split_by_user_time(enc, holdout=holdout, holdout_pct=0.3)
+
+    key = ["userId", "timestamp", "movieId"]
+    for got, ref in [(train, ref_train), (test, ref_test)]:
+        got = got.sort_values(key).reset_index(drop=True)
+        ref = ref.sort_values(key).reset_index(drop=True)
+        assert got[key].values.tolist() == ref[key].values.tolist()
+        assert np.allclose(got["rating"], ref["rating"])
+    # untimed rows still count as seen for serving
+    uid = int(dirty.loc[dirty["timestamp"].isna() & dirty["movieId"].notna(), "userId"].iloc[0])
+    assert enc.user_count(uid) == int((dirty["movieId"].notna() & (dirty["userId"] == uid)).sum())
+
+
+def test_per_user_and_per_item_views(interactions):
+    enc = EncodedInteractions.from_frame(interactions)
+    uid = int(interactions["userId"].iloc[0])
+    mine = interactions[interactions["userId"] == uid].sort_values("timestamp", kind="stable")
+
+    assert enc.user_count(uid) == len(mine)
+    assert set(enc.user_items(uid).tolist()) == set(mine["movieId"].tolist())
+    assert enc.user_count(-1) == 0 and len(enc.user_items(-1)) == 0
+
+    agg, C = enc.item_rating_stats()
+    ref = interactions.groupby("movieId")["rating"].agg(["count", "mean"]).reset_index()
+    assert agg["movieId"].tolist() == ref["movieId"].tolist()
+    assert np.array_equal(agg["n_ratings"], ref["count"])
+    assert np.allclose(agg["avg_rating"], ref["mean"])
+    assert C == pytest.approx(interactions["rating"].mean())
+
+
+def test_load_encoded_builds_once_and_memory_maps(interactions, tmp_path):
+    path = tmp_path / "interactions.parquet"
+    interactions.to_parquet(path, index=False)
+    cache = tmp_path / "encoded"
+
+    first = load_encoded(str(path), cache_dir=str(cache))
+    built = list(cache.glob("*/manifest.json"))
+    second = load_encoded(str(path), cache_dir=str(cache))
+
+    assert len(built) == 1 and list(cache.glob("*/manifest.json")) == built
+    assert isinstance(second.user, np.memmap)
+    assert second.n_rows == first.n_rows == len(interactions)
+    assert second.manifest["source"]["sha256"] == first.manifest["source"]["sha256"]
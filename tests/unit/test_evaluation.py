@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.evaluation import cached_split, split_by_user_time
+
+
+def _split_loop(df, holdout, holdout_pct):
+    # the per-user loop split_by_user_time used to run
+    df = df.dropna(subset=["userId", "movieId", "timestamp"]).copy()
+    df["userId"] = df["userId"].astype(int)
+    df["movieId"] = df["movieId"].astype(int)
+    df = df.sort_values(["userId", "timestamp"])
+    train, test = [], []
+    for _, grp in df.groupby("userId", sort=False):
+        n = len(grp)
+        if n < 2:
+            continue
+        cut = n - 1 if holdout == "last1" else n - max(1, int(np.ceil(n * holdout_pct)))
+        train.append(grp.iloc[:cut])
+        test.append(grp.iloc[cut:])
+    return pd.concat(train, ignore_index=True), pd.concat(test, ignore_index=True)
+
+
+@pytest.fixture
+def interactions():
+    rng = np.random.default_rng(3)
+    n = 2000
+    df = pd.DataFrame({
+        "userId": rng.integers(1, 300, n).astype(float),      # many 1-row users, float ids
+        "movieId": rng.integers(1, 500, n),
+        "rating": rng.integers(1, 11, n) / 2.0,
+        "timestamp": rng.integers(0, 50, n),                   # plenty of timestamp ties
+    })
+    df.loc[::97, "timestamp"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("holdout,pct", [("last1", 0.2), ("lastpct", 0.2), ("lastpct", 0.35), ("lastpct", 1.0)])
+@pytest.mark.parametrize("int_ids", [False, True])
+def test_vectorized_split_matches_loop_exactly(interactions, holdout, pct, int_ids):
+    if int_ids:
+        # integer (userId, timestamp): packed single-key sort instead of lexsort
+        interactions = interactions.dropna().astype({"userId": "int64", "timestamp": "int64"})
+    for got, ref in zip(split_by_user_time(interactions, holdout, pct), _split_loop(interactions, holdout, pct)):
+        pd.testing.assert_frame_equal(got, ref)
+
+
+def test_cached_split_round_trip(interactions, tmp_path, monkeypatch):
+    path = tmp_path / "interactions.parquet"
+    interactions.dropna().to_parquet(path, index=False)
+
+    train, test = cached_split(str(path), holdout="lastpct", holdout_pct=0.3)
+    (split_dir,) = (tmp_path / "splits").iterdir()
+    assert split_dir.name.endswith("_lastpct_0.3")
+
+    # a hit is keyed on the file's size + mtime: the encoded arrays are not loaded again
+    monkeypatch.setattr("src.evaluation.load_encoded", lambda *a, **kw: pytest.fail("cache hit loaded the encoded arrays"))
+    train2, test2 = cached_split(str(path), holdout="lastpct", holdout_pct=0.3)
+    pd.testing.assert_frame_equal(train, train2)
+    pd.testing.assert_frame_equal(test, test2)
+    assert len(train) + len(test) == len(interactions.dropna().groupby("userId").filter(lambda g: len(g) >= 2))
+
+    with pytest.raises(ValueError):
+        split_by_user_time(interactions, holdout="first1")
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.experiments.runner import ExperimentSpec, expand_grid, run_experiment, save_results
+
+
+@pytest.fixture
+def spec(tmp_path):
+    rng = np.random.default_rng(2)
+    datasets = {}
+    for name, n in [("small", 2500), ("large", 4000)]:
+        path = tmp_path / f"{name}.parquet"
+        pd.DataFrame({
+            "userId": rng.integers(1, 90, n),
+            "movieId": rng.integers(1, 160, n),
+            "rating": rng.integers(1, 11, n) / 2.0,
+            "timestamp": rng.integers(10**9, 10**9 + 10**7, n),
+        }).drop_duplicates(["userId", "movieId"]).to_parquet(path, index=False)
+        datasets[name] = str(path)
+    doc = {
+        "name": "unit",
+        "datasets": datasets,
+        "models": {"als": {"train_cf": True, "cf_model": "als", "cf_factors": 8, "cf_epochs": 3, "min_ratings": 1}},
+        "grid": {"mode": ["baseline", "cf"], "k": [5, 10], "candidate_pool": [100]},
+        "holdout": "lastpct",
+        "cache_dir": str(tmp_path / "cache"),
+    }
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps(doc), encoding="utf-8")
+    return ExperimentSpec.load(str(path))
+
+
+def test_grid_runs_in_process_and_in_pool_with_same_results(spec, tmp_path):
+    assert len(expand_grid(spec)) == 4
+    local = run_experiment(spec)
+    assert len(local) == 8
+    assert list(local[["dataset", "mode", "k"]].drop_duplicates().itertuples(index=False)) == [
+        (d, m, k) for d in ["small", "large"] for m in ["baseline", "cf"] for k in [5, 10]]
+    assert (local["users"] > 0).all() and (local["eval_s"] >= 0).all()
+
+    pooled = run_experiment(spec, workers=2)
+    metrics = ["users", "recall", "ndcg", "hit", "map"]
+    pd.testing.assert_frame_equal(pooled[metrics], local[metrics])
+
+    out = save_results(local, spec, str(tmp_path / "out"))
+    assert out.name.startswith("experiment_unit_")
+    pd.testing.assert_frame_equal(pd.read_csv(out)[metrics], local[metrics])
+
+
+def test_spec_validation():
+    with pytest.raises(ValueError, match="grid"):
+        ExperimentSpec.from_dict({"grid": {"modes": ["cf"]}})
+    with pytest.raises(ValueError, match="TrainConfig"):
+        ExperimentSpec.from_dict({"models": {"m": {"factors": 8}}})
+    with pytest.raises(ValueError, match="spec keys"):
+        ExperimentSpec.from_dict({"dataset": {}})
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.factorization import MFConfig, _als_half_step, _conflict_free_rounds, _csr, fit_factor_model, sgd_epoch_per_rating
+
+
+def _ratings(n_users=60, n_items=40, seed=0):
+    rng = np.random.default_rng(seed)
+    P = rng.normal(0, 0.7, size=(n_users, 3))
+    Q = rng.normal(0, 0.7, size=(n_items, 3))
+    u, i = np.nonzero(rng.random((n_users, n_items)) < 0.5)
+    r = np.clip(3.5 + np.einsum("ij,ij->i", P[u], Q[i]), 0.5, 5.0)
+    return pd.DataFrame({"userId": u + 1, "movieId": i + 100, "rating": r})
+
+
+@pytest.mark.parametrize("algo", ["als", "sgd"])
+def test_fit_beats_global_mean(algo):
+    df = _ratings()
+    model, info = fit_factor_model(df, MFConfig(algo=algo, n_factors=8, n_epochs=15, lr=0.02, n_threads=2))
+
+    assert info["num_users"] == df["userId"].nunique()
+    assert info["num_movies"] == df["movieId"].nunique()
+
+    est = np.array([model.predict(u, m).est for u, m in zip(df["userId"], df["movieId"])])
+    rmse = np.sqrt(np.mean((est - df["rating"]) ** 2))
+    baseline = np.sqrt(np.mean((df["rating"].mean() - df["rating"]) ** 2))
+    assert rmse < 0.8 * baseline
+
+
+def test_score_items_matches_predict_and_handles_unknowns():
+    model, _ = fit_factor_model(_ratings(), MFConfig(algo="als", n_factors=4, n_epochs=3))
+    items = np.array([100, 105, 999_999])
+    batch = model.score_items(1, items)
+    single = [model.predict(1, int(m)).est for m in items]
+    assert np.allclose(batch, single)
+
+    # unknown user -> global mean + item bias, still within the rating scale
+    cold = model.score_items(-1, items)
+    assert np.all((cold >= model.rating_min) & (cold <= model.rating_max))
+    assert not model.knows_user(-1)
+
+
+def test_per_rating_epoch_matches_sequential_updates():
+    rng = np.random.default_rng(1)
+    n_u, n_i, f, mu, lr, reg = 12, 9, 4, 3.5, 0.05, 0.02
+    u, i = rng.integers(0, n_u, 200), rng.integers(0, n_i, 200)
+    r = rng.uniform(0.5, 5.0, 200)
+    user_mask, item_mask = rng.random(n_u) < 0.7, rng.random(n_i) < 0.5
+    init = [rng.normal(0, 0.1, (n_u, f)), rng.normal(0, 0.1, (n_i, f)), rng.normal(0, 0.1, n_u), rng.normal(0, 0.1, n_i)]
+
+    pu, qi, bu, bi = (a.copy() for a in init)
+    sgd_epoch_per_rating(pu, qi, bu, bi, u, i, r, mu, lr, reg, np.random.default_rng(7), user_mask, item_mask)
+
+    # Surprise's loop, one rating at a time, in the order the rounds apply them
+    order = np.random.default_rng(7).permutation(len(r))
+    rounds = _conflict_free_rounds(u[order], i[order], user_mask, item_mask)
+    ref_pu, ref_qi, ref_bu, ref_bi = (a.copy() for a in init)
+    for n in order[np.argsort(rounds, kind="stable")]:
+        uu, ii = u[n], i[n]
+        err = r[n] - (mu + ref_bu[uu] + ref_bi[ii] + ref_pu[uu] @ ref_qi[ii])
+        p, q = ref_pu[uu].copy(), ref_qi[ii].copy()
+        if user_mask[uu]:
+            ref_bu[uu] += lr * (err - reg * ref_bu[uu])
+            ref_pu[uu] += lr * (err * q - reg * p)
+        if item_mask[ii]:
+            ref_bi[ii] += lr * (err - reg * ref_bi[ii])
+            ref_qi[ii] += lr * (err * p - reg * q)
+    for got, ref in zip([pu, qi, bu, bi], [ref_pu, ref_qi, ref_bu, ref_bi]):
+        np.testing.assert_allclose(got, ref)
+    assert np.array_equal(pu[~user_mask], init[0][~user_mask]) and np.array_equal(qi[~item_mask], init[1][~item_mask])
+
+
+@pytest.mark.parametrize("budget", [1 << 22, 64])
+def test_als_half_step_matches_per_row_ridge_solves(budget):
+    # uneven row lengths (incl. empty rows); a tiny budget forces single-row blocks
+    rng = np.random.default_rng(5)
+    rows = rng.integers(0, 40, 600) ** 2 // 40
+    cols = rng.integers(0, 25, 600)
+    resid = rng.normal(size=600)
+    indptr, c, v = _csr(rows, cols, resid, 45)
+    fixed = np.hstack([rng.normal(size=(25, 4)), np.ones((25, 1))]).astype(np.float32)
+
+    got = _als_half_step(indptr, c, v, fixed, reg=0.1, shrink=0.5, n_threads=2, chunk=7, budget=budget)
+    for row in range(45):
+        Y = fixed[c[indptr[row]:indptr[row + 1]]].astype(np.float64)
+        A = Y.T @ Y + (0.1 * max(len(Y), 1) + 0.5) * np.eye(5)
+        np.testing.assert_allclose(got[row], np.linalg.solve(A, Y.T @ v[indptr[row]:indptr[row + 1]]), rtol=1e-4, atol=1e-5)
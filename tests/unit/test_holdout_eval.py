@@ -0,0 +1,61 @@
+import json
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import src.holdout_eval as holdout_eval
+from src.evaluation import split_by_user_time
+from src.holdout_eval import HoldoutEvalConfig, evaluate_on_split, trained_models
+from src.training import TrainConfig
+
+
+def _split():
+    rng = np.random.default_rng(1)
+    n = 4000
+    df = pd.DataFrame({
+        "userId": rng.integers(1, 100, n),
+        "movieId": rng.integers(1, 200, n),
+        "rating": rng.integers(1, 11, n) / 2.0,
+        "timestamp": rng.integers(10**9, 10**9 + 10**7, n),
+    }).drop_duplicates(["userId", "movieId"])
+    return split_by_user_time(df, holdout="lastpct", holdout_pct=0.2)
+
+
+def _config(tmp_path, **train) -> HoldoutEvalConfig:
+    train = {"cf_factors": 8, **train}
+    t = TrainConfig(interactions_path=str(tmp_path / "none.parquet"), min_ratings=1, train_cf=True,
+                    cf_model="als", cf_epochs=3, **train)
+    return HoldoutEvalConfig(train=t, cache_dir=str(tmp_path / "cache"), candidate_pool=150)
+
+
+def test_models_see_only_the_train_split(tmp_path):
+    train, test = _split()
+    entry = trained_models(train, _config(tmp_path).train, str(tmp_path / "cache"))
+    run = Path((entry / "LATEST").read_text(encoding="utf-8"))
+
+    top = pd.read_parquet(run / "top_global.parquet")
+    counts = train.groupby("movieId").size()
+    assert (top.set_index("movieId")["n_ratings"] == counts.loc[top["movieId"]]).all()
+    cf_info = json.loads((run / "cf_info.json").read_text(encoding="utf-8"))
+    assert cf_info["model_file"] == "cf_mf.joblib"
+
+
+def test_cache_reused_across_eval_params_and_keyed_by_config(tmp_path, monkeypatch):
+    train, test = _split()
+    calls = []
+    real = holdout_eval.train_on_split
+    monkeypatch.setattr(holdout_eval, "train_on_split", lambda *a: calls.append(1) or real(*a))
+
+    cfg = _config(tmp_path)
+    first = evaluate_on_split(train, test, cfg)
+    assert set(first) == {"baseline", "cf"} and len(calls) == 1
+
+    again = evaluate_on_split(train, test, replace(cfg, k=5, candidate_pool=80))
+    assert len(calls) == 1
+    assert "recall@5" in again["cf"].columns
+
+    evaluate_on_split(train, test, _config(tmp_path, cf_factors=4))
+    assert len(calls) == 2
+    assert len([p for p in (tmp_path / "cache").iterdir()]) == 2
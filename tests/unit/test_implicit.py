@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.etl.merge_feedback import read_feedback_events
+from src.implicit import ImplicitConfig, _cg_half_step, build_weights, fit_implicit_model
+
+
+def test_cg_half_step_matches_exact_solve():
+    rng = np.random.default_rng(0)
+    Y = rng.normal(size=(30, 4))
+    Cm1 = sp.random(5, 30, density=0.3, random_state=0, format="csr") * 10
+    B = rng.normal(size=(5, 4))
+
+    X = _cg_half_step(np.zeros((5, 4)), Y, Cm1, B, reg=0.1, steps=8, chunk=7)
+    for u in range(5):
+        A = Y.T @ (Y * (1.0 + Cm1[u].toarray().ravel())[:, None]) + 0.1 * np.eye(4)
+        assert np.allclose(X[u], np.linalg.solve(A, B[u]), atol=1e-6)
+
+
+def test_build_weights_prefers_swipe_actions_and_keeps_skips():
+    interactions = pd.DataFrame({"userId": [1, 1], "movieId": [10, 11], "rating": [5.0, 1.0]})
+    events = pd.DataFrame({"userId": [1, 1], "movieId": [11, 12], "action": ["save", "skip"]})
+    w = build_weights(interactions, events, ImplicitConfig()).set_index("movieId")["weight"]
+    assert w[10] == 2.5    # 5.0 - pivot
+    assert w[11] == 3.0    # swipe overrides the merged 1.0 rating
+    assert w[12] == -0.5   # skip is a weak negative, not dropped
+
+
+def test_fit_ranks_cluster_items_first(tmp_path):
+    # users 1-20 like items 1-10, users 21-40 like items 11-20; everyone skips the other block
+    rows = []
+    for user in range(1, 41):
+        liked = range(1, 11) if user <= 20 else range(11, 21)
+        other = range(11, 21) if user <= 20 else range(1, 11)
+        rows += [{"user_id": user, "movieId": m, "action": "like"} for m in liked if m % 5 != user % 5]
+        rows += [{"user_id": user, "movieId": m, "action": "skip"} for m in list(other)[:3]]
+    fp = tmp_path / "feedback.jsonl"
+    fp.write_text(pd.DataFrame(rows).to_json(orient="records", lines=True))
+
+    events = read_feedback_events([fp])
+    model, info = fit_implicit_model(None, events, ImplicitConfig(n_factors=4, n_epochs=10))
+    assert info["nnz"] == len(events)
+
+    held_out = 5  # user 5 never saw item 5 or 10
+    scores = model.score_items(held_out, np.arange(1, 21))
+    assert scores[[4, 9]].min() > scores[10:].max()
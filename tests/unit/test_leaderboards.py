@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.api.filters import apply_filters
+from src.leaderboards import Leaderboards, build_leaderboards, movie_years, save_leaderboards
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    genres = ["Drama", "Comedy", "Film-Noir", "War", "Horror"]
+    n = 400
+    movies = pd.DataFrame({
+        "movieId": np.arange(n) * 3 + 1,
+        "title": [f"Movie {i} ({y})" for i, y in enumerate(rng.integers(1930, 2020, n))],
+        "genres": ["|".join(rng.choice(genres, size=rng.integers(1, 3), replace=False)) for _ in range(n)],
+    })
+    movies.loc[5, "title"] = "No Year"
+    ranked = pd.DataFrame({"movieId": rng.permutation(movies["movieId"].to_numpy())[:300]})
+    ranked["bayes_score"] = np.linspace(5, 1, len(ranked))
+    return ranked, movies
+
+
+@pytest.mark.parametrize("depth", [0, 4])
+def test_candidates_cover_every_match_in_rank_order(catalog, tmp_path, depth):
+    ranked, movies = catalog
+    save_leaderboards(tmp_path, ranked, build_leaderboards(ranked, movies, depth=depth))
+    lb = Leaderboards.load(tmp_path)
+    full = ranked.merge(movies.assign(year=movie_years(movies)), on="movieId", how="left")
+
+    # decade-aligned ranges: the leaderboards match these exactly
+    for c in [{"genres_in": ["film-noir"], "min_year": 1950, "max_year": 1959},
+              {"genres_in": ["War", "horror"]},
+              {"min_year": 1970, "max_year": 1989},
+              {"genres_in": ["comedy"], "min_year": 2000}]:
+        positions, complete = lb.candidates(c.get("genres_in"), c.get("min_year"), c.get("max_year"))
+        assert np.all(np.diff(positions) > 0)
+        expected = apply_filters(full, include_genres=c.get("genres_in"),
+                                 min_year=c.get("min_year"), max_year=c.get("max_year"))
+        got = full["movieId"].iloc[positions].tolist()
+        if complete:
+            assert got == expected["movieId"].tolist()
+        else:
+            # truncated boards still hold the best `depth` matches, in rank order
+            assert got[:depth] == expected["movieId"].head(depth).tolist()
+
+
+def test_no_constraints_means_global_table(catalog, tmp_path):
+    ranked, movies = catalog
+    save_leaderboards(tmp_path, ranked, build_leaderboards(ranked, movies))
+    assert Leaderboards.load(tmp_path).candidates() is None
+    positions, complete = Leaderboards.load(tmp_path).candidates(["sci-fi"])
+    assert len(positions) == 0 and complete
@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.benchmarks.bench_http_load import (InProcessServer, _free_port, build_requests, closed_loop,
+                                            load_workload, saturation, summarize)
+from src.llm import intent_parser, reasoning
+from src.llm.fake import FakeLLMConfig, install_fake_llm
+
+
+@pytest.fixture
+def restore_llm(monkeypatch):
+    # install_fake_llm patches module attributes: put the real ones back afterwards
+    monkeypatch.setattr(intent_parser, "get_llm", intent_parser.get_llm)
+    monkeypatch.setattr(reasoning, "get_llm", reasoning.get_llm)
+
+
+def test_fake_llm_answers_and_injected_failures(restore_llm):
+    install_fake_llm(FakeLLMConfig(latency_ms=1, jitter_ms=0))
+    intent = intent_parser.parse_mood_to_filters("a tense thriller from the 90s")
+    assert intent["constraints"] == {"genres": ["Thriller"], "year_range": [1990, 1999]}
+    assert "Heat" in reasoning.generate_reason(["Alien"], "Heat", "Crime")
+
+    install_fake_llm(FakeLLMConfig(latency_ms=1, jitter_ms=0, failure_rate=1.0))
+    assert intent_parser.parse_mood_to_filters("a comedy")["explanation"] == "Based on your request."
+    assert reasoning.generate_reason(["Alien"], "Heat", "Crime") == "Based on your taste."
+
+
+def test_workload_is_deterministic_and_follows_the_mix():
+    spec = load_workload(None)
+    users, movies = np.arange(1, 50), np.arange(1, 500)
+    a = build_requests(spec, 2000, users, movies, seed=3)
+    assert a == build_requests(spec, 2000, users, movies, seed=3)
+    share = np.mean([r[0] == "recommend" for r in a])
+    assert abs(share - spec["mix"]["recommend"] / sum(spec["mix"].values())) < 0.05
+
+
+def test_saturation_level():
+    rows = [{"endpoint": "all", "level": lvl, "qps": q, "p95_ms": p}
+            for lvl, q, p in [(1, 10, 50), (2, 19, 60), (4, 19.5, 120), (8, 19.6, 400)]]
+    assert saturation(rows, p95_budget_ms=200) == 4
+    assert saturation(rows[:2], p95_budget_ms=200) is None
+
+
+def test_closed_loop_against_in_process_server(restore_llm):
+    port = _free_port()
+    server = InProcessServer(port, FakeLLMConfig(latency_ms=2, jitter_ms=1))
+    server.start()
+    try:
+        spec = load_workload(None)
+        spec["mix"] = {"recommend": 1.0, "genres": 1.0}
+        spec["recommend"]["modes"] = {"baseline": 1.0}
+        reqs = build_requests(spec, 50, np.arange(1, 10), np.arange(1, 100))
+        results, elapsed = asyncio.run(closed_loop(f"http://127.0.0.1:{port}", reqs, 2, 1.5, 30.0))
+    finally:
+        server.stop()
+    stats = summarize(results, elapsed)
+    assert stats["all"]["requests"] > 0
+    assert stats["all"]["error_rate"] == 0.0
+    assert {"recommend", "genres"} <= set(stats)
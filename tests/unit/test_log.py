@@ -0,0 +1,26 @@
+import json
+import logging
+
+from src.api.log import InfoSampler, JsonFormatter
+
+
+def _record(level=logging.INFO, **extra):
+    rec = logging.makeLogRecord({"name": "src.api.main", "levelno": level, "levelname": logging.getLevelName(level), "msg": "mode_selected"})
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_json_formatter_emits_extra_fields():
+    line = JsonFormatter().format(_record(mode="cf", history=7))
+    payload = json.loads(line)
+    assert payload["event"] == "mode_selected"
+    assert payload["level"] == "info"
+    assert payload["logger"] == "src.api.main"
+    assert payload["mode"] == "cf" and payload["history"] == 7
+
+
+def test_info_sampler_never_drops_warnings():
+    sampler = InfoSampler(rate=0.0)
+    assert not sampler.filter(_record(logging.INFO))
+    assert sampler.filter(_record(logging.WARNING))
+    assert InfoSampler(rate=1.0).filter(_record(logging.INFO))
@@ -13,4 +13,34 @@ def test_version():
     response = client.get("/version")
     assert response.status_code == 200
     assert "api_version" in response.json()
-    assert "root_path" in response.json()
\ No newline at end of file
+    assert "root_path" in response.json()
+
+class _BaselineOnly:
+    """Serves baseline rows for every mode, like a run without trending.npz / a CF model."""
+    cf_enabled = False
+    movies_df = None
+
+    def recommend(self, **kwargs):
+        return self.recommend_baseline()
+
+    def recommend_baseline(self, **kwargs):
+        import pandas as pd
+        return pd.DataFrame({"movieId": [1, 2], "title": ["A", "B"], "genres": ["Drama", "Comedy"],
+                             "bayes_score": [4.1, 3.9]})
+
+
+@pytest.mark.parametrize("mode", ["baseline", "trending", "cf"])
+def test_recommend_falls_back_to_baseline_scores(monkeypatch, mode):
+    monkeypatch.setattr("src.api.main.get_recommender", lambda: _BaselineOnly())
+    res = client.post("/recommend", json={"k": 2, "mode": mode})
+    assert res.status_code == 200
+    assert [r["score"] for r in res.json()["recommendations"]] == [4.1, 3.9]
+
+
+def test_mode_counter_records_served_mode(monkeypatch):
+    from src.api import metrics
+    monkeypatch.setattr("src.api.main.get_recommender", lambda: _BaselineOnly())
+    served, requested = metrics.MODE_SELECTED.labels("baseline"), metrics.MODE_SELECTED.labels("trending")
+    before = served.value, requested.value
+    client.post("/recommend", json={"k": 2, "mode": "trending"})
+    assert (served.value, requested.value) == (before[0] + 1, before[1])
@@ -0,0 +1,51 @@
+from src.etl.merge_feedback import FEEDBACK_USER_ID, read_feedback, read_feedback_events
+
+
+def test_read_feedback_vectorized_mapping(tmp_path):
+    fp = tmp_path / "feedback.jsonl"
+    fp.write_text(
+        '{"user_id": 7, "movieId": 1, "action": "like", "context": {"screen": "results"}, "_ts": "2026-01-06T02:00:00"}\n'
+        '{"user_id": null, "movieId": 2, "action": "dislike", "_ts": "2026-01-06T02:00:01"}\n'
+        '{"user_id": 7, "movieId": 3, "action": "skip", "_ts": "2026-01-06T02:00:02"}\n'
+        "\n"
+        '{"user_id": 7, "movieId": 1, "action": "dislike", "_ts": "2026-01-06T02:00:03"}\n'
+        '{"user_id": 7, "movieId": 4, "action": "save", "_ts": "not-a-date"}\n',
+        encoding="utf-8",
+    )
+    df, stats = read_feedback([fp], now_ts=123)
+    df = df.sort_values("movieId").reset_index(drop=True)
+
+    assert stats["events"] == 5
+    assert df["movieId"].tolist() == [1, 2, 4]
+    # latest action per (user, movie) wins
+    assert df.loc[0, "rating"] == 1.0
+    assert df.loc[0, "timestamp"] == 1767664803
+    assert df.loc[1, "userId"] == FEEDBACK_USER_ID
+    assert df.loc[2, "timestamp"] == 123
+
+
+def test_read_feedback_skips_malformed_lines_across_blocks(tmp_path):
+    fp = tmp_path / "feedback.jsonl"
+    lines = [f'{{"user_id": 1, "movieId": {i}, "action": "like", "_ts": "2026-01-06T02:00:00"}}' for i in range(50)]
+    lines.insert(10, "{broken json")
+    fp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    df, stats = read_feedback([fp], block_size=256)
+    assert sorted(df["movieId"].tolist()) == list(range(50))
+
+
+def test_read_feedback_events_folds_blocks_like_read_feedback(tmp_path):
+    fp = tmp_path / "feedback.jsonl"
+    lines = [f'{{"user_id": 1, "movieId": {i % 20}, "action": "{a}", "_ts": "2026-01-06T02:00:{i % 60:02d}"}}'
+             for i, a in zip(range(60), ["like", "skip", "save"] * 20)]
+    lines.append('{"user_id": 1, "movieId": 99, "action": "skip", "_ts": "not-a-date"}')
+    fp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    whole = read_feedback_events([fp], now_ts=123)
+    chunked = read_feedback_events([fp], block_size=256, now_ts=123)
+    key = ["userId", "movieId"]
+    assert chunked.sort_values(key).values.tolist() == whole.sort_values(key).values.tolist()
+    assert len(chunked) == 21
+    # latest action per (user, movie) across blocks; a missing _ts falls back to now, as in read_feedback
+    assert chunked.set_index("movieId").loc[0, "action"] == "skip"   # i = 0, 20, 40: like, save, skip
+    assert chunked.set_index("movieId").loc[99, "timestamp"] == 123
@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api.metrics import Counter, Histogram
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("t_seconds", "test", labelnames=("stage",), buckets=(0.1, 1.0))
+    h.labels("a").observe(0.05)
+    h.labels("a").observe(0.5)
+    h.labels("a").observe(5.0)
+    lines = h.render()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="a"} 3' in lines
+
+
+def test_counter_renders_labels():
+    c = Counter("t_total", "test", labelnames=("mode",))
+    c.labels("cf").inc()
+    c.labels(mode="cf").inc()
+    assert 't_total{mode="cf"} 2' in c.render()
+
+
+def test_metrics_endpoint_exposes_stage_histograms():
+    client.post("/recommend", json={"k": 3, "mode": "baseline"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE recommend_stage_seconds histogram" in body
+    assert 'recommend_stage_seconds_count{stage="serialization"}' in body
+    assert 'recommend_mode_total{mode="baseline"}' in body
+    assert "recommender_catalog_size" in body
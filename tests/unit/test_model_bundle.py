@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.factorization import MFConfig, fit_factor_model
+from src.model_bundle import BUNDLE_DIR, export_bundle, load_bundle, verify_bundle
+
+
+@pytest.fixture
+def ratings():
+    rng = np.random.default_rng(0)
+    n = 800
+    # raw ids deliberately not in ascending first-seen order
+    return pd.DataFrame({
+        "userId": rng.permutation(np.repeat(np.arange(40) * 13 + 7, n // 40)),
+        "movieId": rng.integers(0, 90, n) * 17 + 3,
+        "rating": rng.integers(1, 11, n) / 2.0,
+    })
+
+
+def test_bundle_scores_match_surprise_svd(ratings, tmp_path):
+    surprise = pytest.importorskip("surprise")
+    data = surprise.Dataset.load_from_df(ratings, surprise.Reader(rating_scale=(0.5, 5.0)))
+    algo = surprise.SVD(n_factors=5, n_epochs=5, random_state=0)
+    algo.fit(data.build_full_trainset())
+
+    export_bundle(algo, tmp_path, model_file="cf_svd.joblib")
+    model = load_bundle(tmp_path / BUNDLE_DIR)
+
+    items = np.r_[ratings["movieId"].unique()[:30], -1]
+    for uid in [7, 20, 514, -5]:
+        ref = [algo.predict(uid, int(i)).est for i in items]
+        assert np.allclose(model.score_items(uid, items), ref, atol=1e-5)
+
+
+def test_bundle_roundtrip_is_memory_mapped_and_sorted(ratings, tmp_path):
+    ref, _ = fit_factor_model(ratings, MFConfig(algo="als", n_factors=4, n_epochs=3))
+    export_bundle(ref, tmp_path, model_file="cf_mf.joblib")
+    model = load_bundle(tmp_path / BUNDLE_DIR)
+
+    assert isinstance(model.item_factors, np.memmap) and not model.item_factors.flags.writeable
+    assert np.all(np.diff(model.user_ids) > 0) and np.all(np.diff(model.item_ids) > 0)
+    assert model.inner_uid(-1) == -1
+    items = np.r_[ratings["movieId"].unique(), 99999]
+    for uid in ratings["userId"].unique()[:5]:
+        assert np.allclose(model.score_items(uid, items), ref.score_items(uid, items), atol=1e-6)
+
+
+def test_verify_detects_corruption(ratings, tmp_path):
+    ref, _ = fit_factor_model(ratings, MFConfig(algo="sgd", n_factors=4, n_epochs=2))
+    bundle_dir = export_bundle(ref, tmp_path)
+    assert verify_bundle(bundle_dir) == []
+
+    path = bundle_dir / "item_bias.npy"
+    raw = bytearray(path.read_bytes())
+    raw[-1] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    assert verify_bundle(bundle_dir) == ["item_bias: sha256 mismatch"]
+    with pytest.raises(ValueError):
+        load_bundle(bundle_dir, verify=True)
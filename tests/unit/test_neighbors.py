@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src.encoded import EncodedInteractions
+from src.factorization import FactorModel
+from src.neighbors import ItemNeighbors, NeighborsConfig, cooccurrence_neighbors, factor_neighbors, save_neighbors
+
+
+@pytest.fixture
+def ratings():
+    rng = np.random.default_rng(0)
+    n = 4000
+    df = pd.DataFrame({
+        "userId": rng.integers(1, 150, n),
+        "movieId": rng.integers(1, 90, n) * 10,
+        "rating": rng.integers(1, 11, n) / 2.0,
+        "timestamp": rng.integers(10**9, 10**9 + 10**6, n),
+    })
+    return df.drop_duplicates(["userId", "movieId"])
+
+
+def _check_against_dense(arrays, ids, S, k):
+    np.fill_diagonal(S, -np.inf)
+    for row, mid in enumerate(ids):
+        j = int(np.searchsorted(arrays["movie_ids"], mid))
+        best = np.sort(S[row])[::-1][:k]
+        assert np.allclose(arrays["scores"][j].astype(np.float32), best, atol=2e-3)
+        # neighbor ids carry exactly those scores
+        cols = np.searchsorted(ids, arrays["neighbors"][j])
+        assert np.allclose(S[row, cols], arrays["scores"][j].astype(np.float32), atol=2e-3)
+
+
+def test_cooccurrence_matches_dense_cosine(ratings):
+    enc = EncodedInteractions.from_frame(ratings)
+    # tiny blocks + threads: many blocks, merged out of order
+    arrays = cooccurrence_neighbors(enc, NeighborsConfig(k=7, min_ratings=1, block_mb=0, n_threads=3))
+    assert arrays["neighbors"].dtype == np.int32 and arrays["scores"].dtype == np.float16
+
+    R = ratings.pivot_table(index="movieId", columns="userId", values="rating", fill_value=0.0)
+    X = R.to_numpy() / np.linalg.norm(R.to_numpy(), axis=1, keepdims=True)
+    _check_against_dense(arrays, R.index.to_numpy(), X @ X.T, 7)
+
+
+def test_factor_neighbors_and_lookup(tmp_path):
+    rng = np.random.default_rng(1)
+    item_ids = rng.permutation(np.arange(50) * 3 + 2)
+    Q = rng.normal(size=(50, 8)).astype(np.float32)
+    model = FactorModel(user_factors=np.zeros((1, 8), np.float32), item_factors=Q,
+                        user_bias=np.zeros(1, np.float32), item_bias=np.zeros(50, np.float32),
+                        global_mean=3.5, user_ids=np.array([1]), item_ids=item_ids)
+    arrays = factor_neighbors(model, NeighborsConfig(k=5))
+
+    order = np.argsort(item_ids)
+    Qn = Q[order] / np.linalg.norm(Q[order], axis=1, keepdims=True)
+    expected_scores = np.sort(np.where(np.eye(50, dtype=bool), -np.inf, Qn @ Qn.T), axis=1)[:, ::-1][:, :5]
+    expected_scores = np.where(expected_scores > 0, expected_scores, 0.0)
+    assert np.allclose(arrays["scores"].astype(np.float32), expected_scores, atol=2e-3)
+
+    save_neighbors(tmp_path, arrays, "factors")
+    nb = ItemNeighbors.load(tmp_path)
+    assert nb.source == "factors" and nb.k == 5
+    ids, scores = nb.similar(int(item_ids[0]))
+    assert int(item_ids[0]) not in ids.tolist()
+    assert np.all(np.diff(scores) <= 0)
+    assert nb.similar(10**6) is None
+
+
+def test_similar_endpoint_applies_filters(tmp_path, monkeypatch):
+    import src.api.main as api
+    from src.predictions import Recommender
+
+    run = tmp_path / "run_1"
+    run.mkdir()
+    (tmp_path / "LATEST").write_text(str(run))
+    save_neighbors(run, {
+        "movie_ids": np.array([1, 2], dtype=np.int32),
+        "neighbors": np.array([[3, 4, 5, -1], [1, -1, -1, -1]], dtype=np.int32),
+        "scores": np.array([[0.9, 0.8, 0.7, 0], [0.5, 0, 0, 0]], dtype=np.float16),
+    }, "cooccurrence")
+    rec = Recommender(models_dir=str(tmp_path), interactions_path=str(tmp_path / "none.parquet"))
+    rec.movies = pd.DataFrame({
+        "movieId": [1, 2, 3, 4, 5],
+        "title": ["A (1990)", "B (1991)", "C (1992)", "D (2005)", "E (1993)"],
+        "genres": ["Drama", "Comedy", "Drama", "Drama", "Horror"],
+        "year": [1990, 1991, 1992, 2005, 1993],
+    })
+    monkeypatch.setattr(api, "get_recommender", lambda: rec)
+    client = TestClient(api.app)
+
+    body = client.get("/similar/1", params={"k": 10}).json()
+    assert [m["movieId"] for m in body["recommendations"]] == [3, 4, 5]
+    assert body["recommendations"][0]["reason"] == "Similar to A (1990)."
+
+    body = client.get("/similar/1", params={"genres_in": ["drama"], "max_year": 2000}).json()
+    assert [m["movieId"] for m in body["recommendations"]] == [3]
+
+    assert client.get("/similar/99").status_code == 404
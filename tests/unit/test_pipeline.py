@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.pipeline as pipeline
+from src.pipeline import PipelineConfig, build_stages, run_pipeline
+from src.training import TrainConfig
+
+
+def _config(tmp_path, **train) -> PipelineConfig:
+    rng = np.random.default_rng(0)
+    n = 3000
+    path = tmp_path / "interactions.parquet"
+    if not path.exists():
+        pd.DataFrame({
+            "userId": rng.integers(1, 80, n),
+            "movieId": rng.integers(1, 150, n),
+            "rating": rng.integers(1, 11, n) / 2.0,
+            "timestamp": rng.integers(10**9, 10**9 + 10**7, n),
+        }).to_parquet(path, index=False)
+    t = TrainConfig(interactions_path=str(path), movies_path=None, out_dir=str(tmp_path / "models"),
+                    min_ratings=1, **train)
+    return PipelineConfig(train=t, eval_modes=["baseline"], max_users=50,
+                          cache_dir=str(tmp_path / "models" / ".pipeline_cache"), workers=1)
+
+
+def test_rerun_hits_cache_and_config_change_reruns_downstream(tmp_path):
+    first = run_pipeline(_config(tmp_path))
+    assert not any(s["cached"] for s in first["stages"].values())
+
+    again = run_pipeline(_config(tmp_path))
+    assert all(s["cached"] for s in again["stages"].values())
+    assert again["run_dir"] == first["run_dir"]
+
+    changed = run_pipeline(_config(tmp_path, bayes_m=10))
+    cached = {name: s["cached"] for name, s in changed["stages"].items()}
+    assert cached == {"encode": True, "baseline": False, "neighbors": True, "evaluate": False}
+    assert changed["run_dir"] != first["run_dir"]
+
+
+def test_latest_points_at_a_complete_run(tmp_path):
+    result = run_pipeline(_config(tmp_path))
+    models = tmp_path / "models"
+    run_dir = Path((models / "LATEST").read_text(encoding="utf-8"))
+
+    assert str(run_dir) == result["run_dir"]
+    assert {"config.json", "pipeline.json", "top_global.parquet", "neighbors.npz", "eval_summary.json"} <= {p.name for p in run_dir.iterdir()}
+    assert "stage.json" not in {p.name for p in run_dir.iterdir()}
+    assert not [p for p in models.iterdir() if ".tmp" in p.name]
+
+    meta = json.loads((run_dir / "pipeline.json").read_text(encoding="utf-8"))
+    assert set(meta["stages"]) == {"encode", "baseline", "neighbors", "evaluate"}
+
+
+def test_undeclared_dependencies_fail_instead_of_spinning(tmp_path, monkeypatch):
+    cfg = _config(tmp_path, neighbors_source="factors", train_cf=False)
+    with pytest.raises(ValueError, match="train_cf"):
+        build_stages(cfg)
+
+    # the scheduler itself refuses a graph it cannot finish
+    stages = build_stages(_config(tmp_path))
+    stages[-1].deps.append("missing")
+    monkeypatch.setattr(pipeline, "build_stages", lambda cfg: stages)
+    with pytest.raises(RuntimeError, match="evaluate"):
+        run_pipeline(_config(tmp_path))
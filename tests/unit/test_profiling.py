@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+
+client = TestClient(app)
+
+
+def test_timings_are_opt_in():
+    res = client.post("/recommend", json={"k": 3, "mode": "baseline"})
+    assert "timings" not in res.json()["intent"]
+
+    res = client.post("/recommend", json={"k": 3, "mode": "baseline"}, headers={"X-Debug-Timing": "1"})
+    timings = res.json()["intent"]["timings"]
+    stages = [s["stage"] for s in timings["stages"]]
+    assert "reason_generation" in stages
+    assert timings["elapsed_ms"] >= 0
+
+    res = client.post("/recommend", json={"k": 3, "mode": "baseline", "debug": True})
+    assert "timings" in res.json()["intent"]
+
+
+def test_profiler_samples_next_n_requests():
+    assert client.post("/admin/profile", params={"n_requests": 2}).json()["remaining"] == 2
+    for _ in range(3):
+        client.post("/recommend", json={"k": 3, "mode": "baseline"})
+
+    report = client.get("/admin/profile", params={"limit": 10}).json()
+    assert report["sampled_requests"] == 2
+    assert report["remaining"] == 0
+    assert "_recommend" in report["profile"]
+
+
+def test_profile_report_rejects_unknown_sort_keys():
+    client.post("/admin/profile", params={"n_requests": 1})
+    client.post("/recommend", json={"k": 3, "mode": "baseline"})
+    assert client.get("/admin/profile", params={"sort": "bogus"}).status_code == 422
+    assert client.get("/admin/profile", params={"sort": "tottime"}).status_code == 200
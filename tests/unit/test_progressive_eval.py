@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.batch_eval import BatchEvalConfig, evaluate_batched
+from src.evaluation import split_by_user_time
+from src.factorization import FactorModel
+from src.model_bundle import export_bundle
+from src.predictions import Recommender
+from src.progressive_eval import ProgressiveEvalConfig, mean_ci, progressive_evaluate
+
+
+@pytest.fixture
+def setup(tmp_path):
+    rng = np.random.default_rng(3)
+    n_users, n_items = 400, 80
+    df = pd.DataFrame({
+        "userId": rng.integers(1, n_users + 1, 8000),
+        "movieId": rng.integers(1, n_items + 1, 8000),
+        "rating": rng.integers(1, 11, 8000) / 2.0,
+        "timestamp": rng.integers(0, 10**6, 8000),
+    }).drop_duplicates(["userId", "movieId"])
+    train, test = split_by_user_time(df, holdout="lastpct", holdout_pct=0.3)
+
+    run = tmp_path / "run_1"
+    run.mkdir()
+    (tmp_path / "LATEST").write_text(str(run))
+    items = np.arange(1, n_items + 1)
+    pd.DataFrame({"movieId": rng.permutation(items), "bayes_score": np.linspace(5, 1, n_items)}) \
+        .to_parquet(run / "top_global.parquet", index=False)
+    model = FactorModel(
+        user_factors=rng.normal(size=(n_users, 4)).astype(np.float32),
+        item_factors=rng.normal(size=(n_items, 4)).astype(np.float32),
+        user_bias=rng.normal(size=n_users).astype(np.float32),
+        item_bias=rng.normal(size=n_items).astype(np.float32),
+        global_mean=3.5, user_ids=np.arange(1, n_users + 1), item_ids=items,
+    )
+    export_bundle(model, run, model_file="cf_mf.joblib")
+    rec = Recommender(models_dir=str(tmp_path), interactions_path=str(tmp_path / "none.parquet"), interactions_df=train)
+    rec.movies = None
+    return rec, train, test
+
+
+def test_unreachable_target_evaluates_every_user_like_batched(setup):
+    rec, train, test = setup
+    cfg = ProgressiveEvalConfig(k=10, metric="ndcg", target_width=0.0, batch_users=64, block_users=16, candidate_pool=100)
+    per_user, trace, info = progressive_evaluate({"cf": (rec, "cf")}, train, test, cfg)
+    ref = evaluate_batched(rec, train, test, BatchEvalConfig(k=10, mode="cf", candidate_pool=100))
+    assert info["stopped"] == "exhausted" and info["users"] == info["total_users"] == len(ref)
+    got = per_user.set_index("userId").loc[ref["userId"]]
+    np.testing.assert_allclose(got["cf_ndcg@10"].to_numpy(), ref["ndcg@10"].to_numpy())
+    assert trace["users"].tolist() == list(range(64, len(ref), 64)) + [len(ref)]
+    assert info["saved_s"] == pytest.approx(0.0, abs=1e-3)
+
+
+def test_stops_once_interval_is_narrow_enough(setup):
+    rec, train, test = setup
+    cfg = ProgressiveEvalConfig(k=10, target_width=0.5, batch_users=50, min_users=100, candidate_pool=100)
+    per_user, trace, info = progressive_evaluate({"baseline": (rec, "baseline")}, train, test, cfg)
+    assert info["stopped"] == "target_width" and info["users"] == 100 < info["total_users"]
+    assert len(per_user) == 100 and len(trace) == 2
+    assert info["width"] == trace["baseline_width"].iloc[-1] < 0.5
+    # the estimate for every user counts the up-front setup once and the per-batch arrays per user
+    assert info["wall_s"] >= info["setup_s"] and info["saved_s"] == pytest.approx(info["est_full_s"] - info["wall_s"], abs=2e-3)
+
+
+def test_two_models_stop_on_the_paired_difference(setup):
+    rec, train, test = setup
+    cfg = ProgressiveEvalConfig(k=10, target_width=0.0, batch_users=100, candidate_pool=100, seed=7)
+    per_user, trace, _ = progressive_evaluate({"baseline": (rec, "baseline"), "cf": (rec, "cf")}, train, test, cfg)
+    diff = per_user["baseline_recall@10"] - per_user["cf_recall@10"]
+    last = trace.iloc[-1]
+    assert last["diff_mean"] == pytest.approx(diff.mean())
+    assert last["diff_width"] == pytest.approx(mean_ci(diff.to_numpy())[1])
+    # same seeded order for both arms, and a different seed shuffles it
+    other, _, _ = progressive_evaluate({"cf": (rec, "cf")}, train, test, ProgressiveEvalConfig(k=10, target_width=0.0, candidate_pool=100))
+    assert sorted(other["userId"]) == sorted(per_user["userId"]) and other["userId"].tolist() != per_user["userId"].tolist()
+
+
+def test_mean_ci():
+    v = np.r_[np.zeros(200), np.ones(200), np.nan]
+    mean, width = mean_ci(v)
+    assert mean == 0.5
+    assert width == pytest.approx(2 * 1.959964 * np.std(v[:-1], ddof=1) / np.sqrt(400))
+    assert mean_ci(np.array([0.3]))[1] == np.inf
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.batch_eval import BatchEvalConfig, evaluate_report
+from src.evaluation import split_by_user_time
+from src.factorization import FactorModel
+from src.model_bundle import export_bundle
+from src.predictions import Recommender
+from src.sampled_eval import SampledEvalConfig, bootstrap_ci, evaluate_sampled, expected_full_metrics, fit_rank_prior
+
+
+@pytest.fixture
+def setup(tmp_path):
+    rng = np.random.default_rng(11)
+    n_users, n_items = 150, 60
+    df = pd.DataFrame({
+        "userId": rng.integers(1, n_users + 1, 3000),
+        "movieId": rng.integers(1, n_items + 1, 3000),
+        "rating": rng.integers(1, 11, 3000) / 2.0,
+        "timestamp": rng.integers(0, 10**6, 3000),
+    }).drop_duplicates(["userId", "movieId"])
+    train, test = split_by_user_time(df, holdout="last1")
+
+    run = tmp_path / "run_1"
+    run.mkdir()
+    (tmp_path / "LATEST").write_text(str(run))
+    items = np.arange(1, n_items + 1)
+    pd.DataFrame({"movieId": rng.permutation(items), "bayes_score": np.linspace(5, 1, n_items)}) \
+        .to_parquet(run / "top_global.parquet", index=False)
+    model = FactorModel(
+        user_factors=rng.normal(size=(n_users, 4)).astype(np.float32),
+        item_factors=rng.normal(size=(n_items, 4)).astype(np.float32),
+        user_bias=np.zeros(n_users, dtype=np.float32),
+        item_bias=rng.normal(size=n_items).astype(np.float32),
+        global_mean=3.5, user_ids=np.arange(1, n_users + 1), item_ids=items,
+    )
+    export_bundle(model, run, model_file="cf_mf.joblib")
+    rec = Recommender(models_dir=str(tmp_path), interactions_path=str(tmp_path / "none.parquet"), interactions_df=train)
+    rec.movies = None
+    return rec, train, test
+
+
+@pytest.mark.parametrize("mode", ["baseline", "cf"])
+@pytest.mark.parametrize("sampler", ["uniform", "popularity"])
+def test_corrected_metrics_approach_full_protocol(setup, mode, sampler):
+    # with many negatives the sampled ranks pin down the full ranks, so the estimates land near the full values
+    rec, train, test = setup
+    _, full = evaluate_report(rec, train, test, BatchEvalConfig(k=10, mode=mode, candidate_pool=100))
+    _, got = evaluate_sampled(rec, train, test, SampledEvalConfig(k=10, mode=mode, candidate_pool=100, n_negatives=3000,
+                                                                  sampler=sampler, correct=True, n_boot=200))
+    full, got = full.set_index("metric")["value"], got.set_index("metric")
+    for m in ["recall", "ndcg"]:
+        assert got.loc[f"{m}_est", "value"] == pytest.approx(full[m], abs=0.05)
+        assert got.loc[m, "value"] < 0.2   # the raw sampled metric is not an estimate of the full one
+
+
+def test_sampled_ranks_are_not_above_full_ranks(setup):
+    # negatives are drawn from the items the full protocol ranks against, so sampled hits include the full hits
+    rec, train, test = setup
+    full, _ = evaluate_report(rec, train, test, BatchEvalConfig(k=5, mode="cf", candidate_pool=100))
+    got, summary = evaluate_sampled(rec, train, test, SampledEvalConfig(k=5, mode="cf", candidate_pool=100, n_negatives=20))
+    assert got["userId"].tolist() == full["userId"].tolist()
+    assert (got["recall@5"] >= full["recall@5"]).all()
+    assert set(summary["metric"]) == {"recall", "ndcg"}
+    assert (summary["ci_low"] <= summary["value"]).all() and (summary["value"] <= summary["ci_high"]).all()
+
+
+def test_bootstrap_ci():
+    assert bootstrap_ci(np.full(50, 0.3)) == pytest.approx((0.3, 0.3, 0.3))
+    mean, lo, hi = bootstrap_ci(np.r_[np.zeros(500), np.ones(500), np.nan], n_boot=400)
+    assert mean == 0.5 and lo < 0.5 < hi
+    assert hi - lo == pytest.approx(2 * 1.96 * 0.5 / np.sqrt(1000), rel=0.2)
+
+
+def test_expected_full_metrics():
+    hit, ndcg = expected_full_metrics(n_items=8, n_negatives=50, k=10)
+    np.testing.assert_allclose(hit, 1.0)
+    hit, ndcg = expected_full_metrics(n_items=1000, n_negatives=100, k=10)
+    assert np.all(np.diff(hit) <= 1e-12) and np.all(ndcg <= hit)
+    # nothing above among 100 of 999: P(R - 1 <= 9) under the posterior ~ exp(-0.1 (R - 1)), not 1
+    assert hit[0] == pytest.approx(1 - np.exp(-1), abs=0.02)
+
+
+def test_fitted_rank_prior_tracks_a_skewed_model():
+    # a good model puts held-out items near the top; the flat prior spreads them over the catalog
+    rng = np.random.default_rng(0)
+    n_items, n = 1000, 100
+    R = np.minimum(rng.geometric(1 / 40, 2000), n_items)
+    j = rng.binomial(n, (R - 1) / (n_items - 1))
+    truth = (R <= 10).mean()
+    flat = expected_full_metrics(n_items, n, 10)[0][j].mean()
+    prior = fit_rank_prior(n_items, n, np.bincount(j, minlength=n + 1))
+    fitted = expected_full_metrics(n_items, n, 10, prior)[0][j].mean()
+    assert prior.sum() == pytest.approx(1.0) and prior[:10].sum() > 10 / n_items
+    assert abs(fitted - truth) < 0.015 < abs(flat - truth)
+
+
+def test_cutoffs_at_or_above_n_negatives_are_rejected(setup):
+    rec, train, test = setup
+    with pytest.raises(ValueError, match="n_negatives"):
+        evaluate_sampled(rec, train, test, SampledEvalConfig(k=10, ks=(20,), mode="cf", n_negatives=20))
+
+
+@pytest.mark.parametrize("sampler", ["uniform", "popularity"])
+def test_corrected_recall_below_n_negatives(setup, sampler):
+    # 20 negatives for 60 items: one sampled position spans ~3 full ranks, below both cutoffs
+    rec, train, test = setup
+    _, full = evaluate_report(rec, train, test, BatchEvalConfig(k=5, ks=(10,), mode="cf", candidate_pool=100))
+    _, got = evaluate_sampled(rec, train, test, SampledEvalConfig(k=5, ks=(10,), mode="cf", candidate_pool=100, n_negatives=20,
+                                                                  sampler=sampler, correct=True, n_boot=50))
+    full, got = full.set_index(["metric", "k"])["value"], got.set_index(["metric", "k"])["value"]
+    for k in [5, 10]:
+        assert got[("recall_est", k)] == pytest.approx(full[("recall", k)], abs=0.04)
+        assert abs(got[("recall", k)] - full[("recall", k)]) > 0.05
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.factorization import MFConfig, fit_factor_model
+from src.streaming import StreamConfig, movie_rating_stats, plan_memory, train_streaming_sgd
+
+
+@pytest.fixture
+def ratings_path(tmp_path):
+    rng = np.random.default_rng(0)
+    P, Q = rng.normal(0, 0.7, (80, 3)), rng.normal(0, 0.7, (50, 3))
+    u, i = np.nonzero(rng.random((80, 50)) < 0.4)
+    r = np.clip(np.round((3.5 + np.einsum("ij,ij->i", P[u], Q[i])) * 2) / 2, 0.5, 5.0)
+    df = pd.DataFrame({"userId": u + 1, "movieId": i + 1000, "rating": r, "timestamp": np.arange(len(u))})
+    df = df.astype({"userId": "Int64", "movieId": "Int64"})
+    df.loc[3, "movieId"] = pd.NA  # dropped, like load_interactions does
+    path = tmp_path / "interactions.parquet"
+    df.to_parquet(path, index=False, row_group_size=200)
+    return path, df.dropna()
+
+
+def test_movie_rating_stats_matches_groupby(ratings_path):
+    path, df = ratings_path
+    agg, C = movie_rating_stats(str(path), batch_rows=128)
+    ref = df.groupby("movieId")["rating"].agg(["count", "mean", "std"]).reset_index()
+    assert agg["movieId"].tolist() == ref["movieId"].tolist()
+    assert np.array_equal(agg["n_ratings"], ref["count"])
+    assert np.allclose(agg["avg_rating"], ref["mean"])
+    assert np.allclose(agg["std_rating"], ref["std"].fillna(0.0))
+    assert C == pytest.approx(df["rating"].mean())
+
+
+def test_streaming_sgd_matches_in_memory_quality(ratings_path):
+    path, df = ratings_path
+    cfg = StreamConfig(memory_budget_mb=64, batch_rows=128, mix_groups=2, n_factors=8, n_epochs=30, lr=0.02)
+    model, info = train_streaming_sgd(str(path), cfg)
+    ref, _ = fit_factor_model(df, MFConfig(algo="sgd", n_factors=8, n_epochs=30, lr=0.02))
+
+    assert info["trained_rows"] == len(df)
+    assert info["row_groups"] > 1
+
+    def rmse(m):
+        est = np.array([m.predict(u, i).est for u, i in zip(df["userId"], df["movieId"])])
+        return np.sqrt(np.mean((est - df["rating"].to_numpy()) ** 2))
+
+    assert rmse(model) < rmse(ref) * 1.1
+
+
+def test_plan_memory_rejects_budget_below_fixed_costs():
+    with pytest.raises(ValueError, match="too small"):
+        plan_memory(1_000_000, 100_000, StreamConfig(memory_budget_mb=64, n_factors=100))
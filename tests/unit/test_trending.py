@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.trending import FeedbackTail, TrendingConfig, TrendingState
+
+DAY = 86400
+
+
+def test_incremental_updates_match_one_pass(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    movies = rng.integers(1, 300, n)
+    ratings = rng.integers(1, 11, n) / 2.0
+    ts = np.sort(rng.integers(0, 400 * DAY, n)) + 1_400_000_000
+    cfg = TrendingConfig(half_life_days=7.0)
+
+    full = TrendingState.from_history(movies, ratings, ts, cfg)
+    inc = TrendingState.from_history(movies[:1000], ratings[:1000], ts[:1000], cfg)
+    for s in range(1000, n, 137):
+        inc.update(movies[s:s + 137], ratings[s:s + 137], ts[s:s + 137])
+
+    a, b = full.ranked(), inc.ranked()
+    assert a["movieId"].tolist() == b["movieId"].tolist()
+    assert np.allclose(a["trend_count"], b["trend_count"], rtol=1e-9)
+    assert np.allclose(a["trend_score"], b["trend_score"])
+
+    full.save(tmp_path)
+    loaded = TrendingState.load(tmp_path)
+    assert loaded.ranked()["movieId"].tolist() == a["movieId"].tolist()
+
+
+def test_counts_halve_every_half_life():
+    t0 = 1_700_000_000
+    state = TrendingState.from_history(np.array([1, 2]), np.array([4.0, 4.0]), np.array([t0, t0]),
+                                       TrendingConfig(half_life_days=10.0))
+    assert state.ranked(now=t0 + 10 * DAY)["trend_count"].tolist() == pytest.approx([0.5, 0.5])
+
+    # a burst of recent likes outranks an older, equally rated movie
+    state.update([2, 2, 2], [5.0, 5.0, 5.0], [t0 + 30 * DAY] * 3)
+    assert state.ranked()["movieId"].tolist() == [2, 1]
+
+
+def test_feedback_tail_reads_only_new_complete_lines(tmp_path):
+    path = tmp_path / "feedback.jsonl"
+    line = lambda mid, action: json.dumps({"user_id": 1, "movieId": mid, "action": action,
+                                           "_ts": "2026-01-06T02:02:48"}) + "\n"
+    path.write_text(line(10, "like") + line(11, "skip"))
+    tail = FeedbackTail(path)
+
+    first = tail.read_new()
+    assert first["movieId"].tolist() == [10]          # skip has no rating
+    assert tail.read_new().empty
+
+    with path.open("a") as f:
+        f.write(line(12, "dislike") + '{"user_id": 1, "movieId": 13')   # second line still being written
+    assert tail.read_new()["movieId"].tolist() == [12]
+
+    path.unlink()                                      # rotated by merge_feedback
+    path.write_text(line(14, "save"))
+    assert tail.read_new()["movieId"].tolist() == [14]
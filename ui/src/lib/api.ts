@@ -1,6 +1,6 @@
 export const API_BASE = import.meta.env.VITE_API_BASE ?? "http://localhost:8000";
 
-export type RecommendMode = "baseline" | "cf" | "auto";
+export type RecommendMode = "baseline" | "trending" | "cf" | "auto";
 
 export type RecommendRequest = {
   user_id?: number | null;
@@ -8,6 +8,7 @@ export type RecommendRequest = {
   k?: number;
   mode?: RecommendMode;
   candidate_pool?: number;
+  debug?: boolean;
   constraints?: {
     genres_in?: string[];
     genres_out?: string[];